@@ -0,0 +1,419 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+from urllib.parse import urlencode
+
+import networkx as nx
+
+from pynlp5.knowledge_graph import KnowledgeGraph
+from pynlp5.snapshot import GraphSnapshot
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+DATA_DIR = os.path.join(dir_name, "..", "data")
+SERVICES_DIR = os.path.join(dir_name, "..", "services")
+RESULTS_DIR = os.path.join(dir_name, "results")
+
+TEXT_PATHS = [os.path.join(DATA_DIR, f"00{i}ssb_line.txt") for i in range(1, 6)]
+CHARACTER_PATH = os.path.join(DATA_DIR, "characters.txt")
+ALIAS_PATH = os.path.join(DATA_DIR, "character_aliases.json")
+
+
+# Parse arguments
+def get_args():
+    parser = argparse.ArgumentParser(description="Benchmark the knowledge graph")
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=[1, 10],
+        help="sizes of the corpora, as multiples of the five books (1 is the real books)",
+    )
+    parser.add_argument(
+        "--queries", type=int, default=200, help="number of calls of every query"
+    )
+    parser.add_argument(
+        "--processes", type=int, default=1, help="number of processes to build with"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random corpora and queries")
+    parser.add_argument(
+        "-o", "--output", type=str, default=None, help="output json file, defaults to results/<commit>.json"
+    )
+    parser.add_argument(
+        "--compare",
+        type=str,
+        nargs=2,
+        metavar=("BASELINE", "CANDIDATE"),
+        help="compare two result files instead of running the benchmarks",
+    )
+    return parser.parse_args()
+
+
+# ================================================================================================
+# Measurements
+# ================================================================================================
+
+
+def peak_rss_mb() -> float:
+    """Return the peak resident set size of the process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def timed(function: Callable, *args, **kwargs) -> float:
+    """Call a function and return how long it took in seconds."""
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Return a percentile of sorted values, with the nearest rank method."""
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def latency_stats(latencies: List[float]) -> Dict[str, float]:
+    """Summarize latencies in seconds as milliseconds percentiles."""
+    values = sorted(latency * 1000 for latency in latencies)
+    return {
+        "calls": len(values),
+        "mean_ms": sum(values) / len(values),
+        "p50_ms": percentile(values, 0.50),
+        "p90_ms": percentile(values, 0.90),
+        "p99_ms": percentile(values, 0.99),
+        "max_ms": values[-1],
+    }
+
+
+def measure(calls: List[Callable[[], object]]) -> Dict[str, float]:
+    """Run the calls one after the other and return their latency percentiles.
+    Calls that raise a networkx error (no path, unknown node) still count, they are answers too.
+    """
+    latencies = []
+    errors = 0
+    for call in calls:
+        start = time.perf_counter()
+        try:
+            call()
+        except nx.NetworkXException:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+
+    stats = latency_stats(latencies)
+    stats["errors"] = errors
+    return stats
+
+
+# ================================================================================================
+# Corpora
+# ================================================================================================
+
+
+def make_corpus(scale: int, directory: str, seed: int) -> List[str]:
+    """Return the text files of a corpus scale times the size of the books.
+    The synthetic corpora repeat the lines of the books, every copy shuffled differently,
+    so the mentions have the same distribution as the real text but the graph is not simply multiplied.
+
+    Args:
+        scale (int): The size of the corpus, as a multiple of the books.
+        directory (str): The directory where the synthetic corpus is written.
+        seed (int): The seed of the shuffles.
+
+    Returns:
+        List[str]: The paths to the text files.
+    """
+    if scale == 1:
+        return TEXT_PATHS
+
+    lines = []
+    for text_path in TEXT_PATHS:
+        with open(text_path, "r") as f:
+            lines.extend(f)
+
+    rng = random.Random(seed)
+    corpus_path = os.path.join(directory, f"corpus_x{scale}.txt")
+    with open(corpus_path, "w") as f:
+        for _ in range(scale):
+            rng.shuffle(lines)
+            f.writelines(lines)
+
+    return [corpus_path]
+
+
+def count_lines(text_paths: List[str]) -> int:
+    """Count the lines of the text files."""
+    lines = 0
+    for text_path in text_paths:
+        with open(text_path, "rb") as f:
+            lines += sum(1 for _ in f)
+    return lines
+
+
+# ================================================================================================
+# Benchmarks
+# ================================================================================================
+
+
+def query_calls(kg, characters: List[str], rng: random.Random, count: int) -> Dict[str, List[Callable]]:
+    """Return the calls of every query method, with random characters as arguments."""
+
+    def pick():
+        return rng.choice(characters)
+
+    calls = {
+        "get_characters": [kg.get_characters] * count,
+        "get_character_neighbors_depth_1": [
+            (lambda c: lambda: kg.get_character_neighbors(c, 1))(pick()) for _ in range(count)
+        ],
+        "get_character_neighbors_depth_2": [
+            (lambda c: lambda: kg.get_character_neighbors(c, 2))(pick()) for _ in range(count)
+        ],
+        "get_character_with_most_connections": [kg.get_character_with_most_connections] * count,
+        "get_top_connected_characters": [lambda: kg.get_top_connected_characters(10)] * count,
+        "get_connected_components": [kg.get_connected_components] * count,
+        "shortest_path_between_characters": [
+            (lambda c1, c2: lambda: kg.shortest_path_between_characters(c1, c2))(pick(), pick())
+            for _ in range(count)
+        ],
+    }
+    if hasattr(kg, "get_isolated_characters"):
+        calls["get_isolated_characters"] = [kg.get_isolated_characters] * count
+
+    return calls
+
+
+def endpoint_requests(characters: List[str], rng: random.Random, count: int) -> Dict[str, List[str]]:
+    """Return the urls of the requests to every query endpoint, with random characters as arguments."""
+
+    def pick():
+        return rng.choice(characters)
+
+    return {
+        "/get_characters": ["/get_characters"] * count,
+        "/neighbors": [
+            "/neighbors?" + urlencode({"character": pick(), "distance": 1}) for _ in range(count)
+        ],
+        "/get_character_with_most_connections": ["/get_character_with_most_connections"] * count,
+        "/get_isolated_characters": ["/get_isolated_characters"] * count,
+        "/shortest_path": [
+            "/shortest_path?" + urlencode({"character1": pick(), "character2": pick()})
+            for _ in range(count)
+        ],
+        "/top_connected_characters": ["/top_connected_characters?n=10"] * count,
+        "/connected_components": ["/connected_components"] * count,
+    }
+
+
+def benchmark_endpoints(kg, characters: List[str], rng: random.Random, count: int) -> Dict[str, dict]:
+    """Measure the latencies of the query endpoints of the backend, with the flask test client.
+    The result cache is cleared before every request, so we measure the work of the endpoint and not the cache.
+    The endpoints print the results, we silence them.
+    """
+    sys.path.insert(0, SERVICES_DIR)
+    import backend
+
+    backend.store.swap(kg)
+    # The failed requests are counted in the results, we don't need their tracebacks.
+    backend.app.logger.disabled = True
+    client = backend.app.test_client()
+
+    results = {}
+    for endpoint, urls in endpoint_requests(characters, rng, count).items():
+        statuses = []
+
+        def request(url):
+            backend.result_cache.clear()
+            statuses.append(client.get(url).status_code)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[endpoint] = measure([(lambda url: lambda: request(url))(url) for url in urls])
+        results[endpoint]["server_errors"] = sum(status >= 500 for status in statuses)
+
+    return results
+
+
+def benchmark_scale(scale: int, queries: int, processes: int, seed: int) -> dict:
+    """Run every benchmark on a corpus of one scale, in the current process.
+
+    Args:
+        scale (int): The size of the corpus, as a multiple of the books.
+        queries (int): The number of calls of every query.
+        processes (int): The number of processes to build with.
+        seed (int): The seed of the corpus and the queries.
+
+    Returns:
+        dict: The results.
+    """
+    result = {"scale": scale}
+    rng = random.Random(seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        text_paths = make_corpus(scale, directory, seed)
+        line_count = count_lines(text_paths)
+        byte_count = sum(os.path.getsize(text_path) for text_path in text_paths)
+        result["corpus"] = {"files": len(text_paths), "lines": line_count, "bytes": byte_count}
+
+        # The graph is built from an empty text first, so we can time the preprocessing alone.
+        empty_path = os.path.join(directory, "empty.txt")
+        open(empty_path, "w").close()
+        kg = KnowledgeGraph(empty_path, CHARACTER_PATH, ALIAS_PATH)
+        result["compile_characters_regex_s"] = timed(kg.compile_characters_regex)
+        result["compile_mention_matcher_s"] = timed(kg.compile_mention_matcher)
+
+        if processes == 1:
+            build_s = sum(timed(kg.build_kg, text_path) for text_path in text_paths)
+        else:
+            build_s = timed(kg.build_kg_parallel, text_paths, processes)
+        result["build"] = {
+            "processes": processes,
+            "seconds": build_s,
+            "lines_per_s": line_count / build_s,
+            "mb_per_s": byte_count / build_s / (1024 * 1024),
+            "nodes": kg.kg.number_of_nodes(),
+            "edges": kg.kg.number_of_edges(),
+        }
+
+        json_path = os.path.join(directory, "kg.json")
+        snapshot_path = os.path.join(directory, "kg.snapshot")
+        result["serialize_kg_s"] = timed(kg.serialize_kg, json_path)
+        result["serialize_snapshot_s"] = timed(kg.serialize_snapshot, snapshot_path)
+        result["deserialize_kg_s"] = timed(
+            KnowledgeGraph, empty_path, CHARACTER_PATH, ALIAS_PATH, json_path
+        )
+        result["deserialize_snapshot_s"] = timed(
+            KnowledgeGraph, empty_path, CHARACTER_PATH, ALIAS_PATH, snapshot_path
+        )
+        start = time.perf_counter()
+        snapshot = GraphSnapshot(snapshot_path)
+        result["open_snapshot_s"] = time.perf_counter() - start
+
+        characters = list(kg.get_characters())
+        result["queries"] = {
+            name: measure(calls)
+            for name, calls in query_calls(kg, characters, rng, queries).items()
+        }
+        result["snapshot_queries"] = {
+            name: measure(calls)
+            for name, calls in query_calls(snapshot, characters, rng, queries).items()
+        }
+        result["endpoints"] = benchmark_endpoints(kg, characters, rng, queries)
+        snapshot.close()
+
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_scale(scale: int, queries: int, processes: int, seed: int) -> dict:
+    """Run the benchmarks of a scale in a new process, so the peak RSS is the peak of this scale only."""
+    context = multiprocessing.get_context("spawn")
+    pool = context.Pool(1)
+    try:
+        return pool.apply(benchmark_scale, (scale, queries, processes, seed))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def git_commit() -> str:
+    """Return the commit of the repository, None if it is not a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=dir_name,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ================================================================================================
+# Comparison
+# ================================================================================================
+
+
+def flatten(result: dict, prefix: str = "") -> Dict[str, float]:
+    """Flatten the nested results into "path.to.value" keys, keeping only the numbers."""
+    values = {}
+    for key, value in result.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = value
+    return values
+
+
+def compare(baseline_path: str, candidate_path: str) -> None:
+    """Print the ratio candidate / baseline of every timing of two result files."""
+    with open(baseline_path, "r") as f:
+        baseline = json.load(f)
+    with open(candidate_path, "r") as f:
+        candidate = json.load(f)
+
+    print(f"baseline:  {baseline['commit']}\ncandidate: {candidate['commit']}")
+    baseline_scales = {result["scale"]: result for result in baseline["results"]}
+    for result in candidate["results"]:
+        if result["scale"] not in baseline_scales:
+            continue
+        old = flatten(baseline_scales[result["scale"]])
+        new = flatten(result)
+        print(f"\nscale x{result['scale']}")
+        for name in sorted(set(old) & set(new)):
+            timing = name.endswith(("_s", "_ms", ".seconds")) or "_per_s" in name or name.endswith("_mb")
+            if not timing or old[name] == 0:
+                continue
+            print(f"  {name:70} {old[name]:12.4f} {new[name]:12.4f} {new[name] / old[name]:8.2f}x")
+
+
+if __name__ == "__main__":
+    args = get_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    results = []
+    for scale in args.scales:
+        print(f"Benchmarking x{scale}...")
+        results.append(run_scale(scale, args.queries, args.processes, args.seed))
+        build = results[-1]["build"]
+        print(
+            f"  built {results[-1]['corpus']['lines']} lines in {build['seconds']:.2f}s "
+            f"({build['lines_per_s']:.0f} lines/s), peak RSS {results[-1]['peak_rss_mb']:.0f} MB"
+        )
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "arguments": {
+            "scales": args.scales,
+            "queries": args.queries,
+            "processes": args.processes,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{(commit or 'local')[:12]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Results saved to {}".format(output))
@@ -0,0 +1,257 @@
+import os
+import random
+from multiprocessing import Pool
+from typing import Dict, List, Sequence, Tuple, Union
+
+import networkx as nx
+
+from pynlp5.metrics import METRICS
+
+# The community detection algorithms.
+# louvain: the communities that maximise the modularity of the weighted graph, the default.
+# label_propagation: every character takes the community of most of its (weighted) neighbors, faster and coarser.
+LOUVAIN = "louvain"
+LABEL_PROPAGATION = "label_propagation"
+COMMUNITY_ALGORITHMS = [LOUVAIN, LABEL_PROPAGATION]
+
+# The number of sources of the approximate betweenness, 0 means all the characters (the exact betweenness).
+# The exact betweenness of the five books takes seconds, 256 sources take a fraction of it with a few percent of error on the top characters.
+BETWEENNESS_SAMPLES = 256
+
+# The graph of the worker processes of the betweenness, set by init_worker.
+worker_graph = None
+
+
+def detect_communities(graph: nx.Graph, algorithm: str = LOUVAIN, seed: int = 0) -> List[int]:
+    """Find the communities of a graph, the groups of characters more connected to each other than to the rest.
+
+    Args:
+        graph (nx.Graph): The graph.
+        algorithm (str, optional): "louvain" or "label_propagation". Defaults to "louvain".
+        seed (int, optional): The seed of the random order of the algorithms, the same seed gives the same communities. Defaults to 0.
+
+    Raises:
+        ValueError: If the algorithm is unknown.
+
+    Returns:
+        List[int]: The community of every node, in the order of the graph. The largest community is 0, then the next largest...
+    """
+    if algorithm == LOUVAIN:
+        communities = nx.community.louvain_communities(graph, weight="weight", seed=seed)
+    elif algorithm == LABEL_PROPAGATION:
+        communities = nx.community.asyn_lpa_communities(graph, weight="weight", seed=seed)
+    else:
+        raise ValueError(f"Unknown community algorithm {algorithm}, expected one of {', '.join(COMMUNITY_ALGORITHMS)}.")
+
+    node_ids = {node: i for i, node in enumerate(graph.nodes())}
+    # Communities of the same size are ordered by their first node, so the ids don't depend on the order of the sets.
+    communities = sorted(
+        (sorted(node_ids[node] for node in community) for community in communities),
+        key=lambda community: (-len(community), community[0]),
+    )
+    membership = [0] * len(node_ids)
+    for community_id, community in enumerate(communities):
+        for node in community:
+            membership[node] = community_id
+
+    return membership
+
+
+def init_worker(graph: nx.Graph) -> None:
+    """Store the graph in the worker process, it is sent once and not with every chunk of sources."""
+    global worker_graph
+    worker_graph = graph
+
+
+def betweenness_chunk(sources: List[str]) -> Dict[str, float]:
+    """Return the betweenness of the shortest paths from some sources to every node, in a worker process."""
+    return nx.betweenness_centrality_subset(worker_graph, sources, list(worker_graph), normalized=False)
+
+
+def approximate_betweenness(
+    graph: nx.Graph, samples: int = BETWEENNESS_SAMPLES, seed: int = 0, processes: int = 1
+) -> List[float]:
+    """Compute the betweenness centrality of the nodes, the fraction of the shortest paths between other nodes that go through a node.
+    The paths are counted in number of edges, like the shortest paths of the knowledge graph.
+    With samples, only the paths from a random sample of sources are counted and scaled up (Brandes and Pich),
+    the sources are the ones networkx.betweenness_centrality picks with the same seed, so the results are the same.
+    The sources are split between processes, every process counts the paths from its sources and we add them up.
+
+    Args:
+        graph (nx.Graph): The graph.
+        samples (int, optional): The number of sources, 0 (or more than the number of nodes) for all of them. Defaults to BETWEENNESS_SAMPLES.
+        seed (int, optional): The seed of the sample. Defaults to 0.
+        processes (int, optional): The number of processes, None means the number of CPUs. Defaults to 1.
+
+    Returns:
+        List[float]: The normalised betweenness of every node, in the order of the graph.
+    """
+    nodes = list(graph.nodes())
+    n = len(nodes)
+    if n <= 2:
+        return [0.0] * n
+
+    sources = nodes
+    if 0 < samples < n:
+        sources = random.Random(seed).sample(nodes, samples)
+
+    if processes == 1:
+        init_worker(graph)
+        partials = [betweenness_chunk(sources)]
+    else:
+        processes = processes or os.cpu_count()
+        with Pool(processes, initializer=init_worker, initargs=(graph,)) as pool:
+            # A few chunks per process, so a process with slow sources doesn't keep the others waiting.
+            chunk_count = 4 * processes
+            chunks = [sources[i::chunk_count] for i in range(chunk_count) if sources[i::chunk_count]]
+            partials = pool.map(betweenness_chunk, chunks)
+
+    # The subsets count every path once per direction and halve it, we count them twice again.
+    # Then we divide by the number of (source, target) pairs that could go through the node,
+    # a source is not on its own paths so the sources of the sample have one source less.
+    sampled = set(sources)
+    betweenness = []
+    for node in nodes:
+        pairs = (len(sources) - (node in sampled)) * (n - 2)
+        betweenness.append(2 * sum(partial[node] for partial in partials) / pairs if pairs else 0.0)
+
+    return betweenness
+
+
+class GraphAnalytics:
+    def __init__(
+        self,
+        nodes: Sequence[str],
+        communities: Sequence[int],
+        pagerank: Sequence[float],
+        betweenness: Sequence[float],
+        samples: int = 0,
+        version: int = 0,
+    ) -> None:
+        """The communities and the centralities of the characters of a graph, computed once per version of the graph.
+        Computing them takes from a fraction of a second to seconds, so they are computed ahead (after a build, in a background job)
+        and the queries only read them: a character is a dictionary lookup and the top characters are a slice of a sorted list.
+
+        Args:
+            nodes (Sequence[str]): The characters, in the order of the graph.
+            communities (Sequence[int]): The community of every character, 0 is the largest community.
+            pagerank (Sequence[float]): The weighted PageRank of every character.
+            betweenness (Sequence[float]): The (approximate) betweenness of every character.
+            samples (int, optional): The number of sources of the betweenness, 0 if it is exact. Defaults to 0.
+            version (int, optional): The version of the graph the analytics were computed from. Defaults to 0.
+        """
+        self.nodes = list(nodes)
+        self.node_ids = {node: i for i, node in enumerate(self.nodes)}
+        self.communities = list(communities)
+        self.pagerank = list(pagerank)
+        self.betweenness = list(betweenness)
+        self.samples = samples
+        self.version = version
+
+        # The members of every community, and the characters sorted by every centrality (with their position in the order).
+        self.community_members = [[] for _ in range(max(self.communities, default=-1) + 1)]
+        for node, community in zip(self.nodes, self.communities):
+            self.community_members[community].append(node)
+        self.rankings = {
+            "pagerank": sorted(range(len(self.nodes)), key=lambda i: (-self.pagerank[i], i)),
+            "betweenness": sorted(range(len(self.nodes)), key=lambda i: (-self.betweenness[i], i)),
+        }
+        self.ranks = {name: {node: rank for rank, node in enumerate(ranking)} for name, ranking in self.rankings.items()}
+
+    @classmethod
+    def compute(
+        cls,
+        graph: nx.Graph,
+        version: int = 0,
+        algorithm: str = LOUVAIN,
+        samples: int = BETWEENNESS_SAMPLES,
+        seed: int = 0,
+        processes: int = 1,
+    ) -> "GraphAnalytics":
+        """Compute the analytics of a graph, the time they take is recorded in the metrics as "analytics.<measure>".
+
+        Args:
+            graph (nx.Graph): The graph.
+            version (int, optional): The version of the graph. Defaults to 0.
+            algorithm (str, optional): The community detection algorithm, see COMMUNITY_ALGORITHMS. Defaults to "louvain".
+            samples (int, optional): The number of sources of the betweenness, 0 for the exact betweenness. Defaults to BETWEENNESS_SAMPLES.
+            seed (int, optional): The seed of the communities and of the sources. Defaults to 0.
+            processes (int, optional): The number of processes of the betweenness, None means the number of CPUs. Defaults to 1.
+
+        Raises:
+            ValueError: If the algorithm is unknown.
+
+        Returns:
+            GraphAnalytics: The analytics.
+        """
+        with METRICS.timer("analytics"):
+            with METRICS.timer("analytics.communities"):
+                communities = detect_communities(graph, algorithm, seed)
+
+            with METRICS.timer("analytics.pagerank"):
+                pagerank = nx.pagerank(graph, weight="weight") if len(graph) else {}
+
+            with METRICS.timer("analytics.betweenness"):
+                betweenness = approximate_betweenness(graph, samples, seed, processes)
+
+        samples = samples if 0 < samples < len(graph) else 0
+        return cls(graph.nodes(), communities, [pagerank[node] for node in graph.nodes()], betweenness, samples, version)
+
+    def to_dict(self) -> dict:
+        """Return the analytics as json serializable lists, they are saved next to the graph."""
+        return {
+            "nodes": self.nodes,
+            "communities": self.communities,
+            "pagerank": self.pagerank,
+            "betweenness": self.betweenness,
+            "samples": self.samples,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, version: int = 0) -> "GraphAnalytics":
+        """Load the analytics saved by to_dict."""
+        return cls(data["nodes"], data["communities"], data["pagerank"], data["betweenness"], data["samples"], version)
+
+    def node_id(self, character: str) -> int:
+        """Return the position of a character.
+
+        Raises:
+            nx.NodeNotFound: If the character is not in the graph.
+        """
+        if character not in self.node_ids:
+            raise nx.NodeNotFound(f"The character {character} is not in the graph.")
+        return self.node_ids[character]
+
+    def get_communities(self) -> List[List[str]]:
+        """Return the characters of every community, from the largest."""
+        return self.community_members
+
+    def get_community(self, character: str) -> Tuple[int, List[str]]:
+        """Return the community of a character and its characters."""
+        community = self.communities[self.node_id(character)]
+        return community, self.community_members[community]
+
+    def top(self, measure: str, k: int = 10, offset: int = 0) -> List[Tuple[str, float]]:
+        """Return the k most central characters after the first offset ones.
+
+        Args:
+            measure (str): "pagerank" or "betweenness".
+            k (int, optional): The number of characters. Defaults to 10.
+            offset (int, optional): The number of more central characters to skip. Defaults to 0.
+
+        Returns:
+            List[Tuple[str, float]]: The characters and their centralities, from the most central.
+        """
+        scores = getattr(self, measure)
+        return [(self.nodes[i], scores[i]) for i in self.rankings[measure][offset : offset + max(k, 0)]]
+
+    def centrality(self, character: str) -> Dict[str, Union[int, float]]:
+        """Return the community, the centralities of a character and its rank for every centrality (0 is the most central)."""
+        node = self.node_id(character)
+        return {
+            "community": self.communities[node],
+            "pagerank": self.pagerank[node],
+            "pagerank_rank": self.ranks["pagerank"][node],
+            "betweenness": self.betweenness[node],
+            "betweenness_rank": self.ranks["betweenness"][node],
+        }
@@ -0,0 +1,451 @@
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Tuple
+
+import networkx as nx
+
+from pynlp5.analytics import GraphAnalytics
+from pynlp5.k_paths import MAX_PATH_LENGTH
+from pynlp5.metrics import METRICS
+from pynlp5.paging import decode_cursor, page
+from pynlp5.temporal import parse_time_range
+from pynlp5.wire import CYTOSCAPE, encode_graph
+
+# The maximum number of queries of a batch, a batch is answered on one thread and its queries can be deep searches.
+MAX_BATCH_QUERIES = 100
+
+# The arguments of every query type, with their type and default value, None means that the argument is required.
+# The names of the query types and of the arguments are the ones of the backend endpoints.
+# "from" and "to" restrict a query to a time range, "3" is book 3 and "3:12" chapter 12 of book 3, empty means no bound.
+# "limit" and "cursor" page the results, "min_weight" only follows the edges with at least this weight.
+# The communities and the centralities are read from the analytics computed for the graph, they are never computed by a query.
+# "evidence" returns the sentences an edge was counted in, "limit" of them at a time.
+# "mentions" returns the sentences that match a query over the characters they mention, like "Arya Stark AND NOT Jon Snow".
+# "k_shortest_paths" returns the k shortest distinct paths between two characters, "avoid" is a comma separated list of characters
+# the paths can't go through, k and max_length are capped (see k_paths) and the search stops when it runs out of budget.
+# "similar" returns the characters whose neighbors are the most like the ones of a character, "metric" is "cosine" or "jaccard"
+# and "method" is "exact", "lsh" or "auto" (see similarity).
+QUERY_ARGUMENTS = {
+    "get_characters": {},
+    "neighbors": {
+        "character": (str, None),
+        "distance": (int, 1),
+        "from": (str, ""),
+        "to": (str, ""),
+        "min_weight": (float, 0.0),
+        "limit": (int, 0),
+        "cursor": (str, ""),
+    },
+    "get_character_with_most_connections": {"from": (str, ""), "to": (str, "")},
+    "top_connected_characters": {"n": (int, 10)},
+    "top_k_connected": {"k": (int, 10), "cursor": (str, ""), "from": (str, ""), "to": (str, "")},
+    "connected_components": {},
+    "get_isolated_characters": {},
+    "shortest_path": {
+        "character1": (str, None),
+        "character2": (str, None),
+        "from": (str, ""),
+        "to": (str, ""),
+    },
+    "k_shortest_paths": {
+        "character1": (str, None),
+        "character2": (str, None),
+        "k": (int, 3),
+        "max_length": (int, MAX_PATH_LENGTH),
+        "avoid": (str, ""),
+        "from": (str, ""),
+        "to": (str, ""),
+    },
+    "similar": {"character": (str, None), "k": (int, 10), "metric": (str, "cosine"), "method": (str, "auto")},
+    "communities": {"character": (str, "")},
+    "pagerank": {"k": (int, 10), "cursor": (str, "")},
+    "betweenness": {"k": (int, 10), "cursor": (str, "")},
+    "centrality": {"character": (str, None)},
+    "evidence": {
+        "character1": (str, None),
+        "character2": (str, None),
+        "limit": (int, 20),
+        "cursor": (str, ""),
+    },
+    "mentions": {
+        "query": (str, None),
+        "from": (str, ""),
+        "to": (str, ""),
+        "limit": (int, 20),
+        "cursor": (str, ""),
+    },
+}
+
+# A query type and its arguments, in the order of QUERY_ARGUMENTS.
+QueryKey = Tuple[str, Tuple[Any, ...]]
+
+
+def parse_query(query: Dict[str, Any]) -> QueryKey:
+    """Check the type and the arguments of a query and convert the arguments to their types.
+
+    Args:
+        query (Dict[str, Any]): The query, the "type" and the arguments of the query type.
+
+    Raises:
+        ValueError: If the type is unknown or a required argument is missing.
+
+    Returns:
+        QueryKey: The query type and the arguments, equal queries have equal keys.
+    """
+    query_type = query.get("type")
+    if query_type not in QUERY_ARGUMENTS:
+        raise ValueError(f"Unknown query type {query_type}.")
+
+    arguments = []
+    for name, (argument_type, default) in QUERY_ARGUMENTS[query_type].items():
+        value = query.get(name, default)
+        if value is None:
+            raise ValueError(f"The {name} argument of {query_type} is missing.")
+        try:
+            arguments.append(argument_type(value))
+        except (TypeError, ValueError):
+            raise ValueError(f"The {name} argument of {query_type} must be {argument_type.__name__}.")
+
+    return query_type, tuple(arguments)
+
+
+def answer_query(kg, query: Dict[str, Any], graph_format: str = CYTOSCAPE, layout: bool = False) -> Any:
+    """Answer a query on a knowledge graph (or a snapshot), the answer is what the endpoint of the query returns.
+
+    Args:
+        kg: The knowledge graph.
+        query (Dict[str, Any]): The query, the "type" and the arguments of the query type.
+        graph_format (str, optional): The format of the subgraphs of the answer, "cytoscape" or "compact". Defaults to "cytoscape".
+        layout (bool, optional): Add the positions of the nodes to the subgraphs of the answer, see encode_subgraph. Defaults to False.
+
+    Returns:
+        Any: The answer, json serializable, a dict with an "error" if the query failed.
+    """
+    try:
+        return answer(kg, *parse_query(query), graph_format, layout)
+    except ValueError as e:
+        return {"error": str(e)}
+
+
+def answer(
+    kg, query_type: str, arguments: Tuple[Any, ...], graph_format: str = CYTOSCAPE, layout: bool = False
+) -> Any:
+    """Answer a parsed query, the time it takes is recorded in the metrics as "query.<query type>".
+
+    Args:
+        kg: The knowledge graph.
+        query_type (str): The query type.
+        arguments (Tuple[Any, ...]): The arguments, in the order of QUERY_ARGUMENTS.
+        graph_format (str, optional): The format of the subgraphs of the answer. Defaults to "cytoscape".
+        layout (bool, optional): Add the positions of the nodes to the subgraphs of the answer. Defaults to False.
+
+    Returns:
+        Any: The answer, a dict with an "error" if the query failed.
+    """
+    if kg is None:
+        return {"error": "Knowledge graph not loaded."}
+
+    with METRICS.timer(f"query.{query_type}"):
+        return answer_graph_query(kg, query_type, arguments, graph_format, layout)
+
+
+def answer_graph_query(
+    kg, query_type: str, arguments: Tuple[Any, ...], graph_format: str = CYTOSCAPE, layout: bool = False
+) -> Any:
+    """Answer a parsed query on a loaded knowledge graph, see answer."""
+    try:
+        if query_type == "get_characters":
+            return list(kg.get_characters())
+        elif query_type == "neighbors":
+            character, distance, start, end, min_weight, limit, cursor = arguments
+            if min_weight or limit or cursor:
+                return neighbors_page(kg, arguments, graph_format, layout)
+            neighbors = kg.get_character_neighbors(character, distance, parse_time_range(start, end))
+            return encode_subgraph(kg, neighbors, graph_format, layout)
+        elif query_type == "get_character_with_most_connections":
+            character, connections, subgraph = kg.get_character_with_most_connections(
+                parse_time_range(*arguments)
+            )
+            return {
+                "character": character,
+                "connections": connections,
+                "subgraph": encode_subgraph(kg, subgraph, graph_format, layout),
+            }
+        elif query_type == "top_connected_characters":
+            return [
+                {"character": character, "connections": connections}
+                for character, connections in kg.get_top_connected_characters(*arguments)
+            ]
+        elif query_type == "top_k_connected":
+            return top_k_page(kg, arguments)
+        elif query_type == "connected_components":
+            return kg.get_connected_components()
+        elif query_type == "get_isolated_characters":
+            characters, subgraph = kg.get_isolated_characters()
+            return {"characters": characters, "subgraph": encode_subgraph(kg, subgraph, graph_format, layout)}
+        elif query_type == "shortest_path":
+            character1, character2, start, end = arguments
+            path, sum_of_path = kg.shortest_path_between_characters(
+                character1, character2, parse_time_range(start, end)
+            )
+            return {
+                "shortest_path": encode_subgraph(kg, path, graph_format, layout),
+                "sum_of_path_weights": sum_of_path,
+            }
+        elif query_type == "k_shortest_paths":
+            character1, character2, k, max_length, avoid, start, end = arguments
+            subgraph, paths, complete = kg.k_shortest_paths_between_characters(
+                character1,
+                character2,
+                k,
+                max_length,
+                [character.strip() for character in avoid.split(",") if character.strip()],
+                parse_time_range(start, end),
+            )
+            return {
+                "paths": [
+                    {"characters": characters, "length": len(characters) - 1, "sum_of_path_weights": sum_of_path}
+                    for characters, sum_of_path in paths
+                ],
+                "subgraph": encode_subgraph(kg, subgraph, graph_format, layout),
+                "complete": complete,
+            }
+        elif query_type == "similar":
+            character, k, metric, method = arguments
+            similar, method = kg.get_similar_characters(character, k, metric, method)
+            return {
+                "character": character,
+                "metric": metric,
+                "method": method,
+                "similar": [{"character": other, "similarity": similarity} for other, similarity in similar],
+            }
+        elif query_type == "communities":
+            (character,) = arguments
+            analytics = get_analytics(kg)
+            if not character:
+                return [
+                    {"community": community, "characters": characters}
+                    for community, characters in enumerate(analytics.get_communities())
+                ]
+            community, characters = analytics.get_community(character)
+            return {
+                "community": community,
+                "characters": characters,
+                "subgraph": encode_subgraph(kg, kg.get_subgraph(characters), graph_format, layout),
+            }
+        elif query_type in ["pagerank", "betweenness"]:
+            k, cursor = arguments
+            analytics = get_analytics(kg)
+            return ranking_page(lambda n: analytics.top(query_type, n), k, cursor, query_type)
+        elif query_type == "centrality":
+            (character,) = arguments
+            analytics = get_analytics(kg)
+            return {"character": character, **analytics.centrality(character), "samples": analytics.samples}
+        elif query_type == "evidence":
+            return evidence_page(kg, arguments)
+        elif query_type == "mentions":
+            return mentions_page(kg, arguments)
+    except (nx.NodeNotFound, nx.NetworkXNoPath, nx.NetworkXError, ValueError) as e:
+        # A ValueError is an invalid time range or cursor.
+        return {"error": str(e)}
+
+
+def encode_subgraph(kg, graph: nx.Graph, graph_format: str = CYTOSCAPE, layout: bool = False) -> Dict[str, Any]:
+    """Encode a subgraph of an answer, with the positions of its nodes if the query asks for the layout.
+    The nodes start from their positions in the layout of the whole graph, computed once for every version of the graph,
+    so the browser can draw the subgraph without simulating it.
+    """
+    return encode_graph(graph, graph_format, kg.get_layout().subgraph_positions(graph) if layout else None)
+
+
+def neighbors_page(
+    kg, arguments: Tuple[Any, ...], graph_format: str = CYTOSCAPE, layout: bool = False
+) -> Dict[str, Any]:
+    """Answer a neighbors query with a limit, a minimum weight or a cursor.
+    The edges of the neighborhood come level by level, the strongest first, so the first page has the closest and strongest connections.
+
+    Returns:
+        Dict[str, Any]: The subgraph of the edges of the page, with the cursor of the next page ("next_cursor", None after the last page)
+            and the number of edges of the whole neighborhood ("total_edges").
+    """
+    character, distance, start, end, min_weight, limit, cursor = arguments
+    edges = kg.get_neighbor_edges(character, distance, parse_time_range(start, end), min_weight or None)
+    edges_page, next_cursor = page(edges, limit, cursor, key=lambda edge: [edge[0], edge[1]])
+
+    subgraph = nx.Graph()
+    subgraph.add_weighted_edges_from(edges_page)
+    return {**encode_subgraph(kg, subgraph, graph_format, layout), "next_cursor": next_cursor, "total_edges": len(edges)}
+
+
+def top_k_page(kg, arguments: Tuple[Any, ...]) -> Dict[str, Any]:
+    """Answer a top_k_connected query, k characters from the most connected, after the ones of the cursor.
+
+    Returns:
+        Dict[str, Any]: The characters and their connections, and the cursor of the next page ("next_cursor", None after the last page).
+    """
+    k, cursor, start, end = arguments
+    time_range = parse_time_range(start, end)
+    return ranking_page(lambda n: kg.top_k_connected(n, 0, time_range), k, cursor, "connections")
+
+
+def ranking_page(
+    top: Callable[[int], List[Tuple[str, Any]]], k: int, cursor: str, value_name: str
+) -> Dict[str, Any]:
+    """Return a page of k characters of a ranking, after the ones of the cursor.
+
+    Args:
+        top (Callable[[int], List[Tuple[str, Any]]]): Returns the first n characters of the ranking and their values.
+        k (int): The number of characters of the page.
+        cursor (str): The cursor of the previous page, empty for the first page.
+        value_name (str): The name of the values in the answer.
+
+    Raises:
+        ValueError: If k is not positive or the cursor is invalid or out of date.
+
+    Returns:
+        Dict[str, Any]: The characters and their values, and the cursor of the next page ("next_cursor", None after the last page).
+    """
+    if k <= 0:
+        raise ValueError("k must be at least 1.")
+
+    # We only read the ranking up to the end of the page, and one more character to know if there is a next page.
+    offset = decode_cursor(cursor)[0] if cursor else 0
+    characters, next_cursor = page(top(offset + k + 1), k, cursor)
+
+    return {
+        "characters": [{"character": character, value_name: value} for character, value in characters],
+        "next_cursor": next_cursor,
+    }
+
+
+def evidence_page(kg, arguments: Tuple[Any, ...]) -> Dict[str, Any]:
+    """Answer an evidence query, the sentences of an edge in the order of the text, after the ones of the cursor.
+    Only the postings up to the end of the page are decoded, and only the lines of the page are read from the text files.
+
+    Raises:
+        ValueError: If the graph has no evidence, the characters are not linked, or the limit or the cursor is invalid.
+
+    Returns:
+        Dict[str, Any]: The sentences (their source, their line and their text), the number of sentences of the edge ("total"),
+            and the cursor of the next page ("next_cursor", None after the last page).
+    """
+    character1, character2, limit, cursor = arguments
+    evidence = kg.get_evidence()
+    if evidence is None:
+        raise ValueError("The graph has no evidence, it was saved without it.")
+    total = evidence.postings.count(character1, character2)
+    if not total:
+        raise ValueError(f"{character1} and {character2} are not linked.")
+
+    offset = decode_cursor(cursor)[0] if cursor else 0
+    line_ids = evidence.lines(character1, character2, offset + limit + 1 if limit > 0 else None)
+    line_ids, next_cursor = page(line_ids, limit, cursor, key=lambda line_id: [line_id])
+
+    return {
+        "character1": character1,
+        "character2": character2,
+        "total": total,
+        "sentences": evidence.read(line_ids),
+        "next_cursor": next_cursor,
+    }
+
+
+def mentions_page(kg, arguments: Tuple[Any, ...]) -> Dict[str, Any]:
+    """Answer a mentions query, the sentences that match a query over the characters they mention, after the ones of the cursor.
+    The whole query is answered from the index of the mentions, only the lines of the page are read from the text files.
+
+    Raises:
+        ValueError: If the graph has no mentions, the query, the time range, the limit or the cursor is invalid,
+            or a character of the query is never mentioned.
+
+    Returns:
+        Dict[str, Any]: The sentences (their source, their line and their text), the number of matching sentences ("total"),
+            and the cursor of the next page ("next_cursor", None after the last page).
+    """
+    query, start, end, limit, cursor = arguments
+    matches = kg.find_mentions(query, parse_time_range(start, end))
+    line_ids, next_cursor = page(matches, limit, cursor, key=lambda line_id: [int(line_id)])
+
+    return {
+        "query": query,
+        "total": len(matches),
+        "sentences": kg.get_evidence().read([int(line_id) for line_id in line_ids]),
+        "next_cursor": next_cursor,
+    }
+
+
+def get_analytics(kg) -> GraphAnalytics:
+    """Return the analytics of a graph.
+
+    Raises:
+        ValueError: If they were not computed for the current graph.
+    """
+    analytics = kg.get_analytics()
+    if analytics is None:
+        raise ValueError("The analytics of the graph are not computed yet, see /compute_analytics.")
+
+    return analytics
+
+
+def answer_batch(
+    kg, queries: List[Dict[str, Any]], graph_format: str = CYTOSCAPE, layout: bool = False
+) -> List[Any]:
+    """Answer many queries on the same knowledge graph.
+    Equal queries are only answered once, the neighbors of a character at several distances come from a single BFS,
+    and the shortest paths are answered grouped by source, so the BFS tree of a source is computed once.
+
+    Args:
+        kg: The knowledge graph.
+        queries (List[Dict[str, Any]]): The queries.
+        graph_format (str, optional): The format of the subgraphs of the answers. Defaults to "cytoscape".
+        layout (bool, optional): Add the positions of the nodes to the subgraphs of the answers. Defaults to False.
+
+    Raises:
+        ValueError: If there are more than MAX_BATCH_QUERIES queries.
+
+    Returns:
+        List[Any]: The answers, in the order of the queries.
+    """
+    if len(queries) > MAX_BATCH_QUERIES:
+        raise ValueError(f"A batch has at most {MAX_BATCH_QUERIES} queries, got {len(queries)}.")
+
+    keys = []
+    answers = {}
+    for i, query in enumerate(queries):
+        try:
+            keys.append(parse_query(query))
+        except ValueError as e:
+            # An invalid query gets its own key, so it doesn't share the answer of another query.
+            keys.append(("invalid", (i,)))
+            answers[keys[-1]] = {"error": str(e)}
+
+    unique_keys = list(dict.fromkeys(key for key in keys if key not in answers))
+
+    # The distances of the neighbors queries of every character and time range.
+    distances = defaultdict(set)
+    for query_type, arguments in unique_keys:
+        if query_type == "neighbors" and kg is not None:
+            character, distance, start, end, min_weight, limit, cursor = arguments
+            # The paged queries are answered one by one.
+            if not (min_weight or limit or cursor):
+                distances[(character, start, end)].add(distance)
+
+    for (character, start, end), character_distances in distances.items():
+        try:
+            time_range = parse_time_range(start, end)
+            with METRICS.timer("query.neighborhoods"):
+                neighborhoods = kg.get_character_neighborhoods(character, character_distances, time_range)
+        except (nx.NetworkXError, ValueError) as e:
+            neighborhoods = None
+            error = {"error": str(e)}
+        for distance in character_distances:
+            key = ("neighbors", (character, distance, start, end, 0.0, 0, ""))
+            if neighborhoods is None:
+                answers[key] = error
+            else:
+                answers[key] = encode_subgraph(kg, neighborhoods[distance], graph_format, layout)
+
+    # Sorting the keys puts the shortest paths from the same source next to each other.
+    for query_type, arguments in sorted(key for key in unique_keys if key not in answers):
+        answers[(query_type, arguments)] = answer(kg, query_type, arguments, graph_format, layout)
+
+    return [answers[key] for key in keys]
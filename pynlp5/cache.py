@@ -0,0 +1,80 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 1024) -> None:
+        """A bounded cache that evicts the least recently used entry when it is full.
+        It is safe to use from multiple threads, and it counts the hits, the misses and the evictions.
+
+        Args:
+            maxsize (int, optional): The maximum number of entries, 0 disables the cache. Defaults to 1024.
+        """
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the value of a key and mark it as recently used.
+
+        Args:
+            key (Hashable): The key.
+            default (Any, optional): The value to return if the key is not cached. Defaults to None.
+
+        Returns:
+            Any: The cached value or the default.
+        """
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Cache a value, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key (Hashable): The key.
+            value (Any): The value.
+        """
+        if self.maxsize <= 0:
+            return
+
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Remove every entry, the counters are kept.
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Return the size of the cache and the counters.
+
+        Returns:
+            Dict[str, float]: The size, the maximum size, the hits, the misses, the evictions and the hit rate.
+        """
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / requests if requests else 0.0,
+            }
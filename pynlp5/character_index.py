@@ -0,0 +1,234 @@
+import base64
+import re
+from array import array
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from pynlp5.evidence import decode_postings, encode_postings
+
+# numpy takes a while to import, we only import it when the first query is answered.
+if TYPE_CHECKING:
+    import numpy as np
+
+# A parsed query: ("character", name), ("not", query), ("and", [queries]) or ("or", [queries]).
+Query = Tuple[str, Union[str, "Query", List["Query"]]]
+
+# The operators of the queries, in capitals so they are not confused with the names. The names are everything in between.
+QUERY_TOKENS = re.compile(r"\(|\)|\bAND\b|\bOR\b|\bNOT\b")
+
+
+def parse_character_query(text: str) -> Query:
+    """Parse a query over the characters mentioned in a line, like "Arya Stark AND (Sandor Clegane OR Beric Dondarrion) AND NOT Jon Snow".
+    NOT binds tighter than AND, and AND tighter than OR.
+
+    Args:
+        text (str): The query.
+
+    Raises:
+        ValueError: If the query is empty or invalid.
+
+    Returns:
+        Query: The parsed query.
+    """
+    tokens = []
+    position = 0
+    for match in QUERY_TOKENS.finditer(text):
+        if text[position : match.start()].strip():
+            tokens.append(("character", " ".join(text[position : match.start()].split())))
+        tokens.append((match.group(), None))
+        position = match.end()
+    if text[position:].strip():
+        tokens.append(("character", " ".join(text[position:].split())))
+
+    query, position = parse_or(tokens, 0)
+    if position != len(tokens):
+        raise ValueError(f"Unexpected {tokens[position][1] or tokens[position][0]} in the query.")
+
+    return query
+
+
+def parse_or(tokens: List[Tuple[str, Optional[str]]], position: int) -> Tuple[Query, int]:
+    """Parse the queries joined by OR from a position of the tokens, return the query and the position after it."""
+    queries = []
+    while True:
+        query, position = parse_and(tokens, position)
+        queries.append(query)
+        if position < len(tokens) and tokens[position][0] == "OR":
+            position += 1
+        else:
+            return (queries[0] if len(queries) == 1 else ("or", queries)), position
+
+
+def parse_and(tokens: List[Tuple[str, Optional[str]]], position: int) -> Tuple[Query, int]:
+    """Parse the queries joined by AND."""
+    queries = []
+    while True:
+        query, position = parse_not(tokens, position)
+        queries.append(query)
+        if position < len(tokens) and tokens[position][0] == "AND":
+            position += 1
+        else:
+            return (queries[0] if len(queries) == 1 else ("and", queries)), position
+
+
+def parse_not(tokens: List[Tuple[str, Optional[str]]], position: int) -> Tuple[Query, int]:
+    """Parse a character, a query in parentheses or the negation of one of them."""
+    if position == len(tokens):
+        raise ValueError("The query is incomplete.")
+
+    kind, name = tokens[position]
+    if kind == "NOT":
+        query, position = parse_not(tokens, position + 1)
+        return ("not", query), position
+    if kind == "(":
+        query, position = parse_or(tokens, position + 1)
+        if position == len(tokens) or tokens[position][0] != ")":
+            raise ValueError("A parenthesis of the query is not closed.")
+        return query, position + 1
+    if kind == "character":
+        return ("character", name), position + 1
+
+    raise ValueError(f"Unexpected {kind} in the query.")
+
+
+class CharacterIndex:
+    def __init__(self) -> None:
+        """The inverted index of the mentions: the ids of the lines that mention every character, in increasing order.
+        The line ids are the ones of the evidence, so the lines of a query are read like the sentences of an edge.
+        The ids are appended while the graph is built (the lines are counted in order) to arrays of 4 bytes per mention,
+        the queries intersect, merge and subtract the sorted arrays with numpy instead of matching the text again.
+        """
+        self.lines = {}
+        # The line id of the first line of every period (chapter), in the order of the periods of the temporal weights.
+        self.period_lines = []
+
+    def add(self, character_lines: Dict[str, List[int]], first_line: int = 0) -> None:
+        """Add the lines that mention some characters.
+
+        Args:
+            character_lines (Dict[str, List[int]]): The increasing lines of every character, from the first line.
+            first_line (int, optional): The line id of the first line. Defaults to 0.
+        """
+        for character, lines in character_lines.items():
+            if character not in self.lines:
+                self.lines[character] = array("I")
+            self.lines[character].extend(first_line + line for line in lines)
+
+    def add_periods(self, line_ids: Iterable[int]) -> None:
+        """Add the line ids of the first lines of the next periods."""
+        self.period_lines.extend(line_ids)
+
+    def line_range(self, first_period: int, last_period: int, line_count: int) -> Tuple[int, int]:
+        """Return the line ids of a range of periods (from the first included to the last excluded).
+        The lines ingested after the build continue the last period.
+
+        Raises:
+            ValueError: If the index doesn't know the lines of the periods.
+        """
+        if last_period >= len(self.period_lines):
+            raise ValueError("The knowledge graph has no lines for its chapters, build it again to query a time range.")
+
+        end = self.period_lines[last_period + 1] if last_period + 1 < len(self.period_lines) else line_count
+        return self.period_lines[first_period], end
+
+    def get(self, character: str) -> Sequence[int]:
+        """Return the line ids of a character.
+
+        Raises:
+            ValueError: If the character is never mentioned.
+        """
+        if character not in self.lines:
+            raise ValueError(f"{character} is never mentioned.")
+        return self.lines[character]
+
+    def copy(self) -> "CharacterIndex":
+        """Return a copy that can be changed without changing this one."""
+        index = CharacterIndex()
+        index.lines = {character: array("I", lines) for character, lines in self.lines.items()}
+        index.period_lines = list(self.period_lines)
+        return index
+
+    def to_dict(self) -> dict:
+        """Return the index as json serializable lists, the line ids of every character encoded like the postings of the edges, in base64."""
+        return {
+            "characters": [
+                [character, base64.b64encode(encode_postings(lines)).decode("ascii")]
+                for character, lines in self.lines.items()
+            ],
+            "period_lines": self.period_lines,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CharacterIndex":
+        """Load the index saved by to_dict."""
+        index = cls()
+        for character, encoded in data["characters"]:
+            index.lines[character] = array("I", decode_postings(base64.b64decode(encoded)))
+        index.period_lines = list(data["period_lines"])
+        return index
+
+
+def query_lines(
+    index: CharacterIndex, query: Query, line_count: int, line_range: Tuple[int, int] = None
+) -> "np.ndarray":
+    """Find the lines that match a query.
+    Every character is a sorted array of line ids, AND is an intersection, OR a union and NOT a difference.
+    A negation is kept as the lines it excludes until it is combined with lines it can be subtracted from,
+    so "A AND NOT B" never builds the array of all the lines.
+
+    Args:
+        index (CharacterIndex): The index of the mentions (or any object with get(character)).
+        query (Query): The parsed query.
+        line_count (int): The number of line ids, the lines of a query with only negations are taken from all of them.
+        line_range (Tuple[int, int], optional): Only the line ids from the first (included) to the second (excluded). Defaults to all of them.
+
+    Raises:
+        ValueError: If a character of the query is never mentioned.
+
+    Returns:
+        np.ndarray: The line ids, in increasing order.
+    """
+    import numpy as np
+
+    start, end = line_range or (0, line_count)
+    negated, lines = evaluate(index, query, start, end)
+    if negated:
+        lines = np.setdiff1d(np.arange(start, end, dtype=np.uint32), lines, assume_unique=True)
+
+    return lines
+
+
+def evaluate(index: CharacterIndex, query: Query, start: int, end: int) -> Tuple[bool, "np.ndarray"]:
+    """Evaluate a query on the lines from start to end, see query_lines.
+
+    Returns:
+        Tuple[bool, np.ndarray]: Whether the lines are negated (the query is all the lines but these) and the sorted line ids.
+    """
+    import numpy as np
+
+    kind, argument = query
+    if kind == "character":
+        lines = np.frombuffer(index.get(argument), dtype=np.uint32)
+        return False, lines[np.searchsorted(lines, start) : np.searchsorted(lines, end)]
+    if kind == "not":
+        negated, lines = evaluate(index, argument, start, end)
+        return not negated, lines
+
+    results = [evaluate(index, subquery, start, end) for subquery in argument]
+    # AND: the intersection of the lines, minus the union of the negated lines.
+    # OR is the same by De Morgan's laws, with the roles of the lines and of the negated lines swapped.
+    if kind == "or":
+        results = [(not negated, lines) for negated, lines in results]
+    included = [lines for negated, lines in results if not negated]
+    excluded = [lines for negated, lines in results if negated]
+
+    # The smallest arrays first, the intersections only get smaller.
+    lines = None
+    for other in sorted(included, key=len):
+        lines = other if lines is None else np.intersect1d(lines, other, assume_unique=True)
+    excluded_lines = np.unique(np.concatenate(excluded)) if excluded else np.empty(0, dtype=np.uint32)
+    if lines is None:
+        negated, lines = True, excluded_lines
+    else:
+        negated, lines = False, np.setdiff1d(lines, excluded_lines, assume_unique=True)
+
+    return (not negated, lines) if kind == "or" else (negated, lines)
@@ -0,0 +1,196 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from pynlp5.character_index import CharacterIndex
+from pynlp5.cooccurrence import PAIRWISE, Sentence
+from pynlp5.evidence import Postings
+from pynlp5.temporal import TemporalWeights
+
+# The version of the checkpoint format.
+CHECKPOINT_VERSION = 5
+
+# The default number of chunks counted between two checkpoints.
+CHECKPOINT_EVERY = 16
+
+
+def checkpoint_filename(text_path: str, checkpoint_dir: str) -> str:
+    """Return the path of the checkpoint of a text file."""
+    return os.path.join(checkpoint_dir, f"{os.path.basename(text_path)}.checkpoint")
+
+
+def text_stamp(text_path: str) -> Tuple[int, int]:
+    """Return the size and the modification time of a text file.
+    Hashing a big corpus takes too long to do it on every resume, the stamp is enough to notice that the file changed.
+    """
+    stat = os.stat(text_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class BuildCheckpoint:
+    def __init__(
+        self,
+        text_path: str,
+        patterns_hash: str,
+        offset: int = 0,
+        nodes: List[str] = None,
+        edge_weights: Dict[Tuple[str, str], int] = None,
+        cooccurrence: str = PAIRWISE,
+        sentences: int = 0,
+        recent: List[Sentence] = None,
+        temporal: TemporalWeights = None,
+        postings: Postings = None,
+        mentions: CharacterIndex = None,
+    ) -> None:
+        """The progress of a streaming build of one text file: the byte offset reached and the counts of the text before it.
+        The counts are kept in the order they are first seen, so adding them to the graph gives the same graph as an uninterrupted build.
+
+        Args:
+            text_path (str): Path to the text file.
+            patterns_hash (str): The hash of the patterns the text is matched with.
+            offset (int, optional): The byte offset of the first line that is not counted yet. Defaults to 0.
+            nodes (List[str], optional): The nodes counted so far. Defaults to None.
+            edge_weights (Dict[Tuple[str, str], int], optional): The edge weights counted so far. Defaults to None.
+            cooccurrence (str, optional): The key of the co-occurrence policy of the counts. Defaults to "pairwise".
+            sentences (int, optional): The number of sentences counted so far. Defaults to 0.
+            recent (List[Sentence], optional): The last sentences with mentions, a window policy links them to the next sentences. Defaults to None.
+            temporal (TemporalWeights, optional): The edge weights counted so far in every chapter of the text. Defaults to None.
+            postings (Postings, optional): The lines of the edges counted so far, numbered from the start of the text. Defaults to None.
+            mentions (CharacterIndex, optional): The lines of the characters counted so far, numbered the same way. Defaults to None.
+        """
+        self.text_path = os.path.abspath(text_path)
+        self.text_size, self.text_mtime = text_stamp(text_path)
+        self.patterns_hash = patterns_hash
+        self.cooccurrence = cooccurrence
+        self.offset = offset
+        # A dict keeps the nodes unique and in the order they are first seen.
+        self.nodes = dict.fromkeys(nodes or [])
+        self.edge_weights = dict(edge_weights or {})
+        self.sentences = sentences
+        self.recent = list(recent or [])
+        self.temporal = temporal or TemporalWeights()
+        self.postings = postings or Postings()
+        self.mentions = mentions or CharacterIndex()
+
+    @property
+    def done(self) -> bool:
+        """Whether the whole text file is counted."""
+        return self.offset >= self.text_size
+
+    def add(
+        self,
+        nodes: List[str],
+        edge_weights: Dict[Tuple[str, str], int],
+        offset: int,
+        sentences: int = 0,
+        recent: List[Sentence] = None,
+        period: int = 0,
+        edge_lines: Dict[Tuple[str, str], List[int]] = None,
+        character_lines: Dict[str, List[int]] = None,
+    ) -> None:
+        """Add the counts of the next chunk of text.
+
+        Args:
+            nodes (List[str]): The nodes of the chunk.
+            edge_weights (Dict[Tuple[str, str], int]): The edge weights of the chunk.
+            offset (int): The byte offset of the end of the chunk.
+            sentences (int, optional): The number of sentences counted up to the end of the chunk. Defaults to 0.
+            recent (List[Sentence], optional): The last sentences with mentions at the end of the chunk. Defaults to None.
+            period (int, optional): The period (the chapter) of the chunk in the temporal weights. Defaults to 0.
+            edge_lines (Dict[Tuple[str, str], List[int]], optional): The lines of the edges of the chunk. Defaults to None.
+            character_lines (Dict[str, List[int]], optional): The lines of the characters of the chunk. Defaults to None.
+        """
+        for node in nodes:
+            self.nodes.setdefault(node)
+        for edge, weight in edge_weights.items():
+            self.edge_weights[edge] = self.edge_weights.get(edge, 0) + weight
+        self.offset = offset
+        self.sentences = sentences
+        self.recent = list(recent or [])
+        self.temporal.add(period, edge_weights)
+        self.postings.add(edge_lines or {})
+        self.mentions.add(character_lines or {})
+
+    def matches(self, text_path: str, patterns_hash: str, cooccurrence: str = PAIRWISE) -> bool:
+        """Whether the checkpoint was made from the same text file, the same patterns and the same co-occurrence policy."""
+        return (
+            self.text_path == os.path.abspath(text_path)
+            and (self.text_size, self.text_mtime) == text_stamp(text_path)
+            and self.patterns_hash == patterns_hash
+            and self.cooccurrence == cooccurrence
+        )
+
+    def save(self, filename: str) -> None:
+        """Save the checkpoint to a json file.
+        We write a temporary file and rename it, so a build killed while saving leaves the previous checkpoint intact.
+
+        Args:
+            filename (str): Path to the checkpoint file.
+        """
+        data = {
+            "version": CHECKPOINT_VERSION,
+            "text_path": self.text_path,
+            "text_size": self.text_size,
+            "text_mtime": self.text_mtime,
+            "patterns_hash": self.patterns_hash,
+            "cooccurrence": self.cooccurrence,
+            "offset": self.offset,
+            "nodes": list(self.nodes),
+            "edges": [
+                [character1, character2, weight]
+                for (character1, character2), weight in self.edge_weights.items()
+            ],
+            "sentences": self.sentences,
+            "recent": self.recent,
+            "temporal": self.temporal.to_dict(),
+            "postings": self.postings.to_dict(),
+            "mentions": self.mentions.to_dict(),
+        }
+
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        temporary_filename = f"{filename}.tmp"
+        with open(temporary_filename, "w") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_filename, filename)
+
+    @classmethod
+    def load(cls, filename: str) -> Optional["BuildCheckpoint"]:
+        """Load a checkpoint from a json file.
+
+        Args:
+            filename (str): Path to the checkpoint file.
+
+        Returns:
+            Optional[BuildCheckpoint]: The checkpoint, None if there is no usable checkpoint.
+        """
+        if not os.path.isfile(filename):
+            return None
+
+        with open(filename, "r") as f:
+            data = json.load(f)
+        if data.get("version") != CHECKPOINT_VERSION or not os.path.isfile(data["text_path"]):
+            return None
+
+        checkpoint = cls(
+            data["text_path"],
+            data["patterns_hash"],
+            data["offset"],
+            data["nodes"],
+            {
+                (character1, character2): weight
+                for character1, character2, weight in data["edges"]
+            },
+            data["cooccurrence"],
+            data["sentences"],
+            [(sentence, characters) for sentence, characters in data["recent"]],
+            TemporalWeights.from_dict(data["temporal"]),
+            Postings.from_dict(data["postings"]),
+            CharacterIndex.from_dict(data["mentions"]),
+        )
+        # The stamp of the file when the checkpoint was made, not the current one.
+        checkpoint.text_size = data["text_size"]
+        checkpoint.text_mtime = data["text_mtime"]
+
+        return checkpoint
@@ -1,5 +1,20 @@
+# The data of the backend, the text files it can ingest are in this directory.
+DATA_DIR = "../data"
 TEXT_PATH = "../data/001ssb_line.txt"
+TEXT_PATHS = [
+    "../data/001ssb_line.txt",
+    "../data/002ssb_line.txt",
+    "../data/003ssb_line.txt",
+    "../data/004ssb_line.txt",
+    "../data/005ssb_line.txt",
+]
 CHARACTER_PATH = "../data/characters.txt"
 ALIAS_PATH = "../data/character_aliases.json"
+INDEX_DIR = "../data/mention_index"
+CHECKPOINT_DIR = "../data/checkpoints"
+PROFILE_DIR = "../data/profiles"
 
 SERIALIZED_PATH = "serialized_kg.json"
+
+# The maximum number of responses the backend keeps in its result cache.
+RESULT_CACHE_SIZE = 1024
@@ -0,0 +1,253 @@
+from collections import deque
+from itertools import combinations, pairwise
+from typing import Callable, Dict, Iterable, List, Tuple, Union
+
+# The co-occurrence policies.
+# pairwise: the characters of a line are linked to the next one in the order of the characters list (the original behaviour).
+# all_pairs: all the characters of a line are linked together.
+# window: the characters of a line are linked together and to the characters of the previous window - 1 lines.
+PAIRWISE = "pairwise"
+ALL_PAIRS = "all_pairs"
+WINDOW = "window"
+POLICIES = [PAIRWISE, ALL_PAIRS, WINDOW]
+
+# The characters mentioned in a line, with the number of the line.
+Sentence = Tuple[int, List[str]]
+
+
+class CooccurrencePolicy:
+    def __init__(self, mode: str = PAIRWISE, window: int = 1, decay: float = 1.0) -> None:
+        """Which characters are linked when they are mentioned close to each other, and with which weight.
+        Every line of the text is a sentence (the preprocessed books have one sentence per line).
+
+        Args:
+            mode (str, optional): "pairwise", "all_pairs" or "window". Defaults to "pairwise".
+            window (int, optional): The number of sentences of a window, 1 links only the characters of the same sentence.
+                Only used by the window mode. Defaults to 1.
+            decay (float, optional): The weight of a co-occurrence at a distance of d sentences is decay ** d.
+                Only used by the window mode, 1 gives every co-occurrence of the window the weight 1. Defaults to 1.0.
+
+        Raises:
+            ValueError: If the mode is unknown, the window is smaller than 1 or the decay is not in (0, 1].
+        """
+        if mode not in POLICIES:
+            raise ValueError(f"Unknown co-occurrence mode {mode}, expected one of {', '.join(POLICIES)}.")
+        if mode != WINDOW:
+            window, decay = 1, 1.0
+        if window < 1:
+            raise ValueError("The window must be at least 1 sentence.")
+        if not 0 < decay <= 1:
+            raise ValueError("The decay must be in (0, 1].")
+
+        self.mode = mode
+        self.window = window
+        self.decay = decay
+
+    def weight(self, distance: int) -> Union[int, float]:
+        """Return the weight of a co-occurrence of two characters mentioned distance sentences apart."""
+        # We keep integer weights without decay, so the graph is the same as the one of the other modes.
+        if self.decay == 1:
+            return 1
+        return self.decay**distance
+
+    def key(self) -> str:
+        """Return a string that identifies the policy, for the checkpoints and the caches."""
+        if self.mode != WINDOW:
+            return self.mode
+        return f"{self.mode}:{self.window}:{self.decay}"
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, CooccurrencePolicy) and self.key() == other.key()
+
+    def __repr__(self) -> str:
+        return f"CooccurrencePolicy({self.mode!r}, window={self.window}, decay={self.decay})"
+
+
+class CooccurrenceCounter:
+    def __init__(
+        self,
+        policy: CooccurrencePolicy = None,
+        sentences: int = 0,
+        recent: Iterable[Sentence] = (),
+    ) -> None:
+        """Count the co-occurrences of the characters in one pass over the sentences of a text.
+        For the window mode we keep the characters of the last window - 1 sentences in a ring buffer,
+        every new sentence is linked to the sentences of the buffer, so no sentence is read more than once
+        and the cost only grows with the number of mentions in the window, not with the size of the window.
+        Everything is recorded in the order it is first seen, so adding the counts to a graph gives the same graph as building it line by line.
+
+        Args:
+            policy (CooccurrencePolicy, optional): The co-occurrence policy. Defaults to the pairwise policy.
+            sentences (int, optional): The number of sentences counted before, to resume a count. Defaults to 0.
+            recent (Iterable[Sentence], optional): The ring buffer of the count we resume. Defaults to ().
+        """
+        self.policy = policy or CooccurrencePolicy()
+        self.sentences = sentences
+        self.start = sentences
+        # The number of character mentions counted, for the metrics of the builds.
+        self.mentions = 0
+        # Only the sentences with mentions are kept, the sentences without mentions don't cost anything.
+        self.recent = deque(recent)
+        # The first window - 1 sentences, they are linked to the end of the previous chunk when the counts of chunks are merged.
+        self.head = []
+        self.nodes = {}
+        self.edge_weights = {}
+        # The sentences of every link of every edge, for the evidence of the edges (repeats when two sentences link the same edge).
+        self.edge_lines = {}
+        # The sentences that mention every character, for the inverted index of the mentions.
+        self.character_lines = {}
+
+    def add(self, characters: List[str]) -> None:
+        """Count the next sentence.
+
+        Args:
+            characters (List[str]): The characters mentioned in the sentence, in the order of the characters list.
+        """
+        sentence = self.sentences
+        self.sentences += 1
+        self.mentions += len(characters)
+        for character in characters:
+            lines = self.character_lines.get(character)
+            if lines is None:
+                self.character_lines[character] = [sentence]
+            else:
+                lines.append(sentence)
+
+        if self.policy.mode == PAIRWISE:
+            self.add_nodes(characters)
+            self.link_pairs(pairwise(characters), sentence)
+            return
+
+        # The edges of the other modes are sorted by name, so the edges within a sentence and between sentences have the same keys.
+        self.add_nodes(characters)
+        self.link_pairs(combinations(sorted(characters), 2), sentence)
+        if self.policy.window == 1:
+            return
+
+        self.forget(sentence)
+        if characters:
+            for other_sentence, other_characters in self.recent:
+                self.link(characters, other_characters, sentence, sentence - other_sentence)
+            self.recent.append((sentence, characters))
+            if sentence - self.start < self.policy.window - 1:
+                self.head.append((sentence - self.start, characters))
+
+    def add_lines(self, lines: Iterable[str], match_characters: Callable[[str], List[str]]) -> None:
+        """Count the next lines of a text.
+
+        Args:
+            lines (Iterable[str]): The lines.
+            match_characters (Callable[[str], List[str]]): Function returning the characters of a line.
+        """
+        for line in lines:
+            line = line.strip()
+            # An empty line is still a sentence, so the distances are the same as in the mention index.
+            self.add(match_characters(line) if line != "" else [])
+
+    def forget(self, sentence: int) -> None:
+        """Remove the sentences that are too far from a sentence from the ring buffer."""
+        while self.recent and sentence - self.recent[0][0] >= self.policy.window:
+            self.recent.popleft()
+
+    def add_nodes(self, characters: Iterable[str]) -> None:
+        """Add characters as nodes, a sentence with only one character adds the character as a node."""
+        for character in characters:
+            self.nodes.setdefault(character)
+
+    def link_pairs(self, pairs: Iterable[Tuple[str, str]], sentence: int, weight: Union[int, float] = 1) -> None:
+        """Add a weight to the edges of pairs of characters linked by a sentence."""
+        for edge in pairs:
+            self.edge_weights[edge] = self.edge_weights.get(edge, 0) + weight
+            lines = self.edge_lines.get(edge)
+            if lines is None:
+                self.edge_lines[edge] = [sentence]
+            else:
+                lines.append(sentence)
+
+    def link(self, characters: List[str], other_characters: List[str], sentence: int, distance: int) -> None:
+        """Link the characters of a sentence to the ones of a sentence distance sentences before."""
+        weight = self.policy.weight(distance)
+        self.link_pairs(
+            (
+                (character, other_character)
+                if character < other_character
+                else (other_character, character)
+                for character in characters
+                for other_character in other_characters
+                if character != other_character
+            ),
+            sentence,
+            weight,
+        )
+
+    def merge(self, counter: "CooccurrenceCounter") -> None:
+        """Add the counts of the text that follows, counted by another counter from the start.
+        The sentences at the start of the other text are linked to the ones at the end of this text,
+        so merging the counters of consecutive chunks gives the same counts as counting the chunks one after the other.
+        Only the order of the edges can differ, the links to this text are added after the edges of the other text.
+
+        Args:
+            counter (CooccurrenceCounter): The counter of the next chunk of text.
+        """
+        offset = self.sentences - counter.start
+        self.add_nodes(counter.nodes)
+        self.link_pairs_from(counter.edge_weights, counter.edge_lines, offset)
+        for character, lines in counter.character_lines.items():
+            self.character_lines.setdefault(character, []).extend(sentence + offset for sentence in lines)
+        self.mentions += counter.mentions
+
+        for sentence, characters in counter.head:
+            sentence += self.sentences
+            self.forget(sentence)
+            for other_sentence, other_characters in self.recent:
+                self.link(characters, other_characters, sentence, sentence - other_sentence)
+
+        self.sentences += counter.sentences - counter.start
+        self.recent.extend((sentence + offset, characters) for sentence, characters in counter.recent)
+        self.forget(self.sentences)
+
+    def link_pairs_from(
+        self,
+        edge_weights: Dict[Tuple[str, str], Union[int, float]],
+        edge_lines: Dict[Tuple[str, str], List[int]],
+        offset: int,
+    ) -> None:
+        """Add the edge weights of another count, and its sentences moved by an offset."""
+        for edge, weight in edge_weights.items():
+            self.edge_weights[edge] = self.edge_weights.get(edge, 0) + weight
+        for edge, lines in edge_lines.items():
+            self.edge_lines.setdefault(edge, []).extend(sentence + offset for sentence in lines)
+
+    def take(self) -> Tuple[List[str], Dict[Tuple[str, str], Union[int, float]]]:
+        """Return the nodes and the edge weights counted since the last call, the ring buffer is kept to count the next lines.
+
+        Returns:
+            Tuple[List[str], Dict[Tuple[str, str], Union[int, float]]]: The nodes in the order they are first seen and the edge weights.
+        """
+        nodes, edge_weights = list(self.nodes), self.edge_weights
+        self.nodes = {}
+        self.edge_weights = {}
+
+        return nodes, edge_weights
+
+    def take_lines(self) -> Dict[Tuple[str, str], List[int]]:
+        """Return the sentences of the edges counted since the last call, a resumed count goes on with the numbers of the count it resumes.
+
+        Returns:
+            Dict[Tuple[str, str], List[int]]: The sentences of every edge, in the order of the links.
+        """
+        edge_lines = self.edge_lines
+        self.edge_lines = {}
+
+        return edge_lines
+
+    def take_mentions(self) -> Dict[str, List[int]]:
+        """Return the sentences that mention every character counted since the last call, numbered like the ones of take_lines.
+
+        Returns:
+            Dict[str, List[int]]: The increasing sentences of every character.
+        """
+        character_lines = self.character_lines
+        self.character_lines = {}
+
+        return character_lines
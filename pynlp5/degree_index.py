@@ -0,0 +1,86 @@
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Tuple, Union
+
+import networkx as nx
+
+
+class DegreeIndex:
+    def __init__(
+        self, nodes: Iterable[str], degrees: Iterable[Union[int, float]], version: int = 0
+    ) -> None:
+        """The nodes of a graph sorted by their number of connections (the weighted degree), from the most connected.
+        The k most connected nodes are the first k entries, no query has to look at the degrees of all the nodes.
+        When the weights of some edges change, only their nodes move in the order (with binary search), the index is not sorted again.
+        Equal degrees keep the order of the nodes in the graph.
+
+        Args:
+            nodes (Iterable[str]): The nodes, in the order of the graph.
+            degrees (Iterable[Union[int, float]]): The weighted degree of every node.
+            version (int, optional): The version of the graph the index was built from. Defaults to 0.
+        """
+        self.nodes = list(nodes)
+        self.node_ids = {node: i for i, node in enumerate(self.nodes)}
+        self.degrees = list(degrees)
+        # The sorted keys, the negated degree and the id of every node.
+        self.keys = sorted((-degree, i) for i, degree in enumerate(self.degrees))
+        self.version = version
+
+    @classmethod
+    def from_graph(cls, graph: nx.Graph, version: int = 0) -> "DegreeIndex":
+        """Build the index of a networkx graph, self loops count twice in the degree like in networkx."""
+        nodes = list(graph.nodes())
+        degrees = dict(graph.degree(weight="weight"))
+        return cls(nodes, [degrees[node] for node in nodes], version)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def copy(self) -> "DegreeIndex":
+        """Return a copy that can be updated without changing this index."""
+        index = DegreeIndex([], [], self.version)
+        index.nodes = list(self.nodes)
+        index.node_ids = dict(self.node_ids)
+        index.degrees = list(self.degrees)
+        index.keys = list(self.keys)
+        return index
+
+    def top(self, k: int, offset: int = 0) -> List[Tuple[str, Union[int, float]]]:
+        """Return the k most connected nodes after the first offset ones.
+
+        Args:
+            k (int): The number of nodes.
+            offset (int, optional): The number of more connected nodes to skip. Defaults to 0.
+
+        Returns:
+            List[Tuple[str, Union[int, float]]]: The nodes and their weighted degrees, from the most connected.
+        """
+        return [(self.nodes[i], -degree) for degree, i in self.keys[offset : offset + max(k, 0)]]
+
+    def add(self, nodes: Iterable[str], edge_weights: Dict[Tuple[str, str], Union[int, float]]) -> None:
+        """Update the index with counts added to the graph, see add_mention_counts.
+
+        Args:
+            nodes (Iterable[str]): The nodes added to the graph, the new ones go after the existing ones.
+            edge_weights (Dict[Tuple[str, str], Union[int, float]]): The weights added to the edges.
+        """
+        for node in nodes:
+            self.add_node(node)
+        for (node1, node2), weight in edge_weights.items():
+            self.add_degree(node1, weight)
+            self.add_degree(node2, weight)
+
+    def add_node(self, node: str) -> None:
+        """Add a node without connections, if it is not in the index."""
+        if node not in self.node_ids:
+            self.node_ids[node] = len(self.nodes)
+            self.nodes.append(node)
+            self.degrees.append(0)
+            insort(self.keys, (0, self.node_ids[node]))
+
+    def add_degree(self, node: str, weight: Union[int, float]) -> None:
+        """Add a weight to the degree of a node and move it to its new place in the order."""
+        self.add_node(node)
+        i = self.node_ids[node]
+        del self.keys[bisect_left(self.keys, (-self.degrees[i], i))]
+        self.degrees[i] += weight
+        insort(self.keys, (-self.degrees[i], i))
@@ -0,0 +1,330 @@
+import base64
+import os
+from array import array
+from bisect import bisect_right
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# An edge of the graph, the two characters in the order of their names.
+Edge = Tuple[str, str]
+
+
+def edge_key(character1: str, character2: str) -> Edge:
+    """Return the key of the edge between two characters, the same in both directions."""
+    return (character1, character2) if character1 <= character2 else (character2, character1)
+
+
+def encode_varint(value: int, data: bytearray) -> None:
+    """Append a non negative integer to data, 7 bits per byte, the high bit set on every byte but the last."""
+    while value >= 0x80:
+        data.append((value & 0x7F) | 0x80)
+        value >>= 7
+    data.append(value)
+
+
+def encode_postings(line_ids: Iterable[int]) -> bytearray:
+    """Encode increasing line ids as a postings list, the gaps between them as varints."""
+    data = bytearray()
+    last = 0
+    for line_id in line_ids:
+        encode_varint(line_id - last, data)
+        last = line_id
+    return data
+
+
+def decode_postings(data: bytes) -> Iterator[int]:
+    """Decode a postings list, the line ids are the running sums of the varint encoded gaps.
+
+    Args:
+        data (bytes): The encoded postings list.
+
+    Yields:
+        int: The line ids, in increasing order.
+    """
+    line_id, value, shift = 0, 0, 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            line_id += value
+            yield line_id
+            value, shift = 0, 0
+
+
+class Postings:
+    def __init__(self) -> None:
+        """The lines where every edge was counted, a postings list per edge.
+        The line ids of an edge only grow (the text is counted in order), so we store the gaps between them as varints:
+        most gaps take a single byte, a list costs about a byte per line instead of a Python int and a list slot.
+        The first gap of a list is the first line id itself.
+        """
+        self.data = {}
+        # The last line id and the number of line ids of every edge, to append the next ones.
+        self.last = {}
+        self.counts = {}
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def add(self, edge_lines: Dict[Edge, List[int]], first_line: int = 0) -> None:
+        """Add the lines counted for some edges.
+
+        Args:
+            edge_lines (Dict[Edge, List[int]]): The lines of every edge (any order, with repeats), from the first line.
+            first_line (int, optional): The line id of the first line. Defaults to 0.
+        """
+        for (character1, character2), lines in edge_lines.items():
+            self.append(edge_key(character1, character2), (first_line + line for line in sorted(set(lines))))
+
+    def append(self, edge: Edge, line_ids: Iterable[int]) -> None:
+        """Append increasing line ids to the postings list of an edge, the ids already in the list are skipped."""
+        data = self.data.get(edge)
+        if data is None:
+            data = self.data[edge] = bytearray()
+            last, count = -1, 0
+        else:
+            last, count = self.last[edge], self.counts[edge]
+        for line_id in line_ids:
+            if line_id > last:
+                # The first gap is from 0, so the first line id 0 is stored too.
+                encode_varint(line_id - max(last, 0), data)
+                last = line_id
+                count += 1
+        self.last[edge], self.counts[edge] = last, count
+
+    def extend(self, other: "Postings", first_line: int = 0) -> None:
+        """Add the postings of another text that starts at a line id."""
+        for edge, data in other.data.items():
+            self.append(edge, (first_line + line_id for line_id in decode_postings(data)))
+
+    def lines(self, character1: str, character2: str) -> Iterator[int]:
+        """Return the line ids of an edge, in increasing order."""
+        return decode_postings(self.data.get(edge_key(character1, character2), b""))
+
+    def count(self, character1: str, character2: str) -> int:
+        """Return the number of lines of an edge."""
+        return self.counts.get(edge_key(character1, character2), 0)
+
+    def encoded(self, character1: str, character2: str) -> bytes:
+        """Return the encoded postings list of an edge."""
+        return bytes(self.data.get(edge_key(character1, character2), b""))
+
+    def copy(self) -> "Postings":
+        """Return a copy that can be changed without changing this one."""
+        postings = Postings()
+        postings.data = {edge: bytearray(data) for edge, data in self.data.items()}
+        postings.last = dict(self.last)
+        postings.counts = dict(self.counts)
+        return postings
+
+    def to_dict(self) -> dict:
+        """Return the postings as json serializable lists, the encoded lists in base64."""
+        return {
+            "edges": [
+                [character1, character2, self.counts[(character1, character2)], base64.b64encode(data).decode("ascii")]
+                for (character1, character2), data in self.data.items()
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Postings":
+        """Load the postings saved by to_dict."""
+        return cls.from_lists(
+            ((character1, character2), count, base64.b64decode(encoded))
+            for character1, character2, count, encoded in data["edges"]
+        )
+
+    @classmethod
+    def from_lists(cls, lists: Iterable[Tuple[Edge, int, bytes]]) -> "Postings":
+        """Build the postings from the encoded list and the number of lines of every edge."""
+        postings = cls()
+        for edge, count, data in lists:
+            postings.data[edge] = bytearray(data)
+            postings.counts[edge] = count
+            last = -1
+            for last in decode_postings(data):
+                pass
+            postings.last[edge] = last
+        return postings
+
+
+class LineIndex:
+    def __init__(self, text_path: str, line_offsets: array) -> None:
+        """The byte offset of every line of a text file, so a line is read with a single seek.
+
+        Args:
+            text_path (str): Path to the text file.
+            line_offsets (array): The byte offset of every line, and the size of the file at the end.
+        """
+        self.text_path = text_path
+        self.line_offsets = line_offsets
+
+    @classmethod
+    def build(cls, text_path: str) -> "LineIndex":
+        """Find the offsets of the lines of a text file, with one pass over its bytes."""
+        line_offsets = array("Q", [0])
+        with open(text_path, "rb") as f:
+            for line in f:
+                line_offsets.append(line_offsets[-1] + len(line))
+        # The file doesn't always end with a new line, the offset of the end of the last line is the size of the file.
+        if len(line_offsets) == 1:
+            line_offsets.append(0)
+
+        return cls(text_path, line_offsets)
+
+    def __len__(self) -> int:
+        return len(self.line_offsets) - 1
+
+    def line_number(self, offset: int) -> int:
+        """Return the number of the line that starts at (or contains) a byte offset."""
+        return bisect_right(self.line_offsets, offset) - 1
+
+    def read_lines(self, line_numbers: Iterable[int]) -> List[str]:
+        """Read some lines of the text file.
+
+        Raises:
+            ValueError: If the text file changed since the index was built.
+        """
+        if os.path.getsize(self.text_path) != self.line_offsets[-1]:
+            raise ValueError(f"{self.text_path} changed since the graph was built.")
+
+        lines = []
+        with open(self.text_path, "rb") as f:
+            for line_number in line_numbers:
+                start, end = self.line_offsets[line_number], self.line_offsets[line_number + 1]
+                f.seek(start)
+                lines.append(f.read(end - start).decode("utf-8", errors="replace").strip())
+        return lines
+
+
+# A text of the evidence, the lines of a text file or lines that were ingested (kept in memory).
+Text = Union[LineIndex, List[str]]
+
+
+class EvidenceStore:
+    def __init__(self) -> None:
+        """The sentences behind the edges of a knowledge graph.
+        Every line of every text counted into the graph has an id, the texts get consecutive ranges of ids in the order they are counted.
+        The postings give the line ids of an edge, the text of a line id is read from its text file with the line index,
+        so the evidence of an edge is a dictionary lookup and a few seeks, we never scan the text again.
+        """
+        self.postings = Postings()
+        self.texts = []
+        # The line id of the first line of every text.
+        self.first_lines = []
+        # The line indexes of the text files, a file counted twice is only indexed once.
+        self.line_indexes = {}
+
+    @property
+    def line_count(self) -> int:
+        """The number of line ids given to the texts."""
+        return self.first_lines[-1] + len(self.texts[-1]) if self.texts else 0
+
+    def add_text(self, text_path: str) -> int:
+        """Add a text file, its lines get the next line ids.
+
+        Args:
+            text_path (str): Path to the text file.
+
+        Returns:
+            int: The line id of the first line of the file.
+        """
+        text_path = os.path.abspath(text_path)
+        if text_path not in self.line_indexes:
+            self.line_indexes[text_path] = LineIndex.build(text_path)
+        return self.add(self.line_indexes[text_path])
+
+    def add_lines(self, lines: List[str]) -> int:
+        """Add ingested lines, they are kept in memory since they don't come from a file.
+
+        Returns:
+            int: The line id of the first line.
+        """
+        return self.add([line.strip() for line in lines])
+
+    def add(self, text: Text) -> int:
+        first_line = self.line_count
+        self.texts.append(text)
+        self.first_lines.append(first_line)
+        return first_line
+
+    def locate(self, line_id: int) -> Tuple[int, int]:
+        """Return the text of a line id and the number of the line in the text."""
+        text = bisect_right(self.first_lines, line_id) - 1
+        return text, line_id - self.first_lines[text]
+
+    def read(self, line_ids: Iterable[int]) -> List[Dict[str, Union[str, int]]]:
+        """Read the lines of some line ids.
+
+        Returns:
+            List[Dict[str, Union[str, int]]]: The source of every line (the name of the text file or "ingested"),
+                the number of the line in its source (from 1, like an editor) and the text of the line.
+        """
+        locations = [self.locate(line_id) for line_id in line_ids]
+
+        # We read the lines of every file together, in the order of the file.
+        texts = {}
+        for text, line_number in sorted(set(locations)):
+            texts.setdefault(text, []).append(line_number)
+        lines = {}
+        for text, line_numbers in texts.items():
+            if isinstance(self.texts[text], LineIndex):
+                text_lines = self.texts[text].read_lines(line_numbers)
+            else:
+                text_lines = [self.texts[text][line_number] for line_number in line_numbers]
+            lines.update(((text, line_number), line) for line_number, line in zip(line_numbers, text_lines))
+
+        return [
+            {
+                "source": self.source(text),
+                "line": line_number + 1,
+                "text": lines[(text, line_number)],
+            }
+            for text, line_number in locations
+        ]
+
+    def source(self, text: int) -> str:
+        """Return the name of a text, the name of its file or "ingested"."""
+        if isinstance(self.texts[text], LineIndex):
+            return os.path.basename(self.texts[text].text_path)
+        return "ingested"
+
+    def lines(self, character1: str, character2: str, limit: Optional[int] = None) -> List[int]:
+        """Return the first line ids of an edge (all of them without a limit)."""
+        return list(islice(self.postings.lines(character1, character2), limit))
+
+    def copy(self) -> "EvidenceStore":
+        """Return a copy that can be changed without changing this one, the texts never change so they are shared."""
+        evidence = EvidenceStore()
+        evidence.postings = self.postings.copy()
+        evidence.texts = list(self.texts)
+        evidence.first_lines = list(self.first_lines)
+        evidence.line_indexes = dict(self.line_indexes)
+        return evidence
+
+    def to_dict(self) -> dict:
+        """Return the evidence as json serializable lists, the line offsets of the files are kept so they are not read again."""
+        return {
+            "texts": [
+                {"path": text.text_path, "line_offsets": text.line_offsets.tolist()}
+                if isinstance(text, LineIndex)
+                else {"lines": text}
+                for text in self.texts
+            ],
+            "postings": self.postings.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "EvidenceStore":
+        """Load the evidence saved by to_dict."""
+        evidence = cls()
+        for text in data["texts"]:
+            if "path" in text:
+                if text["path"] not in evidence.line_indexes:
+                    evidence.line_indexes[text["path"]] = LineIndex(text["path"], array("Q", text["line_offsets"]))
+                evidence.add(evidence.line_indexes[text["path"]])
+            else:
+                evidence.add(text["lines"])
+        evidence.postings = Postings.from_dict(data["postings"])
+        return evidence
@@ -0,0 +1,206 @@
+import heapq
+from itertools import pairwise
+from typing import Callable, Collection, Dict, List, Optional, Sequence, Set, Tuple
+
+# The hard caps of a query: the number of paths, the number of edges of a path,
+# and the number of neighbors the searches of a query look at, after which it returns the paths found so far.
+MAX_PATHS = 20
+MAX_PATH_LENGTH = 8
+EXPANSION_BUDGET = 500_000
+
+
+class BudgetExhausted(Exception):
+    """The searches of a query looked at more neighbors than their budget."""
+
+
+class SearchBudget:
+    def __init__(self, expansions: int = EXPANSION_BUDGET) -> None:
+        """The number of neighbors the searches of a query can still look at, shared by all of them.
+
+        Args:
+            expansions (int, optional): The number of neighbors. Defaults to EXPANSION_BUDGET.
+        """
+        self.remaining = expansions
+
+    def spend(self, expansions: int) -> None:
+        """Spend some of the budget.
+
+        Raises:
+            BudgetExhausted: If there is not enough budget left.
+        """
+        self.remaining -= expansions
+        if self.remaining < 0:
+            raise BudgetExhausted()
+
+
+def bidirectional_path(
+    adjacency: Sequence[Sequence[int]],
+    source: int,
+    target: int,
+    max_length: int,
+    blocked_nodes: Collection[int] = (),
+    blocked_edges: Collection[Tuple[int, int]] = (),
+    budget: SearchBudget = None,
+) -> Optional[List[int]]:
+    """Find a shortest path (in number of edges) with a BFS from both ends, the smaller frontier is expanded first.
+    The two searches meet in the middle, so they look at far fewer neighbors than one BFS from the source around the hubs.
+
+    Args:
+        adjacency (Sequence[Sequence[int]]): The ids of the neighbors of every node.
+        source (int): The id of the first node.
+        target (int): The id of the last node.
+        max_length (int): The largest number of edges of the path.
+        blocked_nodes (Collection[int], optional): The nodes the path can't go through. Defaults to none.
+        blocked_edges (Collection[Tuple[int, int]], optional): The edges the path can't follow, in both directions. Defaults to none.
+        budget (SearchBudget, optional): The budget the neighbors are taken from. Defaults to no limit.
+
+    Raises:
+        BudgetExhausted: If the budget runs out before the search ends.
+
+    Returns:
+        Optional[List[int]]: The ids of the nodes of the path, None if there is no path of at most max_length edges.
+    """
+    if source == target:
+        return [source]
+
+    # The predecessor of every node reached from each end, and the nodes of the last level of each end.
+    parents = [{source: None}, {target: None}]
+    frontiers = [[source], [target]]
+    length = 0
+    while frontiers[0] and frontiers[1] and length < max_length:
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        visited, other = parents[side], parents[1 - side]
+        next_frontier = []
+        for node in frontiers[side]:
+            neighbors = adjacency[node]
+            if budget is not None:
+                budget.spend(len(neighbors))
+            for neighbor in neighbors:
+                if neighbor in visited or neighbor in blocked_nodes or (node, neighbor) in blocked_edges:
+                    continue
+                visited[neighbor] = node
+                # The other end has reached every node of its levels, and none of them was reached from this end before,
+                # so the first node both ends reach is on a shortest path.
+                if neighbor in other:
+                    return join_path(parents, neighbor)
+                next_frontier.append(neighbor)
+        frontiers[side] = next_frontier
+        length += 1
+
+    return None
+
+
+def join_path(parents: List[Dict[int, Optional[int]]], middle: int) -> List[int]:
+    """Return the path through the node where the two searches met, from the source to the target."""
+    path = []
+    node = middle
+    while node is not None:
+        path.append(node)
+        node = parents[0][node]
+    path.reverse()
+
+    node = parents[1][middle]
+    while node is not None:
+        path.append(node)
+        node = parents[1][node]
+
+    return path
+
+
+def k_shortest_paths(
+    adjacency: Sequence[Sequence[int]],
+    source: int,
+    target: int,
+    k: int,
+    max_length: int = MAX_PATH_LENGTH,
+    avoid: Collection[int] = (),
+    weight: Callable[[int, int], float] = None,
+    budget: int = EXPANSION_BUDGET,
+) -> Tuple[List[List[int]], bool]:
+    """Find the k shortest simple paths (in number of edges) between two nodes, with Yen's algorithm.
+    Every path after the first one leaves a path found before at a spur node: the edges the paths found before take from
+    the same beginning are removed, and a bidirectional BFS finds the rest of the path from the spur node.
+    The searches are pruned:
+    - a path only spurs from the node where it left its own parent path (Lawler), the earlier spurs were already searched,
+    - a spur search stops at the length of the longest candidate that can still be chosen, a longer path would never be.
+    The candidates of the same length are taken by decreasing sum of the weights of their edges, and the paths are returned in that order.
+
+    Args:
+        adjacency (Sequence[Sequence[int]]): The ids of the neighbors of every node.
+        source (int): The id of the first node.
+        target (int): The id of the last node.
+        k (int): The number of paths, from 1 to MAX_PATHS.
+        max_length (int, optional): The largest number of edges of a path, from 1 to MAX_PATH_LENGTH. Defaults to MAX_PATH_LENGTH.
+        avoid (Collection[int], optional): The nodes the paths can't go through. Defaults to none.
+        weight (Callable[[int, int], float], optional): The weight of the edge between two nodes. Defaults to the same weight for every edge.
+        budget (int, optional): The number of neighbors all the searches can look at. Defaults to EXPANSION_BUDGET.
+
+    Raises:
+        ValueError: If k or max_length is out of bounds, or the paths must avoid their own ends.
+
+    Returns:
+        Tuple[List[List[int]], bool]: The paths, the ids of their nodes from the source to the target, the shortest first,
+            and whether the search is complete (False if it ran out of budget, there may be more paths than the ones found).
+    """
+    if not 1 <= k <= MAX_PATHS:
+        raise ValueError(f"k must be between 1 and {MAX_PATHS}.")
+    if not 1 <= max_length <= MAX_PATH_LENGTH:
+        raise ValueError(f"The length of the paths must be between 1 and {MAX_PATH_LENGTH}.")
+    avoid = set(avoid)
+    if source in avoid or target in avoid:
+        raise ValueError("The paths can't avoid their own ends.")
+
+    def rank(path: List[int]) -> Tuple[int, float, List[int]]:
+        # The shortest first, then the strongest, then the smallest ids so the order never depends on the heap.
+        strength = sum(weight(node1, node2) for node1, node2 in pairwise(path)) if weight is not None else 0
+        return len(path) - 1, -strength, path
+
+    search_budget = SearchBudget(budget)
+    paths = []
+    try:
+        first = bidirectional_path(adjacency, source, target, max_length, avoid, (), search_budget)
+        if first is None:
+            return [], True
+        paths.append(first)
+
+        # The candidates (rank, spur index, path), and every path that was ever a candidate.
+        deviations = [0]
+        candidates = []
+        seen = {tuple(first)}
+        while len(paths) < k:
+            previous = paths[-1]
+            for spur in range(deviations[-1], len(previous) - 1):
+                root = previous[: spur + 1]
+                limit = max_length - spur
+                needed = k - len(paths)
+                if len(candidates) >= needed:
+                    limit = min(limit, heapq.nsmallest(needed, candidates)[-1][0][0] - spur)
+                # The limits only get smaller with the next spur nodes.
+                if limit < 1:
+                    break
+
+                blocked_edges: Set[Tuple[int, int]] = set()
+                for path in paths:
+                    if len(path) > spur + 1 and path[: spur + 1] == root:
+                        blocked_edges.add((path[spur], path[spur + 1]))
+                        blocked_edges.add((path[spur + 1], path[spur]))
+                spur_path = bidirectional_path(
+                    adjacency, root[-1], target, limit, avoid.union(root[:-1]), blocked_edges, search_budget
+                )
+                if spur_path is None:
+                    continue
+
+                path = root[:-1] + spur_path
+                if tuple(path) not in seen:
+                    seen.add(tuple(path))
+                    heapq.heappush(candidates, (rank(path), spur, path))
+
+            if not candidates:
+                break
+            _, spur, path = heapq.heappop(candidates)
+            paths.append(path)
+            deviations.append(spur)
+    except BudgetExhausted:
+        return sorted(paths, key=rank), False
+
+    return sorted(paths, key=rank), True
@@ -1,20 +1,76 @@
+import copy
+import hashlib
 import json
+import os
 import re
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
-from typing import Iterable, Tuple
+from itertools import islice, pairwise
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 import networkx as nx
-from more_itertools import pairwise
-from tqdm import tqdm
+
+from pynlp5.analytics import GraphAnalytics
+from pynlp5.cache import LRUCache
+from pynlp5.character_index import CharacterIndex, parse_character_query, query_lines
+from pynlp5.checkpoint import CHECKPOINT_EVERY, BuildCheckpoint, checkpoint_filename
+from pynlp5.cooccurrence import CooccurrenceCounter, CooccurrencePolicy
+from pynlp5.degree_index import DegreeIndex
+from pynlp5.evidence import EvidenceStore
+from pynlp5.k_paths import MAX_PATH_LENGTH, k_shortest_paths
+from pynlp5.matcher import MentionMatcher, build_patterns
+from pynlp5.mention_index import MentionIndex, hash_patterns, named_patterns
+from pynlp5.metrics import METRICS
+from pynlp5.parallel import (
+    CHUNK_SIZE,
+    Chunk,
+    add_mention_counts,
+    count_chunks_parallel,
+    read_chunk,
+    split_into_chunks,
+)
+from pynlp5.path_index import PathIndex
+from pynlp5.snapshot import GraphSnapshot, is_snapshot, write_snapshot
+from pynlp5.temporal import (
+    TIME_SLICE_CACHE_SIZE,
+    TemporalWeights,
+    TimeRange,
+    chapter_ranges,
+    slice_k_shortest_paths,
+    slice_most_connections,
+    slice_neighborhoods,
+    slice_shortest_path,
+    slice_top_connected,
+)
+
+# scipy takes a while to import, we only import it when the sparse adjacency matrix is first needed.
+if TYPE_CHECKING:
+    import numpy as np
+
+    from pynlp5.layout import GraphLayout
+    from pynlp5.similarity import SimilarityIndex
+    from pynlp5.sparse import SparseAdjacency
+
+# First names that are common words, we never match these alone.
+IGNORED_FIRST_NAMES = ["the", "a", "an", "lady"]
+
+# The compiled regular expressions and matchers of this process, keyed by the hash of the characters and the aliases.
+# Every graph built from the same files (for example every build of the backend) compiles them only once.
+COMPILED_REGEX = {}
+COMPILED_MATCHERS = {}
 
 
 class KnowledgeGraph:
     def __init__(
         self,
-        text_path: str,
+        text_path: Union[str, List[str]],
         characters_path: str,
         character_aliases_path: str,
         serialized_kg: str = None,
+        processes: int = 1,
+        index_dir: str = None,
+        checkpoint_dir: str = None,
+        cooccurrence: CooccurrencePolicy = None,
     ) -> None:
         """This is the graph class that will contain the knowledge graph and implement all the preprocessing and graph building methods.
         For the preprocessing, we will use the characters and character aliases files.
@@ -23,14 +79,39 @@ class KnowledgeGraph:
         For graph algorithms we will use the networkx library, this will be the backbone of the graph class.
 
         Args:
-            text_path (str): The path to the text file, it contains the text line by line.
+            text_path (Union[str, List[str]]): The path to the text file (or a list of paths), it contains the text line by line.
             characters_path (str): The path to the characters file, it contains the characters line by line.
             character_aliases_path (str): The path to the character aliases file, it contains the character aliases as a json object.
             serialized_kg (str, optional): The path to the serialized knowledge graph, if present we won't build it. Defaults to None.
+            processes (int, optional): The number of processes used to build the graph, None means the number of CPUs.
+                It is ignored with an index_dir or a checkpoint_dir, those builds are always sequential. Defaults to 1.
+            index_dir (str, optional): The directory of the mention indexes, if present we reuse the matches of previous builds. Defaults to None.
+            checkpoint_dir (str, optional): The directory of the build checkpoints, if present an interrupted build resumes from its last checkpoint. Defaults to None.
+            cooccurrence (CooccurrencePolicy, optional): Which mentioned characters are linked, see CooccurrencePolicy. Defaults to the pairwise policy.
         """
 
         # The knowledge graph, empty at first.
         self.kg = nx.Graph()
+        # The version of the graph, it is increased every time the graph changes.
+        # The indexes built from the graph remember the version, so we know when they are outdated.
+        self.version = 0
+        # The shortest path index, the sparse adjacency matrix, the degree index, the layout and the similarity index, built when they are first needed.
+        self.path_index = None
+        self.sparse_adjacency = None
+        self.degree_index = None
+        self.layout = None
+        self.similarity_index = None
+        # The communities and the centralities, only computed on demand (compute_analytics) since they take a while.
+        self.analytics = None
+        # Which characters we link when they are mentioned close to each other.
+        self.cooccurrence = cooccurrence or CooccurrencePolicy()
+        # The weights of the edges in every chapter of every book, and the adjacency matrices of the time ranges queried lately.
+        self.temporal = TemporalWeights()
+        self.time_slices = LRUCache(TIME_SLICE_CACHE_SIZE)
+        # The lines every edge was counted in, to show the sentences behind an edge.
+        self.evidence = EvidenceStore()
+        # The lines that mention every character, numbered like the lines of the evidence.
+        self.mentions = CharacterIndex()
 
         # The characters list, empty at first.
         self.characters = []
@@ -54,38 +135,129 @@ class KnowledgeGraph:
         # We will use regular expressions to recognize mentions of the characters.
         # We compile the regular expressions for the characters, the first names and the aliases.
         # We do this to speed up the recognition of mentions of the characters. (Only need to compile the regex once)
-        self.characters_regex = {}
-        self.character_first_names_regex = {}
-        self.character_aliases_regex = {}
-        self.compile_characters_regex()
+        # They are compiled when they are first used (see the properties below), a graph loaded from a file may never match any text.
+        self._characters_regex = None
+        self._character_first_names_regex = None
+        self._character_aliases_regex = None
+
+        # The regular expressions above are checked one character at a time.
+        # For building the graph we compile every name, first name and alias into one automaton instead,
+        # this way we find all the mentions in a line with a single pass over the line.
+        # The automaton is also compiled when it is first used.
+        self._patterns = None
+        self._matcher = None
 
         # If the serialized knowledge graph is present, we deserialize it.
         # Else we build the knowledge graph.
+        # With more than one process we build the graph with a process pool, unless the matches come from the mention index
+        # or the build is checkpointed: both read the books in order, so they ignore the number of processes.
+        # The time it takes is recorded in the metrics, as "load" or "build".
+        text_paths = [text_path] if isinstance(text_path, str) else text_path
         if serialized_kg:
-            self.deserialize_kg(serialized_kg)
+            with METRICS.timer("load"):
+                self.deserialize_kg(serialized_kg)
+        elif processes == 1 or index_dir or checkpoint_dir:
+            with METRICS.timer("build"):
+                for path in text_paths:
+                    self.build_kg(path, index_dir, checkpoint_dir)
         else:
-            self.build_kg(text_path)
+            with METRICS.timer("build"):
+                self.build_kg_parallel(text_paths, processes)
+
+    def copy(self) -> "KnowledgeGraph":
+        """Return a copy of the knowledge graph that can be changed without changing this one.
+        Only the graph, its temporal weights, its evidence and its mentions are copied, the characters, the patterns and the matcher never change after the construction so they are shared.
+
+        Returns:
+            KnowledgeGraph: The copy.
+        """
+        knowledge_graph = copy.copy(self)
+        knowledge_graph.kg = self.kg.copy()
+        knowledge_graph.temporal = self.temporal.copy()
+        knowledge_graph.evidence = self.evidence.copy()
+        knowledge_graph.mentions = self.mentions.copy()
+        knowledge_graph.time_slices = LRUCache(TIME_SLICE_CACHE_SIZE)
+        # The degree index is updated in place by ingest_lines.
+        if self.degree_index is not None:
+            knowledge_graph.degree_index = self.degree_index.copy()
+
+        return knowledge_graph
 
     def serialize_kg(self, filename: str) -> None:
         """We use networkx to serialize the knowledge graph to a json file.
+        The weights of the edges in every chapter, the analytics, the evidence and the mentions are saved next to the graph.
 
         Args:
             filename (str): Path to the file where we will serialize the knowledge graph.
         """
         json_graph = nx.cytoscape_data(self.kg)
+        if self.temporal.periods:
+            json_graph["temporal"] = self.temporal.to_dict()
+        if self.get_analytics() is not None:
+            json_graph["analytics"] = self.analytics.to_dict()
+        if self.get_evidence() is not None:
+            json_graph["evidence"] = self.evidence.to_dict()
+            json_graph["mentions"] = self.mentions.to_dict()
         with open(filename, "w") as f:
             json.dump(json_graph, f)
 
+    def serialize_snapshot(self, filename: str) -> None:
+        """Serialize the knowledge graph to a compact binary snapshot.
+        The snapshot can be loaded with deserialize_kg, or memory-mapped with GraphSnapshot without building a networkx graph.
+
+        Args:
+            filename (str): Path to the file where we will serialize the knowledge graph.
+        """
+        write_snapshot(
+            self.kg,
+            filename,
+            self.temporal,
+            self.get_analytics(),
+            self.get_evidence(),
+            self.mentions if self.get_evidence() is not None else None,
+        )
+
     def deserialize_kg(self, filename: str) -> None:
         """
-        Deserialize the knowledge graph from a file.
+        Deserialize the knowledge graph from a file, either a json file or a binary snapshot.
 
         Args:
             filename (str): Path to the file where the knowledge graph is serialized.
         """
-        with open(filename, "r") as f:
-            json_graph = json.load(f)
-            self.kg = nx.cytoscape_graph(json_graph)
+        if is_snapshot(filename):
+            snapshot = GraphSnapshot(filename)
+            self.kg = snapshot.to_networkx()
+            self.temporal = snapshot.get_temporal() or TemporalWeights()
+            self.analytics = snapshot.get_analytics()
+            # The evidence and the mentions of the snapshot are read from the memory map, we copy them before closing the map.
+            if snapshot.get_evidence() is not None:
+                self.evidence = EvidenceStore.from_dict(snapshot.get_evidence().to_dict())
+            if snapshot.get_mentions() is not None:
+                self.mentions = CharacterIndex.from_dict(snapshot.get_mentions().to_dict())
+            snapshot.close()
+        else:
+            with open(filename, "r") as f:
+                json_graph = json.load(f)
+                self.kg = nx.cytoscape_graph(json_graph)
+            if "temporal" in json_graph:
+                self.temporal = TemporalWeights.from_dict(json_graph["temporal"])
+            if "analytics" in json_graph:
+                self.analytics = GraphAnalytics.from_dict(json_graph["analytics"])
+            if "evidence" in json_graph:
+                self.evidence = EvidenceStore.from_dict(json_graph["evidence"])
+            if "mentions" in json_graph:
+                self.mentions = CharacterIndex.from_dict(json_graph["mentions"])
+
+        self.graph_changed()
+        # The saved analytics are the ones of the loaded graph.
+        if self.analytics is not None:
+            self.analytics.version = self.version
+
+    def graph_changed(self) -> None:
+        """
+        Increase the version of the graph, the indexes of the older versions are rebuilt when they are next used.
+        """
+        self.version += 1
 
     # ================================================================================================
     # Preprocessing and regex methods
@@ -122,15 +294,28 @@ class KnowledgeGraph:
         """
         Compile the regular expressions for the characters, the first names and the aliases.
         """
+        # Graphs with the same characters and aliases share the compiled regular expressions.
+        key = self.characters_hash()
+        if key in COMPILED_REGEX:
+            (
+                self._characters_regex,
+                self._character_first_names_regex,
+                self._character_aliases_regex,
+            ) = COMPILED_REGEX[key]
+            return
+
+        self._characters_regex = {}
+        self._character_first_names_regex = {}
+        self._character_aliases_regex = {}
 
         # For each character we compile a regular expression that matches the character name.
         # We build a dictionary where the keys are the characters and the values are the compiled regular expressions.
         for character in self.characters:
-            self.characters_regex[character] = re.compile(r"\b" + character + r"\b")
+            self._characters_regex[character] = re.compile(r"\b" + character + r"\b")
 
         # For each first name we compile a regular expression that matches the first name.
         for first_name in self.character_first_names:
-            self.character_first_names_regex[first_name] = re.compile(
+            self._character_first_names_regex[first_name] = re.compile(
                 r"\b" + first_name + r"\b"
             )
 
@@ -143,10 +328,84 @@ class KnowledgeGraph:
                 if alias not in self.characters:
                     character_aliases_regex += r"\b" + alias + r"\b|"
             if character_aliases_regex != "":
-                self.character_aliases_regex[character] = re.compile(
+                self._character_aliases_regex[character] = re.compile(
                     character_aliases_regex.strip("|")
                 )
 
+        COMPILED_REGEX[key] = (
+            self._characters_regex,
+            self._character_first_names_regex,
+            self._character_aliases_regex,
+        )
+
+    def compile_mention_matcher(self) -> None:
+        """
+        Compile the full names, the unambiguous first names and the aliases into a single MentionMatcher.
+        """
+        # Graphs with the same characters and aliases share the compiled matcher.
+        key = self.characters_hash()
+        if key not in COMPILED_MATCHERS:
+            patterns = build_patterns(
+                self.characters,
+                self.character_first_names,
+                self.character_aliases,
+                IGNORED_FIRST_NAMES,
+            )
+            COMPILED_MATCHERS[key] = (patterns, MentionMatcher(patterns))
+
+        self._patterns, self._matcher = COMPILED_MATCHERS[key]
+
+    def characters_hash(self) -> str:
+        """Return the hash of the characters and the character aliases, the compiled regular expressions and matchers only depend on these."""
+        data = json.dumps([self.characters, self.character_aliases], sort_keys=True)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    @property
+    def characters_regex(self) -> Dict[str, re.Pattern]:
+        if self._characters_regex is None:
+            self.compile_characters_regex()
+        return self._characters_regex
+
+    @property
+    def character_first_names_regex(self) -> Dict[str, re.Pattern]:
+        if self._character_first_names_regex is None:
+            self.compile_characters_regex()
+        return self._character_first_names_regex
+
+    @property
+    def character_aliases_regex(self) -> Dict[str, re.Pattern]:
+        if self._character_aliases_regex is None:
+            self.compile_characters_regex()
+        return self._character_aliases_regex
+
+    @property
+    def patterns(self) -> Dict[str, Set[int]]:
+        if self._patterns is None:
+            self.compile_mention_matcher()
+        return self._patterns
+
+    @property
+    def matcher(self) -> MentionMatcher:
+        if self._matcher is None:
+            self.compile_mention_matcher()
+        return self._matcher
+
+    @matcher.setter
+    def matcher(self, matcher: MentionMatcher) -> None:
+        self._matcher = matcher
+
+    def match_characters(self, text: str) -> List[str]:
+        """Match all the characters in a text.
+        This finds the same characters as calling match_character for every character, but in one pass over the text.
+
+        Args:
+            text (str): The text where we will search for the characters.
+
+        Returns:
+            List[str]: The characters present in the text, in the order of the characters list.
+        """
+        return [self.characters[i] for i in sorted(self.matcher.find(text))]
+
     def match_character(self, text: str, character: str) -> bool:
         """Match a character in a text.
 
@@ -180,50 +439,323 @@ class KnowledgeGraph:
             # And if the first name is not in a list of common first names.
             if self.character_first_names[
                 first_name
-            ] == 1 and first_name.lower() not in ["the", "a", "an", "lady"]:
+            ] == 1 and first_name.lower() not in IGNORED_FIRST_NAMES:
                 if character_first_name_regex.search(text):
                     return True
             else:
                 return False
 
-    def build_kg(self, text_path: str) -> None:
+    def build_kg(
+        self, text_path: str, index_dir: str = None, checkpoint_dir: str = None
+    ) -> None:
         """Build knowledge graph from text file.
         Iterate on the lines of the text path and if the line contains multiple characters
-        Add an edge between every characters.
-        The nodes will be the characters, the weights of the edges will be how many times the characters are mentioned in the text.
+        Add an edge between the characters, which ones depends on the co-occurrence policy
+        (by default every character is linked to the next one in the order of the characters list).
+        The nodes will be the characters, the weights of the edges will be how many times the characters are mentioned together in the text.
+        The lines of every co-occurrence are added to the evidence of the edges, and the lines of every mention to the index of the mentions.
+        The time spent reading the text, matching it and adding to the graph is recorded in the metrics.
 
         Args:
             text_path (str): Path to the text file.
+            index_dir (str, optional): The directory of the mention indexes.
+                If present, we save the matches of every line there, and later builds only match the lines affected by changed characters or aliases. Defaults to None.
+            checkpoint_dir (str, optional): The directory of the build checkpoints.
+                If present, we build the graph chunk by chunk and save the progress there, see build_kg_streaming. Defaults to None.
         """
+        if checkpoint_dir:
+            self.build_kg_streaming(text_path, checkpoint_filename(text_path, checkpoint_dir))
+            return
+
+        # We count the text one chapter at a time, so we know the weights of the edges in every chapter.
+        with METRICS.timer("build.chapters"):
+            chapters = chapter_ranges(text_path)
+        first_period = self.temporal.add_book(chapter for chapter, _, _ in chapters)
+        # The chapters start at the first line of the file, the sentences of the counter are the lines of the file.
+        with METRICS.timer("build.evidence"):
+            first_line = self.evidence.add_text(text_path)
+            self.add_period_lines(text_path, first_line, chapters)
+        counter = CooccurrenceCounter(self.cooccurrence)
+        edges = self.kg.number_of_edges()
+
+        if index_dir:
+            # Loading the index also matches the lines of the changed characters.
+            with METRICS.timer("build.index"):
+                index = MentionIndex.load_or_build(
+                    text_path,
+                    index_dir,
+                    self.matcher,
+                    self.characters,
+                    named_patterns(self.patterns, self.characters),
+                )
+            matches = index.matches()
+            for period, (_, start, end) in enumerate(chapters, first_period):
+                line_count = bisect_left(index.line_offsets, end) - bisect_left(index.line_offsets, start)
+                with METRICS.timer("build.match"):
+                    for character_matches in islice(matches, line_count):
+                        counter.add(character_matches)
+                self.add_counts(*counter.take(), period, counter.take_lines(), counter.take_mentions(), first_line)
+            self.count_build(edges, counter)
+            self.graph_changed()
+            return
+
+        from tqdm import tqdm
+
+        for period, (_, start, end) in enumerate(tqdm(chapters), first_period):
+            # We read a whole chapter before matching it, so the reading and the matching are timed apart.
+            with METRICS.timer("build.read"):
+                lines = list(read_chunk((text_path, start, end)))
+            with METRICS.timer("build.match"):
+                counter.add_lines(lines, self.match_characters)
+            self.add_counts(*counter.take(), period, counter.take_lines(), counter.take_mentions(), first_line)
+        self.count_build(edges, counter)
+        self.graph_changed()
+
+        return
+
+    def build_kg_streaming(
+        self,
+        text_path: str,
+        checkpoint_path: str,
+        chunk_size: int = CHUNK_SIZE,
+        checkpoint_every: int = CHECKPOINT_EVERY,
+    ) -> None:
+        """Build knowledge graph from a text file, chunk by chunk, with a resumable checkpoint.
+        The counts of every chunk are added to the checkpoint, and every checkpoint_every chunks we save it with the byte offset reached.
+        If the build is interrupted, the next build with the same checkpoint path starts from the saved offset instead of the beginning.
+        The finished checkpoint is kept, so building the same file again with the same characters doesn't read the text at all.
+
+        Args:
+            text_path (str): Path to the text file.
+            checkpoint_path (str): Path to the checkpoint file.
+            chunk_size (int, optional): The size of a chunk in bytes. Defaults to CHUNK_SIZE.
+            checkpoint_every (int, optional): The number of chunks between two checkpoints. Defaults to CHECKPOINT_EVERY.
+        """
+        patterns_hash = hash_patterns(named_patterns(self.patterns, self.characters))
+
+        cooccurrence = self.cooccurrence.key()
+        with METRICS.timer("build.chapters"):
+            chapters = chapter_ranges(text_path)
+
+        # We only resume from a checkpoint of the same file, matched with the same characters and aliases and the same policy.
+        checkpoint = BuildCheckpoint.load(checkpoint_path)
+        if checkpoint is None or not checkpoint.matches(text_path, patterns_hash, cooccurrence):
+            checkpoint = BuildCheckpoint(text_path, patterns_hash, cooccurrence=cooccurrence)
+            checkpoint.temporal.add_book(chapter for chapter, _, _ in chapters)
+
+        if not checkpoint.done:
+            from tqdm import tqdm
+
+            # The chunks don't cross the chapters, the counts of a chunk are the counts of its chapter.
+            chapter_starts = [start for _, start, _ in chapters]
+            chunks = split_into_chunks(
+                [
+                    (text_path, max(start, checkpoint.offset), end)
+                    for _, start, end in chapters
+                    if end > checkpoint.offset
+                ],
+                chunk_size,
+            )
+            # The counter keeps the last sentences of the previous chunk, so a window spans the chunks (and the resumes).
+            counter = CooccurrenceCounter(self.cooccurrence, checkpoint.sentences, checkpoint.recent)
+            for i, chunk in enumerate(tqdm(chunks), 1):
+                with METRICS.timer("build.read"):
+                    lines = list(read_chunk(chunk))
+                with METRICS.timer("build.match"):
+                    counter.add_lines(lines, self.match_characters)
+                nodes, edge_weights = counter.take()
+                with METRICS.timer("build.graph"):
+                    checkpoint.add(
+                        nodes,
+                        edge_weights,
+                        chunk[2],
+                        counter.sentences,
+                        list(counter.recent),
+                        bisect_right(chapter_starts, chunk[1]) - 1,
+                        counter.take_lines(),
+                        counter.take_mentions(),
+                    )
+                METRICS.increment("build.edge_updates", len(edge_weights))
+                if i % checkpoint_every == 0:
+                    with METRICS.timer("build.checkpoint"):
+                        checkpoint.save(checkpoint_path)
+            checkpoint.offset = checkpoint.text_size
+            with METRICS.timer("build.checkpoint"):
+                checkpoint.save(checkpoint_path)
+        else:
+            counter = None
+
+        edges = self.kg.number_of_edges()
+        with METRICS.timer("build.graph"):
+            add_mention_counts(self.kg, list(checkpoint.nodes), checkpoint.edge_weights)
+            self.temporal.extend(checkpoint.temporal)
+        with METRICS.timer("build.evidence"):
+            first_line = self.evidence.add_text(text_path)
+            self.evidence.postings.extend(checkpoint.postings, first_line)
+            self.mentions.add(checkpoint.mentions.lines, first_line)
+            self.add_period_lines(text_path, first_line, chapters)
+        self.count_build(edges, counter)
+        self.graph_changed()
+
+    def add_counts(
+        self,
+        nodes: List[str],
+        edge_weights: Dict[Tuple[str, str], int],
+        period: int,
+        edge_lines: Dict[Tuple[str, str], List[int]] = None,
+        character_lines: Dict[str, List[int]] = None,
+        first_line: int = 0,
+    ) -> None:
+        """Add counted nodes and edge weights to the graph, to the temporal weights of a period, to the evidence and to the mentions.
+
+        Args:
+            nodes (List[str]): The nodes to add.
+            edge_weights (Dict[Tuple[str, str], int]): The weights to add to the edges.
+            period (int): The period (the chapter) of the counts.
+            edge_lines (Dict[Tuple[str, str], List[int]], optional): The lines of the edges. Defaults to None.
+            character_lines (Dict[str, List[int]], optional): The lines of the characters. Defaults to None.
+            first_line (int, optional): The line id of the first line the lines are numbered from. Defaults to 0.
+        """
+        with METRICS.timer("build.graph"):
+            add_mention_counts(self.kg, nodes, edge_weights)
+            self.temporal.add(period, edge_weights)
+        with METRICS.timer("build.evidence"):
+            self.evidence.postings.add(edge_lines or {}, first_line)
+            self.mentions.add(character_lines or {}, first_line)
+        METRICS.increment("build.edge_updates", len(edge_weights))
+
+    def add_period_lines(self, text_path: str, first_line: int, chapters: List[Tuple[int, int, int]]) -> None:
+        """Add the line ids of the first lines of the chapters of a text file to the index of the mentions.
+
+        Args:
+            text_path (str): Path to the text file.
+            first_line (int): The line id of the first line of the file.
+            chapters (List[Tuple[int, int, int]]): The chapters of the file, their byte ranges start at the beginning of a line.
+        """
+        line_index = self.evidence.line_indexes[os.path.abspath(text_path)]
+        self.mentions.add_periods(first_line + line_index.line_number(start) for _, start, _ in chapters)
+
+    def count_build(self, edges: int, counter: CooccurrenceCounter = None) -> None:
+        """Record the edges added to the graph by a build in the metrics, and the lines and mentions counted by its counter.
+
+        Args:
+            edges (int): The number of edges of the graph before the build.
+            counter (CooccurrenceCounter, optional): The counter of the build, if the lines were counted in this process. Defaults to None.
+        """
+        METRICS.increment("build.edges_added", self.kg.number_of_edges() - edges)
+        if counter is not None:
+            METRICS.increment("build.lines", counter.sentences - counter.start)
+            METRICS.increment("build.mentions", counter.mentions)
+
+    def ingest_lines(self, lines: Iterable[str]) -> None:
+        """Add new lines of text to the knowledge graph without rebuilding it.
+        Only the new lines are matched, their co-occurrences are added to the weights of the existing edges.
+        The lines are a text of their own, a window doesn't link them to the lines ingested before.
+        They continue the last chapter of the text, if the graph has chapters.
+        The lines are kept in the evidence, they are the sentences of their co-occurrences.
+
+        Args:
+            lines (Iterable[str]): The new lines of text.
+        """
+        lines = list(lines)
+        self.ingest_text(lines, self.evidence.add_lines(lines))
+
+    def ingest_file(self, text_path: str) -> None:
+        """Add the lines of a new text file to the knowledge graph without rebuilding it.
+        The evidence reads the sentences from the file, like the ones of the built text files.
+
+        Args:
+            text_path (str): Path to the text file.
+        """
+        first_line = self.evidence.add_text(text_path)
         with open(text_path, "r") as f:
-            for line in tqdm(f):
-                line = line.strip()
-                if line == "":
-                    continue
+            self.ingest_text(f, first_line)
+
+    def ingest_text(self, lines: Iterable[str], first_line: int) -> None:
+        """Add the co-occurrences of lines of text to the knowledge graph, see ingest_lines.
+
+        Args:
+            lines (Iterable[str]): The lines of text.
+            first_line (int): The line id of the first line in the evidence.
+        """
+        # We count the co-occurrences of the characters line by line, then we add them to the graph.
+        # The characters are linked following the co-occurrence policy, a line with only one character adds an isolated node.
+        with METRICS.timer("ingest"):
+            counter = CooccurrenceCounter(self.cooccurrence)
+            counter.add_lines(lines, self.match_characters)
+            nodes, edge_weights = counter.take()
+            add_mention_counts(self.kg, nodes, edge_weights)
+            self.evidence.postings.add(counter.take_lines(), first_line)
+            self.mentions.add(counter.take_mentions(), first_line)
+            if self.temporal.periods:
+                self.temporal.add(len(self.temporal.periods) - 1, edge_weights)
+
+            # An up to date degree index is updated with the new counts instead of being rebuilt.
+            degree_index_current = self.degree_index is not None and self.degree_index.version == self.version
+            self.graph_changed()
+            if degree_index_current:
+                self.degree_index.add(nodes, edge_weights)
+                self.degree_index.version = self.version
+
+    def build_kg_parallel(
+        self,
+        text_paths: Iterable[Union[str, Chunk]],
+        processes: int = None,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> None:
+        """Build knowledge graph from multiple text files with a process pool.
+        The files are split into chunks, the mentions of every chunk are counted in a worker process,
+        then the counts are merged into the graph in the order of the text.
+        The result is the same as calling build_kg on every file one after the other
+        (with a window policy, the edges that span two chunks can come in another order).
+        Every file (or byte range) is a book, the chunks don't cross the chapters of the books.
+
+        Args:
+            text_paths (Iterable[Union[str, Chunk]]): Paths to the text files or (path, start, end) byte ranges.
+            processes (int, optional): The number of worker processes. Defaults to the number of CPUs.
+            chunk_size (int, optional): The size of a chunk in bytes. Defaults to CHUNK_SIZE.
+        """
+        chunks = []
+        chunk_periods = []
+        # The line id of the first line of every chunk's file, or of the byte range it continues (the lines of the counts start there).
+        chunk_first_lines = []
+        text_first_line = None
+        previous_chunk = None
+        for text_path in text_paths:
+            path, start, end = (text_path, 0, None) if isinstance(text_path, str) else text_path
+            with METRICS.timer("build.chapters"):
+                chapters = chapter_ranges(path, start, end)
+            first_period = self.temporal.add_book(chapter for chapter, _, _ in chapters)
+            for period, (_, chapter_start, chapter_end) in enumerate(chapters, first_period):
+                chapter_chunks = split_into_chunks([(path, chapter_start, chapter_end)], chunk_size)
+                chunks.extend(chapter_chunks)
+                chunk_periods.extend([period] * len(chapter_chunks))
+                for chunk in chapter_chunks:
+                    # The counts are merged the same way, see count_chunks_parallel.
+                    if previous_chunk is None or chunk[:2] != (previous_chunk[0], previous_chunk[2]):
+                        with METRICS.timer("build.evidence"):
+                            text_first_line = self.evidence.add_text(path)
+                            first_line = text_first_line + self.evidence.line_indexes[os.path.abspath(path)].line_number(chunk[1])
+                    chunk_first_lines.append(first_line)
+                    previous_chunk = chunk
+                # A chapter too short to start a line has no lines, it starts where the lines are.
+                if chapter_chunks:
+                    self.add_period_lines(path, text_first_line, [(period, chapter_chunks[0][1], chapter_end)])
                 else:
-                    character_matches = []
-                    # We iterate on the characters and check if the line contains the character.
-                    for character in self.characters:
-                        # If the line contains the character, we add the character to the list of character matches.
-                        if self.match_character(line, character):
-                            character_matches.append(character)
-
-                    # If the line contains more than one character, we add an edge between every character.
-                    # For this we use the pairwise function from itertools which generates all the possible pairs of characters.
-                    # This is important if we have more than two characters in the line.
-                    if len(character_matches) > 1:
-                        for character1, character2 in pairwise(character_matches):
-                            self.kg.add_edge(character1, character2)
-
-                            # If the edge already exists, we increase the weight of the edge.
-                            self.kg[character1][character2]["weight"] = (
-                                self.kg[character1][character2].get("weight", 0) + 1
-                            )
-                    # If the line contains only one character, we add the character to the list of isolated nodes.
-                    elif len(character_matches) == 1:
-                        self.kg.add_node(character_matches[0])
-                    else:
-                        continue
+                    self.mentions.add_periods([self.evidence.line_count])
+
+        edges = self.kg.number_of_edges()
+        counts = count_chunks_parallel(
+            chunks, self.matcher, self.characters, processes, self.cooccurrence
+        )
+        # The counts go first, so the pool is closed when they are all added.
+        # The lines and the mentions are recorded in the metrics as the counts of the workers come in.
+        for (nodes, edge_weights, edge_lines, character_lines), period, first_line in zip(
+            counts, chunk_periods, chunk_first_lines
+        ):
+            self.add_counts(nodes, edge_weights, period, edge_lines, character_lines, first_line)
+        self.count_build(edges)
+        self.graph_changed()
 
         return
 
@@ -239,7 +771,9 @@ class KnowledgeGraph:
         """
         return list(self.kg.nodes())
 
-    def get_character_neighbors(self, character: str, depth: int = 1) -> nx.Graph:
+    def get_character_neighbors(
+        self, character: str, depth: int = 1, time_range: TimeRange = None
+    ) -> nx.Graph:
         # generate docstring
         """Return the neighbors of a character.
         We apply a BFS to get the neighbors of the character.
@@ -247,41 +781,227 @@ class KnowledgeGraph:
         Args:
             character (str): Character to get neighbors for.
             depth (int, optional): Depth of the neighbors. Defaults to 1.
+            time_range (TimeRange, optional): Only the co-occurrences of these books or chapters. Defaults to the whole text.
 
         Returns:
             nx.Graph: The neighbors of the character.
         """
+        if time_range is not None:
+            return slice_neighborhoods(self.get_time_slice(time_range), character, [depth])[depth]
+
 
         # We only need the edges between the character and its neighbors.
-        # For this we apply bfs_edges to get the edges of the subgraph, this breadth first search will start from the character.
+        # For this we get the edges of a breadth first search tree, the search will start from the character.
         # Important to note that we didn't use depth first search because then it might be possible that we don't get the neighbors of the character.
-        edges = list(nx.bfs_edges(self.kg, source=character, depth_limit=depth))
+        # The search runs on the sparse adjacency matrix, one level at a time, networkx is only used for the output.
+        adjacency = self.get_sparse_adjacency()
+        edges = [
+            (adjacency.nodes[parent], adjacency.nodes[child])
+            for parent, child in adjacency.bfs_edges(adjacency.node_id(character), depth)
+        ]
         subgraph = self.kg.edge_subgraph(edges)
 
         return subgraph
 
-    def get_character_with_most_connections(self) -> Tuple[str, int, nx.Graph]:
+    def get_character_neighborhoods(
+        self, character: str, depths: Iterable[int], time_range: TimeRange = None
+    ) -> Dict[int, nx.Graph]:
+        """Return the neighbors of a character at several depths.
+        We apply a single BFS up to the largest depth, the neighbors at a smaller depth are the first levels of the same search.
+
+        Args:
+            character (str): Character to get neighbors for.
+            depths (Iterable[int]): The depths of the neighbors.
+            time_range (TimeRange, optional): Only the co-occurrences of these books or chapters. Defaults to the whole text.
+
+        Returns:
+            Dict[int, nx.Graph]: The neighbors of the character at every depth.
+        """
+        if time_range is not None:
+            return slice_neighborhoods(self.get_time_slice(time_range), character, depths)
+
+        depths = set(depths)
+        if not depths:
+            return {}
+
+        adjacency = self.get_sparse_adjacency()
+        levels = adjacency.bfs_levels(adjacency.node_id(character), max(depths))
+        return {
+            depth: self.kg.edge_subgraph(
+                [
+                    (adjacency.nodes[parent], adjacency.nodes[child])
+                    for level in levels[: max(depth, 0)]
+                    for parent, child in level
+                ]
+            )
+            for depth in depths
+        }
+
+    def get_character_with_most_connections(
+        self, time_range: TimeRange = None
+    ) -> Tuple[str, int, nx.Graph]:
         """Get the character that is most connected to other characters.
 
+        Args:
+            time_range (TimeRange, optional): Only the co-occurrences of these books or chapters. Defaults to the whole text.
+
         Returns:
             Tuple[str, int, nx.Graph]: The character with the most connections, the number of connections and the subgraph of the character.
         """
+        if time_range is not None:
+            return slice_most_connections(self.get_time_slice(time_range))
 
-        # First we get the degree (number of connections) of each node (character) in the graph.
-        # Then we sort the nodes by their degree and get the node with the highest degree.
-        character, connections = max(
-            self.kg.degree(weight="weight"), key=lambda x: x[1]
-        )
+        # The degree (number of connections) of each node (character) is the sum of the weights of its edges.
+        # The degree index keeps the characters sorted by degree, the first one has the most connections.
+        top = self.get_degree_index().top(1)
+        if not top:
+            raise nx.NetworkXError("The knowledge graph is empty.")
+        character, connections = top[0]
 
         # We get the subgraph of the character with the most connections.
         # But we only need the edges between the character and its neighbors.
-        # For this we apply dfs_edges to get the edges of the subgraph, this depth first search will start from the character.
-        edges = list(nx.dfs_edges(self.kg, source=character, depth_limit=1))
+        edges = [(character, neighbor) for neighbor in self.kg[character] if neighbor != character]
         # Then we only keep the edges that are between the character and its neighbors.
         subgraph = self.kg.edge_subgraph(edges)
 
         return character, connections, subgraph
 
+    def get_top_connected_characters(self, n: int = 10) -> List[Tuple[str, int]]:
+        """Get the n characters that are most connected to other characters.
+
+        Args:
+            n (int, optional): The number of characters. Defaults to 10.
+
+        Returns:
+            List[Tuple[str, int]]: The characters and their number of connections, from the most connected.
+        """
+        return self.top_k_connected(n)
+
+    def top_k_connected(
+        self, k: int = 10, offset: int = 0, time_range: TimeRange = None
+    ) -> List[Tuple[str, int]]:
+        """Get the k most connected characters after the first offset ones, from the degree index.
+        Only the returned characters are read from the index, the degrees of the other characters are not looked at.
+
+        Args:
+            k (int, optional): The number of characters. Defaults to 10.
+            offset (int, optional): The number of more connected characters to skip, for paging. Defaults to 0.
+            time_range (TimeRange, optional): Only the co-occurrences of these books or chapters. Defaults to the whole text.
+
+        Returns:
+            List[Tuple[str, int]]: The characters and their number of connections, from the most connected.
+        """
+        if time_range is not None:
+            return slice_top_connected(self.get_time_slice(time_range), k, offset)
+
+        return self.get_degree_index().top(k, offset)
+
+    def get_neighbor_edges(
+        self, character: str, depth: int = 1, time_range: TimeRange = None, min_weight: float = None
+    ) -> List[Tuple[str, str, int]]:
+        """Return the edges of the neighborhood of a character, the strongest edges of every level first, for paging.
+        These are the edges of the subgraph of get_character_neighbors, the same BFS tree.
+
+        Args:
+            character (str): Character to get neighbors for.
+            depth (int, optional): Depth of the neighbors. Defaults to 1.
+            time_range (TimeRange, optional): Only the co-occurrences of these books or chapters. Defaults to the whole text.
+            min_weight (float, optional): Only follow the edges with at least this weight. Defaults to None (all the edges).
+
+        Returns:
+            List[Tuple[str, str, int]]: The (parent, child, weight) edges of the BFS tree, level by level.
+        """
+        adjacency = self.get_time_slice(time_range) if time_range is not None else self.get_sparse_adjacency()
+        return adjacency.neighbor_edges(character, depth, min_weight)
+
+    def get_connected_components(self) -> List[List[str]]:
+        """Get the groups of characters that are connected to each other, from the largest group.
+
+        Returns:
+            List[List[str]]: The characters of every connected component.
+        """
+        adjacency = self.get_sparse_adjacency()
+        return [
+            [adjacency.nodes[node] for node in component]
+            for component in adjacency.connected_components()
+        ]
+
+    def get_sparse_adjacency(self) -> "SparseAdjacency":
+        """Return the sparse adjacency matrix of the graph, rebuilding it if the graph changed since it was built.
+
+        Returns:
+            SparseAdjacency: The sparse adjacency matrix of the current graph.
+        """
+        from pynlp5.sparse import SparseAdjacency
+
+        if self.sparse_adjacency is None or self.sparse_adjacency.version != self.version:
+            self.sparse_adjacency = SparseAdjacency.from_graph(self.kg, self.version)
+
+        return self.sparse_adjacency
+
+    def get_layout(self) -> "GraphLayout":
+        """Return the positions of the nodes of the graph, computing them again if the graph changed since they were computed.
+        The layout is seeded, so the same graph always gets the same positions.
+
+        Returns:
+            GraphLayout: The layout of the current graph.
+        """
+        from pynlp5.layout import GraphLayout
+
+        if self.layout is None or self.layout.version != self.version:
+            with METRICS.timer("layout"):
+                self.layout = GraphLayout.compute(self.kg, self.version)
+
+        return self.layout
+
+    def get_similarity_index(self) -> "SimilarityIndex":
+        """Return the neighborhood similarity index of the graph, rebuilding it if the graph changed since it was built.
+
+        Returns:
+            SimilarityIndex: The similarity index of the current graph.
+        """
+        from pynlp5.similarity import SimilarityIndex
+
+        if self.similarity_index is None or self.similarity_index.version != self.version:
+            with METRICS.timer("similarity"):
+                self.similarity_index = SimilarityIndex(self.get_sparse_adjacency())
+
+        return self.similarity_index
+
+    def get_degree_index(self) -> DegreeIndex:
+        """Return the degree index of the graph, rebuilding it if the graph changed since it was built (ingest_lines updates it instead).
+
+        Returns:
+            DegreeIndex: The degree index of the current graph.
+        """
+        if self.degree_index is None or self.degree_index.version != self.version:
+            self.degree_index = DegreeIndex.from_graph(self.kg, self.version)
+
+        return self.degree_index
+
+    def get_time_slice(self, time_range: TimeRange) -> "SparseAdjacency":
+        """Return the sparse adjacency matrix of the graph in a time range.
+        The weights of the edges are the differences of the prefix sums of the temporal weights, we don't rebuild a graph.
+        The matrices of the last time ranges are cached until the graph changes.
+
+        Args:
+            time_range (TimeRange): The first and the last book (or book and chapter), both included.
+
+        Raises:
+            ValueError: If the graph has no chapters or there is no chapter in the time range.
+
+        Returns:
+            SparseAdjacency: The adjacency matrix of the time range.
+        """
+        first, last = self.temporal.period_range(time_range)
+        key = (self.version, first, last)
+        adjacency = self.time_slices.get(key)
+        if adjacency is None:
+            adjacency = self.temporal.adjacency(first, last)
+            self.time_slices.put(key, adjacency)
+
+        return adjacency
+
     # ================================================================================================
     # TASK 1
     # ================================================================================================
@@ -291,27 +1011,226 @@ class KnowledgeGraph:
         Returns:
             Tuple[Iterable[str], nx.Graph]: The characters that are not connected to other characters and the subgraph of the characters.
         """
-        # TODO: Implement this function.
+        characters = list(nx.isolates(self.kg))
+
+        return characters, self.kg.subgraph(characters)
+
+    def get_subgraph(self, characters: Iterable[str]) -> nx.Graph:
+        """Return the subgraph of some characters and the edges between them.
+
+        Raises:
+            nx.NetworkXError: If a character is not in the graph.
+        """
+        characters = list(characters)
+        for character in characters:
+            if character not in self.kg:
+                raise nx.NetworkXError(f"The node {character} is not in the graph.")
 
-        return None, None
+        return self.kg.subgraph(characters)
 
     # ================================================================================================
     # TASK 2
     # ================================================================================================
     def shortest_path_between_characters(
-        self, character1: str, character2: str
+        self, character1: str, character2: str, time_range: TimeRange = None
     ) -> Tuple[nx.Graph, int]:
         # generate docstring
-        """Get the shortest path between two characters.
+        """Get the shortest path (in number of edges) between two characters.
+        The path has the fewest edges, it is not the path with the smallest (or largest) sum of weights:
+        the length returned is the sum of the weights of the edges of this path.
 
         Args:
             character1 (str): First character.
             character2 (str): Second character.
+            time_range (TimeRange, optional): Only the co-occurrences of these books or chapters. Defaults to the whole text.
 
         Returns:
-            Tuple[nx.Graph, int]: The shortest path between the characters and the length of the path with the weights of the edges.
+            Tuple[nx.Graph, int]: The path with the fewest edges between the characters and the sum of the weights of its edges.
         """
+        if time_range is not None:
+            return slice_shortest_path(self.get_time_slice(time_range), character1, character2)
 
-        # TODO: Implement this function.
+        path_index = self.get_path_index()
+        if character1 not in path_index.node_ids or character2 not in path_index.node_ids:
+            raise nx.NodeNotFound(f"Either {character1} or {character2} is not in the graph.")
+
+        # The path comes from the (cached) BFS tree of the first character.
+        # It is the shortest in number of edges, then we sum the weights of its edges.
+        path = path_index.path(
+            path_index.node_ids[character1], path_index.node_ids[character2]
+        )
+        if path is None:
+            raise nx.NetworkXNoPath(f"No path between {character1} and {character2}.")
+
+        edges = [
+            (path_index.nodes[node1], path_index.nodes[node2])
+            for node1, node2 in pairwise(path)
+        ]
+        sum_of_weights = sum(self.kg[node1][node2]["weight"] for node1, node2 in edges)
+        subgraph = self.kg.edge_subgraph(edges)
+
+        return subgraph, sum_of_weights
+
+    def k_shortest_paths_between_characters(
+        self,
+        character1: str,
+        character2: str,
+        k: int = 3,
+        max_length: int = MAX_PATH_LENGTH,
+        avoid: Iterable[str] = (),
+        time_range: TimeRange = None,
+    ) -> Tuple[nx.Graph, List[Tuple[List[str], int]], bool]:
+        """Get the k shortest distinct paths (in number of edges) between two characters, the alternative chains of connections.
+        The search is bounded, see k_shortest_paths: it returns the paths it found when it runs out of budget.
+
+        Args:
+            character1 (str): First character.
+            character2 (str): Second character.
+            k (int, optional): The number of paths, at most MAX_PATHS. Defaults to 3.
+            max_length (int, optional): The largest number of edges of a path, at most MAX_PATH_LENGTH. Defaults to MAX_PATH_LENGTH.
+            avoid (Iterable[str], optional): The characters the paths can't go through. Defaults to none.
+            time_range (TimeRange, optional): Only the co-occurrences of these books or chapters. Defaults to the whole text.
+
+        Raises:
+            nx.NodeNotFound: If a character is not in the graph.
+            nx.NetworkXNoPath: If there is no path of at most max_length edges.
+            ValueError: If k or max_length is out of bounds, or a character is avoided.
+
+        Returns:
+            Tuple[nx.Graph, List[Tuple[List[str], int]], bool]: The subgraph of the edges of the paths, the characters of every path
+                with the sum of the weights of its edges, and whether the search is complete.
+        """
+        if time_range is not None:
+            return slice_k_shortest_paths(
+                self.get_time_slice(time_range), character1, character2, k, max_length, avoid
+            )
+
+        path_index = self.get_path_index()
+        if character1 not in path_index.node_ids or character2 not in path_index.node_ids:
+            raise nx.NodeNotFound(f"Either {character1} or {character2} is not in the graph.")
+
+        # The searches walk the adjacency of the (cached) path index, the weights only rank the paths of the same length.
+        def weight(node1: int, node2: int) -> int:
+            return self.kg[path_index.nodes[node1]][path_index.nodes[node2]]["weight"]
+
+        paths, complete = k_shortest_paths(
+            path_index.adjacency,
+            path_index.node_ids[character1],
+            path_index.node_ids[character2],
+            k,
+            max_length,
+            [path_index.node_ids[character] for character in avoid if character in path_index.node_ids],
+            weight,
+        )
+        if not paths and complete:
+            raise nx.NetworkXNoPath(f"No path of at most {max_length} edges between {character1} and {character2}.")
+
+        named_paths = [
+            ([path_index.nodes[node] for node in path], sum(weight(node1, node2) for node1, node2 in pairwise(path)))
+            for path in paths
+        ]
+        edges = [
+            (path_index.nodes[node1], path_index.nodes[node2]) for path in paths for node1, node2 in pairwise(path)
+        ]
+        return self.kg.edge_subgraph(edges), named_paths, complete
+
+    def get_similar_characters(
+        self, character: str, k: int = 10, metric: str = "cosine", method: str = "auto"
+    ) -> Tuple[List[Tuple[str, float]], str]:
+        """Get the characters connected to the same characters as a character, with the same weights.
+        The similarities are computed from the sparse adjacency matrix, see SimilarityIndex.
+
+        Args:
+            character (str): The character.
+            k (int, optional): The number of characters. Defaults to 10.
+            metric (str, optional): "cosine" or "jaccard" (weighted). Defaults to "cosine".
+            method (str, optional): "exact", "lsh" (the candidates of the MinHash LSH index only) or "auto" (LSH for large graphs). Defaults to "auto".
+
+        Raises:
+            nx.NetworkXError: If the character is not in the graph.
+            ValueError: If k is negative, or the metric or the method is unknown.
+
+        Returns:
+            Tuple[List[Tuple[str, float]], str]: The most similar characters and their similarity, the most similar first, and the method used.
+        """
+        return self.get_similarity_index().most_similar(character, k, metric, method)
+
+    def compute_analytics(self, **options) -> None:
+        """Compute the communities, the PageRank and the betweenness of the current graph, see GraphAnalytics.compute.
+        They are computed once per version of the graph and saved with it, the queries only read them.
+
+        Args:
+            **options: The options of GraphAnalytics.compute (algorithm, samples, seed, processes).
+        """
+        self.analytics = GraphAnalytics.compute(self.kg, self.version, **options)
+
+    def get_analytics(self) -> Optional[GraphAnalytics]:
+        """Return the analytics of the graph, None if they were not computed since the graph last changed.
+        Unlike the indexes they are not computed here, the betweenness takes far too long for a query.
+
+        Returns:
+            Optional[GraphAnalytics]: The analytics of the current graph.
+        """
+        if self.analytics is None or self.analytics.version != self.version:
+            return None
+
+        return self.analytics
+
+    def get_evidence(self) -> Optional[EvidenceStore]:
+        """Return the lines of the edges, None if the graph has none (it was loaded from a file saved without them).
+
+        Returns:
+            Optional[EvidenceStore]: The evidence of the graph.
+        """
+        if not self.evidence.texts:
+            return None
+
+        return self.evidence
+
+    def find_mentions(self, query: str, time_range: TimeRange = None) -> "np.ndarray":
+        """Find the lines that match a query over the characters they mention,
+        like "Arya Stark AND Sandor Clegane AND NOT Jon Snow" or "Tyrion Lannister AND (Bronn OR Podrick Payne)".
+        The lines of the characters are intersected (AND), merged (OR) and subtracted (NOT), the text is not read again.
+
+        Args:
+            query (str): The query, the names of the characters joined by AND, OR and NOT, with parentheses.
+            time_range (TimeRange, optional): The first and the last book (or book and chapter), both included. Defaults to the whole text.
+
+        Raises:
+            ValueError: If the graph has no mentions, the query is invalid, a character is never mentioned or there is no chapter in the time range.
+
+        Returns:
+            np.ndarray: The line ids of the evidence, in increasing order.
+        """
+        evidence = self.get_evidence()
+        if evidence is None:
+            raise ValueError("The knowledge graph has no mentions, build it again to find the lines of the characters.")
+
+        line_range = None
+        if time_range is not None:
+            first, last = self.temporal.period_range(time_range)
+            line_range = self.mentions.line_range(first, last, evidence.line_count)
+
+        return query_lines(self.mentions, parse_character_query(query), evidence.line_count, line_range)
+
+    def build_path_index(self, precompute: bool = True) -> None:
+        """Build the shortest path index of the current graph.
+        With precompute we compute the BFS tree of every character now, so the queries don't have to search the graph.
+
+        Args:
+            precompute (bool, optional): Compute the paths from every character ahead of the queries. Defaults to True.
+        """
+        self.path_index = PathIndex.from_graph(self.kg, self.version)
+        if precompute:
+            self.path_index.precompute()
+
+    def get_path_index(self) -> PathIndex:
+        """Return the shortest path index, rebuilding it if the graph changed since it was built.
+
+        Returns:
+            PathIndex: The path index of the current graph.
+        """
+        if self.path_index is None or self.path_index.version != self.version:
+            self.build_path_index(precompute=False)
 
-        return None, None
+        return self.path_index
@@ -0,0 +1,172 @@
+from typing import Dict, List, Sequence, Tuple
+
+import networkx as nx
+import numpy as np
+
+# The seed of the layouts, the same graph always gets the same positions.
+LAYOUT_SEED = 42
+
+# The iterations of the layout of the whole graph, and of a subgraph that starts from the positions of the whole graph.
+LAYOUT_ITERATIONS = 100
+SUBGRAPH_ITERATIONS = 30
+
+# The distances between the nodes are computed for this many pairs at a time, so a large graph doesn't need n * n memory.
+LAYOUT_BLOCK_SIZE = 1 << 22
+
+# The side of the square of a node in pixels, a layout of n nodes is sqrt(n) nodes wide.
+NODE_SPACING = 60.0
+
+
+def force_layout(
+    node_count: int,
+    sources: Sequence[int],
+    targets: Sequence[int],
+    positions: np.ndarray = None,
+    iterations: int = LAYOUT_ITERATIONS,
+    seed: int = LAYOUT_SEED,
+    temperature: float = 0.1,
+) -> np.ndarray:
+    """Compute a force-directed layout (Fruchterman-Reingold) with vectorized numpy operations.
+    Every node pushes every other node away and the edges pull their nodes together, the nodes move by at most the temperature,
+    which cools down to 0 over the iterations. The repulsion of a block of nodes is computed at once for all the other nodes,
+    the attraction with one bincount over the edges, so an iteration doesn't loop over the nodes in python.
+
+    Args:
+        node_count (int): The number of nodes, the nodes are 0 to node_count - 1.
+        sources (Sequence[int]): The first nodes of the edges.
+        targets (Sequence[int]): The second nodes of the edges.
+        positions (np.ndarray, optional): The initial positions (node_count x 2) in the unit square. Defaults to random positions.
+        iterations (int, optional): The number of iterations. Defaults to LAYOUT_ITERATIONS.
+        seed (int, optional): The seed of the random positions. Defaults to LAYOUT_SEED.
+        temperature (float, optional): The largest move of a node in an iteration, in the unit square. Defaults to 0.1.
+
+    Returns:
+        np.ndarray: The positions (node_count x 2), around the unit square.
+    """
+    if positions is None:
+        positions = np.random.default_rng(seed).random((node_count, 2), dtype=np.float32)
+    else:
+        positions = np.array(positions, dtype=np.float32)
+    if node_count < 2:
+        return positions
+
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    # The distance the forces balance at, for node_count nodes in the unit square.
+    k = np.float32(1 / np.sqrt(node_count))
+    block = max(1, LAYOUT_BLOCK_SIZE // node_count)
+    forces = np.empty_like(positions)
+
+    for step in np.linspace(temperature, 0, iterations, endpoint=False, dtype=np.float32):
+        x, y = positions[:, 0], positions[:, 1]
+        for start in range(0, node_count, block):
+            dx = x[start : start + block, None] - x[None, :]
+            dy = y[start : start + block, None] - y[None, :]
+            # The repulsion is k^2 / distance along the unit vector, k^2 / distance^2 along the difference.
+            # A node doesn't push itself, its difference is 0.
+            factor = k * k / np.maximum(dx * dx + dy * dy, np.float32(1e-6))
+            forces[start : start + block, 0] = (dx * factor).sum(axis=1)
+            forces[start : start + block, 1] = (dy * factor).sum(axis=1)
+
+        # The attraction of an edge is distance^2 / k along the unit vector, distance / k along the difference.
+        ex, ey = x[sources] - x[targets], y[sources] - y[targets]
+        attraction = np.sqrt(ex * ex + ey * ey) / k
+        for axis, difference in enumerate([ex * attraction, ey * attraction]):
+            forces[:, axis] -= np.bincount(sources, difference, node_count).astype(np.float32)
+            forces[:, axis] += np.bincount(targets, difference, node_count).astype(np.float32)
+
+        # Every node moves along its force, by at most the temperature.
+        length = np.maximum(np.sqrt((forces * forces).sum(axis=1)), np.float32(1e-9))
+        positions += forces * (np.minimum(length, step) / length)[:, None]
+
+    return positions
+
+
+def normalize_positions(positions: np.ndarray) -> np.ndarray:
+    """Move and scale positions into the unit square, keeping their proportions."""
+    if len(positions) == 0:
+        return positions
+    positions = positions - positions.min(axis=0)
+    size = positions.max()
+    return positions / size if size > 0 else positions + 0.5
+
+
+class GraphLayout:
+    def __init__(self, nodes: List[str], positions: np.ndarray, version: int = 0) -> None:
+        """The positions of the nodes of a graph, computed once for every version of the graph.
+        The subgraphs of the queries start from these positions, so a character keeps its place around the same characters from one query to the next.
+
+        Args:
+            nodes (List[str]): The nodes of the graph.
+            positions (np.ndarray): The positions of the nodes (len(nodes) x 2), in the unit square.
+            version (int, optional): The version of the graph the layout was computed for. Defaults to 0.
+        """
+        self.nodes = nodes
+        self.node_ids = {node: i for i, node in enumerate(nodes)}
+        self.positions = positions
+        self.version = version
+
+    @classmethod
+    def compute(
+        cls, graph: nx.Graph, version: int = 0, seed: int = LAYOUT_SEED, iterations: int = LAYOUT_ITERATIONS
+    ) -> "GraphLayout":
+        """Compute the layout of a whole graph.
+
+        Args:
+            graph (nx.Graph): The graph.
+            version (int, optional): The version of the graph. Defaults to 0.
+            seed (int, optional): The seed of the initial positions. Defaults to LAYOUT_SEED.
+            iterations (int, optional): The number of iterations. Defaults to LAYOUT_ITERATIONS.
+
+        Returns:
+            GraphLayout: The layout.
+        """
+        nodes = list(graph.nodes())
+        sources, targets = edge_arrays(graph, {node: i for i, node in enumerate(nodes)})
+        positions = force_layout(len(nodes), sources, targets, iterations=iterations, seed=seed)
+
+        return cls(nodes, normalize_positions(positions), version)
+
+    def subgraph_positions(
+        self, graph: nx.Graph, iterations: int = SUBGRAPH_ITERATIONS
+    ) -> Dict[str, Tuple[float, float]]:
+        """Return the positions of the nodes of a subgraph, in pixels.
+        The nodes start at their positions in the whole graph and the layout of the subgraph is relaxed from there,
+        so the subgraph fills its own view without the characters moving around between two queries.
+
+        Args:
+            graph (nx.Graph): The subgraph.
+            iterations (int, optional): The number of iterations. Defaults to SUBGRAPH_ITERATIONS.
+
+        Returns:
+            Dict[str, Tuple[float, float]]: The x and y of every node, centered on 0.
+        """
+        # The nodes are laid out in the order of the whole graph, so the same subgraph gets the same positions
+        # whatever the order of its nodes (the graph and the snapshot don't build their subgraphs the same way).
+        # A node that is not in the layout (it was added since) comes last, and starts in the middle.
+        nodes = sorted(graph.nodes(), key=lambda node: (self.node_ids.get(node, len(self.nodes)), str(node)))
+        node_ids = {node: i for i, node in enumerate(nodes)}
+        initial = np.array(
+            [self.positions[self.node_ids[node]] if node in self.node_ids else (0.5, 0.5) for node in nodes],
+            dtype=np.float32,
+        ).reshape(-1, 2)
+        sources, targets = edge_arrays(graph, node_ids)
+        positions = force_layout(
+            len(nodes), sources, targets, normalize_positions(initial), iterations, temperature=0.05
+        )
+
+        positions = (normalize_positions(positions) - 0.5) * NODE_SPACING * np.sqrt(len(nodes))
+        return {node: (round(float(x), 1), round(float(y), 1)) for node, (x, y) in zip(nodes, positions)}
+
+
+def edge_arrays(graph: nx.Graph, node_ids: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the ids of the first and of the second nodes of the edges of a graph, without the self loops.
+    The edges are sorted (the smallest id first), the sums of the forces don't depend on the order of the edges of the graph.
+    """
+    edges = sorted(
+        (min(node_ids[node1], node_ids[node2]), max(node_ids[node1], node_ids[node2]))
+        for node1, node2 in graph.edges()
+        if node1 != node2
+    )
+    edges = np.array(edges, dtype=np.int64).reshape(-1, 2)
+    return edges[:, 0], edges[:, 1]
@@ -0,0 +1,186 @@
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Set
+
+# Characters that have a special meaning in a regular expression.
+# Names containing one of these (e.g. "Laenor Velaryon." or "Hukko (unconfirmed)") were always
+# matched as regular expressions, so we keep matching them with the regex engine to get the same results.
+REGEX_SPECIAL_CHARACTERS = re.compile(r"[.^$*+?{}\[\]\\|()]")
+
+
+def is_word_character(char: str) -> bool:
+    """Check if a character is a word character, the same way as \\w does in the re module.
+
+    Args:
+        char (str): A single character.
+
+    Returns:
+        bool: True if the character is a word character, False otherwise.
+    """
+    return char.isalnum() or char == "_"
+
+
+def is_word_boundary(text: str, position: int) -> bool:
+    """Check if there is a word boundary at a position of the text, the same way as \\b does in the re module.
+
+    Args:
+        text (str): The text.
+        position (int): The position between two characters of the text (0 is before the first character).
+
+    Returns:
+        bool: True if there is a word boundary at the position, False otherwise.
+    """
+    left = position > 0 and is_word_character(text[position - 1])
+    right = position < len(text) and is_word_character(text[position])
+
+    return left != right
+
+
+def build_patterns(
+    characters: List[str],
+    character_first_names: Dict[str, int],
+    character_aliases: Dict[str, List[str]],
+    ignored_first_names: Iterable[str],
+) -> Dict[str, Set[int]]:
+    """Build the patterns of the characters with the same rules as KnowledgeGraph.match_character.
+    The full name and the aliases (that are not character names themselves) always refer to the character,
+    the first name only if no other character has the same first name and it is not an ignored word.
+
+    Args:
+        characters (List[str]): The characters, the id of a character is its index in the list.
+        character_first_names (Dict[str, int]): The number of characters with the given first name.
+        character_aliases (Dict[str, List[str]]): The aliases of the characters.
+        ignored_first_names (Iterable[str]): Lowercased first names that we never match alone.
+
+    Returns:
+        Dict[str, Set[int]]: The patterns and the ids of the characters they refer to.
+    """
+    patterns = {}
+    character_set = set(characters)
+    ignored_first_names = set(ignored_first_names)
+
+    for character_id, character in enumerate(characters):
+        patterns.setdefault(character, set()).add(character_id)
+
+        for alias in character_aliases.get(character, []):
+            if alias not in character_set:
+                patterns.setdefault(alias, set()).add(character_id)
+
+        first_name = character.split(" ")[0]
+        if (
+            character_first_names[first_name] == 1
+            and first_name.lower() not in ignored_first_names
+        ):
+            patterns.setdefault(first_name, set()).add(character_id)
+
+    return patterns
+
+
+def is_regex_pattern(pattern: str) -> bool:
+    """Check if a pattern has to be matched with the regex engine instead of literally."""
+    return not pattern or REGEX_SPECIAL_CHARACTERS.search(pattern) is not None
+
+
+class MentionMatcher:
+    def __init__(self, patterns: Dict[str, Iterable[int]]) -> None:
+        """Aho-Corasick automaton that finds every mention of the characters in a text in one left-to-right pass.
+        Every pattern (full name, first name or alias) is a key of the patterns dictionary,
+        the values are the ids of the characters that the pattern refers to.
+        A pattern only matches if it is surrounded by word boundaries, like the \\b...\\b regular expressions.
+
+        Args:
+            patterns (Dict[str, Iterable[int]]): The patterns and the ids of the characters they refer to.
+        """
+        # The trie of the automaton, every state is a dictionary from characters to the next state.
+        self.goto: List[Dict[str, int]] = [{}]
+        # The failure links, the state we fall back to if we can't continue the match.
+        self.fail: List[int] = [0]
+        # The outputs of every state, a tuple of the length of the pattern and the character ids.
+        self.outputs: List[List[tuple]] = [[]]
+
+        # The patterns that can't be matched literally, we use the regex engine for them.
+        self.regex_patterns: List[tuple] = []
+
+        for pattern, character_ids in patterns.items():
+            character_ids = frozenset(character_ids)
+            if is_regex_pattern(pattern):
+                self.regex_patterns.append(
+                    (re.compile(r"\b" + pattern + r"\b"), character_ids)
+                )
+            else:
+                self.add_pattern(pattern, character_ids)
+
+        self.build_failure_links()
+
+    def add_pattern(self, pattern: str, character_ids: frozenset) -> None:
+        """Add a literal pattern to the trie.
+
+        Args:
+            pattern (str): The pattern to add.
+            character_ids (frozenset): The ids of the characters the pattern refers to.
+        """
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+                self.goto[state][char] = next_state
+            state = next_state
+
+        self.outputs[state].append((len(pattern), character_ids))
+
+    def build_failure_links(self) -> None:
+        """
+        Compute the failure links with a breadth first search on the trie and merge the outputs along them.
+        """
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+
+                # A state also outputs every pattern that is a suffix of its own prefix.
+                self.outputs[next_state] = (
+                    self.outputs[next_state] + self.outputs[self.fail[next_state]]
+                )
+
+    def find(self, text: str) -> Set[int]:
+        """Find the ids of all the characters mentioned in the text.
+
+        Args:
+            text (str): The text where we will search for the characters.
+
+        Returns:
+            Set[int]: The ids of the characters mentioned in the text.
+        """
+        goto = self.goto
+        fail = self.fail
+        outputs = self.outputs
+        found = set()
+
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            for length, character_ids in outputs[state]:
+                end = position + 1
+                if is_word_boundary(text, end - length) and is_word_boundary(
+                    text, end
+                ):
+                    found.update(character_ids)
+
+        for regex, character_ids in self.regex_patterns:
+            if regex.search(text):
+                found.update(character_ids)
+
+        return found
@@ -0,0 +1,338 @@
+import hashlib
+import json
+import os
+import re
+import struct
+from array import array
+from bisect import bisect_right
+from typing import Dict, Iterable, Iterator, List, Set
+
+from pynlp5.matcher import MentionMatcher, is_regex_pattern
+
+# The first bytes of every mention index file.
+INDEX_MAGIC = b"PYNLP5MI"
+INDEX_VERSION = 1
+
+# After the magic, the size of the json header.
+HEADER_SIZE = struct.Struct("<I")
+
+
+def hash_file(filename: str) -> str:
+    """Return the sha256 hash of the content of a file."""
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def named_patterns(
+    patterns: Dict[str, Set[int]], characters: List[str]
+) -> Dict[str, List[str]]:
+    """Replace the character ids of the patterns with the character names.
+    The ids depend on the order of the characters file, the names don't, so we can compare the patterns of two builds.
+
+    Args:
+        patterns (Dict[str, Set[int]]): The patterns and the ids of the characters they refer to.
+        characters (List[str]): The characters, in the order of the character ids.
+
+    Returns:
+        Dict[str, List[str]]: The patterns and the (sorted) names of the characters they refer to.
+    """
+    return {
+        pattern: sorted(characters[i] for i in character_ids)
+        for pattern, character_ids in patterns.items()
+    }
+
+
+def hash_patterns(patterns: Dict[str, List[str]]) -> str:
+    """Return the sha256 hash of the patterns built from the characters and the character aliases files."""
+    data = json.dumps(patterns, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def read_lines(text_path: str) -> Iterator[tuple]:
+    """Read the lines of a text file with their byte offsets.
+
+    Args:
+        text_path (str): Path to the text file.
+
+    Yields:
+        tuple: The byte offset of the line and the line.
+    """
+    offset = 0
+    with open(text_path, "rb") as f:
+        for line in f:
+            yield offset, line.decode("utf-8")
+            offset += len(line)
+
+
+class MentionIndex:
+    def __init__(
+        self,
+        text_hash: str,
+        patterns: Dict[str, List[str]],
+        characters: List[str],
+        line_offsets: array,
+        line_pointers: array,
+        character_ids: array,
+    ) -> None:
+        """The characters matched in every line of a text file.
+        The matches of line i are character_ids[line_pointers[i]:line_pointers[i + 1]],
+        sorted in the order of the characters list, and the line starts at byte line_offsets[i] of the file.
+
+        Args:
+            text_hash (str): The hash of the text file.
+            patterns (Dict[str, List[str]]): The patterns used for matching and the names of the characters they refer to.
+            characters (List[str]): The characters, in the order of the character ids.
+            line_offsets (array): The byte offset of every line, and the size of the file at the end.
+            line_pointers (array): The start of the matches of every line, and the number of matches at the end.
+            character_ids (array): The matched character ids of all the lines.
+        """
+        self.text_hash = text_hash
+        self.patterns = patterns
+        self.patterns_hash = hash_patterns(patterns)
+        self.characters = characters
+        self.line_offsets = line_offsets
+        self.line_pointers = line_pointers
+        self.character_ids = character_ids
+
+    @classmethod
+    def build(
+        cls,
+        text_path: str,
+        matcher: MentionMatcher,
+        characters: List[str],
+        patterns: Dict[str, List[str]],
+    ) -> "MentionIndex":
+        """Match every line of a text file and build the index.
+
+        Args:
+            text_path (str): Path to the text file.
+            matcher (MentionMatcher): The compiled mention matcher.
+            characters (List[str]): The characters, in the order of the character ids.
+            patterns (Dict[str, List[str]]): The patterns of the matcher with character names.
+
+        Returns:
+            MentionIndex: The index of the text file.
+        """
+        line_offsets = array("Q")
+        line_pointers = array("I", [0])
+        character_ids = array("I")
+
+        for offset, line in read_lines(text_path):
+            line_offsets.append(offset)
+            character_ids.extend(sorted(matcher.find(line.strip())))
+            line_pointers.append(len(character_ids))
+        line_offsets.append(os.path.getsize(text_path))
+
+        return cls(
+            hash_file(text_path),
+            patterns,
+            characters,
+            line_offsets,
+            line_pointers,
+            character_ids,
+        )
+
+    @classmethod
+    def load(cls, filename: str) -> "MentionIndex":
+        """Load an index from a file.
+
+        Args:
+            filename (str): Path to the index file.
+
+        Raises:
+            ValueError: If the file is not a mention index or it has an unsupported version.
+
+        Returns:
+            MentionIndex: The index.
+        """
+        with open(filename, "rb") as f:
+            if f.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                raise ValueError(f"{filename} is not a mention index.")
+            (header_size,) = HEADER_SIZE.unpack(f.read(HEADER_SIZE.size))
+            header = json.loads(f.read(header_size))
+            if header["version"] != INDEX_VERSION:
+                raise ValueError(
+                    f"Unsupported mention index version {header['version']}, expected {INDEX_VERSION}."
+                )
+
+            arrays = []
+            for typecode, count in [
+                ("Q", header["line_count"] + 1),
+                ("I", header["line_count"] + 1),
+                ("I", header["match_count"]),
+            ]:
+                values = array(typecode)
+                values.fromfile(f, count)
+                arrays.append(values)
+
+        return cls(header["text_hash"], header["patterns"], header["characters"], *arrays)
+
+    def save(self, filename: str) -> None:
+        """Save the index to a file: a json header with the hashes, the characters and the patterns, then the arrays.
+
+        Args:
+            filename (str): Path to the index file.
+        """
+        header = json.dumps(
+            {
+                "version": INDEX_VERSION,
+                "text_hash": self.text_hash,
+                "patterns": self.patterns,
+                "characters": self.characters,
+                "line_count": len(self.line_pointers) - 1,
+                "match_count": len(self.character_ids),
+            }
+        ).encode("utf-8")
+
+        with open(filename, "wb") as f:
+            f.write(INDEX_MAGIC)
+            f.write(HEADER_SIZE.pack(len(header)))
+            f.write(header)
+            for values in [self.line_offsets, self.line_pointers, self.character_ids]:
+                values.tofile(f)
+
+    def changed_patterns(self, patterns: Dict[str, List[str]]) -> List[str]:
+        """Return the patterns that were added, removed or refer to other characters than in the index."""
+        return [
+            pattern
+            for pattern in set(self.patterns) | set(patterns)
+            if self.patterns.get(pattern) != patterns.get(pattern)
+        ]
+
+    def affected_lines(self, text_path: str, patterns: Iterable[str]) -> Set[int]:
+        """Find the lines of the text where one of the patterns occurs.
+        A line where none of the changed patterns occur has the same matches as before, only the other lines have to be matched again.
+        We look for the patterns as plain substrings, this finds every line where they could match.
+
+        Args:
+            text_path (str): Path to the text file.
+            patterns (Iterable[str]): The changed patterns.
+
+        Returns:
+            Set[int]: The numbers of the affected lines.
+        """
+        line_starts = []
+        lines = []
+        position = 0
+        for _, line in read_lines(text_path):
+            line_starts.append(position)
+            lines.append(line)
+            position += len(line)
+        text = "".join(lines)
+
+        affected = set()
+        for pattern in patterns:
+            if not pattern:
+                return set(range(len(lines)))
+            elif is_regex_pattern(pattern):
+                positions = (m.start() for m in re.finditer(pattern, text))
+            else:
+                positions = self.find_all(text, pattern)
+            for position in positions:
+                affected.add(bisect_right(line_starts, position) - 1)
+
+        return affected
+
+    @staticmethod
+    def find_all(text: str, pattern: str) -> Iterator[int]:
+        """Yield every position where the pattern occurs in the text."""
+        position = text.find(pattern)
+        while position != -1:
+            yield position
+            position = text.find(pattern, position + 1)
+
+    def update(
+        self,
+        text_path: str,
+        matcher: MentionMatcher,
+        characters: List[str],
+        patterns: Dict[str, List[str]],
+    ) -> "MentionIndex":
+        """Update the index to new characters and aliases.
+        Only the lines where a changed pattern occurs are matched again, the matches of the other lines are reused.
+
+        Args:
+            text_path (str): Path to the text file of the index.
+            matcher (MentionMatcher): The compiled mention matcher.
+            characters (List[str]): The characters, in the order of the character ids.
+            patterns (Dict[str, List[str]]): The patterns of the matcher with character names.
+
+        Returns:
+            MentionIndex: The updated index, or the index itself if nothing changed.
+        """
+        if self.characters == characters and self.patterns_hash == hash_patterns(patterns):
+            return self
+
+        affected = self.affected_lines(text_path, self.changed_patterns(patterns))
+        new_ids = {character: i for i, character in enumerate(characters)}
+
+        line_pointers = array("I", [0])
+        character_ids = array("I")
+        for line_number, (_, line) in enumerate(read_lines(text_path)):
+            if line_number in affected:
+                character_ids.extend(sorted(matcher.find(line.strip())))
+            else:
+                start = self.line_pointers[line_number]
+                end = self.line_pointers[line_number + 1]
+                character_ids.extend(
+                    sorted(new_ids[self.characters[i]] for i in self.character_ids[start:end])
+                )
+            line_pointers.append(len(character_ids))
+
+        return MentionIndex(
+            self.text_hash,
+            patterns,
+            characters,
+            self.line_offsets,
+            line_pointers,
+            character_ids,
+        )
+
+    @classmethod
+    def load_or_build(
+        cls,
+        text_path: str,
+        index_dir: str,
+        matcher: MentionMatcher,
+        characters: List[str],
+        patterns: Dict[str, List[str]],
+    ) -> "MentionIndex":
+        """Load the index of a text file from the index directory, updating it if the characters or aliases changed.
+        If the text file has no index yet (or the text changed) we build a new one. The index is saved back if it changed.
+
+        Args:
+            text_path (str): Path to the text file.
+            index_dir (str): The directory of the index files.
+            matcher (MentionMatcher): The compiled mention matcher.
+            characters (List[str]): The characters, in the order of the character ids.
+            patterns (Dict[str, List[str]]): The patterns of the matcher with character names.
+
+        Returns:
+            MentionIndex: The up to date index of the text file.
+        """
+        text_hash = hash_file(text_path)
+        filename = os.path.join(
+            index_dir, f"{os.path.basename(text_path)}.{text_hash[:16]}.mentions"
+        )
+
+        index = cls.load(filename) if os.path.isfile(filename) else None
+        if index is not None and index.text_hash == text_hash:
+            updated_index = index.update(text_path, matcher, characters, patterns)
+        else:
+            updated_index = cls.build(text_path, matcher, characters, patterns)
+
+        if updated_index is not index:
+            os.makedirs(index_dir, exist_ok=True)
+            updated_index.save(filename)
+
+        return updated_index
+
+    def matches(self) -> Iterator[List[str]]:
+        """Yield the characters matched in every line, in the order of the characters list."""
+        for line_number in range(len(self.line_pointers) - 1):
+            start = self.line_pointers[line_number]
+            end = self.line_pointers[line_number + 1]
+            yield [self.characters[i] for i in self.character_ids[start:end]]
@@ -0,0 +1,242 @@
+import cProfile
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Union
+
+# The upper bounds of the buckets of the timing histograms, in seconds.
+TIMING_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# The profilers of a build, cProfile traces every call, the sampling profiler looks at the stack every few milliseconds.
+CPROFILE = "cprofile"
+SAMPLING = "sampling"
+PROFILERS = [CPROFILE, SAMPLING]
+
+# The interval between two samples of the sampling profiler, in seconds.
+SAMPLING_INTERVAL = 0.005
+
+
+class Histogram:
+    def __init__(self, buckets: tuple = TIMING_BUCKETS) -> None:
+        """The distribution of the values of a timing, in fixed buckets.
+
+        Args:
+            buckets (tuple, optional): The upper bounds of the buckets, sorted. Defaults to TIMING_BUCKETS.
+        """
+        self.buckets = buckets
+        # One more bucket for the values larger than the last bound.
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Add a value."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Return an upper bound of a quantile of the values, the bound of the bucket where it falls (the maximum for the last bucket)."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def stats(self) -> Dict[str, Union[int, float, List[int]]]:
+        """Return the count, the sum, the mean, the maximum, the 50th and 99th percentiles and the counts of the buckets."""
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": list(self.buckets),
+            "counts": list(self.counts),
+        }
+
+
+class Metrics:
+    def __init__(self) -> None:
+        """The counters and the timings of a process.
+        The counters are totals (lines read, mentions matched, edges added...), the timings are histograms of durations in seconds.
+        Other components (the caches) register a function that returns their own statistics, read when the metrics are.
+        It is safe to use from multiple threads, recording a value only takes a lock and a few additions.
+        """
+        self.lock = threading.Lock()
+        self.counters = Counter()
+        self.timings = {}
+        self.sources = {}
+        self.started = time.time()
+
+    def increment(self, name: str, value: Union[int, float] = 1) -> None:
+        """Add a value to a counter."""
+        with self.lock:
+            self.counters[name] += value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Add a duration to a timing."""
+        with self.lock:
+            if name not in self.timings:
+                self.timings[name] = Histogram()
+            self.timings[name].observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Time the block of a with statement, the duration is added to a timing even if the block raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def register(self, name: str, source: Callable[[], Dict[str, float]]) -> None:
+        """Register a function returning statistics, like the stats of a cache, they are read with the metrics."""
+        with self.lock:
+            self.sources[name] = source
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Return the current values of the counters, the timings and the registered statistics.
+
+        Returns:
+            Dict[str, dict]: The uptime in seconds, the counters, the statistics of every timing and the registered statistics.
+        """
+        with self.lock:
+            metrics = {
+                "uptime": time.time() - self.started,
+                "counters": dict(self.counters),
+                "timings": {name: histogram.stats() for name, histogram in self.timings.items()},
+            }
+            sources = dict(self.sources)
+
+        # The sources take their own locks, we don't call them with ours.
+        for name, source in sources.items():
+            metrics[name] = source()
+        return metrics
+
+    def reset(self) -> None:
+        """Set every counter and timing back to zero, the registered statistics are kept."""
+        with self.lock:
+            self.counters.clear()
+            self.timings.clear()
+            self.started = time.time()
+
+    def prometheus(self) -> str:
+        """Return the metrics in the Prometheus text format.
+        The names are prefixed with pynlp5_ and the dots become underscores,
+        the timings are histograms, the counters and the registered statistics are untyped values.
+        """
+        metrics = self.snapshot()
+        lines = []
+        for name, value in sorted(metrics["counters"].items()):
+            lines.append(f"{metric_name(name)} {value}")
+        for name, stats in sorted(metrics["timings"].items()):
+            name = metric_name(name + ".seconds")
+            lines.append(f"# TYPE {name} histogram")
+            seen = 0
+            for bound, count in zip(stats["buckets"], stats["counts"]):
+                seen += count
+                lines.append(f'{name}_bucket{{le="{bound}"}} {seen}')
+            lines.append(f'{name}_bucket{{le="+Inf"}} {stats["count"]}')
+            lines.append(f"{name}_sum {stats['sum']}")
+            lines.append(f"{name}_count {stats['count']}")
+        for source in sorted(set(metrics) - {"uptime", "counters", "timings"}):
+            for name, value in sorted(metrics[source].items()):
+                if isinstance(value, (int, float)):
+                    lines.append(f"{metric_name(source + '.' + name)} {value}")
+        lines.append(f"{metric_name('uptime.seconds')} {metrics['uptime']}")
+
+        return "\n".join(lines) + "\n"
+
+
+def metric_name(name: str) -> str:
+    """Return the Prometheus name of a metric."""
+    return "pynlp5_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+# The metrics of this process, every graph and the backend record to it.
+METRICS = Metrics()
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = SAMPLING_INTERVAL) -> None:
+        """A profiler that looks at the stack of a thread every few milliseconds and counts the stacks it sees.
+        Unlike cProfile it doesn't slow down the calls of the profiled code, the time of a function is proportional to its samples.
+        The stacks are written in the folded format (one "frame;frame;frame count" line per stack) that flame graph tools read.
+        It has the methods of cProfile.Profile that profiled uses.
+
+        Args:
+            interval (float, optional): The interval between two samples, in seconds. Defaults to SAMPLING_INTERVAL.
+        """
+        self.interval = interval
+        self.stacks = Counter()
+        self.thread_id = None
+        self.stopped = threading.Event()
+        self.sampler = None
+
+    def enable(self) -> None:
+        """Start sampling the calling thread."""
+        self.thread_id = threading.get_ident()
+        self.stopped.clear()
+        self.sampler = threading.Thread(target=self.sample, daemon=True)
+        self.sampler.start()
+
+    def disable(self) -> None:
+        """Stop sampling."""
+        self.stopped.set()
+        self.sampler.join()
+
+    def sample(self) -> None:
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def dump_stats(self, filename: str) -> None:
+        """Write the stacks and their number of samples in the folded format."""
+        with open(filename, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profiled(filename: str = None, profiler: str = CPROFILE) -> Iterator[None]:
+    """Profile the block of a with statement and write the profile to a file.
+    A cProfile profile can be read with pstats or snakeviz, a sampling profile with a flame graph tool.
+    Only the thread running the block is profiled.
+
+    Args:
+        filename (str, optional): The path of the profile, nothing is profiled without it. Defaults to None.
+        profiler (str, optional): "cprofile" or "sampling". Defaults to "cprofile".
+
+    Raises:
+        ValueError: If the profiler is unknown.
+    """
+    if profiler not in PROFILERS:
+        raise ValueError(f"Unknown profiler {profiler}, expected one of {', '.join(PROFILERS)}.")
+    if filename is None:
+        yield
+        return
+
+    profile = cProfile.Profile() if profiler == CPROFILE else SamplingProfiler()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(filename)
@@ -0,0 +1,63 @@
+import base64
+import json
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+
+def encode_cursor(offset: int, key: list) -> str:
+    """Encode the position of the next page, the offset and the key of the last item of the previous page."""
+    data = json.dumps([offset, key], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, list]:
+    """Decode a cursor made by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is not one of ours.
+    """
+    try:
+        offset, key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
+    if not isinstance(offset, int) or offset < 1 or not isinstance(key, list):
+        raise ValueError("Invalid cursor.")
+
+    return offset, key
+
+
+def page(
+    items: Sequence[Any],
+    limit: int = 0,
+    cursor: str = "",
+    key: Callable[[Any], list] = lambda item: [item[0]],
+) -> Tuple[List[Any], Optional[str]]:
+    """Return a page of the items of a query, and the cursor of the next page.
+    The items must come in the same order for every page, the cursor remembers the key of the last item it has seen,
+    so if the items changed in between (the graph was rebuilt), the cursor is refused instead of skipping or repeating items.
+
+    Args:
+        items (Sequence[Any]): All the items (or at least the items up to the end of the page and one more).
+        limit (int, optional): The number of items of a page, 0 means all the remaining items. Defaults to 0.
+        cursor (str, optional): The cursor returned with the previous page, empty for the first page. Defaults to "".
+        key (Callable[[Any], list], optional): Returns the json key of an item. Defaults to its first element.
+
+    Raises:
+        ValueError: If the limit is negative or the cursor is invalid or out of date.
+
+    Returns:
+        Tuple[List[Any], Optional[str]]: The items of the page, and the cursor of the next page (None after the last page).
+    """
+    if limit < 0:
+        raise ValueError("The limit must be positive, or 0 for no limit.")
+
+    offset = 0
+    if cursor:
+        offset, last_key = decode_cursor(cursor)
+        if offset > len(items) or key(items[offset - 1]) != last_key:
+            raise ValueError("The cursor is out of date, the graph changed since the previous page.")
+
+    end = offset + limit if limit else len(items)
+    items_page = list(items[offset:end])
+    next_cursor = encode_cursor(end, key(items[end - 1])) if end < len(items) else None
+
+    return items_page, next_cursor
@@ -0,0 +1,188 @@
+import os
+import time
+from multiprocessing import Pool
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+import networkx as nx
+
+from pynlp5.cooccurrence import CooccurrenceCounter, CooccurrencePolicy
+from pynlp5.matcher import MentionMatcher
+from pynlp5.metrics import METRICS
+
+# A chunk of a text file, the path and the start and end byte offsets.
+Chunk = Tuple[str, int, int]
+
+# The default size of a chunk in bytes.
+CHUNK_SIZE = 256 * 1024
+
+# The matcher, the characters and the co-occurrence policy of the worker processes, set by init_worker.
+worker_matcher = None
+worker_characters = None
+worker_policy = None
+
+
+def add_mention_counts(
+    graph: nx.Graph, nodes: List[str], edge_weights: Dict[Tuple[str, str], int]
+) -> None:
+    """Add the counted nodes and edge weights to a graph.
+
+    Args:
+        graph (nx.Graph): The graph to update.
+        nodes (List[str]): The nodes to add.
+        edge_weights (Dict[Tuple[str, str], int]): The weights to add to the edges.
+    """
+    graph.add_nodes_from(nodes)
+    for (character1, character2), weight in edge_weights.items():
+        graph.add_edge(character1, character2)
+        graph[character1][character2]["weight"] = (
+            graph[character1][character2].get("weight", 0) + weight
+        )
+
+
+def split_into_chunks(
+    text_paths: Iterable[Union[str, Chunk]], chunk_size: int = CHUNK_SIZE
+) -> List[Chunk]:
+    """Split text files into chunks of roughly chunk_size bytes.
+    The chunks always start at the beginning of a line.
+
+    Args:
+        text_paths (Iterable[Union[str, Chunk]]): Paths to the text files or (path, start, end) byte ranges.
+        chunk_size (int, optional): The size of a chunk in bytes. Defaults to CHUNK_SIZE.
+
+    Returns:
+        List[Chunk]: The chunks in the order of the text.
+    """
+    chunks = []
+    for text_path in text_paths:
+        if isinstance(text_path, str):
+            path, start, end = text_path, 0, os.path.getsize(text_path)
+        else:
+            path, start, end = text_path
+
+        with open(path, "rb") as f:
+            position = align_to_line(f, start)
+            while position < end:
+                f.seek(min(position + chunk_size, end))
+                f.readline()
+                chunk_end = min(f.tell(), end)
+                chunks.append((path, position, chunk_end))
+                position = chunk_end
+
+    return chunks
+
+
+def align_to_line(f, position: int) -> int:
+    """Move a position forward to the start of the next line, unless it already is the start of a line.
+
+    Args:
+        f: The file opened in binary mode.
+        position (int): The byte offset.
+
+    Returns:
+        int: The byte offset of the start of the line.
+    """
+    if position == 0:
+        return 0
+    f.seek(position - 1)
+    f.readline()
+    return f.tell()
+
+
+def read_chunk(chunk: Chunk) -> Iterator[str]:
+    """Read the lines that start inside the byte range of a chunk.
+
+    Args:
+        chunk (Chunk): The path and the start and end byte offsets.
+
+    Yields:
+        str: The lines of the chunk.
+    """
+    path, start, end = chunk
+    with open(path, "rb") as f:
+        position = align_to_line(f, start)
+        f.seek(position)
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            yield line.decode("utf-8")
+
+
+def init_worker(
+    matcher: MentionMatcher, characters: List[str], policy: CooccurrencePolicy = None
+) -> None:
+    """Store the matcher, the characters and the co-occurrence policy in the worker process.
+
+    Args:
+        matcher (MentionMatcher): The compiled mention matcher.
+        characters (List[str]): The characters, in the order of the character ids.
+        policy (CooccurrencePolicy, optional): The co-occurrence policy. Defaults to the pairwise policy.
+    """
+    global worker_matcher, worker_characters, worker_policy
+    worker_matcher = matcher
+    worker_characters = characters
+    worker_policy = policy
+
+
+def worker_match_characters(text: str) -> List[str]:
+    """Match all the characters in a text with the matcher of the worker process."""
+    return [worker_characters[i] for i in sorted(worker_matcher.find(text))]
+
+
+def count_chunk(chunk: Chunk) -> Tuple[CooccurrenceCounter, float]:
+    """Count the mentions of a chunk in a worker process.
+    The whole counter is returned, the start and the end of the chunk are needed to link it to the chunks around it.
+    The time it took is returned too, the metrics of the worker processes are not the ones of the main process.
+    """
+    start = time.perf_counter()
+    counter = CooccurrenceCounter(worker_policy)
+    counter.add_lines(read_chunk(chunk), worker_match_characters)
+    return counter, time.perf_counter() - start
+
+
+def count_chunks_parallel(
+    chunks: List[Chunk],
+    matcher: MentionMatcher,
+    characters: List[str],
+    processes: int = None,
+    policy: CooccurrencePolicy = None,
+) -> Iterator[
+    Tuple[List[str], Dict[Tuple[str, str], int], Dict[Tuple[str, str], List[int]], Dict[str, List[int]]]
+]:
+    """Count the mentions of chunks of text with a process pool.
+    Every worker counts the mentions of its chunks, then we merge the counts in the order of the chunks,
+    so adding them to a graph gives the same graph as building it sequentially.
+    With a window policy, the sentences at the start of a chunk are linked to the end of the previous chunk of the same file while merging:
+    the nodes and the weights are the same, but these links come after the edges of the chunk, so the edges can be in another order.
+
+    Args:
+        chunks (List[Chunk]): The chunks of the text.
+        matcher (MentionMatcher): The compiled mention matcher.
+        characters (List[str]): The characters, in the order of the character ids.
+        processes (int, optional): The number of worker processes. Defaults to the number of CPUs.
+        policy (CooccurrencePolicy, optional): The co-occurrence policy. Defaults to the pairwise policy.
+
+    Yields:
+        Tuple[List[str], Dict[Tuple[str, str], int], Dict[Tuple[str, str], List[int]], Dict[str, List[int]]]: The nodes,
+            the edge weights, the lines of the edges and the lines of the characters of every chunk, in the order of the chunks.
+            The lines are numbered from the first chunk of the file, or of the chunks of the file that follow each other.
+    """
+    from tqdm import tqdm
+
+    counter = None
+    previous_chunk = None
+    with Pool(
+        processes, initializer=init_worker, initargs=(matcher, characters, policy)
+    ) as pool:
+        chunk_counters = pool.imap(count_chunk, chunks)
+        for chunk, (chunk_counter, seconds) in tqdm(zip(chunks, chunk_counters), total=len(chunks)):
+            METRICS.observe("build.match", seconds)
+            METRICS.increment("build.lines", chunk_counter.sentences)
+            METRICS.increment("build.mentions", chunk_counter.mentions)
+            # A window doesn't span two files, like when the files are built one after the other.
+            if previous_chunk is None or chunk[:2] != (previous_chunk[0], previous_chunk[2]):
+                counter = CooccurrenceCounter(policy)
+            counter.merge(chunk_counter)
+            yield (*counter.take(), counter.take_lines(), counter.take_mentions())
+            previous_chunk = chunk
@@ -0,0 +1,110 @@
+from array import array
+from typing import Iterable, List, Optional, Sequence
+
+import networkx as nx
+
+
+class PathIndex:
+    def __init__(self, adjacency: List[Sequence[int]], version: int = 0) -> None:
+        """Shortest path index of a graph, it stores a BFS tree (the predecessor of every node) for every source.
+        The trees are computed when a source is first queried, or all at once with precompute,
+        which gives a full all-pairs predecessor matrix (n * n integers, this is fine for graphs of a few thousand nodes).
+        After that a path is reconstructed by following the predecessors, no graph search is needed.
+
+        Args:
+            adjacency (List[Sequence[int]]): The ids of the neighbors of every node, the id of a node is its index.
+            version (int, optional): The version of the graph the index was built from. Defaults to 0.
+        """
+        self.adjacency = adjacency
+        self.version = version
+
+        # The BFS tree of every source that was already queried.
+        self.trees = {}
+
+        # The nodes of the graph and their ids, set by from_graph.
+        self.nodes = None
+        self.node_ids = None
+
+    @classmethod
+    def from_graph(cls, graph: nx.Graph, version: int = 0) -> "PathIndex":
+        """Build the index of a networkx graph, the id of a node is its position in graph.nodes().
+
+        Args:
+            graph (nx.Graph): The graph.
+            version (int, optional): The version of the graph. Defaults to 0.
+
+        Returns:
+            PathIndex: The path index.
+        """
+        nodes = list(graph.nodes())
+        node_ids = {node: i for i, node in enumerate(nodes)}
+        adjacency = [
+            array("i", (node_ids[neighbor] for neighbor in graph.adj[node]))
+            for node in nodes
+        ]
+
+        index = cls(adjacency, version)
+        index.nodes = nodes
+        index.node_ids = node_ids
+
+        return index
+
+    def tree(self, source: int) -> array:
+        """Return the BFS tree of a source, computing it if needed.
+        The BFS visits the neighbors in the order of the adjacency, like networkx does.
+
+        Args:
+            source (int): The id of the source node.
+
+        Returns:
+            array: The predecessor of every node on a shortest path from the source, -1 for unreachable nodes.
+        """
+        if source in self.trees:
+            return self.trees[source]
+
+        predecessors = array("i", [-1]) * len(self.adjacency)
+        predecessors[source] = source
+        frontier = [source]
+        while frontier:
+            next_frontier = []
+            for node in frontier:
+                for neighbor in self.adjacency[node]:
+                    if predecessors[neighbor] == -1:
+                        predecessors[neighbor] = node
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+
+        self.trees[source] = predecessors
+        return predecessors
+
+    def precompute(self, sources: Iterable[int] = None) -> None:
+        """Compute the BFS trees of the sources ahead of the queries.
+
+        Args:
+            sources (Iterable[int], optional): The ids of the sources. Defaults to every node.
+        """
+        if sources is None:
+            sources = range(len(self.adjacency))
+        for source in sources:
+            self.tree(source)
+
+    def path(self, source: int, target: int) -> Optional[List[int]]:
+        """Return a shortest path (in number of edges) between two nodes.
+
+        Args:
+            source (int): The id of the first node.
+            target (int): The id of the second node.
+
+        Returns:
+            Optional[List[int]]: The ids of the nodes of the path, from the source to the target, None if there is no path.
+        """
+        predecessors = self.tree(source)
+        if predecessors[target] == -1:
+            return None
+
+        path = [target]
+        while path[-1] != source:
+            path.append(predecessors[path[-1]])
+        path.reverse()
+
+        return path
@@ -0,0 +1,259 @@
+import fcntl
+import itertools
+import json
+import os
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from threading import Lock
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from pynlp5.knowledge_graph import KnowledgeGraph
+from pynlp5.snapshot import GraphSnapshot
+
+Graph = Union[KnowledgeGraph, GraphSnapshot]
+
+# The number of published snapshots kept on disk, the older ones are deleted.
+PUBLISHED_SNAPSHOTS = 3
+
+# The number of finished jobs whose status is kept, the statuses of the older ones are deleted.
+FINISHED_JOBS = 100
+
+
+class GraphStore:
+    def __init__(
+        self,
+        publish_dir: str = None,
+        on_change: Callable[[], None] = None,
+    ) -> None:
+        """The graph served by the backend.
+        The graph is never modified while it is served: a build or an ingestion makes a new graph in a background thread,
+        then we replace the (graph, version) pair with a single assignment.
+        A request reads the pair once and works with that graph until it is done, so reads never wait for a rebuild.
+
+        With a publish directory the graph is shared between worker processes:
+        every new graph is written to a snapshot there, and a pointer file names the current snapshot.
+        Every worker memory-maps the current snapshot, so the operating system keeps only one copy of the graph in memory,
+        and a worker notices a new graph at its next request.
+
+        Args:
+            publish_dir (str, optional): The directory of the shared snapshots, None to serve from this process only. Defaults to None.
+            on_change (Callable[[], None], optional): Called every time the served graph changes. Defaults to None.
+        """
+        self.publish_dir = publish_dir
+        self.on_change = on_change
+
+        # The served graph and its version, always replaced together.
+        self.state = (None, 0)
+        # The stat (mtime, size, inode) of the pointer file the state was loaded from.
+        self.pointer_stamp = None
+
+        # Only one build or ingestion runs at a time, the reads don't take the lock.
+        self.write_lock = Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.jobs = {}
+        # The futures of the jobs that are not finished, for waiting on them.
+        self.futures = {}
+        # The ids of the finished jobs, the oldest first.
+        self.finished_jobs = deque()
+        self.job_ids = itertools.count(1)
+
+        if self.publish_dir:
+            os.makedirs(self.publish_dir, exist_ok=True)
+            self.refresh()
+
+    @property
+    def pointer_path(self) -> str:
+        return os.path.join(self.publish_dir, "current.json")
+
+    def get(self) -> Tuple[Optional[Graph], int]:
+        """Return the served graph and its version, loading the graph published by another worker if there is a new one.
+
+        Returns:
+            Tuple[Optional[Graph], int]: The graph (None if nothing was built yet) and its version.
+        """
+        if self.publish_dir:
+            self.refresh()
+        return self.state
+
+    def swap(self, graph: Graph) -> int:
+        """Serve a new graph.
+
+        Args:
+            graph (Graph): The new graph, it must not be modified afterwards.
+
+        Returns:
+            int: The version of the new graph.
+        """
+        with self.write_lock:
+            if self.publish_dir:
+                self.publish(graph)
+                self.refresh()
+            else:
+                self.state = (graph, self.state[1] + 1)
+                self.changed()
+
+        return self.state[1]
+
+    def changed(self) -> None:
+        if self.on_change:
+            self.on_change()
+
+    # ================================================================================================
+    # Shared snapshots
+    # ================================================================================================
+
+    def publish(self, graph: Graph) -> None:
+        """Write a graph to a new snapshot and point the other workers to it.
+        The pointer is replaced with a rename, so a worker always reads a complete pointer to a complete snapshot.
+        A file lock keeps two workers from publishing the same version.
+
+        Args:
+            graph (Graph): The graph to publish.
+        """
+        with open(os.path.join(self.publish_dir, "publish.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            pointer = self.read_pointer()
+            version = (pointer["version"] if pointer else 0) + 1
+            snapshot_path = os.path.join(self.publish_dir, f"kg.{version}.snapshot")
+            graph.serialize_snapshot(snapshot_path)
+
+            temporary_path = f"{self.pointer_path}.tmp"
+            with open(temporary_path, "w") as f:
+                json.dump({"version": version, "snapshot": os.path.basename(snapshot_path)}, f)
+            os.replace(temporary_path, self.pointer_path)
+
+            # The workers that still use an old snapshot keep their memory map, deleting the file doesn't affect them.
+            if version > PUBLISHED_SNAPSHOTS:
+                old_path = os.path.join(self.publish_dir, f"kg.{version - PUBLISHED_SNAPSHOTS}.snapshot")
+                if os.path.isfile(old_path):
+                    os.remove(old_path)
+
+    def read_pointer(self) -> Optional[Dict]:
+        """Return the content of the pointer file, None if nothing was published yet."""
+        if not os.path.isfile(self.pointer_path):
+            return None
+        with open(self.pointer_path, "r") as f:
+            return json.load(f)
+
+    def refresh(self) -> None:
+        """
+        Load the published snapshot if the pointer file changed since we last loaded it.
+        """
+        try:
+            stat = os.stat(self.pointer_path)
+        except FileNotFoundError:
+            return
+
+        stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if stamp == self.pointer_stamp:
+            return
+
+        pointer = self.read_pointer()
+        if pointer["version"] != self.state[1]:
+            snapshot = GraphSnapshot(os.path.join(self.publish_dir, pointer["snapshot"]))
+            self.state = (snapshot, pointer["version"])
+            self.changed()
+        self.pointer_stamp = stamp
+
+    # ================================================================================================
+    # Background jobs
+    # ================================================================================================
+
+    def submit(self, name: str, task: Callable[[Optional[Graph]], Graph], **details) -> str:
+        """Run a task that makes a new graph in the background, the new graph is served when the task is done.
+
+        Args:
+            name (str): The name of the task, for the status of the job.
+            task (Callable[[Optional[Graph]], Graph]): Makes the new graph from the served one, it must not modify the served graph.
+            **details: More information about the job, added to its status.
+
+        Returns:
+            str: The id of the job, it contains the process id so the ids of the workers never collide.
+        """
+        job_id = f"{os.getpid()}.{next(self.job_ids)}"
+        self.jobs[job_id] = {
+            "id": job_id,
+            "name": name,
+            "status": "queued",
+            "submitted": time.time(),
+            **details,
+        }
+        self.record(job_id)
+        future = self.executor.submit(self.run_job, job_id, task)
+        self.futures[job_id] = future
+        # The future is only needed until the job ends (the callback runs right away if it already ended).
+        future.add_done_callback(lambda _: self.futures.pop(job_id, None))
+
+        return job_id
+
+    def run_job(self, job_id: str, task: Callable[[Optional[Graph]], Graph]) -> None:
+        job = self.jobs[job_id]
+        job["status"] = "running"
+        self.record(job_id)
+        try:
+            graph = task(self.get()[0])
+            job["version"] = self.swap(graph)
+            job["status"] = "done"
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            traceback.print_exc()
+        job["finished"] = time.time()
+        self.record(job_id)
+        self.forget_finished_jobs(job_id)
+
+    def forget_finished_jobs(self, job_id: str) -> None:
+        """Add a job to the finished jobs, and delete the status of the oldest ones above FINISHED_JOBS."""
+        self.finished_jobs.append(job_id)
+        while len(self.finished_jobs) > FINISHED_JOBS:
+            old_job_id = self.finished_jobs.popleft()
+            self.jobs.pop(old_job_id, None)
+            if self.publish_dir:
+                job_path = os.path.join(self.publish_dir, "jobs", f"{old_job_id}.json")
+                if os.path.isfile(job_path):
+                    os.remove(job_path)
+
+    def record(self, job_id: str) -> None:
+        """Write the status of a job to the publish directory, so every worker can answer about it."""
+        if not self.publish_dir:
+            return
+
+        jobs_dir = os.path.join(self.publish_dir, "jobs")
+        os.makedirs(jobs_dir, exist_ok=True)
+        temporary_path = os.path.join(jobs_dir, f"{job_id}.json.tmp")
+        with open(temporary_path, "w") as f:
+            json.dump(self.jobs[job_id], f)
+        os.replace(temporary_path, os.path.join(jobs_dir, f"{job_id}.json"))
+
+    def job(self, job_id: str) -> Optional[Dict]:
+        """Return the status of a job, None if there is no such job."""
+        if job_id in self.jobs:
+            return dict(self.jobs[job_id])
+
+        # The job may run in another worker.
+        if self.publish_dir:
+            job_path = os.path.join(self.publish_dir, "jobs", f"{os.path.basename(job_id)}.json")
+            if os.path.isfile(job_path):
+                with open(job_path, "r") as f:
+                    return json.load(f)
+
+        return None
+
+    def wait(self, job_id: str, timeout: float = None) -> Optional[Dict]:
+        """Wait until a job of this process is done or failed and return its status.
+
+        Args:
+            job_id (str): The id of the job.
+            timeout (float, optional): The maximum time to wait in seconds, None to wait until the job ends. Defaults to None.
+
+        Returns:
+            Optional[Dict]: The status of the job, None if there is no such job.
+        """
+        future = self.futures.get(job_id)
+        if future is not None:
+            wait([future], timeout)
+
+        return self.job(job_id)
@@ -0,0 +1,1076 @@
+import json
+import mmap
+import shutil
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from itertools import pairwise
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+import networkx as nx
+
+from pynlp5.analytics import GraphAnalytics
+from pynlp5.cache import LRUCache
+from pynlp5.character_index import CharacterIndex, parse_character_query, query_lines
+from pynlp5.degree_index import DegreeIndex
+from pynlp5.evidence import EvidenceStore, LineIndex, Postings, decode_postings, edge_key
+from pynlp5.k_paths import MAX_PATH_LENGTH, k_shortest_paths
+from pynlp5.path_index import PathIndex
+from pynlp5.temporal import (
+    TIME_SLICE_CACHE_SIZE,
+    TemporalWeights,
+    TimeRange,
+    slice_k_shortest_paths,
+    slice_most_connections,
+    slice_neighborhoods,
+    slice_shortest_path,
+    slice_top_connected,
+)
+
+# numpy and scipy take a while to import, we only import them when the sparse adjacency matrix is first needed.
+if TYPE_CHECKING:
+    import numpy as np
+
+    from pynlp5.layout import GraphLayout
+    from pynlp5.similarity import SimilarityIndex
+    from pynlp5.sparse import SparseAdjacency
+
+# The first bytes of every snapshot file.
+SNAPSHOT_MAGIC = b"PYNLP5KG"
+SNAPSHOT_VERSION = 1
+
+# The header is made of these parts, one after the other.
+# The graph: magic, version, weight typecode (+3 padding bytes), number of nodes, number of adjacency entries, size of the string table.
+HEADER = struct.Struct("<8sIcxxxIIQ")
+
+# The temporal weights: number of periods, number of edges, number of entries, integer weights.
+TEMPORAL_HEADER = struct.Struct("<IIQI")
+
+# The analytics: 1 if the snapshot has analytics, the number of sources of the betweenness.
+ANALYTICS_HEADER = struct.Struct("<II")
+
+# The evidence: size of the json of the texts (0 without evidence), number of line offsets, size of the postings.
+EVIDENCE_HEADER = struct.Struct("<QQQ")
+
+# The mentions: 1 if the snapshot has mentions, the number of periods, the number of mentions.
+MENTIONS_HEADER = struct.Struct("<IIQ")
+
+# Every array of the file starts at a multiple of this.
+ALIGNMENT = 8
+
+
+def is_snapshot(filename: str) -> bool:
+    """Check if a file is a binary graph snapshot (and not a json serialized graph).
+
+    Args:
+        filename (str): Path to the file.
+
+    Returns:
+        bool: True if the file starts with the snapshot magic bytes.
+    """
+    with open(filename, "rb") as f:
+        return f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+
+
+def padding(size: int) -> bytes:
+    """Return the zero bytes needed to align a position of the file."""
+    return b"\0" * (-size % ALIGNMENT)
+
+
+def to_little_endian(values: array) -> bytes:
+    """Return the bytes of an array in little endian byte order."""
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_snapshot(
+    graph: nx.Graph,
+    filename: str,
+    temporal: TemporalWeights = None,
+    analytics: GraphAnalytics = None,
+    evidence: EvidenceStore = None,
+    mentions: CharacterIndex = None,
+) -> None:
+    """Write a graph to a compact binary snapshot.
+    The node names are stored once in a string table, the edges as a CSR (compressed sparse row) adjacency:
+    the neighbors of node i are indices[indptr[i]:indptr[i + 1]] with the weights at the same positions.
+    The nodes and the neighbors keep the order of the graph, so queries return the same results as on the graph.
+    The temporal weights follow, with the ids of the snapshot nodes, then the community and the centralities of every node.
+    The evidence comes last: the texts and their line offsets, then the postings list of every adjacency entry,
+    the two entries of an edge point to the same bytes so the postings of an edge are found from either character.
+    The mentions are a CSR too: the line ids of node i are mention_lines[mention_indptr[i]:mention_indptr[i + 1]].
+
+    Args:
+        graph (nx.Graph): The graph to write.
+        filename (str): Path to the snapshot file.
+        temporal (TemporalWeights, optional): The weights of the edges in every chapter. Defaults to None.
+        analytics (GraphAnalytics, optional): The analytics of the graph. Defaults to None.
+        evidence (EvidenceStore, optional): The lines of the edges. Defaults to None.
+        mentions (CharacterIndex, optional): The lines of the characters. Defaults to None.
+    """
+    nodes = list(graph.nodes())
+    node_ids = {node: i for i, node in enumerate(nodes)}
+
+    # The string table, the name of node i is strings[string_offsets[i]:string_offsets[i + 1]].
+    encoded_names = [str(node).encode("utf-8") for node in nodes]
+    string_offsets = array("I", [0])
+    for name in encoded_names:
+        string_offsets.append(string_offsets[-1] + len(name))
+    strings = b"".join(encoded_names)
+
+    # The node ids sorted by name, we use this for finding a node by its name with binary search.
+    sorted_ids = array("I", sorted(range(len(nodes)), key=lambda i: str(nodes[i])))
+
+    indptr = array("I", [0])
+    indices = array("I")
+    weights = []
+    for node in nodes:
+        for neighbor, data in graph.adj[node].items():
+            indices.append(node_ids[neighbor])
+            weights.append(data.get("weight", 1))
+        indptr.append(len(indices))
+
+    # We store integer weights as unsigned integers and fall back to doubles otherwise.
+    if all(isinstance(weight, int) and weight >= 0 for weight in weights):
+        weights = array("I", weights)
+    else:
+        weights = array("d", weights)
+
+    temporal_arrays = []
+    temporal_counts = (0, 0, 0, 1)
+    if temporal is not None and temporal.periods:
+        temporal.compact()
+        # The edges of the temporal weights go from the smallest to the largest snapshot node id, like the ones we load.
+        edges = [
+            sorted((node_ids[temporal.nodes[source]], node_ids[temporal.nodes[target]]))
+            for source, target in zip(temporal.sources, temporal.targets)
+        ]
+        temporal_arrays = [
+            array("I", [book for book, _ in temporal.periods]),
+            array("I", [chapter for _, chapter in temporal.periods]),
+            array("I", [source for source, _ in edges]),
+            array("I", [target for _, target in edges]),
+            array("Q", temporal.indptr.tolist()),
+            array("I", temporal.entry_periods.tolist()),
+            array("d", temporal.cumulative.tolist()),
+        ]
+        temporal_counts = (
+            len(temporal.periods),
+            len(temporal.sources),
+            len(temporal.entry_periods),
+            int(temporal.integer_weights),
+        )
+
+    analytics_arrays = []
+    analytics_counts = (0, 0)
+    if analytics is not None:
+        node_analytics = [analytics.node_id(node) for node in nodes]
+        analytics_arrays = [
+            array("I", [analytics.communities[i] for i in node_analytics]),
+            array("d", [analytics.pagerank[i] for i in node_analytics]),
+            array("d", [analytics.betweenness[i] for i in node_analytics]),
+        ]
+        analytics_counts = (1, analytics.samples)
+
+    evidence_arrays = []
+    evidence_json = b""
+    evidence_data = bytearray()
+    if evidence is not None and evidence.texts:
+        # The offsets of a file counted twice are only written once.
+        texts = []
+        line_offsets = array("Q")
+        offset_starts = {}
+        for text in evidence.texts:
+            if isinstance(text, LineIndex):
+                if text.text_path not in offset_starts:
+                    offset_starts[text.text_path] = len(line_offsets)
+                    line_offsets.extend(text.line_offsets)
+                texts.append({"path": text.text_path, "start": offset_starts[text.text_path], "count": len(text.line_offsets)})
+            else:
+                texts.append({"lines": text})
+        evidence_json = json.dumps(texts).encode("utf-8")
+
+        starts, sizes, counts = array("Q"), array("I"), array("I")
+        # The second entry of an edge points to the postings written for the first one.
+        first_entries = {}
+        for node in nodes:
+            for neighbor in graph.adj[node]:
+                entry = first_entries.pop((node_ids[neighbor], node_ids[node]), None)
+                if entry is None:
+                    first_entries[(node_ids[node], node_ids[neighbor])] = len(starts)
+                    postings = evidence.postings.encoded(node, neighbor)
+                    starts.append(len(evidence_data))
+                    sizes.append(len(postings))
+                    counts.append(evidence.postings.count(node, neighbor))
+                    evidence_data += postings
+                else:
+                    starts.append(starts[entry])
+                    sizes.append(sizes[entry])
+                    counts.append(counts[entry])
+        evidence_arrays = [line_offsets, starts, sizes, counts]
+
+    mentions_arrays = []
+    mentions_counts = (0, 0, 0)
+    if mentions is not None:
+        # Every mentioned character is a node of the graph.
+        mention_indptr = array("Q", [0])
+        mention_lines = array("I")
+        for node in nodes:
+            mention_lines.extend(mentions.lines.get(node, ()))
+            mention_indptr.append(len(mention_lines))
+        mentions_arrays = [mention_indptr, mention_lines, array("Q", mentions.period_lines)]
+        mentions_counts = (1, len(mentions.period_lines), len(mention_lines))
+
+    with open(filename, "wb") as f:
+        header = HEADER.pack(
+            SNAPSHOT_MAGIC,
+            SNAPSHOT_VERSION,
+            weights.typecode.encode("ascii"),
+            len(nodes),
+            len(indices),
+            len(strings),
+        ) + TEMPORAL_HEADER.pack(*temporal_counts) + ANALYTICS_HEADER.pack(*analytics_counts) + EVIDENCE_HEADER.pack(
+            len(evidence_json), len(evidence_arrays[0]) if evidence_arrays else 0, len(evidence_data)
+        ) + MENTIONS_HEADER.pack(*mentions_counts)
+        f.write(header + padding(len(header)))
+        for values in [string_offsets, sorted_ids, indptr, indices, weights]:
+            data = to_little_endian(values)
+            f.write(data + padding(len(data)))
+        f.write(strings + padding(len(strings)))
+        for values in temporal_arrays + analytics_arrays:
+            data = to_little_endian(values)
+            f.write(data + padding(len(data)))
+        if evidence_json:
+            f.write(evidence_json + padding(len(evidence_json)))
+            for values in evidence_arrays:
+                data = to_little_endian(values)
+                f.write(data + padding(len(data)))
+            f.write(evidence_data + padding(len(evidence_data)))
+        for values in mentions_arrays:
+            data = to_little_endian(values)
+            f.write(data + padding(len(data)))
+
+
+class SnapshotPostings:
+    def __init__(
+        self,
+        snapshot: "GraphSnapshot",
+        starts: memoryview,
+        sizes: memoryview,
+        counts: memoryview,
+        data: memoryview,
+    ) -> None:
+        """The postings of the edges of a snapshot, read from the memory map.
+        The postings of an edge are the ones of its adjacency entry, found among the neighbors of the first character.
+        The neighbors keep the order of the graph, so we sort the entries of every row by neighbor when the first edge is looked up,
+        then an entry is a binary search in its row.
+
+        Args:
+            snapshot (GraphSnapshot): The snapshot.
+            starts (memoryview): The position of the postings of every adjacency entry in data.
+            sizes (memoryview): The size of the postings of every adjacency entry.
+            counts (memoryview): The number of lines of every adjacency entry.
+            data (memoryview): The encoded postings lists.
+        """
+        self.snapshot = snapshot
+        self.starts = starts
+        self.sizes = sizes
+        self.counts = counts
+        self.data = data
+        # The adjacency entries sorted by row then by neighbor, and their neighbors.
+        self.sorted_entries = None
+        self.sorted_indices = None
+
+    def sort_entries(self) -> None:
+        """Sort the adjacency entries of every row by neighbor."""
+        import numpy as np
+
+        # We copy the arrays, numpy arrays over the memoryviews would keep them from being released by close.
+        indptr, indices = np.array(self.snapshot.indptr), np.array(self.snapshot.indices)
+        rows = np.repeat(np.arange(self.snapshot.node_count), np.diff(indptr))
+        self.sorted_entries = np.lexsort((indices, rows))
+        self.sorted_indices = indices[self.sorted_entries]
+
+    def entry(self, character1: str, character2: str) -> Optional[int]:
+        """Return the adjacency entry of the edge between two characters, None if they are not linked."""
+        node1, node2 = self.snapshot.node_id(character1), self.snapshot.node_id(character2)
+        if self.sorted_entries is None:
+            self.sort_entries()
+        start, end = self.snapshot.indptr[node1], self.snapshot.indptr[node1 + 1]
+        position = bisect_left(self.sorted_indices, node2, start, end)
+        if position < end and self.sorted_indices[position] == node2:
+            return int(self.sorted_entries[position])
+        return None
+
+    def lines(self, character1: str, character2: str) -> Iterable[int]:
+        """Return the line ids of an edge, in increasing order."""
+        return decode_postings(self.encoded(character1, character2))
+
+    def count(self, character1: str, character2: str) -> int:
+        """Return the number of lines of an edge."""
+        entry = self.entry(character1, character2)
+        return 0 if entry is None else self.counts[entry]
+
+    def encoded(self, character1: str, character2: str) -> bytes:
+        """Return the encoded postings list of an edge."""
+        entry = self.entry(character1, character2)
+        if entry is None:
+            return b""
+        return bytes(self.data[self.starts[entry] : self.starts[entry] + self.sizes[entry]])
+
+    def copy(self) -> Postings:
+        """Return the postings as in memory Postings, that don't need the memory map."""
+        snapshot = self.snapshot
+        return Postings.from_lists(
+            (
+                edge_key(snapshot.name(node), snapshot.name(snapshot.indices[entry])),
+                self.counts[entry],
+                bytes(self.data[self.starts[entry] : self.starts[entry] + self.sizes[entry]]),
+            )
+            for node in range(snapshot.node_count)
+            for entry in range(snapshot.indptr[node], snapshot.indptr[node + 1])
+            if snapshot.indices[entry] >= node
+        )
+
+    def to_dict(self) -> dict:
+        """Return the postings as json serializable lists, see Postings.to_dict."""
+        return self.copy().to_dict()
+
+
+class SnapshotMentions(CharacterIndex):
+    def __init__(self, snapshot: "GraphSnapshot", indptr: memoryview, lines: memoryview, period_lines: memoryview) -> None:
+        """The index of the mentions of a snapshot, read from the memory map.
+
+        Args:
+            snapshot (GraphSnapshot): The snapshot.
+            indptr (memoryview): The position of the line ids of every node in lines.
+            lines (memoryview): The line ids of the nodes.
+            period_lines (memoryview): The line id of the first line of every period.
+        """
+        self.snapshot = snapshot
+        self.indptr = indptr
+        self.mention_lines = lines
+        self.period_lines = period_lines
+
+    @property
+    def lines(self) -> Dict[str, memoryview]:
+        """The line ids of every mentioned character."""
+        return {
+            self.snapshot.name(node): self.mention_lines[self.indptr[node] : self.indptr[node + 1]]
+            for node in range(self.snapshot.node_count)
+            if self.indptr[node + 1] > self.indptr[node]
+        }
+
+    def get(self, character: str) -> memoryview:
+        """Return the line ids of a character, see CharacterIndex.get."""
+        try:
+            node = self.snapshot.node_id(character)
+        except nx.NetworkXError:
+            node = None
+        if node is None or self.indptr[node + 1] == self.indptr[node]:
+            raise ValueError(f"{character} is never mentioned.")
+        return self.mention_lines[self.indptr[node] : self.indptr[node + 1]]
+
+    def copy(self) -> CharacterIndex:
+        """Return the mentions as an in memory CharacterIndex, that doesn't need the memory map."""
+        index = CharacterIndex()
+        index.add(self.lines)
+        index.add_periods(self.period_lines)
+        return index
+
+    def to_dict(self) -> dict:
+        """Return the mentions as json serializable lists, see CharacterIndex.to_dict."""
+        return self.copy().to_dict()
+
+
+class GraphSnapshot:
+    def __init__(self, filename: str) -> None:
+        """A read-only knowledge graph backed by a memory-mapped binary snapshot.
+        Nothing is parsed at load time, the arrays of the file are used directly through memoryviews,
+        and the queries only build the (small) networkx subgraphs they return.
+
+        Args:
+            filename (str): Path to the snapshot file written by write_snapshot.
+        """
+        self.filename = filename
+        with open(filename, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (
+            magic,
+            version,
+            weight_typecode,
+            self.node_count,
+            entry_count,
+            strings_size,
+        ) = HEADER.unpack_from(self.mmap, 0)
+
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{filename} is not a graph snapshot.")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(
+                f"Unsupported snapshot version {version}, expected {SNAPSHOT_VERSION}."
+            )
+
+        header_size = HEADER.size
+        (
+            period_count,
+            temporal_edge_count,
+            temporal_entry_count,
+            integer_weights,
+        ) = TEMPORAL_HEADER.unpack_from(self.mmap, header_size)
+        header_size += TEMPORAL_HEADER.size
+        has_analytics, self.analytics_samples = ANALYTICS_HEADER.unpack_from(self.mmap, header_size)
+        header_size += ANALYTICS_HEADER.size
+        evidence_json_size, line_offset_count, postings_size = EVIDENCE_HEADER.unpack_from(self.mmap, header_size)
+        header_size += EVIDENCE_HEADER.size
+        has_mentions, mention_period_count, mention_count = MENTIONS_HEADER.unpack_from(self.mmap, header_size)
+        header_size += MENTIONS_HEADER.size
+
+        self.buffer = memoryview(self.mmap)
+        self.position = header_size + len(padding(header_size))
+        self.string_offsets = self.read_array("I", self.node_count + 1)
+        self.sorted_ids = self.read_array("I", self.node_count)
+        self.indptr = self.read_array("I", self.node_count + 1)
+        self.indices = self.read_array("I", entry_count)
+        self.weight_typecode = weight_typecode.decode("ascii")
+        self.weights = self.read_array(self.weight_typecode, entry_count)
+        self.strings = self.buffer[self.position : self.position + strings_size]
+        self.position += strings_size + len(padding(strings_size))
+
+        # The temporal weights, the arrays are only turned into a TemporalWeights when a time range is queried.
+        self.temporal_arrays = []
+        if period_count:
+            self.temporal_arrays = [
+                self.read_array("I", period_count),
+                self.read_array("I", period_count),
+                self.read_array("I", temporal_edge_count),
+                self.read_array("I", temporal_edge_count),
+                self.read_array("Q", temporal_edge_count + 1),
+                self.read_array("I", temporal_entry_count),
+                self.read_array("d", temporal_entry_count),
+            ]
+        self.integer_weights = bool(integer_weights)
+        self.temporal = None
+
+        # The communities and the centralities, loaded when first needed, or computed by compute_analytics.
+        self.analytics_arrays = []
+        if has_analytics:
+            self.analytics_arrays = [
+                self.read_array("I", self.node_count),
+                self.read_array("d", self.node_count),
+                self.read_array("d", self.node_count),
+            ]
+        self.analytics = None
+        # True when the analytics were computed after the snapshot was loaded, they differ from the ones of the file.
+        self.analytics_changed = False
+
+        # The evidence of the edges, the postings are read from the file when an edge is queried.
+        self.evidence_texts = []
+        self.evidence_arrays = []
+        if evidence_json_size:
+            self.evidence_texts = json.loads(bytes(self.buffer[self.position : self.position + evidence_json_size]))
+            self.position += evidence_json_size + len(padding(evidence_json_size))
+            self.evidence_arrays = [
+                self.read_array("Q", line_offset_count),
+                self.read_array("Q", entry_count),
+                self.read_array("I", entry_count),
+                self.read_array("I", entry_count),
+                self.buffer[self.position : self.position + postings_size],
+            ]
+            self.position += postings_size + len(padding(postings_size))
+        self.evidence = None
+
+        # The lines of every character, for the queries of the mentions.
+        self.mentions_arrays = []
+        if has_mentions:
+            self.mentions_arrays = [
+                self.read_array("Q", self.node_count + 1),
+                self.read_array("I", mention_count),
+                self.read_array("Q", mention_period_count),
+            ]
+        self.mentions = None
+        self.time_slices = LRUCache(TIME_SLICE_CACHE_SIZE)
+
+        # The degree index, the shortest path index, the sparse adjacency matrix, the layout and the similarity index, only computed when needed.
+        self.degree_index = None
+        self.path_index = None
+        self.sparse_adjacency = None
+        self.layout = None
+        self.similarity_index = None
+
+    def read_array(self, typecode: str, count: int) -> memoryview:
+        """Return the next array of the file as a memoryview (without copying it).
+
+        Args:
+            typecode (str): The typecode of the array.
+            count (int): The number of elements.
+
+        Returns:
+            memoryview: The elements of the array.
+        """
+        size = array(typecode).itemsize * count
+        values = self.buffer[self.position : self.position + size].cast(typecode)
+        self.position += size + len(padding(size))
+
+        # The file is little endian, on big endian machines we have to copy and swap the bytes.
+        if sys.byteorder != "little":
+            values = array(typecode, values)
+            values.byteswap()
+
+        return values
+
+    def close(self) -> None:
+        """
+        Release the memoryviews and close the memory map.
+        """
+        # The path index, the evidence and the mentions hold slices of the arrays.
+        self.path_index = None
+        self.evidence = None
+        self.mentions = None
+        for values in [
+            self.string_offsets,
+            self.sorted_ids,
+            self.indptr,
+            self.indices,
+            self.weights,
+            self.strings,
+            *self.temporal_arrays,
+            *self.analytics_arrays,
+            *self.evidence_arrays,
+            *self.mentions_arrays,
+        ]:
+            if isinstance(values, memoryview):
+                values.release()
+        self.buffer.release()
+        self.mmap.close()
+
+    # ================================================================================================
+    # Low level access
+    # ================================================================================================
+
+    def name(self, node_id: int) -> str:
+        """Return the name of a node."""
+        start, end = self.string_offsets[node_id], self.string_offsets[node_id + 1]
+        return str(self.strings[start:end], "utf-8")
+
+    def node_id(self, name: str) -> int:
+        """Return the id of a node, with binary search on the names.
+
+        Args:
+            name (str): The name of the node.
+
+        Raises:
+            nx.NetworkXError: If the node is not in the graph.
+
+        Returns:
+            int: The id of the node.
+        """
+        position = bisect_left(self.sorted_ids, name, key=self.name)
+        if position < self.node_count and self.name(self.sorted_ids[position]) == name:
+            return self.sorted_ids[position]
+
+        raise nx.NetworkXError(f"The node {name} is not in the graph.")
+
+    def neighbors(self, node_id: int) -> Iterable[Tuple[int, float]]:
+        """Return the ids of the neighbors of a node and the weights of the edges."""
+        start, end = self.indptr[node_id], self.indptr[node_id + 1]
+        return zip(self.indices[start:end], self.weights[start:end])
+
+    def weighted_degree(self, node_id: int) -> float:
+        """Return the sum of the weights of the edges of a node (self loops are counted twice, like in networkx)."""
+        return sum(
+            weight * 2 if neighbor == node_id else weight
+            for neighbor, weight in self.neighbors(node_id)
+        )
+
+    def edge_subgraph(self, edges: Iterable[Tuple[int, int]]) -> nx.Graph:
+        """Build the subgraph of the given edges, the nodes are in the order of the snapshot.
+
+        Args:
+            edges (Iterable[Tuple[int, int]]): The edges, as pairs of node ids.
+
+        Returns:
+            nx.Graph: The subgraph.
+        """
+        edge_set = set()
+        for node1, node2 in edges:
+            edge_set.add((node1, node2))
+            edge_set.add((node2, node1))
+        node_ids = sorted({node for edge in edge_set for node in edge})
+
+        subgraph = nx.Graph()
+        subgraph.add_nodes_from(self.name(node) for node in node_ids)
+        for node in node_ids:
+            for neighbor, weight in self.neighbors(node):
+                if neighbor >= node and (node, neighbor) in edge_set:
+                    subgraph.add_edge(self.name(node), self.name(neighbor), weight=weight)
+
+        return subgraph
+
+    def to_networkx(self) -> nx.Graph:
+        """Materialise the whole snapshot as a networkx graph.
+
+        Returns:
+            nx.Graph: The graph.
+        """
+        graph = nx.Graph()
+        graph.add_nodes_from(self.get_characters())
+        for node in range(self.node_count):
+            for neighbor, weight in self.neighbors(node):
+                if neighbor >= node:
+                    graph.add_edge(self.name(node), self.name(neighbor), weight=weight)
+
+        return graph
+
+    def node_subgraph(self, node_ids: Iterable[int]) -> nx.Graph:
+        """Build the subgraph of the given nodes and the edges between them, the nodes are in the order of the snapshot.
+
+        Args:
+            node_ids (Iterable[int]): The ids of the nodes.
+
+        Returns:
+            nx.Graph: The subgraph.
+        """
+        node_ids = sorted(set(node_ids))
+        node_set = set(node_ids)
+
+        subgraph = nx.Graph()
+        subgraph.add_nodes_from(self.name(node) for node in node_ids)
+        for node in node_ids:
+            for neighbor, weight in self.neighbors(node):
+                if neighbor >= node and neighbor in node_set:
+                    subgraph.add_edge(self.name(node), self.name(neighbor), weight=weight)
+
+        return subgraph
+
+    def serialize_snapshot(self, filename: str) -> None:
+        """Write the snapshot to another file, with the analytics if they were computed after it was loaded.
+        Otherwise the file is unchanged and only copied.
+
+        Args:
+            filename (str): Path to the new snapshot file.
+        """
+        if self.analytics_changed:
+            write_snapshot(
+                self.to_networkx(),
+                filename,
+                self.get_temporal(),
+                self.analytics,
+                self.get_evidence(),
+                self.get_mentions(),
+            )
+        else:
+            shutil.copyfile(self.filename, filename)
+
+    # ================================================================================================
+    # Graph Algorithms
+    # ================================================================================================
+
+    def get_characters(self) -> List[str]:
+        """Return matching characters.
+
+        Returns:
+            list: List of characters.
+        """
+        return [self.name(node) for node in range(self.node_count)]
+
+    def get_character_neighbors(
+        self, character: str, depth: int = 1, time_range: TimeRange = None
+    ) -> nx.Graph:
+        """Return the neighbors of a character, with a BFS on the CSR adjacency.
+
+        Args:
+            character (str): Character to get neighbors for.
+            depth (int, optional): Depth of the neighbors. Defaults to 1.
+            time_range (TimeRange, optional): Only the co-occurrences of these books or chapters. Defaults to the whole text.
+
+        Returns:
+            nx.Graph: The neighbors of the character.
+        """
+        if time_range is not None:
+            return slice_neighborhoods(self.get_time_slice(time_range), character, [depth])[depth]
+
+        levels = self.bfs_levels(self.node_id(character), depth)
+        edges = [edge for level in levels for edge in level]
+
+        return self.edge_subgraph(edges)
+
+    def get_character_neighborhoods(
+        self, character: str, depths: Iterable[int], time_range: TimeRange = None
+    ) -> Dict[int, nx.Graph]:
+        """Return the neighbors of a character at several depths, with a single BFS.
+
+        Args:
+            character (str): Character to get neighbors for.
+            depths (Iterable[int]): The depths of the neighbors.
+            time_range (TimeRange, optional): Only the co-occurrences of these books or chapters. Defaults to the whole text.
+
+        Returns:
+            Dict[int, nx.Graph]: The neighbors of the character at every depth.
+        """
+        if time_range is not None:
+            return slice_neighborhoods(self.get_time_slice(time_range), character, depths)
+
+        depths = set(depths)
+        if not depths:
+            return {}
+
+        levels = self.bfs_levels(self.node_id(character), max(depths))
+        return {
+            depth: self.edge_subgraph(
+                [edge for level in levels[: max(depth, 0)] for edge in level]
+            )
+            for depth in depths
+        }
+
+    def bfs_levels(self, source: int, depth: int) -> List[List[Tuple[int, int]]]:
+        """Return the edges of a breadth first search tree, one level of the tree at a time.
+
+        Args:
+            source (int): The id of the source node.
+            depth (int): The depth of the search.
+
+        Returns:
+            List[List[Tuple[int, int]]]: The (parent, child) edges of every level.
+        """
+        levels = []
+        seen = {source}
+        frontier = [source]
+        for _ in range(depth):
+            level = []
+            # The frontier is in the order the nodes were found, so the parent of a new node is the one networkx gives it.
+            for parent in frontier:
+                for child, _ in self.neighbors(parent):
+                    if child not in seen:
+                        seen.add(child)
+                        level.append((parent, child))
+            if not level:
+                break
+            levels.append(level)
+            frontier = [child for _, child in level]
+
+        return levels
+
+    def get_character_with_most_connections(
+        self, time_range: TimeRange = None
+    ) -> Tuple[str, int, nx.Graph]:
+        """Get the character that is most connected to other characters.
+
+        Args:
+            time_range (TimeRange, optional): Only the co-occurrences of these books or chapters. Defaults to the whole text.
+
+        Returns:
+            Tuple[str, int, nx.Graph]: The character with the most connections, the number of connections and the subgraph of the character.
+        """
+        if time_range is not None:
+            return slice_most_connections(self.get_time_slice(time_range))
+
+        top = self.get_degree_index().top(1)
+        if not top:
+            raise nx.NetworkXError("The knowledge graph is empty.")
+        character, connections = top[0]
+        node = self.node_id(character)
+        edges = [(node, neighbor) for neighbor, _ in self.neighbors(node) if neighbor != node]
+
+        return character, connections, self.edge_subgraph(edges)
+
+    def shortest_path_between_characters(
+        self, character1: str, character2: str, time_range: TimeRange = None
+    ) -> Tuple[nx.Graph, int]:
+        """Get the shortest path (in number of edges) between two characters.
+
+        Args:
+            character1 (str): First character.
+            character2 (str): Second character.
+            time_range (TimeRange, optional): Only the co-occurrences of these books or chapters. Defaults to the whole text.
+
+        Returns:
+            Tuple[nx.Graph, int]: The shortest path between the characters and the length of the path with the weights of the edges.
+        """
+        if time_range is not None:
+            return slice_shortest_path(self.get_time_slice(time_range), character1, character2)
+
+        source, target = self.node_id(character1), self.node_id(character2)
+
+        path = self.get_path_index().path(source, target)
+        if path is None:
+            raise nx.NetworkXNoPath(f"No path between {character1} and {character2}.")
+
+        weights = {
+            (node1, node2): dict(self.neighbors(node1))[node2]
+            for node1, node2 in pairwise(path)
+        }
+
+        return self.edge_subgraph(weights), sum(weights.values())
+
+    def k_shortest_paths_between_characters(
+        self,
+        character1: str,
+        character2: str,
+        k: int = 3,
+        max_length: int = MAX_PATH_LENGTH,
+        avoid: Iterable[str] = (),
+        time_range: TimeRange = None,
+    ) -> Tuple[nx.Graph, List[Tuple[List[str], int]], bool]:
+        """Get the k shortest distinct paths (in number of edges) between two characters, see KnowledgeGraph.k_shortest_paths_between_characters.
+
+        Returns:
+            Tuple[nx.Graph, List[Tuple[List[str], int]], bool]: The subgraph of the edges of the paths, the characters of every path
+                with the sum of the weights of its edges, and whether the search is complete.
+        """
+        if time_range is not None:
+            return slice_k_shortest_paths(
+                self.get_time_slice(time_range), character1, character2, k, max_length, avoid
+            )
+
+        source, target = self.node_id(character1), self.node_id(character2)
+        avoided = []
+        for character in avoid:
+            try:
+                avoided.append(self.node_id(character))
+            except nx.NetworkXError:
+                # A character that is not in the graph is avoided anyway.
+                pass
+
+        def weight(node1: int, node2: int) -> float:
+            return dict(self.neighbors(node1))[node2]
+
+        paths, complete = k_shortest_paths(
+            self.get_path_index().adjacency, source, target, k, max_length, avoided, weight
+        )
+        if not paths and complete:
+            raise nx.NetworkXNoPath(f"No path of at most {max_length} edges between {character1} and {character2}.")
+
+        named_paths = [
+            ([self.name(node) for node in path], sum(weight(node1, node2) for node1, node2 in pairwise(path)))
+            for path in paths
+        ]
+        return self.edge_subgraph(edge for path in paths for edge in pairwise(path)), named_paths, complete
+
+    def get_similar_characters(
+        self, character: str, k: int = 10, metric: str = "cosine", method: str = "auto"
+    ) -> Tuple[List[Tuple[str, float]], str]:
+        """Get the characters most similar to a character, see KnowledgeGraph.get_similar_characters."""
+        return self.get_similarity_index().most_similar(character, k, metric, method)
+
+    def get_top_connected_characters(self, n: int = 10) -> List[Tuple[str, int]]:
+        """Get the n characters that are most connected to other characters.
+
+        Args:
+            n (int, optional): The number of characters. Defaults to 10.
+
+        Returns:
+            List[Tuple[str, int]]: The characters and their number of connections, from the most connected.
+        """
+        return self.top_k_connected(n)
+
+    def top_k_connected(
+        self, k: int = 10, offset: int = 0, time_range: TimeRange = None
+    ) -> List[Tuple[str, int]]:
+        """Get the k most connected characters after the first offset ones, see KnowledgeGraph.top_k_connected."""
+        if time_range is not None:
+            return slice_top_connected(self.get_time_slice(time_range), k, offset)
+
+        return self.get_degree_index().top(k, offset)
+
+    def get_neighbor_edges(
+        self, character: str, depth: int = 1, time_range: TimeRange = None, min_weight: float = None
+    ) -> List[Tuple[str, str, int]]:
+        """Return the edges of the neighborhood of a character, the strongest edges of every level first, see KnowledgeGraph.get_neighbor_edges."""
+        adjacency = self.get_time_slice(time_range) if time_range is not None else self.get_sparse_adjacency()
+        return adjacency.neighbor_edges(character, depth, min_weight)
+
+    def get_connected_components(self) -> List[List[str]]:
+        """Get the groups of characters that are connected to each other, from the largest group.
+
+        Returns:
+            List[List[str]]: The characters of every connected component.
+        """
+        adjacency = self.get_sparse_adjacency()
+        return [
+            [adjacency.nodes[node] for node in component]
+            for component in adjacency.connected_components()
+        ]
+
+    def get_isolated_characters(self) -> Tuple[List[str], nx.Graph]:
+        """Get the characters that are not connected to other characters.
+
+        Returns:
+            Tuple[List[str], nx.Graph]: The characters that are not connected to other characters and the subgraph of the characters.
+        """
+        node_ids = [node for node in range(self.node_count) if self.indptr[node] == self.indptr[node + 1]]
+        return [self.name(node) for node in node_ids], self.node_subgraph(node_ids)
+
+    def get_subgraph(self, characters: Iterable[str]) -> nx.Graph:
+        """Return the subgraph of some characters and the edges between them.
+
+        Raises:
+            nx.NetworkXError: If a character is not in the graph.
+        """
+        return self.node_subgraph(self.node_id(character) for character in characters)
+
+    def get_sparse_adjacency(self) -> "SparseAdjacency":
+        """Return the sparse adjacency matrix of the snapshot, it is built from the CSR arrays of the file."""
+        import numpy as np
+
+        from pynlp5.sparse import SparseAdjacency
+
+        if self.sparse_adjacency is None:
+            # We copy the arrays, numpy arrays over the memoryviews would keep them from being released by close.
+            # The integer weights are stored unsigned, we make them signed so that the degrees can be negated for sorting.
+            weight_type = np.float64 if self.weight_typecode == "d" else np.int64
+            nodes = [self.name(node) for node in range(self.node_count)]
+            self.sparse_adjacency = SparseAdjacency.from_adjacency(
+                nodes,
+                np.array(self.indptr),
+                np.array(self.indices),
+                np.array(self.weights, dtype=weight_type),
+            )
+
+        return self.sparse_adjacency
+
+    def get_layout(self) -> "GraphLayout":
+        """Return the positions of the nodes of the snapshot, see KnowledgeGraph.get_layout."""
+        from pynlp5.layout import GraphLayout
+
+        if self.layout is None:
+            self.layout = GraphLayout.compute(self.to_networkx())
+
+        return self.layout
+
+    def get_similarity_index(self) -> "SimilarityIndex":
+        """Return the neighborhood similarity index of the snapshot, see KnowledgeGraph.get_similarity_index."""
+        from pynlp5.similarity import SimilarityIndex
+
+        if self.similarity_index is None:
+            self.similarity_index = SimilarityIndex(self.get_sparse_adjacency())
+
+        return self.similarity_index
+
+    def get_degree_index(self) -> DegreeIndex:
+        """Return the degree index of the snapshot, a snapshot never changes so it is only built once."""
+        if self.degree_index is None:
+            self.degree_index = DegreeIndex(
+                [self.name(node) for node in range(self.node_count)],
+                [self.weighted_degree(node) for node in range(self.node_count)],
+            )
+
+        return self.degree_index
+
+    def get_temporal(self) -> Optional[TemporalWeights]:
+        """Return the temporal weights of the snapshot, None if it has none. They are loaded (copied) when first needed."""
+        if self.temporal is None and self.temporal_arrays:
+            books, chapters, sources, targets, indptr, entry_periods, cumulative = self.temporal_arrays
+            self.temporal = TemporalWeights.from_arrays(
+                zip(books, chapters),
+                [self.name(node) for node in range(self.node_count)],
+                sources,
+                targets,
+                indptr,
+                entry_periods,
+                cumulative,
+                self.integer_weights,
+            )
+
+        return self.temporal
+
+    def get_time_slice(self, time_range: TimeRange) -> "SparseAdjacency":
+        """Return the sparse adjacency matrix of the snapshot in a time range, see KnowledgeGraph.get_time_slice.
+
+        Raises:
+            ValueError: If the snapshot has no chapters or there is no chapter in the time range.
+        """
+        temporal = self.get_temporal() or TemporalWeights()
+        first, last = temporal.period_range(time_range)
+        adjacency = self.time_slices.get((first, last))
+        if adjacency is None:
+            adjacency = temporal.adjacency(first, last)
+            self.time_slices.put((first, last), adjacency)
+
+        return adjacency
+
+    def compute_analytics(self, **options) -> None:
+        """Compute the communities and the centralities of the snapshot, they are written with serialize_snapshot.
+
+        Args:
+            **options: The options of GraphAnalytics.compute (algorithm, samples, seed, processes).
+        """
+        self.analytics = GraphAnalytics.compute(self.to_networkx(), **options)
+        self.analytics_changed = True
+
+    def get_analytics(self) -> Optional[GraphAnalytics]:
+        """Return the analytics of the snapshot, None if they were neither saved in the file nor computed."""
+        if self.analytics is None and self.analytics_arrays:
+            communities, pagerank, betweenness = self.analytics_arrays
+            self.analytics = GraphAnalytics(
+                self.get_characters(), communities, pagerank, betweenness, self.analytics_samples
+            )
+
+        return self.analytics
+
+    def get_evidence(self) -> Optional[EvidenceStore]:
+        """Return the evidence of the snapshot, None if it has none. The line offsets and the postings stay in the memory map."""
+        if self.evidence is None and self.evidence_arrays:
+            line_offsets, starts, sizes, counts, data = self.evidence_arrays
+            self.evidence = EvidenceStore()
+            for text in self.evidence_texts:
+                if "path" in text:
+                    if text["path"] not in self.evidence.line_indexes:
+                        self.evidence.line_indexes[text["path"]] = LineIndex(
+                            text["path"], line_offsets[text["start"] : text["start"] + text["count"]]
+                        )
+                    self.evidence.add(self.evidence.line_indexes[text["path"]])
+                else:
+                    self.evidence.add(text["lines"])
+            self.evidence.postings = SnapshotPostings(self, starts, sizes, counts, data)
+
+        return self.evidence
+
+    def get_mentions(self) -> Optional[CharacterIndex]:
+        """Return the index of the mentions of the snapshot, None if it has none. The line ids stay in the memory map."""
+        if self.mentions is None and self.mentions_arrays:
+            self.mentions = SnapshotMentions(self, *self.mentions_arrays)
+
+        return self.mentions
+
+    def find_mentions(self, query: str, time_range: TimeRange = None) -> "np.ndarray":
+        """Find the lines that match a query over the characters they mention, see KnowledgeGraph.find_mentions.
+
+        Raises:
+            ValueError: If the snapshot has no mentions, the query is invalid, a character is never mentioned or there is no chapter in the time range.
+        """
+        mentions, evidence = self.get_mentions(), self.get_evidence()
+        if mentions is None or evidence is None:
+            raise ValueError("The knowledge graph has no mentions, build it again to find the lines of the characters.")
+
+        line_range = None
+        if time_range is not None:
+            first, last = (self.get_temporal() or TemporalWeights()).period_range(time_range)
+            line_range = mentions.line_range(first, last, evidence.line_count)
+
+        return query_lines(mentions, parse_character_query(query), evidence.line_count, line_range)
+
+    def build_path_index(self, precompute: bool = True) -> None:
+        """Build the shortest path index of the snapshot.
+
+        Args:
+            precompute (bool, optional): Compute the paths from every character ahead of the queries. Defaults to True.
+        """
+        adjacency = [
+            self.indices[self.indptr[node] : self.indptr[node + 1]]
+            for node in range(self.node_count)
+        ]
+        self.path_index = PathIndex(adjacency)
+        if precompute:
+            self.path_index.precompute()
+
+    def get_path_index(self) -> PathIndex:
+        """Return the shortest path index, a snapshot never changes so it is only built once."""
+        if self.path_index is None:
+            self.build_path_index(precompute=False)
+
+        return self.path_index
@@ -0,0 +1,326 @@
+from typing import List, Tuple
+
+import networkx as nx
+import numpy as np
+from scipy.sparse import csgraph, csr_array
+
+
+class SparseAdjacency:
+    def __init__(
+        self, nodes: List[str], matrix: csr_array, version: int = 0, adjacency_order: np.ndarray = None
+    ) -> None:
+        """The weighted adjacency matrix of a graph in CSR format.
+        The analytics (degrees, neighborhoods, hubs, components) are computed with vectorized sparse operations.
+
+        Args:
+            nodes (List[str]): The nodes of the graph, the id of a node is its index.
+            matrix (csr_array): The symmetric adjacency matrix, with the weights of the edges.
+            version (int, optional): The version of the graph the matrix was built from. Defaults to 0.
+            adjacency_order (np.ndarray, optional): The position in the matrix of every entry of the graph adjacency,
+                row by row in the order of the neighbors of the graph. Defaults to None (the order of the matrix).
+        """
+        self.nodes = nodes
+        self.node_ids = {node: i for i, node in enumerate(nodes)}
+        self.matrix = matrix
+        self.version = version
+        # The columns of the matrix are sorted, the breadth first searches visit the neighbors in the order of the graph, like networkx does.
+        self.adjacency_order = adjacency_order
+
+        # The weighted degrees, self loops are counted twice like in networkx.
+        self.degrees = np.asarray(self.matrix.sum(axis=1)).ravel() + self.matrix.diagonal()
+
+    @classmethod
+    def from_graph(cls, graph: nx.Graph, version: int = 0) -> "SparseAdjacency":
+        """Build the adjacency matrix of a networkx graph, the id of a node is its position in graph.nodes().
+
+        Args:
+            graph (nx.Graph): The graph.
+            version (int, optional): The version of the graph. Defaults to 0.
+
+        Returns:
+            SparseAdjacency: The sparse adjacency matrix.
+        """
+        nodes = list(graph.nodes())
+        node_ids = {node: i for i, node in enumerate(nodes)}
+        indptr, indices, weights = [0], [], []
+        for node in nodes:
+            for neighbor, data in graph.adj[node].items():
+                indices.append(node_ids[neighbor])
+                weights.append(data.get("weight", 1))
+            indptr.append(len(indices))
+
+        weights = np.array(weights) if weights else np.zeros(0, dtype=int)
+
+        return cls.from_adjacency(nodes, np.array(indptr), np.array(indices, dtype=int), weights, version)
+
+    @classmethod
+    def from_adjacency(
+        cls,
+        nodes: List[str],
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        weights: np.ndarray,
+        version: int = 0,
+    ) -> "SparseAdjacency":
+        """Build the adjacency matrix of CSR arrays in the order of the neighbors of the graph, the columns of the matrix are sorted.
+
+        Args:
+            nodes (List[str]): The nodes, the id of a node is its index.
+            indptr (np.ndarray): The CSR row pointers, the neighbors of node i are indices[indptr[i]:indptr[i + 1]].
+            indices (np.ndarray): The neighbors, in the order of the graph.
+            weights (np.ndarray): The weight of every neighbor.
+            version (int, optional): The version of the graph. Defaults to 0.
+
+        Returns:
+            SparseAdjacency: The sparse adjacency matrix.
+        """
+        rows = np.repeat(np.arange(len(nodes)), np.diff(indptr))
+        sorted_entries = np.lexsort((indices, rows))
+        matrix = csr_array(
+            (weights[sorted_entries], indices[sorted_entries], indptr), shape=(len(nodes), len(nodes))
+        )
+        adjacency_order = np.empty_like(sorted_entries)
+        adjacency_order[sorted_entries] = np.arange(len(sorted_entries))
+
+        return cls(nodes, matrix, version, adjacency_order)
+
+    @classmethod
+    def from_edges(
+        cls,
+        nodes: List[str],
+        sources: np.ndarray,
+        targets: np.ndarray,
+        weights: np.ndarray,
+        version: int = 0,
+    ) -> "SparseAdjacency":
+        """Build the adjacency matrix of undirected edges given as arrays of node ids.
+
+        Args:
+            nodes (List[str]): The nodes, the id of a node is its index.
+            sources (np.ndarray): The first node of every edge.
+            targets (np.ndarray): The second node of every edge.
+            weights (np.ndarray): The weight of every edge.
+            version (int, optional): The version of the graph. Defaults to 0.
+
+        Returns:
+            SparseAdjacency: The sparse adjacency matrix.
+        """
+        # Every edge is in the row of both of its nodes, a self loop only once.
+        loops = sources == targets
+        rows = np.concatenate([sources, targets[~loops]])
+        columns = np.concatenate([targets, sources[~loops]])
+        matrix = csr_array(
+            (np.concatenate([weights, weights[~loops]]), (rows, columns)),
+            shape=(len(nodes), len(nodes)),
+        )
+        matrix.sort_indices()
+
+        return cls(nodes, matrix, version)
+
+    def node_id(self, node: str) -> int:
+        """Return the id of a node.
+
+        Args:
+            node (str): The node.
+
+        Raises:
+            nx.NetworkXError: If the node is not in the graph.
+
+        Returns:
+            int: The id of the node.
+        """
+        if node not in self.node_ids:
+            raise nx.NetworkXError(f"The node {node} is not in the graph.")
+        return self.node_ids[node]
+
+    def neighbors(self, node_id: int) -> np.ndarray:
+        """Return the ids of the neighbors of a node."""
+        return self.matrix.indices[self.matrix.indptr[node_id] : self.matrix.indptr[node_id + 1]]
+
+    def weight(self, node1: int, node2: int) -> int:
+        """Return the weight of the edge between two nodes, 0 if they are not connected."""
+        start, end = self.matrix.indptr[node1], self.matrix.indptr[node1 + 1]
+        position = np.flatnonzero(self.matrix.indices[start:end] == node2)
+        return self.matrix.data[start + position[0]].item() if len(position) else 0
+
+    def edge_subgraph(self, edges: List[Tuple[int, int]]) -> nx.Graph:
+        """Build the networkx graph of some edges, with their weights.
+
+        Args:
+            edges (List[Tuple[int, int]]): The edges, as pairs of node ids.
+
+        Returns:
+            nx.Graph: The subgraph.
+        """
+        subgraph = nx.Graph()
+        subgraph.add_weighted_edges_from(
+            (self.nodes[node1], self.nodes[node2], self.weight(node1, node2))
+            for node1, node2 in edges
+        )
+        return subgraph
+
+    def shortest_path(self, source: int, target: int) -> List[int]:
+        """Return a shortest path (in number of edges) between two nodes, with a breadth first search.
+
+        Args:
+            source (int): The id of the first node.
+            target (int): The id of the second node.
+
+        Returns:
+            List[int]: The ids of the nodes of the path, None if the nodes are not connected.
+        """
+        parents = {source: None}
+        for level in self.bfs_levels(source, len(self.nodes)):
+            parents.update((child, parent) for parent, child in level)
+            if target in parents:
+                break
+        if target not in parents:
+            return None
+
+        path = [target]
+        while parents[path[-1]] is not None:
+            path.append(parents[path[-1]])
+
+        return path[::-1]
+
+    def bfs_edges(self, source: int, depth: int = 1) -> List[Tuple[int, int]]:
+        """Return the edges of a breadth first search tree.
+
+        Args:
+            source (int): The id of the source node.
+            depth (int, optional): The depth of the search. Defaults to 1.
+
+        Returns:
+            List[Tuple[int, int]]: The (parent, child) edges of the tree.
+        """
+        return [edge for level in self.bfs_levels(source, depth) for edge in level]
+
+    def bfs_levels(
+        self, source: int, depth: int = 1, min_weight: float = None
+    ) -> List[List[Tuple[int, int]]]:
+        """Return the edges of a breadth first search tree, one level of the tree at a time.
+
+        Args:
+            source (int): The id of the source node.
+            depth (int, optional): The depth of the search. Defaults to 1.
+            min_weight (float, optional): Only follow the edges with at least this weight. Defaults to None (all the edges).
+
+        Returns:
+            List[List[Tuple[int, int]]]: The (parent, child) edges of every level, the search stops early at an empty level.
+        """
+        return [
+            list(zip(parents.tolist(), children.tolist()))
+            for parents, children, _ in self.bfs_arrays(source, depth, min_weight)
+        ]
+
+    def bfs_arrays(
+        self, source: int, depth: int = 1, min_weight: float = None
+    ) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Return the edges of a breadth first search tree as arrays, one level of the tree at a time.
+        Every level is computed from the rows of the frontier with array operations. The rows are read in the order
+        the nodes were found and the neighbors in the order of the graph, so the parent of a new node is the one networkx gives it.
+
+        Args:
+            source (int): The id of the source node.
+            depth (int, optional): The depth of the search. Defaults to 1.
+            min_weight (float, optional): Only follow the edges with at least this weight. Defaults to None (all the edges).
+
+        Returns:
+            List[Tuple[np.ndarray, np.ndarray, np.ndarray]]: The parents, the children (in the order they are found)
+                and the weights of the edges of every level.
+        """
+        visited = np.zeros(len(self.nodes), dtype=bool)
+        visited[source] = True
+        frontier = np.array([source])
+
+        levels = []
+        for _ in range(depth):
+            entries, lengths = self.row_entries(frontier)
+            parents = np.repeat(frontier, lengths)
+            children, weights = self.matrix.indices[entries], self.matrix.data[entries]
+            new = ~visited[children]
+            if min_weight is not None:
+                new &= weights >= min_weight
+            parents, children, weights = parents[new], children[new], weights[new]
+
+            # A child is found by the first of its entries.
+            _, first = np.unique(children, return_index=True)
+            if len(first) == 0:
+                break
+            first.sort()
+            levels.append((parents[first], children[first], weights[first]))
+
+            visited[children[first]] = True
+            frontier = children[first]
+
+        return levels
+
+    def row_entries(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the positions in the matrix of the entries of rows, one row after the other in the order of the graph,
+        and the number of entries of every row."""
+        starts = self.matrix.indptr[rows]
+        lengths = self.matrix.indptr[rows + 1] - starts
+        # The k-th entry of a row is at the start of the row plus k.
+        entries = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        if self.adjacency_order is not None:
+            entries = self.adjacency_order[entries]
+        return entries, lengths
+
+    def neighbor_edges(
+        self, node: str, depth: int = 1, min_weight: float = None
+    ) -> List[Tuple[str, str, float]]:
+        """Return the edges of the breadth first search tree of a node, the strongest edges of every level first.
+        It is the tree of the neighbors of the node, in an order that doesn't change while the graph doesn't, so it can be paged.
+
+        Args:
+            node (str): The node.
+            depth (int, optional): The depth of the search. Defaults to 1.
+            min_weight (float, optional): Only follow the edges with at least this weight. Defaults to None (all the edges).
+
+        Returns:
+            List[Tuple[str, str, float]]: The (parent, child, weight) edges, level by level, from the largest weight (then by child id).
+        """
+        edges = []
+        for parents, children, weights in self.bfs_arrays(self.node_id(node), depth, min_weight):
+            order = np.lexsort((children, -weights))
+            edges.extend(
+                (self.nodes[parent], self.nodes[child], weight)
+                for parent, child, weight in zip(
+                    parents[order].tolist(), children[order].tolist(), weights[order].tolist()
+                )
+            )
+
+        return edges
+
+    def top_hubs(self, n: int = 1) -> List[Tuple[int, int]]:
+        """Return the nodes with the largest weighted degrees.
+
+        Args:
+            n (int, optional): The number of nodes. Defaults to 1.
+
+        Returns:
+            List[Tuple[int, int]]: The ids and the weighted degrees of the nodes, from the largest degree.
+        """
+        n = min(n, len(self.nodes))
+        if n <= 0:
+            return []
+
+        # The stable sort keeps the graph order for equal degrees, like max() does.
+        top = np.argsort(-self.degrees, kind="stable")[:n]
+        return [(node, self.degrees[node].item()) for node in top.tolist()]
+
+    def connected_components(self) -> List[List[int]]:
+        """Return the connected components, from the largest.
+
+        Returns:
+            List[List[int]]: The ids of the nodes of every component.
+        """
+        if not self.nodes:
+            return []
+
+        count, labels = csgraph.connected_components(self.matrix, directed=False)
+        order = np.argsort(labels, kind="stable")
+        boundaries = np.searchsorted(labels[order], np.arange(1, count))
+        components = [component.tolist() for component in np.split(order, boundaries)]
+
+        return sorted(components, key=len, reverse=True)
@@ -0,0 +1,578 @@
+import os
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import pairwise
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple, Union
+
+import networkx as nx
+
+from pynlp5.k_paths import k_shortest_paths
+
+# numpy and scipy take a while to import, we only import them when a time slice is first queried.
+if TYPE_CHECKING:
+    import numpy as np
+
+    from pynlp5.sparse import SparseAdjacency
+
+# A chapter heading of the raw books, a line of capital letters (the OCR page headers have page numbers and punctuation).
+CHAPTER_HEADING = re.compile(r"^[A-Z][A-Z' ]*$")
+# The start of the back matter (the house lists, the acknowledgments, the teaser of the next book), it has no chapters.
+# A Storm of Swords writes "Appendix", A Dance with Dragons has no appendix heading: its back matter follows the epilogue.
+APPENDIX_HEADING = re.compile(r"^appendix$", re.IGNORECASE)
+EPILOGUE_HEADING = "EPILOGUE"
+
+# A point in time, the book and the chapter (both start at 1, chapter 0 is the text before the first heading).
+# A chapter of None means the whole book.
+Period = Tuple[int, Optional[int]]
+# The first and the last period of a time range, both included, None means from the start or until the end.
+TimeRange = Tuple[Optional[Period], Optional[Period]]
+
+# A chapter of a text file, the chapter number and the start and end byte offsets.
+ChapterRange = Tuple[int, int, int]
+
+# The number of time slices (adjacency matrices of a time range) a graph keeps for the queries.
+TIME_SLICE_CACHE_SIZE = 16
+
+
+def raw_text_path(text_path: str) -> Optional[str]:
+    """Return the path of the raw book of a preprocessed text file ("001ssb_line.txt" -> "001ssb.txt"), None if there is none."""
+    if not text_path.endswith("_line.txt"):
+        return None
+    raw_path = text_path[: -len("_line.txt")] + ".txt"
+    return raw_path if os.path.isfile(raw_path) else None
+
+
+def raw_chapters(raw_path: str) -> List[Tuple[bool, str]]:
+    """Split a raw book into the parts process_data.py writes one after the other, and find the chapters.
+    The preprocessing starts a new part at every line in capital letters, the parts that follow a chapter heading start a chapter.
+    The parts after the appendix, or after the epilogue, are the back matter and never start a chapter.
+
+    Args:
+        raw_path (str): Path to the raw book.
+
+    Returns:
+        List[Tuple[bool, str]]: Whether the part starts a chapter, and the text of the part without whitespace.
+    """
+    parts = []
+    starts_chapter = False
+    back_matter = False
+    heading = None
+    text = []
+    with open(raw_path, "r", errors="ignore") as f:
+        for line in f:
+            back_matter = back_matter or bool(APPENDIX_HEADING.match(line.strip()))
+            if line.strip("\n").isupper():
+                parts.append((starts_chapter, re.sub(r"\s+", "", "".join(text))))
+                text = []
+                # The epilogue of the table of contents has no text, only the real one ends the main text.
+                back_matter = back_matter or heading == EPILOGUE_HEADING and parts[-1][1] != ""
+                heading = line.strip()
+                # A heading followed by a page header still starts a chapter at the next text.
+                starts_chapter = not back_matter and (
+                    starts_chapter and parts[-1][1] == "" or bool(CHAPTER_HEADING.match(heading))
+                )
+            else:
+                text.append(line)
+
+    return [part for part in parts if part[1]]
+
+
+def chapter_ranges(text_path: str, start: int = 0, end: int = None) -> List[ChapterRange]:
+    """Find the chapters of a preprocessed text file.
+    The sentences of the text file don't keep the chapter headings, so we align them with the raw book:
+    the sentences are the parts of the raw book one after the other, we compare them without whitespace.
+    A text file without a raw book (or that doesn't align with it) is a single chapter 0.
+
+    Args:
+        text_path (str): Path to the text file, one sentence per line.
+        start (int, optional): Only the chapters of the text from this byte offset. Defaults to 0.
+        end (int, optional): Only the chapters of the text before this byte offset. Defaults to the size of the file.
+
+    Returns:
+        List[ChapterRange]: The chapter numbers and byte ranges, in the order of the text.
+    """
+    size = os.path.getsize(text_path)
+    end = size if end is None else end
+    starts = [(0, 0)]
+
+    raw_path = raw_text_path(text_path)
+    if raw_path is not None:
+        parts = raw_chapters(raw_path)
+        chapter, part, position, offset = 0, 0, 0, 0
+        with open(text_path, "rb") as f:
+            for line in f:
+                sentence = re.sub(r"\s+", "", line.decode("utf-8", errors="ignore"))
+                while part < len(parts) and position >= len(parts[part][1]):
+                    part, position = part + 1, 0
+                if part == len(parts) or not parts[part][1].startswith(sentence, position):
+                    # The text doesn't come from this book, we don't guess the chapters.
+                    starts = [(0, 0)] if part < len(parts) else starts
+                    break
+                if sentence and position == 0 and parts[part][0]:
+                    chapter += 1
+                    starts.append((chapter, offset))
+                position += len(sentence)
+                offset += len(line)
+
+    # The front matter is only a chapter if it has text.
+    if len(starts) > 1 and starts[1][1] == 0:
+        starts = starts[1:]
+
+    boundaries = [offset for _, offset in starts[1:]] + [size]
+    return [
+        (chapter, max(chapter_start, start), min(chapter_end, end))
+        for (chapter, chapter_start), chapter_end in zip(starts, boundaries)
+        if chapter_start < end and chapter_end > start
+    ]
+
+
+def parse_period(period: str) -> Optional[Period]:
+    """Parse a period of a request, "3" is book 3 and "3:12" is chapter 12 of book 3, an empty string is None.
+
+    Raises:
+        ValueError: If the period is not a book or a book and a chapter.
+    """
+    if period is None or period.strip() == "":
+        return None
+
+    try:
+        numbers = [int(number) for number in period.split(":")]
+    except ValueError:
+        raise ValueError(f"Invalid period {period}, expected a book or book:chapter.")
+    if len(numbers) > 2 or min(numbers) < 0:
+        raise ValueError(f"Invalid period {period}, expected a book or book:chapter.")
+
+    return (numbers[0], numbers[1] if len(numbers) == 2 else None)
+
+
+def parse_time_range(start: str = "", end: str = "") -> Optional[TimeRange]:
+    """Parse the time range of a request, None if it covers the whole text.
+
+    Args:
+        start (str, optional): The first period, see parse_period. Defaults to "" (the start of the text).
+        end (str, optional): The last period. Defaults to "" (the end of the text).
+
+    Returns:
+        Optional[TimeRange]: The time range.
+    """
+    time_range = (parse_period(start), parse_period(end))
+    return None if time_range == (None, None) else time_range
+
+
+class TemporalWeights:
+    def __init__(self) -> None:
+        """The weights of the edges of a knowledge graph in every chapter of every book.
+        For every edge we keep the periods where the edge has a weight and the prefix sums of the weights up to those periods,
+        so the weight of an edge in any time range is the difference of two prefix sums, found with binary search.
+        The weights are added in the order of the text (the periods never go back), they are compacted into arrays when they are queried.
+        """
+        # The periods, the book and the chapter of every period in the order of the text.
+        self.periods = []
+        # Our own node table, the edges are pairs of node ids (the smallest id first).
+        self.nodes = []
+        self.node_ids = {}
+        self.edge_ids = {}
+        self.sources = array("I")
+        self.targets = array("I")
+        # The weights added since the arrays were compacted: the edge, the period and the weight.
+        self.pending_edges = array("I")
+        self.pending_periods = array("I")
+        self.pending_weights = array("d")
+        self.integer_weights = True
+
+        # The compacted arrays: the entries of edge e are entry_periods[indptr[e]:indptr[e + 1]] with the prefix sums in cumulative.
+        self.indptr = None
+        self.entry_periods = None
+        self.cumulative = None
+
+    @property
+    def books(self) -> int:
+        """The number of books."""
+        return self.periods[-1][0] if self.periods else 0
+
+    def add_book(self, chapters: Iterable[int]) -> int:
+        """Add the periods of the next book.
+
+        Args:
+            chapters (Iterable[int]): The chapter numbers of the book.
+
+        Returns:
+            int: The period of the first chapter, the other chapters follow it.
+        """
+        first_period = len(self.periods)
+        book = self.books + 1
+        self.periods.extend((book, chapter) for chapter in chapters)
+
+        return first_period
+
+    def node_id(self, node: str) -> int:
+        """Return the id of a node in the node table, adding it if it is new."""
+        if node not in self.node_ids:
+            self.node_ids[node] = len(self.nodes)
+            self.nodes.append(node)
+        return self.node_ids[node]
+
+    def add(self, period: int, edge_weights: Dict[Tuple[str, str], Union[int, float]]) -> None:
+        """Add the weights of the edges in a period.
+
+        Args:
+            period (int): The period, not before the periods added before.
+            edge_weights (Dict[Tuple[str, str], Union[int, float]]): The weights of the edges.
+        """
+        for (node1, node2), weight in edge_weights.items():
+            node_ids = sorted((self.node_id(node1), self.node_id(node2)))
+            edge = self.edge_ids.setdefault(tuple(node_ids), len(self.edge_ids))
+            if edge == len(self.sources):
+                self.sources.append(node_ids[0])
+                self.targets.append(node_ids[1])
+            self.pending_edges.append(edge)
+            self.pending_periods.append(period)
+            self.pending_weights.append(weight)
+            self.integer_weights = self.integer_weights and isinstance(weight, int)
+
+    def extend(self, other: "TemporalWeights") -> None:
+        """Add the books of another temporal weights after the books of this one."""
+        first_period = len(self.periods)
+        book_offset = self.books
+        self.periods.extend((book + book_offset, chapter) for book, chapter in other.periods)
+
+        other.compact()
+        entry_edges = [
+            edge for edge, count in enumerate(other.indptr[1:] - other.indptr[:-1]) for _ in range(count)
+        ]
+        for edge, period, weight in zip(
+            entry_edges, other.entry_periods.tolist(), other.entry_weights().tolist()
+        ):
+            source, target = other.sources[edge], other.targets[edge]
+            weight = round(weight) if other.integer_weights else weight
+            self.add(first_period + period, {(other.nodes[source], other.nodes[target]): weight})
+
+    def copy(self) -> "TemporalWeights":
+        """Return a copy that can be changed without changing this one."""
+        self.compact()
+        temporal = TemporalWeights()
+        temporal.periods = list(self.periods)
+        temporal.nodes = list(self.nodes)
+        temporal.node_ids = dict(self.node_ids)
+        temporal.edge_ids = dict(self.edge_ids)
+        temporal.sources = array("I", self.sources)
+        temporal.targets = array("I", self.targets)
+        temporal.integer_weights = self.integer_weights
+        # The compacted arrays are never changed in place, compact() replaces them.
+        temporal.indptr = self.indptr
+        temporal.entry_periods = self.entry_periods
+        temporal.cumulative = self.cumulative
+
+        return temporal
+
+    def entry_weights(self) -> "np.ndarray":
+        """Return the weights of the compacted entries, the differences of the prefix sums of every edge."""
+        import numpy as np
+
+        weights = np.diff(self.cumulative, prepend=0.0)
+        starts = self.indptr[:-1][np.diff(self.indptr) > 0]
+        weights[starts] = self.cumulative[starts]
+        return weights
+
+    def compact(self) -> None:
+        """Merge the pending weights into the prefix sums arrays."""
+        import numpy as np
+
+        edge_count = len(self.sources)
+        if self.indptr is not None and len(self.pending_edges) == 0:
+            return
+
+        edges = np.frombuffer(self.pending_edges, dtype=np.uint32).astype(np.int64)
+        periods = np.frombuffer(self.pending_periods, dtype=np.uint32).astype(np.int64)
+        weights = np.frombuffer(self.pending_weights, dtype=np.float64)
+        if self.indptr is not None:
+            edges = np.concatenate([np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr)), edges])
+            periods = np.concatenate([self.entry_periods, periods])
+            weights = np.concatenate([self.entry_weights(), weights])
+
+        # One entry per edge and period, sorted by edge then by period.
+        period_count = len(self.periods) + 1
+        keys, inverse = np.unique(edges * period_count + periods, return_inverse=True)
+        weights = np.bincount(inverse, weights=weights, minlength=len(keys))
+        edges, periods = np.divmod(keys, period_count)
+
+        indptr = np.zeros(edge_count + 1, dtype=np.int64)
+        counts = np.bincount(edges, minlength=edge_count)
+        indptr[1:] = np.cumsum(counts)
+        # The prefix sums start again at every edge.
+        cumulative = np.cumsum(weights)
+        before = np.concatenate([[0.0], cumulative])[indptr[:-1]]
+        cumulative -= np.repeat(before, counts)
+        if self.integer_weights:
+            cumulative = np.round(cumulative)
+
+        self.indptr = indptr
+        self.entry_periods = periods
+        self.cumulative = cumulative
+        self.pending_edges = array("I")
+        self.pending_periods = array("I")
+        self.pending_weights = array("d")
+
+    def to_dict(self) -> dict:
+        """Return the temporal weights as a json serializable dict."""
+        self.compact()
+        return {
+            "periods": [list(period) for period in self.periods],
+            "nodes": self.nodes,
+            "sources": self.sources.tolist(),
+            "targets": self.targets.tolist(),
+            "indptr": self.indptr.tolist(),
+            "entry_periods": self.entry_periods.tolist(),
+            "cumulative": self.cumulative.tolist(),
+            "integer_weights": self.integer_weights,
+        }
+
+    @classmethod
+    def from_arrays(
+        cls,
+        periods: Iterable[Tuple[int, int]],
+        nodes: List[str],
+        sources: Iterable[int],
+        targets: Iterable[int],
+        indptr: Iterable[int],
+        entry_periods: Iterable[int],
+        cumulative: Iterable[float],
+        integer_weights: bool = True,
+    ) -> "TemporalWeights":
+        """Load compacted temporal weights, from a serialized graph or a snapshot.
+
+        Args:
+            periods (Iterable[Tuple[int, int]]): The book and the chapter of every period.
+            nodes (List[str]): The node table.
+            sources (Iterable[int]): The first node of every edge.
+            targets (Iterable[int]): The second node of every edge.
+            indptr (Iterable[int]): The start of the entries of every edge, and the number of entries at the end.
+            entry_periods (Iterable[int]): The period of every entry.
+            cumulative (Iterable[float]): The prefix sum of the weights of the edge up to the period of every entry.
+            integer_weights (bool, optional): Whether all the weights are integers. Defaults to True.
+
+        Returns:
+            TemporalWeights: The temporal weights.
+        """
+        import numpy as np
+
+        temporal = cls()
+        temporal.periods = [tuple(period) for period in periods]
+        temporal.nodes = list(nodes)
+        temporal.node_ids = {node: i for i, node in enumerate(temporal.nodes)}
+        temporal.sources = array("I", sources)
+        temporal.targets = array("I", targets)
+        temporal.edge_ids = {
+            edge: i for i, edge in enumerate(zip(temporal.sources, temporal.targets))
+        }
+        temporal.indptr = np.array(indptr, dtype=np.int64)
+        temporal.entry_periods = np.array(entry_periods, dtype=np.int64)
+        temporal.cumulative = np.array(cumulative, dtype=np.float64)
+        temporal.integer_weights = integer_weights
+
+        return temporal
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TemporalWeights":
+        """Load temporal weights saved with to_dict."""
+        return cls.from_arrays(
+            data["periods"],
+            data["nodes"],
+            data["sources"],
+            data["targets"],
+            data["indptr"],
+            data["entry_periods"],
+            data["cumulative"],
+            data["integer_weights"],
+        )
+
+    def period_range(self, time_range: TimeRange) -> Tuple[int, int]:
+        """Return the first and the last period of a time range.
+
+        Args:
+            time_range (TimeRange): The first and the last book (or book and chapter), both included.
+
+        Raises:
+            ValueError: If there are no periods, or no period in the time range.
+
+        Returns:
+            Tuple[int, int]: The first and the last period.
+        """
+        if not self.periods:
+            raise ValueError("The knowledge graph has no books and chapters, build it again to query a time range.")
+
+        start, end = time_range
+        first = 0
+        if start is not None:
+            first = bisect_left(self.periods, (start[0], start[1] or 0))
+        last = len(self.periods) - 1
+        if end is not None:
+            # A book without chapter goes until the last chapter of the book.
+            last = bisect_right(self.periods, (end[0], float("inf") if end[1] is None else end[1])) - 1
+
+        if first > last:
+            raise ValueError("There is no chapter in the time range.")
+
+        return first, last
+
+    def prefix_sums(self, period: int) -> "np.ndarray":
+        """Return the prefix sums of the weights of every edge up to a period (included)."""
+        import numpy as np
+
+        self.compact()
+        edge_count = len(self.indptr) - 1
+        if period < 0 or edge_count == 0:
+            return np.zeros(edge_count)
+
+        # The entries are sorted by edge then by period, we look for every edge at once.
+        period_count = len(self.periods) + 1
+        entry_edges = np.repeat(np.arange(edge_count), np.diff(self.indptr))
+        positions = np.searchsorted(
+            entry_edges * period_count + self.entry_periods,
+            np.arange(edge_count) * period_count + period,
+            side="right",
+        ) - 1
+        found = positions >= self.indptr[:-1]
+
+        return np.where(found, self.cumulative[np.maximum(positions, 0)], 0.0)
+
+    def weights(self, first: int, last: int) -> "np.ndarray":
+        """Return the weight of every edge from the first to the last period (both included)."""
+        return self.prefix_sums(last) - self.prefix_sums(first - 1)
+
+    def adjacency(self, first: int, last: int) -> "SparseAdjacency":
+        """Return the sparse adjacency matrix of the graph from the first to the last period (both included).
+        The nodes are the ones of the node table, the edges without weight in the time range are left out.
+
+        Args:
+            first (int): The first period.
+            last (int): The last period.
+
+        Returns:
+            SparseAdjacency: The adjacency matrix of the time slice.
+        """
+        import numpy as np
+
+        from pynlp5.sparse import SparseAdjacency
+
+        weights = self.weights(first, last)
+        if self.integer_weights:
+            weights = np.round(weights).astype(np.int64)
+        present = weights > 0
+
+        sources = np.frombuffer(self.sources, dtype=np.uint32)[present]
+        targets = np.frombuffer(self.targets, dtype=np.uint32)[present]
+        return SparseAdjacency.from_edges(self.nodes, sources, targets, weights[present])
+
+
+def slice_neighborhoods(
+    adjacency: "SparseAdjacency", character: str, depths: Iterable[int]
+) -> Dict[int, nx.Graph]:
+    """Return the neighbors of a character at several depths in a time slice, with a single BFS.
+
+    Args:
+        adjacency (SparseAdjacency): The adjacency matrix of the time slice.
+        character (str): Character to get neighbors for.
+        depths (Iterable[int]): The depths of the neighbors.
+
+    Returns:
+        Dict[int, nx.Graph]: The neighbors of the character at every depth, with the weights of the time slice.
+    """
+    depths = set(depths)
+    if not depths:
+        return {}
+
+    levels = adjacency.bfs_levels(adjacency.node_id(character), max(depths))
+    return {
+        depth: adjacency.edge_subgraph(
+            [edge for level in levels[: max(depth, 0)] for edge in level]
+        )
+        for depth in depths
+    }
+
+
+def slice_most_connections(adjacency: "SparseAdjacency") -> Tuple[str, int, nx.Graph]:
+    """Get the character that is most connected to other characters in a time slice.
+
+    Returns:
+        Tuple[str, int, nx.Graph]: The character, the number of connections and the subgraph of the character.
+    """
+    if not adjacency.nodes:
+        raise nx.NetworkXError("The knowledge graph is empty.")
+
+    node, connections = adjacency.top_hubs(1)[0]
+    edges = [(node, neighbor) for neighbor in adjacency.neighbors(node).tolist() if neighbor != node]
+
+    return adjacency.nodes[node], connections, adjacency.edge_subgraph(edges)
+
+
+def slice_top_connected(adjacency: "SparseAdjacency", k: int = 10, offset: int = 0) -> List[Tuple[str, int]]:
+    """Get the k most connected characters after the first offset ones in a time slice.
+
+    Returns:
+        List[Tuple[str, int]]: The characters and their number of connections, from the most connected.
+    """
+    return [(adjacency.nodes[node], connections) for node, connections in adjacency.top_hubs(offset + k)[offset:]]
+
+
+def slice_shortest_path(
+    adjacency: "SparseAdjacency", character1: str, character2: str
+) -> Tuple[nx.Graph, int]:
+    """Get the shortest path (in number of edges) between two characters in a time slice.
+
+    Returns:
+        Tuple[nx.Graph, int]: The path and the sum of the weights of its edges in the time slice.
+    """
+    if character1 not in adjacency.node_ids or character2 not in adjacency.node_ids:
+        raise nx.NodeNotFound(f"Either {character1} or {character2} is not in the graph.")
+
+    path = adjacency.shortest_path(adjacency.node_ids[character1], adjacency.node_ids[character2])
+    if path is None:
+        raise nx.NetworkXNoPath(f"No path between {character1} and {character2}.")
+
+    subgraph = adjacency.edge_subgraph(list(pairwise(path)))
+    return subgraph, subgraph.size(weight="weight")
+
+
+def slice_k_shortest_paths(
+    adjacency: "SparseAdjacency",
+    character1: str,
+    character2: str,
+    k: int,
+    max_length: int,
+    avoid: Iterable[str] = (),
+) -> Tuple[nx.Graph, List[Tuple[List[str], int]], bool]:
+    """Get the k shortest paths (in number of edges) between two characters in a time slice, see k_shortest_paths.
+
+    Returns:
+        Tuple[nx.Graph, List[Tuple[List[str], int]], bool]: The subgraph of the edges of the paths, the characters of every path
+            with the sum of the weights of its edges in the time slice, and whether the search is complete.
+    """
+    if character1 not in adjacency.node_ids or character2 not in adjacency.node_ids:
+        raise nx.NodeNotFound(f"Either {character1} or {character2} is not in the graph.")
+
+    # The searches look at the neighbors one by one, python lists are faster to walk than the rows of the matrix.
+    indptr, indices = adjacency.matrix.indptr.tolist(), adjacency.matrix.indices.tolist()
+    neighbors = [indices[start:end] for start, end in pairwise(indptr)]
+    paths, complete = k_shortest_paths(
+        neighbors,
+        adjacency.node_ids[character1],
+        adjacency.node_ids[character2],
+        k,
+        max_length,
+        [adjacency.node_ids[character] for character in avoid if character in adjacency.node_ids],
+        adjacency.weight,
+    )
+    if not paths and complete:
+        raise nx.NetworkXNoPath(f"No path of at most {max_length} edges between {character1} and {character2}.")
+
+    named_paths = [
+        (
+            [adjacency.nodes[node] for node in path],
+            sum(adjacency.weight(node1, node2) for node1, node2 in pairwise(path)),
+        )
+        for path in paths
+    ]
+    subgraph = adjacency.edge_subgraph([edge for path in paths for edge in pairwise(path)])
+    return subgraph, named_paths, complete
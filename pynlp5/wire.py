@@ -0,0 +1,107 @@
+import json
+from typing import Any, Dict, Tuple
+
+import networkx as nx
+
+# msgpack is optional, without it the responses can only be json.
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# The formats of the subgraphs in the responses.
+CYTOSCAPE = "cytoscape"
+COMPACT = "compact"
+GRAPH_FORMATS = [CYTOSCAPE, COMPACT]
+
+# The serializations of the responses.
+JSON = "json"
+MSGPACK = "msgpack"
+
+# The mimetypes that select the compact format in the Accept header of a request.
+COMPACT_MIMETYPE = "application/vnd.pynlp5.compact+json"
+MSGPACK_MIMETYPE = "application/msgpack"
+
+
+def compact_graph(graph: nx.Graph) -> Dict[str, list]:
+    """Encode a graph as arrays: the names of the nodes, and the edges as indexes into the nodes with their weights.
+    Every name appears once, unlike in the cytoscape format where it is repeated in the nodes and in every edge.
+
+    Args:
+        graph (nx.Graph): The graph.
+
+    Returns:
+        Dict[str, list]: The nodes, and the sources, the targets and the weights of the edges.
+    """
+    nodes = list(graph.nodes())
+    node_ids = {node: i for i, node in enumerate(nodes)}
+
+    sources, targets, weights = [], [], []
+    for node1, node2, weight in graph.edges(data="weight", default=1):
+        sources.append(node_ids[node1])
+        targets.append(node_ids[node2])
+        weights.append(weight)
+
+    return {"nodes": nodes, "sources": sources, "targets": targets, "weights": weights}
+
+
+def graph_from_compact(data: Dict[str, list]) -> nx.Graph:
+    """Decode a graph encoded by compact_graph."""
+    nodes = data["nodes"]
+    graph = nx.Graph()
+    graph.add_nodes_from(nodes)
+    graph.add_weighted_edges_from(
+        (nodes[source], nodes[target], weight)
+        for source, target, weight in zip(data["sources"], data["targets"], data["weights"])
+    )
+
+    return graph
+
+
+def encode_graph(
+    graph: nx.Graph, graph_format: str = CYTOSCAPE, positions: Dict[str, Tuple[float, float]] = None
+) -> Dict[str, Any]:
+    """Encode a graph for a response, in the cytoscape or in the compact format.
+
+    Args:
+        graph (nx.Graph): The graph.
+        graph_format (str, optional): "cytoscape" or "compact". Defaults to "cytoscape".
+        positions (Dict[str, Tuple[float, float]], optional): The positions of the nodes. In the compact format they are
+            the "x" and "y" arrays, in the order of the nodes, in the cytoscape format the "position" of every node. Defaults to None.
+
+    Returns:
+        Dict[str, Any]: The encoded graph.
+    """
+    if graph_format == COMPACT:
+        data = compact_graph(graph)
+        if positions is not None:
+            data["x"] = [positions[node][0] for node in data["nodes"]]
+            data["y"] = [positions[node][1] for node in data["nodes"]]
+        return data
+
+    data = nx.cytoscape_data(graph)
+    if positions is not None:
+        for node, element in zip(graph.nodes(), data["elements"]["nodes"]):
+            element["position"] = {"x": positions[node][0], "y": positions[node][1]}
+    return data
+
+
+def serialize_response(data: Any, serialization: str = JSON) -> Tuple[bytes, str]:
+    """Serialize the data of a response.
+
+    Args:
+        data (Any): The data.
+        serialization (str, optional): "json" or "msgpack". Defaults to "json".
+
+    Raises:
+        ValueError: If msgpack is asked for but it is not installed.
+
+    Returns:
+        Tuple[bytes, str]: The body and the mimetype of the response.
+    """
+    if serialization == MSGPACK:
+        if msgpack is None:
+            raise ValueError("msgpack is not installed.")
+        return msgpack.packb(data), MSGPACK_MIMETYPE
+
+    return json.dumps(data, separators=(",", ":")).encode("utf-8"), "application/json"
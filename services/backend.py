@@ -1,15 +1,198 @@
-import networkx as nx
-from flask import Flask, jsonify, request
-from pynlp5.constants import ALIAS_PATH, CHARACTER_PATH, TEXT_PATH
+import gzip
+import os
+import time
+from functools import wraps
+
+from flask import Flask, Response, g, jsonify, make_response, request
+from pynlp5.analytics import BETWEENNESS_SAMPLES, COMMUNITY_ALGORITHMS, LOUVAIN
+from pynlp5.batch import answer_batch, answer_query
+from pynlp5.cache import LRUCache
+from pynlp5.constants import (
+    ALIAS_PATH,
+    CHARACTER_PATH,
+    CHECKPOINT_DIR,
+    DATA_DIR,
+    INDEX_DIR,
+    PROFILE_DIR,
+    RESULT_CACHE_SIZE,
+    TEXT_PATH,
+    TEXT_PATHS,
+)
+from pynlp5.cooccurrence import PAIRWISE, CooccurrencePolicy
+from pynlp5.k_paths import MAX_PATH_LENGTH
 from pynlp5.knowledge_graph import KnowledgeGraph
-
-kg = None
+from pynlp5.metrics import CPROFILE, METRICS, PROFILERS, profiled
+from pynlp5.serving import GraphStore
+from pynlp5.snapshot import GraphSnapshot, is_snapshot
+from pynlp5.wire import (
+    COMPACT,
+    COMPACT_MIMETYPE,
+    CYTOSCAPE,
+    GRAPH_FORMATS,
+    JSON,
+    MSGPACK,
+    MSGPACK_MIMETYPE,
+    serialize_response,
+)
+
+# The cached responses of the query endpoints, the keys contain the graph version.
+result_cache = LRUCache(RESULT_CACHE_SIZE)
+
+# The served graph, it is only replaced as a whole, and the cached responses of the previous graph are dropped.
+# With PYNLP5_PUBLISH_DIR set, the graph is shared with the other worker processes through snapshots in that directory.
+store = GraphStore(os.environ.get("PYNLP5_PUBLISH_DIR"), on_change=result_cache.clear)
+
+
+def time_slice_cache_stats():
+    # The time slices are cached by the served graph.
+    kg = store.get()[0]
+    return kg.time_slices.stats() if kg is not None else {}
+
+
+# The statistics of the caches are read with the metrics.
+METRICS.register("result_cache", result_cache.stats)
+METRICS.register("time_slice_cache", time_slice_cache_stats)
 
 HOST = "localhost"
 PORT = 5005
+# Responses smaller than this are not worth compressing.
+GZIP_MIN_SIZE = 1024
 app = Flask(__name__)
 
 
+@app.before_request
+def load_graph():
+    g.request_start = time.perf_counter()
+
+    # Every request works with the graph that is served when it starts, even if a new graph is swapped in meanwhile.
+    g.kg, g.graph_version = store.get()
+
+    # The format of the subgraphs and the serialization of the response, chosen with the format and encoding arguments
+    # or with the Accept header. The default is the cytoscape json the frontend always used.
+    # Only the exact mimetypes count, a browser accepting */* gets the default.
+    accepted = {mimetype for mimetype, quality in request.accept_mimetypes if quality > 0}
+    g.graph_format = request.args.get("format")
+    if g.graph_format not in GRAPH_FORMATS:
+        compact = COMPACT_MIMETYPE in accepted or MSGPACK_MIMETYPE in accepted
+        g.graph_format = COMPACT if compact else CYTOSCAPE
+    g.serialization = request.args.get("encoding")
+    if g.serialization not in [JSON, MSGPACK]:
+        g.serialization = MSGPACK if MSGPACK_MIMETYPE in accepted else JSON
+    # With layout=true the subgraphs come with the positions of their nodes, the frontend draws them without physics.
+    g.layout = request.args.get("layout") == "true"
+
+
+@app.after_request
+def record_request(response: Response) -> Response:
+    # It is registered before compress, so it runs after it and the latency includes the compression.
+    if request.endpoint is not None and "request_start" in g:
+        METRICS.observe(f"http.{request.endpoint}", time.perf_counter() - g.request_start)
+        METRICS.increment(f"http.responses.{response.status_code}")
+
+    return response
+
+
+@app.after_request
+def compress(response: Response) -> Response:
+    # Large responses are compressed if the client accepts gzip.
+    if (
+        "gzip" in request.accept_encodings
+        and response.status_code == 200
+        and not response.direct_passthrough
+        and "Content-Encoding" not in response.headers
+        and response.content_length is not None
+        and response.content_length >= GZIP_MIN_SIZE
+    ):
+        response.set_data(gzip.compress(response.get_data(), compresslevel=5))
+        response.headers["Content-Encoding"] = "gzip"
+        response.vary.add("Accept-Encoding")
+
+    return response
+
+
+def encoded_response(data):
+    """Return the data serialized as the request asked for."""
+    try:
+        body, mimetype = serialize_response(data, g.serialization)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 406
+
+    if mimetype == "application/json" and g.graph_format == COMPACT:
+        mimetype = COMPACT_MIMETYPE
+
+    return Response(body, mimetype=mimetype)
+
+
+def not_loaded_response():
+    """Return the error of a request that needs a graph before one is served."""
+    return jsonify({"error": "Knowledge graph not loaded."}), 503
+
+
+def job_response(job_id: str):
+    """Return the status of a background job, waiting for it to end if the request asks to."""
+    if request.args.get("wait") == "true":
+        return jsonify(store.wait(job_id))
+
+    return jsonify(store.job(job_id)), 202
+
+
+def analytics_options() -> dict:
+    """Return the options of the analytics given in the request arguments.
+
+    Raises:
+        ValueError: If the community algorithm is unknown or the number of samples is not an integer.
+    """
+    algorithm = request.args.get("algorithm", LOUVAIN)
+    if algorithm not in COMMUNITY_ALGORITHMS:
+        raise ValueError(f"Unknown community algorithm {algorithm}, expected one of {', '.join(COMMUNITY_ALGORITHMS)}.")
+
+    return {
+        "algorithm": algorithm,
+        "samples": int(request.args.get("samples", BETWEENNESS_SAMPLES)),
+        "seed": int(request.args.get("seed", 0)),
+    }
+
+
+def cached(defaults: dict = None):
+    """Cache the responses of an endpoint in the result cache.
+    The key is the endpoint, the normalised query arguments and the graph version,
+    so the same question about the same graph is only answered once.
+
+    Args:
+        defaults (dict, optional): The default values of the arguments, so leaving out an argument hits the same entry. Defaults to None.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            arguments = dict(defaults or {})
+            arguments.update((key, value.strip()) for key, value in request.args.items())
+            key = (
+                request.path,
+                tuple(sorted(arguments.items())),
+                g.graph_format,
+                g.serialization,
+                g.graph_version,
+            )
+
+            cached_response = result_cache.get(key)
+            if cached_response is None:
+                response = make_response(view(*args, **kwargs))
+                cached_response = (
+                    response.get_data(),
+                    response.status_code,
+                    response.mimetype,
+                )
+                result_cache.put(key, cached_response)
+
+            body, status, mimetype = cached_response
+            return Response(body, status=status, mimetype=mimetype)
+
+        return wrapper
+
+    return decorator
+
+
 @app.route("/")
 def index():
     return "Hello World"
@@ -17,98 +200,340 @@ def index():
 
 @app.route("/build")
 def build():
-    global kg
     serialized_path = request.args.get("serialized_path")
-
-    if serialized_path:
-        kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH, serialized_path)
+    # Build from all the books instead of only the first one.
+    all_books = request.args.get("all_books") == "true"
+    # Reuse the matches of previous builds from the mention index.
+    index_dir = INDEX_DIR if request.args.get("use_index") == "true" else None
+    # Save the progress of the build, so an interrupted build resumes where it stopped.
+    checkpoint_dir = CHECKPOINT_DIR if request.args.get("checkpoint") == "true" else None
+    # Precompute the shortest paths between every pair of characters.
+    path_index = request.args.get("path_index") == "true"
+    # Compute the communities and the centralities of the new graph, with the algorithm and the number of betweenness samples given.
+    analytics = request.args.get("analytics") == "true"
+    # Compute the layout of the whole graph, the first query with layout=true doesn't wait for it.
+    layout = request.args.get("layout") == "true"
+    # Build the similarity index with its MinHash LSH index, the first /similar query doesn't wait for it.
+    similarity = request.args.get("similarity") == "true"
+    # Which characters are linked: "pairwise", "all_pairs", or "window" with the number of sentences and the decay of the weights.
+    try:
+        # The number of processes to build with, 0 means all the CPUs.
+        processes = int(request.args.get("processes") or 1)
+        if processes < 0:
+            raise ValueError("The number of processes can't be negative.")
+        processes = processes or None
+        cooccurrence = CooccurrencePolicy(
+            request.args.get("cooccurrence", PAIRWISE),
+            int(request.args.get("window", 1)),
+            float(request.args.get("decay", 1.0)),
+        )
+        options = analytics_options()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    # Profile the build with "cprofile" or "sampling", the profile is written to data/profiles.
+    profiler = request.args.get("profile")
+    profile_path = None
+    if profiler:
+        if profiler not in PROFILERS:
+            return jsonify({"error": f"Unknown profiler {profiler}, expected one of {', '.join(PROFILERS)}."}), 400
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        extension = "prof" if profiler == CPROFILE else "folded"
+        profile_path = os.path.join(PROFILE_DIR, f"build-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.{extension}")
+
+    text_path = TEXT_PATHS if all_books else TEXT_PATH
+
+    # The graph is built in the background and swapped in when it is ready,
+    # the queries keep being answered from the previous graph meanwhile.
+    def build_graph(current_kg):
+        with profiled(profile_path, profiler or CPROFILE):
+            # A binary snapshot is memory-mapped and queried directly, without building a networkx graph.
+            if serialized_path and is_snapshot(serialized_path):
+                kg = GraphSnapshot(serialized_path)
+            elif serialized_path:
+                kg = KnowledgeGraph(text_path, CHARACTER_PATH, ALIAS_PATH, serialized_path)
+            else:
+                kg = KnowledgeGraph(
+                    text_path,
+                    CHARACTER_PATH,
+                    ALIAS_PATH,
+                    processes=processes,
+                    index_dir=index_dir,
+                    checkpoint_dir=checkpoint_dir,
+                    cooccurrence=cooccurrence,
+                )
+
+            if path_index:
+                kg.build_path_index()
+            # A snapshot may have been saved with its analytics.
+            if analytics and kg.get_analytics() is None:
+                kg.compute_analytics(processes=processes, **options)
+            if layout:
+                kg.get_layout()
+            if similarity:
+                kg.get_similarity_index().build_lsh()
+
+        return kg
+
+    job_details = {"profile": profile_path} if profile_path else {}
+    return job_response(store.submit("build", build_graph, **job_details))
+
+
+@app.route("/build_status")
+def build_status():
+    job = store.job(request.args.get("job", ""))
+    if job is None:
+        return jsonify({"error": "No such job."}), 404
+
+    return jsonify(job)
+
+
+@app.route("/ingest", methods=["POST"])
+def ingest():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "The body must be a json object."}), 400
+
+    if g.kg is None:
+        return not_loaded_response()
+
+    # The new text can be sent as a list of lines, as a single text or as a path to a text file.
+    if "lines" in data:
+        lines = data["lines"]
+        if not isinstance(lines, list) or not all(isinstance(line, str) for line in lines):
+            return jsonify({"error": "The lines must be a list of strings."}), 400
+    elif "text" in data:
+        if not isinstance(data["text"], str):
+            return jsonify({"error": "The text must be a string."}), 400
+        lines = data["text"].splitlines()
+    elif "text_path" in data:
+        lines = None
+        if not isinstance(data["text_path"], str):
+            return jsonify({"error": "The text_path must be a string."}), 400
+        # Only the files of the data directory can be ingested, a relative path is relative to it.
+        data_dir = os.path.realpath(DATA_DIR)
+        text_path = os.path.realpath(os.path.join(data_dir, data["text_path"]))
+        if os.path.commonpath([data_dir, text_path]) != data_dir or not os.path.isfile(text_path):
+            return jsonify({"error": f"No text file {data['text_path']} in the data directory."}), 400
     else:
-        kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
-
-    return "Built"
+        return jsonify({"error": "No lines, text or text_path given."}), 400
+
+    # The served graph is never changed, we add the text to a copy and swap it in.
+    # A snapshot is read-only, so we load it into a new knowledge graph first.
+    def ingest_graph(current_kg):
+        if current_kg is None:
+            raise ValueError("Knowledge graph not loaded.")
+        if isinstance(current_kg, GraphSnapshot):
+            kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH, current_kg.filename)
+        else:
+            kg = current_kg.copy()
+
+        if lines is None:
+            kg.ingest_file(text_path)
+        else:
+            kg.ingest_lines(lines)
+
+        # The analytics of the previous graph are outdated, we compute the new ones (with the default options).
+        if current_kg.get_analytics() is not None:
+            kg.compute_analytics()
+        # The same for the layout, if the previous graph had one.
+        if current_kg.layout is not None:
+            kg.get_layout()
+        # And for the similarity index, the LSH index too if it was built.
+        if current_kg.similarity_index is not None:
+            similarity_index = kg.get_similarity_index()
+            if current_kg.similarity_index.band_keys is not None:
+                similarity_index.build_lsh()
+
+        return kg
+
+    return job_response(store.submit("ingest", ingest_graph))
+
+
+@app.route("/compute_analytics")
+def compute_analytics():
+    # The communities and the centralities of the served graph are computed in the background,
+    # the graph is then served again with them, the queries never compute them.
+    try:
+        options = analytics_options()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if g.kg is None:
+        return not_loaded_response()
+
+    def analytics_graph(current_kg):
+        if current_kg is None:
+            raise ValueError("Knowledge graph not loaded.")
+        # The served graph is never changed, a snapshot is opened again and a knowledge graph is copied.
+        if isinstance(current_kg, GraphSnapshot):
+            kg = GraphSnapshot(current_kg.filename)
+        else:
+            kg = current_kg.copy()
+        kg.compute_analytics(**options)
+
+        return kg
+
+    return job_response(store.submit("analytics", analytics_graph, **options))
 
 
 @app.route("/serialize")
 def serialize():
-    global kg
+    kg = g.kg
     serialized_path = request.args.get("serialized_path")
+    # The format of the file, "json" (default) or "snapshot".
+    serialization_format = request.args.get("format", "json")
 
-    if kg:
+    if isinstance(kg, GraphSnapshot):
+        return "Knowledge Graph is already a snapshot", 400
+    elif kg and serialization_format == "snapshot":
+        kg.serialize_snapshot(serialized_path)
+        return "Serialized"
+    elif kg:
         serialized_kg = kg.serialize_kg(serialized_path)
         return "Serialized"
     else:
-        return "No Knowledge Graph to serialize"
+        return "No Knowledge Graph to serialize", 503
+
+
+def query_response(query_type: str):
+    """Answer the query of an endpoint, the arguments are the query arguments of the request.
+    An answer with an error (an unknown character, an invalid argument, analytics not computed yet...) is a bad request.
+    """
+    if g.kg is None:
+        return not_loaded_response()
+
+    answer = answer_query(g.kg, {**request.args, "type": query_type}, g.graph_format, g.layout)
+    if isinstance(answer, dict) and "error" in answer:
+        return jsonify(answer), 400
+
+    return encoded_response(answer)
 
 
 @app.route("/get_characters")
+@cached()
 def get_characters():
-    global kg
-    characters = kg.get_characters()
-
-    return jsonify(characters)
+    return query_response("get_characters")
 
 
 @app.route("/neighbors")
+@cached(defaults={"distance": "1", "from": "", "to": "", "min_weight": "0", "limit": "0", "cursor": ""})
 def kg_neighbors():
-    global kg
-    character = request.args.get("character")
-    distance = request.args.get("distance")
-    if distance:
-        distance = int(distance)
-    else:
-        distance = 1
+    return query_response("neighbors")
 
-    if kg is None:
-        return jsonify({"error": "Knowledge graph not loaded."})
 
-    neighbors = kg.get_character_neighbors(character, distance)
+@app.route("/get_character_with_most_connections")
+@cached(defaults={"from": "", "to": ""})
+def get_character_with_most_connections():
+    return query_response("get_character_with_most_connections")
 
-    subgraph = nx.cytoscape_data(neighbors)
 
-    print("Returning subgraph...")
-    print(neighbors.nodes)
+@app.route("/top_connected_characters")
+@cached(defaults={"n": "10"})
+def top_connected_characters():
+    return query_response("top_connected_characters")
 
-    return jsonify(subgraph)
 
+@app.route("/top_k_connected")
+@cached(defaults={"k": "10", "cursor": "", "from": "", "to": ""})
+def top_k_connected():
+    return query_response("top_k_connected")
 
-@app.route("/get_character_with_most_connections")
-def get_character_with_most_connections():
-    global kg
-    character, connections, subgraph = kg.get_character_with_most_connections()
 
-    return jsonify(
-        {
-            "character": character,
-            "connections": connections,
-            "subgraph": nx.cytoscape_data(subgraph),
-        }
-    )
+@app.route("/connected_components")
+@cached()
+def connected_components():
+    return query_response("connected_components")
 
 
 @app.route("/get_isolated_characters")
+@cached()
 def get_isolated_characters():
-    global kg
-    characters, subgraph = kg.get_isolated_characters()
-
-    return jsonify({"characters": characters, "subgraph": nx.cytoscape_data(subgraph)})
+    return query_response("get_isolated_characters")
 
 
 @app.route("/shortest_path")
+@cached(defaults={"from": "", "to": ""})
 def shortest_path():
-    global kg
-    character1 = request.args.get("character1")
-    character2 = request.args.get("character2")
+    return query_response("shortest_path")
+
+
+@app.route("/k_shortest_paths")
+@cached(defaults={"k": "3", "max_length": str(MAX_PATH_LENGTH), "avoid": "", "from": "", "to": ""})
+def k_shortest_paths():
+    return query_response("k_shortest_paths")
+
+
+@app.route("/similar")
+@cached(defaults={"k": "10", "metric": "cosine", "method": "auto"})
+def similar():
+    return query_response("similar")
+
+
+@app.route("/communities")
+@cached(defaults={"character": ""})
+def communities():
+    return query_response("communities")
+
+
+@app.route("/pagerank")
+@cached(defaults={"k": "10", "cursor": ""})
+def pagerank():
+    return query_response("pagerank")
+
+
+@app.route("/betweenness")
+@cached(defaults={"k": "10", "cursor": ""})
+def betweenness():
+    return query_response("betweenness")
+
+
+@app.route("/centrality")
+@cached()
+def centrality():
+    return query_response("centrality")
+
+
+@app.route("/evidence")
+@cached(defaults={"limit": "20", "cursor": ""})
+def evidence():
+    return query_response("evidence")
+
+
+@app.route("/mentions")
+@cached(defaults={"from": "", "to": "", "limit": "20", "cursor": ""})
+def mentions():
+    return query_response("mentions")
+
+
+@app.route("/batch", methods=["POST"])
+def batch():
+    # The queries are a json list, every query has a "type" (the name of an endpoint) and the arguments of the endpoint.
+    # They are all answered from the same graph, the one served when the request started.
+    data = request.get_json(silent=True)
+    queries = data.get("queries") if isinstance(data, dict) else data
+    if not isinstance(queries, list):
+        return jsonify({"error": "The queries must be a list."}), 400
+    if g.kg is None:
+        return not_loaded_response()
+    try:
+        results = answer_batch(g.kg, queries, g.graph_format, g.layout)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return encoded_response({"version": g.graph_version, "results": results})
+
 
-    sp, sum_of_path = kg.shortest_path_between_characters(
-        character1, character2
-    )
+@app.route("/cache_stats")
+def cache_stats():
+    return jsonify(result_cache.stats())
 
-    subgraph = nx.cytoscape_data(sp)
 
-    print("Returning shortest path")
-    print(sp.nodes)
+@app.route("/metrics")
+def metrics():
+    # The metrics of this worker process, as json or in the Prometheus text format.
+    if request.args.get("format") == "prometheus":
+        return Response(METRICS.prometheus(), mimetype="text/plain")
 
-    return jsonify({"shortest_path": subgraph, "sum_of_path_weights": sum_of_path})
+    return jsonify(METRICS.snapshot())
 
 
 if "__main__" == __name__:
@@ -0,0 +1,83 @@
+from typing import Any, Dict, List
+
+import requests
+from pynlp5.wire import COMPACT_MIMETYPE, MSGPACK_MIMETYPE, msgpack
+from requests.adapters import HTTPAdapter
+
+BACKEND_URL = "http://localhost:5005"
+
+
+class KnowledgeGraphClient:
+    def __init__(
+        self,
+        base_url: str = BACKEND_URL,
+        pool_size: int = 10,
+        compact: bool = False,
+        layout: bool = False,
+    ) -> None:
+        """Client of the backend API.
+        The requests go through one session, so the connections to the backend are kept open and reused.
+        The responses are gzip compressed by the backend when they are large, requests decompresses them.
+
+        Args:
+            base_url (str, optional): The url of the backend. Defaults to BACKEND_URL.
+            pool_size (int, optional): The maximum number of open connections. Defaults to 10.
+            compact (bool, optional): Ask for the subgraphs in the compact format (node names, and edges as node indexes and weights),
+                serialized with msgpack if it is installed. Defaults to False.
+            layout (bool, optional): Ask for the positions of the nodes with the subgraphs, computed by the backend. Defaults to False.
+        """
+        self.base_url = base_url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        if compact:
+            self.session.headers["Accept"] = MSGPACK_MIMETYPE if msgpack else COMPACT_MIMETYPE
+        if layout:
+            self.session.params["layout"] = "true"
+
+    def get(self, endpoint: str, **params) -> Any:
+        """Send a GET request to an endpoint and return the json response."""
+        response = self.session.get(f"{self.base_url}{endpoint}", params=params)
+        return self.decode(response)
+
+    def post(self, endpoint: str, data: Any, **params) -> Any:
+        """Send a json POST request to an endpoint and return the json response."""
+        response = self.session.post(f"{self.base_url}{endpoint}", json=data, params=params)
+        return self.decode(response)
+
+    def decode(self, response: requests.Response) -> Any:
+        """Decode a json or msgpack response."""
+        if response.headers.get("Content-Type", "").startswith(MSGPACK_MIMETYPE):
+            return msgpack.unpackb(response.content)
+        return response.json()
+
+    def batch(self, queries: List[Dict[str, Any]]) -> List[Any]:
+        """Answer many queries with a single request, from the same version of the graph.
+
+        Args:
+            queries (List[Dict[str, Any]]): The queries, every query has a "type" (the name of an endpoint) and the arguments of the endpoint.
+
+        Returns:
+            List[Any]: The responses of the queries, in the order of the queries.
+        """
+        return self.post("/batch", queries)["results"]
+
+    def neighbors(self, characters: List[str], distance: int = 1) -> List[dict]:
+        """Get the neighbors of several characters with a single request."""
+        return self.batch(
+            [
+                {"type": "neighbors", "character": character, "distance": distance}
+                for character in characters
+            ]
+        )
+
+    def shortest_paths(self, pairs: List[tuple]) -> List[dict]:
+        """Get the shortest paths between several pairs of characters with a single request."""
+        return self.batch(
+            [
+                {"type": "shortest_path", "character1": character1, "character2": character2}
+                for character1, character2 in pairs
+            ]
+        )
@@ -1,12 +1,17 @@
 import argparse
 import os
+import time
 
-import requests
 import streamlit as st
 from pynlp5.constants import SERIALIZED_PATH
 
-from utils import (convert_networkx_to_agraph, init_session_states,
-                   json_to_networkx)
+from client import KnowledgeGraphClient
+from utils import (convert_compact_to_agraph, init_session_states,
+                   merge_compact_graphs)
+
+# All the requests to the backend go through one session, so the connection is reused.
+# The subgraphs come in the compact format (node names and edge arrays), we render them without rebuilding a networkx graph.
+client = KnowledgeGraphClient(compact=True, layout=True)
 
 # ===============================================================================
 # Functions for querying the backend flask based API
@@ -17,44 +22,49 @@ from utils import (convert_networkx_to_agraph, init_session_states,
 # so that the function is not called everytime the page is refreshed
 @st.cache
 def build_kg(serialized_path=None):
+    # The communities and the centralities are computed with the graph, the queries only read them.
     if serialized_path:
-        response = requests.get(
-            f"http://localhost:5005/build?serialized_path={serialized_path}"
-        )
+        job = client.get("/build", serialized_path=serialized_path, analytics="true")
     else:
-        response = requests.get("http://localhost:5005/build")
+        job = client.get("/build", analytics="true")
+
+    # The graph is built in the background, we wait until it is served.
+    while job["status"] in ["queued", "running"]:
+        time.sleep(0.5)
+        job = client.get("/build_status", job=job["id"])
 
 
 @st.cache
 def get_characters():
-    response = requests.get("http://localhost:5005/get_characters")
-    return response.json()
+    return client.get("/get_characters")
 
 
 def serialize_kg(serialized_path):
-    response = requests.get(
-        f"http://localhost:5005/serialize?serialized_path={serialized_path}"
+    response = client.session.get(
+        f"{client.base_url}/serialize", params={"serialized_path": serialized_path}
     )
 
 
 @st.cache
 def query_neighbor(character):
-    response = requests.get(f"http://localhost:5005/neighbors?character={character}")
-    return response.json()
+    return client.get("/neighbors", character=character)
 
 
 @st.cache
-def query_neighbor_with_distance(character, distance):
-    response = requests.get(
-        f"http://localhost:5005/neighbors?character={character}&distance={distance}"
-    )
-    return response.json()
+def query_neighbor_with_distance(character, distance, limit=0):
+    # With a limit only the strongest edges are returned, the large neighborhoods stay readable.
+    return client.get("/neighbors", character=character, distance=distance, limit=limit)
+
+
+@st.cache
+def query_neighbors_of_characters(characters, distance):
+    # One request for all the characters, instead of one request per character.
+    return client.neighbors(characters, distance)
 
 
 # @st.cache
 def get_characters_with_most_connections():
-    response = requests.get("http://localhost:5005/get_character_with_most_connections")
-    d = response.json()
+    d = client.get("/get_character_with_most_connections")
     character = d["character"]
     connections = d["connections"]
     graph = d["subgraph"]
@@ -64,20 +74,38 @@ def get_characters_with_most_connections():
 
 # @st.cache
 def get_isolated_characters():
-    response = requests.get("http://localhost:5005/get_isolated_characters")
-    d = response.json()
+    d = client.get("/get_isolated_characters")
     characters = d["characters"]
     graph = d["subgraph"]
 
     return characters, graph
 
 
+# @st.cache
+def get_community(character):
+    return client.get("/communities", character=character)
+
+
+# @st.cache
+def get_evidence(character1, character2, limit):
+    return client.get("/evidence", character1=character1, character2=character2, limit=limit)
+
+
+def get_mentions(query, limit):
+    return client.get("/mentions", query=query, limit=limit)
+
+
 # @st.cache
 def shortest_path(character1, character2):
-    response = requests.get(
-        f"http://localhost:5005/shortest_path?character1={character1}&character2={character2}"
-    )
-    return response.json()
+    return client.get("/shortest_path", character1=character1, character2=character2)
+
+
+def get_similar(character, k, metric):
+    return client.get("/similar", character=character, k=k, metric=metric)
+
+
+def k_shortest_paths(character1, character2, k, avoid):
+    return client.get("/k_shortest_paths", character1=character1, character2=character2, k=k, avoid=",".join(avoid))
 
 
 # ==============================================================================
@@ -139,9 +167,15 @@ def main(args):
                 [
                     "Neighbors",
                     "Neighbors with distance",
+                    "Neighbors of several characters",
                     "Character with most connections",
                     "Isolated Characters",
                     "Shortest Path",
+                    "Alternative Paths",
+                    "Similar characters",
+                    "Community of a character",
+                    "Sentences of a connection",
+                    "Sentences mentioning characters",
                 ],
             )
 
@@ -156,17 +190,34 @@ def main(args):
 
                 if st.button("Get Neighbors"):
                     neighbors = query_neighbor(character)
-                    st.session_state.current_graph = json_to_networkx(neighbors)
+                    st.session_state.current_graph = neighbors
 
             elif query_type == "Neighbors with distance":
                 character = st.selectbox(
                     "Select a character", st.session_state.characters
                 )
                 distance = st.number_input("Enter distance", value=1)
+                limit = st.number_input("Maximum number of edges (0 for all)", value=200, min_value=0)
+
+                if st.button("Get Neighbors"):
+                    neighbors = query_neighbor_with_distance(character, distance, limit)
+                    st.session_state.current_graph = neighbors
+                    if neighbors.get("next_cursor"):
+                        st.session_state.info = (
+                            f"Showing the {limit} strongest of {neighbors['total_edges']} edges."
+                        )
+
+            elif query_type == "Neighbors of several characters":
+                characters = st.multiselect(
+                    "Select characters", st.session_state.characters
+                )
+                distance = st.number_input("Enter distance", value=1)
 
                 if st.button("Get Neighbors"):
-                    neighbors = query_neighbor_with_distance(character, distance)
-                    st.session_state.current_graph = json_to_networkx(neighbors)
+                    neighborhoods = query_neighbors_of_characters(characters, distance)
+                    st.session_state.current_graph = merge_compact_graphs(
+                        [neighbors for neighbors in neighborhoods if "error" not in neighbors]
+                    )
 
             elif query_type == "Character with most connections":
                 if st.button("Get Character"):
@@ -176,44 +227,129 @@ def main(args):
                         graph,
                     ) = get_characters_with_most_connections()
                     st.session_state.info = f"Character with most connections is {character} with {connections} connections."
-                    st.session_state.current_graph = json_to_networkx(graph)
+                    st.session_state.current_graph = graph
 
             # ==============================================================================
             # TASK 1: Add a query type to get the isolated characters
             # ==============================================================================
             elif query_type == "Isolated Characters":
                 if st.button("Get Characters"):
-                    st.error("Not implemented yet")
-                    # UNCOMMENT THE FOLLOWING LINES FOR TASK 1
-                    
-                    # characters, graph = get_isolated_characters()
-                    # st.session_state.info = (
-                    #     f"Isolated characters are {', '.join(characters)}."
-                    # )
-                    # st.session_state.current_graph = json_to_networkx(graph)
+                    characters, graph = get_isolated_characters()
+                    st.session_state.info = (
+                        f"Isolated characters are {', '.join(characters)}."
+                    )
+                    st.session_state.current_graph = graph
 
             # ==============================================================================
             # TASK 2: Add a query type to get the shortest path between two characters
             # ==============================================================================
             elif query_type == "Shortest Path":
-                st.error("Not implemented yet")
-                # UNCOMMENT THE FOLLOWING LINES FOR TASK 2
+                character1 = st.selectbox(
+                    "Select a character", st.session_state.characters
+                )
+                character2 = st.selectbox(
+                    "Select a character", st.session_state.characters, index=1
+                )
+
+                if st.button("Get Shortest Path"):
+                    d = shortest_path(character1, character2)
+                    if "error" in d:
+                        st.error(d["error"])
+                    else:
+                        path = d["shortest_path"]
+                        st.session_state.current_graph = path
+
+                        num_edges = len(path["weights"])
+                        sum_of_path_weights = d["sum_of_path_weights"]
+                        st.session_state.info = f"Shortest path between {character1} and {character2} has {num_edges} number of edges with a sum weights of {sum_of_path_weights}"
 
-                # character1 = st.selectbox(
-                #     "Select a character", st.session_state.characters
-                # )
-                # character2 = st.selectbox(
-                #     "Select a character", st.session_state.characters, index=1
-                # )
+            elif query_type == "Alternative Paths":
+                character1 = st.selectbox(
+                    "Select a character", st.session_state.characters
+                )
+                character2 = st.selectbox(
+                    "Select a character", st.session_state.characters, index=1
+                )
+                k = st.number_input("Number of paths", value=3, min_value=1, max_value=20)
+                avoid = st.multiselect("Avoid the characters", st.session_state.characters)
+
+                if st.button("Get Paths"):
+                    d = k_shortest_paths(character1, character2, k, avoid)
+                    if "error" in d:
+                        st.error(d["error"])
+                    else:
+                        st.session_state.current_graph = d["subgraph"]
+                        paths = "\n".join(
+                            f"- {' -> '.join(path['characters'])} ({path['length']} edges, sum of weights {path['sum_of_path_weights']})"
+                            for path in d["paths"]
+                        )
+                        incomplete = "" if d["complete"] else " The search stopped early, there may be more paths."
+                        st.session_state.info = f"{len(d['paths'])} paths between {character1} and {character2}.{incomplete}\n{paths}"
+
+            elif query_type == "Similar characters":
+                character = st.selectbox(
+                    "Select a character", st.session_state.characters
+                )
+                k = st.number_input("Number of characters", value=10, min_value=1)
+                metric = st.selectbox("Similarity", ["cosine", "jaccard"])
+
+                if st.button("Get Similar Characters"):
+                    d = get_similar(character, k, metric)
+                    if "error" in d:
+                        st.error(d["error"])
+                    else:
+                        similar = "\n".join(
+                            f"- {other['character']} ({other['similarity']:.3f})" for other in d["similar"]
+                        )
+                        st.session_state.info = f"Characters connected like {character} ({d['method']} {metric} similarity):\n{similar}"
+
+            elif query_type == "Community of a character":
+                character = st.selectbox(
+                    "Select a character", st.session_state.characters
+                )
 
-                # if st.button("Get Shortest Path"):
-                #     d = shortest_path(character1, character2)
-                #     path = d["shortest_path"]
-                #     st.session_state.current_graph = json_to_networkx(path)
+                if st.button("Get Community"):
+                    d = get_community(character)
+                    if "error" in d:
+                        st.error(d["error"])
+                    else:
+                        st.session_state.info = f"{character} is in community {d['community']} with {len(d['characters'])} characters."
+                        st.session_state.current_graph = d["subgraph"]
 
-                #     num_edges = len(st.session_state.current_graph.edges())
-                #     sum_of_path_weights = d["sum_of_path_weights"]
-                #     st.session_state.info = f"Shortest path between {character1} and {character2} has {num_edges} number of edges with a sum weights of {sum_of_path_weights}"
+            elif query_type == "Sentences of a connection":
+                character1 = st.selectbox(
+                    "Select a character", st.session_state.characters
+                )
+                character2 = st.selectbox(
+                    "Select a character", st.session_state.characters, index=1
+                )
+                limit = st.number_input("Maximum number of sentences", value=20, min_value=1)
+
+                if st.button("Get Sentences"):
+                    d = get_evidence(character1, character2, limit)
+                    if "error" in d:
+                        st.error(d["error"])
+                    else:
+                        sentences = "\n".join(
+                            f"- {sentence['source']}:{sentence['line']} {sentence['text']}"
+                            for sentence in d["sentences"]
+                        )
+                        st.session_state.info = f"{character1} and {character2} are mentioned together in {d['total']} sentences.\n{sentences}"
+
+            elif query_type == "Sentences mentioning characters":
+                query = st.text_input("Query", value="Eddard Stark AND NOT Jon Snow")
+                limit = st.number_input("Maximum number of sentences", value=20, min_value=1)
+
+                if st.button("Get Sentences"):
+                    d = get_mentions(query, limit)
+                    if "error" in d:
+                        st.error(d["error"])
+                    else:
+                        sentences = "\n".join(
+                            f"- {sentence['source']}:{sentence['line']} {sentence['text']}"
+                            for sentence in d["sentences"]
+                        )
+                        st.session_state.info = f"{d['total']} sentences match the query.\n{sentences}"
 
         with col2:
             # We display the saved informatin and the built graph here using the agraph package in streamlit
@@ -221,7 +357,7 @@ def main(args):
                 st.write("Info")
                 st.write(st.session_state.info)
             if st.session_state.current_graph:
-                agraph = convert_networkx_to_agraph(st.session_state.current_graph)
+                agraph = convert_compact_to_agraph(st.session_state.current_graph)
 
 
 def get_args():
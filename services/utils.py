@@ -1,3 +1,5 @@
+from typing import List
+
 import networkx as nx
 import streamlit as st
 from streamlit_agraph import Config, Edge, Node, agraph
@@ -45,3 +47,51 @@ def json_to_networkx(json_graph: dict) -> nx.Graph:
     graph = nx.cytoscape_graph(json_graph)
 
     return graph
+
+
+def convert_compact_to_agraph(graph: dict) -> agraph:
+    # The compact format of the backend: the node names, and the edges as indexes into the nodes with their weights.
+    # We render it directly, without building a networkx graph first.
+    # The backend computes the positions of the nodes (x and y), the browser then draws the graph without simulating the physics.
+    if "x" in graph:
+        nodes = [
+            Node(id=i, label=i, size=20, x=x, y=y)
+            for i, x, y in zip(graph["nodes"], graph["x"], graph["y"])
+        ]
+    else:
+        nodes = [Node(id=i, label=i, size=20) for i in graph["nodes"]]
+    edges = [
+        Edge(
+            source=graph["nodes"][i],
+            target=graph["nodes"][j],
+            type="CURVE_SMOOTH",
+            label=str(weight),
+            arrows="",
+        )
+        for i, j, weight in zip(graph["sources"], graph["targets"], graph["weights"])
+    ]
+
+    config = UpdatedConfig(physics={"enabled": "x" not in graph})
+
+    return_value = agraph(nodes=nodes, edges=edges, config=config)
+
+    return return_value
+
+
+def merge_compact_graphs(graphs: List[dict]) -> dict:
+    # The union of graphs in the compact format, the nodes and edges that are in several graphs are kept once.
+    node_ids = {}
+    edges = {}
+    for graph in graphs:
+        for node in graph["nodes"]:
+            node_ids.setdefault(node, len(node_ids))
+        for i, j, weight in zip(graph["sources"], graph["targets"], graph["weights"]):
+            source, target = node_ids[graph["nodes"][i]], node_ids[graph["nodes"][j]]
+            edges[(min(source, target), max(source, target))] = weight
+
+    return {
+        "nodes": list(node_ids),
+        "sources": [source for source, _ in edges],
+        "targets": [target for _, target in edges],
+        "weights": list(edges.values()),
+    }
@@ -7,7 +7,16 @@ setup(
     author="Adam Kovacs",
     author_email="adam.kovacs@tuwien.ac.at",
     license="MIT",
-    install_requires=["streamlit", "flask", "more_itertools", "tqdm", "matplotlib"],
+    install_requires=[
+        "streamlit",
+        "flask",
+        "tqdm",
+        "matplotlib",
+        "networkx",
+        "numpy",
+        "scipy",
+    ],
+    extras_require={"msgpack": ["msgpack"]},
     packages=find_packages(),
     classifiers=[
         "Development Status :: 3 - Alpha",
@@ -0,0 +1,7 @@
+class Interrupted(Exception):
+    """Raised by the tests to stop a build half way through."""
+
+
+def assert_same_graph(graph1, graph2):
+    assert list(graph1.nodes()) == list(graph2.nodes())
+    assert list(graph1.edges(data=True)) == list(graph2.edges(data=True))
@@ -0,0 +1,173 @@
+from pynlp5.analytics import LABEL_PROPAGATION, approximate_betweenness, detect_communities
+from pynlp5.batch import answer_query
+from pynlp5.knowledge_graph import KnowledgeGraph
+from pynlp5.snapshot import GraphSnapshot
+import networkx as nx
+import os
+import pytest
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+kg.compute_analytics(samples=5)
+
+
+def assert_same_analytics(analytics1, analytics2):
+    assert analytics1.nodes == analytics2.nodes
+    assert analytics1.communities == analytics2.communities
+    assert analytics1.pagerank == pytest.approx(analytics2.pagerank)
+    assert analytics1.betweenness == pytest.approx(analytics2.betweenness)
+    assert analytics1.samples == analytics2.samples
+
+
+@pytest.mark.parametrize("samples", [0, 1, 20])
+def test_betweenness_same_as_networkx(samples):
+    graph = nx.les_miserables_graph()
+    betweenness = approximate_betweenness(graph, samples, seed=3)
+    expected = nx.betweenness_centrality(graph, k=samples or None, seed=3)
+    # With a single source, networkx leaves the source undefined.
+    assert [value for value, node in zip(betweenness, graph) if expected[node] == expected[node]] == pytest.approx(
+        [value for value in expected.values() if value == value]
+    )
+
+
+def test_parallel_betweenness():
+    graph = nx.les_miserables_graph()
+    assert approximate_betweenness(graph, 30, processes=2) == pytest.approx(approximate_betweenness(graph, 30))
+
+
+def test_communities():
+    graph = nx.les_miserables_graph()
+    communities = detect_communities(graph)
+    sizes = [communities.count(community) for community in range(max(communities) + 1)]
+    assert sizes == sorted(sizes, reverse=True)
+    assert detect_communities(graph) == communities
+
+    assert len(detect_communities(graph, LABEL_PROPAGATION)) == len(graph)
+    with pytest.raises(ValueError):
+        detect_communities(graph, "girvan_newman")
+
+
+def test_analytics():
+    analytics = kg.get_analytics()
+    assert analytics.version == kg.version
+    assert analytics.nodes == list(kg.kg.nodes())
+    assert sum(analytics.pagerank) == pytest.approx(1.0)
+
+    pagerank = nx.pagerank(kg.kg, weight="weight")
+    assert [character for character, _ in analytics.top("pagerank", 3)] == sorted(pagerank, key=pagerank.get, reverse=True)[:3]
+
+    # The communities are parts of the connected components, an isolated character is a community of its own.
+    community, characters = analytics.get_community("Sansa Stark")
+    component = next(component for component in kg.get_connected_components() if "Sansa Stark" in component)
+    assert "Sansa Stark" in characters and set(characters) <= set(component)
+    isolated, _ = kg.get_isolated_characters()
+    assert all(analytics.get_community(character)[1] == [character] for character in isolated)
+
+    centrality = analytics.centrality("Sansa Stark")
+    assert centrality["community"] == community
+    assert analytics.top("betweenness", 1, centrality["betweenness_rank"])[0][0] == "Sansa Stark"
+    with pytest.raises(nx.NodeNotFound):
+        analytics.centrality("Arya Stark")
+
+
+def test_analytics_per_version():
+    incremental_kg = kg.copy()
+    assert incremental_kg.get_analytics() is kg.get_analytics()
+
+    incremental_kg.ingest_lines(["Sansa Stark watched Nymeria."])
+    assert incremental_kg.get_analytics() is None
+    assert "error" in answer_query(incremental_kg, {"type": "pagerank"})
+    assert kg.get_analytics() is not None
+
+
+def test_serialized_analytics(tmp_path):
+    json_path = str(tmp_path / "kg.json")
+    kg.serialize_kg(json_path)
+    json_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH, json_path)
+    assert_same_analytics(json_kg.get_analytics(), kg.get_analytics())
+
+    snapshot_path = str(tmp_path / "kg.snapshot")
+    kg.serialize_snapshot(snapshot_path)
+    snapshot_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH, snapshot_path)
+    assert_same_analytics(snapshot_kg.get_analytics(), kg.get_analytics())
+
+    snapshot = GraphSnapshot(snapshot_path)
+    assert_same_analytics(snapshot.get_analytics(), kg.get_analytics())
+    snapshot.close()
+
+
+def test_snapshot_analytics(tmp_path):
+    plain_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+    snapshot_path = str(tmp_path / "kg.snapshot")
+    plain_kg.serialize_snapshot(snapshot_path)
+
+    snapshot = GraphSnapshot(snapshot_path)
+    assert snapshot.get_analytics() is None
+    assert snapshot.get_isolated_characters()[0] == plain_kg.get_isolated_characters()[0]
+
+    # The analytics computed on a snapshot are written with it.
+    snapshot.compute_analytics(samples=5)
+    assert_same_analytics(snapshot.get_analytics(), kg.get_analytics())
+    copy_path = str(tmp_path / "kg_analytics.snapshot")
+    snapshot.serialize_snapshot(copy_path)
+    snapshot.close()
+
+    snapshot = GraphSnapshot(copy_path)
+    assert_same_analytics(snapshot.get_analytics(), kg.get_analytics())
+    assert answer_query(snapshot, {"type": "centrality", "character": "Mycah"}) == answer_query(
+        kg, {"type": "centrality", "character": "Mycah"}
+    )
+    snapshot.close()
+
+
+def test_recomputed_snapshot_analytics(tmp_path):
+    # A snapshot saved with analytics, then computed again with other options: the new analytics are written.
+    snapshot_path = str(tmp_path / "kg.snapshot")
+    kg.serialize_snapshot(snapshot_path)
+    snapshot = GraphSnapshot(snapshot_path)
+    assert_same_analytics(snapshot.get_analytics(), kg.get_analytics())
+
+    snapshot.compute_analytics(algorithm=LABEL_PROPAGATION, samples=0)
+    recomputed = snapshot.get_analytics()
+    assert recomputed.samples == 0
+    copy_path = str(tmp_path / "kg_recomputed.snapshot")
+    snapshot.serialize_snapshot(copy_path)
+    snapshot.close()
+
+    snapshot = GraphSnapshot(copy_path)
+    assert_same_analytics(snapshot.get_analytics(), recomputed)
+    assert snapshot.get_analytics().betweenness != pytest.approx(kg.get_analytics().betweenness)
+    snapshot.close()
+
+
+def test_analytics_queries():
+    communities = answer_query(kg, {"type": "communities"})
+    assert [community["characters"] for community in communities] == kg.get_analytics().get_communities()
+
+    answer = answer_query(kg, {"type": "communities", "character": "Sansa Stark"})
+    assert "Sansa Stark" in answer["characters"]
+    assert set(answer["subgraph"]["elements"]["nodes"][0]["data"]) >= {"id", "name"}
+
+    characters = []
+    cursor = ""
+    while cursor is not None:
+        answer = answer_query(kg, {"type": "betweenness", "k": 4, "cursor": cursor})
+        characters += [(item["character"], item["betweenness"]) for item in answer["characters"]]
+        cursor = answer["next_cursor"]
+    assert characters == kg.get_analytics().top("betweenness", len(kg.kg))
+
+    answer = answer_query(kg, {"type": "centrality", "character": "Sansa Stark"})
+    assert answer["samples"] == 5
+    ranking = answer_query(kg, {"type": "pagerank", "k": len(kg.kg)})["characters"]
+    assert ranking[answer["pagerank_rank"]]["character"] == "Sansa Stark"
+    assert "error" in answer_query(kg, {"type": "centrality", "character": "Arya Stark"})
+
+
+def test_isolated_characters_subgraph():
+    characters, subgraph = kg.get_isolated_characters()
+    assert set(subgraph.nodes()) == set(characters)
+    assert subgraph.number_of_edges() == 0
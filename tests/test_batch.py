@@ -0,0 +1,105 @@
+from pynlp5.batch import MAX_BATCH_QUERIES, answer_batch, answer_query
+from pynlp5.knowledge_graph import KnowledgeGraph
+from pynlp5.snapshot import GraphSnapshot
+import os
+import pytest
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+QUERIES = [
+    {"type": "neighbors", "character": "Sansa Stark", "distance": 1},
+    {"type": "neighbors", "character": "Sansa Stark", "distance": "2"},
+    {"type": "neighbors", "character": "Ilyn Payne"},
+    {"type": "shortest_path", "character1": "Mycah", "character2": "Sandor Clegane"},
+    {"type": "shortest_path", "character1": "Mycah", "character2": "Serwyn"},
+    {"type": "top_connected_characters", "n": 3},
+    {"type": "neighbors", "character": "Arya Stark"},
+    {"type": "get_characters"},
+]
+
+
+def assert_same_answer(answer1, answer2):
+    # The order of the nodes of a subgraph is not fixed, we compare sets.
+    if isinstance(answer1, dict) and "elements" in answer1:
+        nodes1 = {node["data"]["id"] for node in answer1["elements"]["nodes"]}
+        nodes2 = {node["data"]["id"] for node in answer2["elements"]["nodes"]}
+        assert nodes1 == nodes2
+        assert len(answer1["elements"]["edges"]) == len(answer2["elements"]["edges"])
+    elif isinstance(answer1, dict) and "shortest_path" in answer1:
+        assert_same_answer(answer1["shortest_path"], answer2["shortest_path"])
+        assert answer1["sum_of_path_weights"] == answer2["sum_of_path_weights"]
+    else:
+        assert answer1 == answer2
+
+
+def test_batch_same_as_queries():
+    answers = answer_batch(kg, QUERIES)
+    assert len(answers) == len(QUERIES)
+    for query, answer in zip(QUERIES, answers):
+        assert_same_answer(answer, answer_query(kg, query))
+
+    assert "error" in answers[4]
+    assert "error" in answers[6]
+
+
+def test_neighborhoods_share_one_search():
+    class CountingKnowledgeGraph:
+        def __init__(self, kg):
+            self.kg = kg
+            self.searches = []
+
+        def get_character_neighborhoods(self, character, depths, time_range=None):
+            self.searches.append(character)
+            return self.kg.get_character_neighborhoods(character, depths, time_range)
+
+    counting_kg = CountingKnowledgeGraph(kg)
+    answers = answer_batch(
+        counting_kg,
+        [
+            {"type": "neighbors", "character": "Sansa Stark", "distance": distance}
+            for distance in [1, 2, 3, 1, 2]
+        ],
+    )
+
+    assert counting_kg.searches == ["Sansa Stark"]
+    assert answers[0] == answers[3]
+
+
+def test_invalid_queries():
+    answers = answer_batch(
+        kg,
+        [
+            {"type": "unknown"},
+            {"type": "shortest_path", "character1": "Mycah"},
+            {"type": "neighbors", "character": "Mycah", "distance": "far"},
+        ],
+    )
+    assert all("error" in answer for answer in answers)
+    assert answer_batch(None, [{"type": "get_characters"}]) == [
+        {"error": "Knowledge graph not loaded."}
+    ]
+
+
+def test_batch_size_is_capped():
+    queries = [{"type": "neighbors", "character": "Mycah", "distance": 3}] * MAX_BATCH_QUERIES
+    assert len(answer_batch(kg, queries)) == MAX_BATCH_QUERIES
+    with pytest.raises(ValueError):
+        answer_batch(kg, queries + [{"type": "get_characters"}])
+
+
+def test_snapshot_neighborhoods(tmp_path):
+    filename = str(tmp_path / "kg.snapshot")
+    kg.serialize_snapshot(filename)
+    snapshot = GraphSnapshot(filename)
+
+    for depth, subgraph in snapshot.get_character_neighborhoods("Sansa Stark", [1, 2, 3]).items():
+        expected = kg.get_character_neighbors("Sansa Stark", depth)
+        assert set(subgraph.nodes()) == set(expected.nodes())
+        assert subgraph.number_of_edges() == expected.number_of_edges()
+
+    snapshot.close()
@@ -0,0 +1,37 @@
+from pynlp5.cache import LRUCache
+
+
+def test_lru_eviction():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+
+    # "b" is the least recently used entry now.
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_counters():
+    cache = LRUCache(maxsize=10)
+    cache.put(("neighbors", 1), "result")
+    cache.get(("neighbors", 1))
+    cache.get(("neighbors", 2))
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+    cache.clear()
+    assert cache.get(("neighbors", 1)) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_disabled_cache():
+    cache = LRUCache(maxsize=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
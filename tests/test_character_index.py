@@ -0,0 +1,216 @@
+from pynlp5.batch import answer_query
+from pynlp5.character_index import CharacterIndex, parse_character_query, query_lines
+from pynlp5.knowledge_graph import KnowledgeGraph
+from pynlp5.snapshot import GraphSnapshot
+import os
+import pytest
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+with open(TEXT_PATH, "r") as f:
+    LINES = [line.strip() for line in f]
+
+# The characters of every line, to check the queries against.
+LINE_CHARACTERS = [set(kg.match_characters(line)) if line else set() for line in LINES]
+
+# The chapters of the raw book we write for the test lines, the first line of every chapter.
+CHAPTER_STARTS = [0, 40, 110]
+
+
+@pytest.fixture
+def book(tmp_path):
+    # A raw book with chapter headings, and the preprocessed text of the book.
+    text_path = str(tmp_path / "001test_line.txt")
+    with open(text_path, "w") as f:
+        f.writelines(f"{line}\n" for line in LINES)
+
+    headings = dict(zip(CHAPTER_STARTS, ["PROLOGUE", "SANSA", "ARYA"]))
+    with open(str(tmp_path / "001test.txt"), "w") as f:
+        for i, line in enumerate(LINES):
+            if i in headings:
+                f.write(f"{headings[i]}\n")
+            f.write(f"{line}\n")
+        # The preprocessing only keeps the text followed by a line in capital letters.
+        f.write("\nAPPENDIX\n")
+
+    return text_path
+
+
+def matching_lines(match, start=0, end=len(LINES)):
+    return [i for i in range(start, end) if match(LINE_CHARACTERS[i])]
+
+
+def test_parse_character_query():
+    assert parse_character_query(" Arya  Stark ") == ("character", "Arya Stark")
+    # NOT binds tighter than AND, and AND tighter than OR.
+    assert parse_character_query("a OR NOT b AND c") == (
+        "or",
+        [("character", "a"), ("and", [("not", ("character", "b")), ("character", "c")])],
+    )
+    assert parse_character_query("(a OR b) AND c") == (
+        "and",
+        [("or", [("character", "a"), ("character", "b")]), ("character", "c")],
+    )
+    # The operators are words in capitals, not parts of the names.
+    assert parse_character_query("Lord Andor AND Nothing") == (
+        "and",
+        [("character", "Lord Andor"), ("character", "Nothing")],
+    )
+
+    for query in ["", "a AND", "(a OR b", "a b)", "AND a", "a NOT b", "()"]:
+        with pytest.raises(ValueError):
+            parse_character_query(query)
+
+
+def test_query_lines():
+    index = CharacterIndex()
+    index.add({"a": [0, 2, 4, 6], "b": [2, 3, 6], "c": [1, 6]})
+    index.add({"a": [0], "c": [1]}, first_line=8)
+    line_sets = {"a": {0, 2, 4, 6, 8}, "b": {2, 3, 6}, "c": {1, 6, 9}}
+    everything = set(range(10))
+
+    def lines(query, line_range=None):
+        return query_lines(index, parse_character_query(query), 10, line_range).tolist()
+
+    assert lines("a AND b") == sorted(line_sets["a"] & line_sets["b"])
+    assert lines("a OR c") == sorted(line_sets["a"] | line_sets["c"])
+    assert lines("a AND NOT b") == sorted(line_sets["a"] - line_sets["b"])
+    assert lines("NOT a") == sorted(everything - line_sets["a"])
+    assert lines("NOT (a OR b)") == sorted(everything - line_sets["a"] - line_sets["b"])
+    assert lines("b OR NOT a") == sorted(line_sets["b"] | (everything - line_sets["a"]))
+    assert lines("NOT a AND NOT c") == sorted(everything - line_sets["a"] - line_sets["c"])
+    assert lines("a AND b AND c") == [6]
+    assert lines("a AND NOT a") == []
+    assert lines("a OR NOT c", (2, 7)) == [2, 3, 4, 5, 6]
+
+    with pytest.raises(ValueError):
+        lines("a AND d")
+
+    loaded = CharacterIndex.from_dict(index.to_dict())
+    assert {character: list(lines) for character, lines in loaded.lines.items()} == {
+        character: sorted(lines) for character, lines in line_sets.items()
+    }
+
+
+def test_find_mentions():
+    assert kg.find_mentions("Sansa Stark").tolist() == matching_lines(lambda characters: "Sansa Stark" in characters)
+    assert kg.find_mentions("Sansa Stark AND Joffrey Baratheon").tolist() == matching_lines(
+        lambda characters: {"Sansa Stark", "Joffrey Baratheon"} <= characters
+    )
+    assert kg.find_mentions("Sansa Stark AND NOT (Joffrey Baratheon OR Eddard Stark)").tolist() == matching_lines(
+        lambda characters: "Sansa Stark" in characters and not {"Joffrey Baratheon", "Eddard Stark"} & characters
+    )
+    assert kg.find_mentions("NOT Sansa Stark").tolist() == matching_lines(lambda characters: "Sansa Stark" not in characters)
+
+    # The lines are the ones of the evidence.
+    for sentence in kg.get_evidence().read(kg.find_mentions("Joffrey Baratheon").tolist()):
+        assert "Joffrey Baratheon" in kg.match_characters(sentence["text"])
+
+    with pytest.raises(ValueError):
+        kg.find_mentions("Sansa Stark AND Nobody")
+    with pytest.raises(ValueError):
+        kg.find_mentions("Sansa Stark", ((9, None), (9, None)))
+
+
+def test_mentions_of_every_build(book, tmp_path):
+    sequential_kg = KnowledgeGraph(book, CHARACTER_PATH, ALIAS_PATH)
+    parallel_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH)
+    parallel_kg.build_kg_parallel([book], processes=2, chunk_size=300)
+    index_kg = KnowledgeGraph(book, CHARACTER_PATH, ALIAS_PATH, index_dir=str(tmp_path / "index"))
+    streaming_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH)
+    streaming_kg.build_kg_streaming(book, str(tmp_path / "kg.checkpoint"), chunk_size=1024)
+
+    assert sequential_kg.mentions.period_lines == CHAPTER_STARTS
+    expected = {character: list(lines) for character, lines in sequential_kg.mentions.lines.items()}
+    assert expected == {character: list(lines) for character, lines in kg.mentions.lines.items()}
+    for other_kg in [parallel_kg, index_kg, streaming_kg]:
+        assert other_kg.mentions.period_lines == CHAPTER_STARTS
+        assert {character: list(lines) for character, lines in other_kg.mentions.lines.items()} == expected
+
+    # The second chapter, then the last one with the lines ingested after the build.
+    query = "Sansa Stark AND NOT Joffrey Baratheon"
+    chapter_lines = matching_lines(
+        lambda characters: "Sansa Stark" in characters and "Joffrey Baratheon" not in characters, 40, 110
+    )
+    for other_kg in [sequential_kg, parallel_kg, index_kg, streaming_kg]:
+        assert other_kg.find_mentions(query, ((1, 2), (1, 2))).tolist() == chapter_lines
+
+    sequential_kg.ingest_lines(["Sansa Stark sang."])
+    assert sequential_kg.find_mentions(query, ((1, 3), None)).tolist() == matching_lines(
+        lambda characters: "Sansa Stark" in characters and "Joffrey Baratheon" not in characters, 110
+    ) + [len(LINES)]
+
+
+def test_ingested_mentions(tmp_path):
+    incremental_kg = kg.copy()
+    incremental_kg.ingest_lines(["Sansa Stark watched Joffrey Baratheon.", "Mycah ran."])
+    text_path = str(tmp_path / "new_lines.txt")
+    with open(text_path, "w") as f:
+        f.write("Nothing here.\nMycah ran from Sansa Stark.\n")
+    incremental_kg.ingest_file(text_path)
+
+    line_ids = incremental_kg.find_mentions("Mycah").tolist()
+    assert line_ids[-2:] == [len(LINES) + 1, len(LINES) + 3]
+    assert incremental_kg.get_evidence().read(line_ids[-2:]) == [
+        {"source": "ingested", "line": 2, "text": "Mycah ran."},
+        {"source": "new_lines.txt", "line": 2, "text": "Mycah ran from Sansa Stark."},
+    ]
+    # The graph it was copied from is unchanged.
+    assert kg.find_mentions("Mycah").tolist() == line_ids[:-2]
+
+
+def test_serialized_mentions(tmp_path):
+    incremental_kg = kg.copy()
+    incremental_kg.ingest_lines(["Sansa Stark watched Joffrey Baratheon."])
+    query = {"type": "mentions", "query": "Sansa Stark AND NOT Eddard Stark", "limit": 0}
+    expected = answer_query(incremental_kg, query)
+
+    json_path = str(tmp_path / "kg.json")
+    incremental_kg.serialize_kg(json_path)
+    json_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH, json_path)
+    assert answer_query(json_kg, query) == expected
+
+    snapshot_path = str(tmp_path / "kg.snapshot")
+    incremental_kg.serialize_snapshot(snapshot_path)
+    snapshot_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH, snapshot_path)
+    assert answer_query(snapshot_kg, query) == expected
+
+    snapshot = GraphSnapshot(snapshot_path)
+    assert answer_query(snapshot, query) == expected
+    assert "error" in answer_query(snapshot, {**query, "query": "Nobody"})
+    snapshot.close()
+
+    # A graph saved without evidence has no mentions either.
+    plain_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH)
+    plain_kg.kg = kg.kg.copy()
+    plain_kg.serialize_snapshot(snapshot_path)
+    snapshot = GraphSnapshot(snapshot_path)
+    assert snapshot.get_mentions() is None
+    assert "error" in answer_query(snapshot, query)
+    snapshot.close()
+
+
+def test_mentions_pages():
+    query = {"type": "mentions", "query": "Sansa Stark OR Mycah"}
+    expected = kg.get_evidence().read(kg.find_mentions(query["query"]).tolist())
+    sentences = []
+    cursor = ""
+    while cursor is not None:
+        answer = answer_query(kg, {**query, "limit": 3, "cursor": cursor})
+        assert answer["total"] == len(expected)
+        assert len(answer["sentences"]) <= 3
+        sentences += answer["sentences"]
+        cursor = answer["next_cursor"]
+    assert sentences == expected
+    assert answer_query(kg, query)["sentences"] == expected[:20]
+
+    assert "error" in answer_query(kg, {**query, "query": "Sansa Stark AND"})
+    assert "error" in answer_query(kg, {**query, "query": "Nobody"})
+    assert "error" in answer_query(kg, {**query, "from": "9"})
+    assert "error" in answer_query(kg, {**query, "limit": -1})
+    assert "error" in answer_query(kg, {**query, "cursor": "nope"})
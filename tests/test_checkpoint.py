@@ -0,0 +1,82 @@
+from conftest import Interrupted, assert_same_graph
+from pynlp5.checkpoint import BuildCheckpoint
+from pynlp5.knowledge_graph import KnowledgeGraph
+import os
+import pytest
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+
+def test_streaming_same_as_build(tmp_path):
+    streaming_kg = KnowledgeGraph(
+        TEXT_PATH, CHARACTER_PATH, ALIAS_PATH, checkpoint_dir=str(tmp_path)
+    )
+    assert_same_graph(streaming_kg.kg, kg.kg)
+
+    checkpoint = BuildCheckpoint.load(str(tmp_path / "test_lines.txt.checkpoint"))
+    assert checkpoint.done
+
+
+def test_resume_after_interruption(tmp_path):
+    checkpoint_path = str(tmp_path / "kg.checkpoint")
+    interrupted_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+    interrupted_kg.kg.clear()
+
+    # We stop the build in the middle of the text.
+    match_characters = interrupted_kg.match_characters
+    calls = []
+
+    def failing_match_characters(text):
+        calls.append(text)
+        if len(calls) > 150:
+            raise Interrupted()
+        return match_characters(text)
+
+    interrupted_kg.match_characters = failing_match_characters
+    with pytest.raises(Interrupted):
+        interrupted_kg.build_kg_streaming(
+            TEXT_PATH, checkpoint_path, chunk_size=1024, checkpoint_every=2
+        )
+
+    checkpoint = BuildCheckpoint.load(checkpoint_path)
+    assert 0 < checkpoint.offset < os.path.getsize(TEXT_PATH)
+
+    # The new build only matches the lines after the checkpoint.
+    resumed_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+    resumed_kg.kg.clear()
+    match_characters = resumed_kg.match_characters
+    resumed_calls = []
+
+    def counting_match_characters(text):
+        resumed_calls.append(text)
+        return match_characters(text)
+
+    resumed_kg.match_characters = counting_match_characters
+    resumed_kg.build_kg_streaming(TEXT_PATH, checkpoint_path, chunk_size=1024)
+
+    assert_same_graph(resumed_kg.kg, kg.kg)
+    with open(TEXT_PATH, "r") as f:
+        line_count = sum(1 for line in f if line.strip())
+    assert len(resumed_calls) < line_count - 100
+
+
+def test_changed_text_restarts(tmp_path):
+    text_path = tmp_path / "lines.txt"
+    text_path.write_text("Sansa Stark saw Mycah.\n")
+    checkpoint_path = str(tmp_path / "lines.checkpoint")
+
+    first_kg = KnowledgeGraph(str(text_path), CHARACTER_PATH, ALIAS_PATH)
+    first_kg.build_kg_streaming(str(text_path), checkpoint_path)
+
+    text_path.write_text("Sansa Stark saw Sandor Clegane.\n")
+    second_kg = KnowledgeGraph(str(text_path), CHARACTER_PATH, ALIAS_PATH)
+    second_kg.kg.clear()
+    second_kg.build_kg_streaming(str(text_path), checkpoint_path)
+
+    assert "Mycah" not in second_kg.kg
+    assert second_kg.kg.has_edge("Sansa Stark", "Sandor Clegane")
@@ -0,0 +1,123 @@
+from conftest import Interrupted
+from pynlp5.cooccurrence import ALL_PAIRS, WINDOW, CooccurrenceCounter, CooccurrencePolicy
+from pynlp5.knowledge_graph import KnowledgeGraph
+import os
+import pytest
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+with open(TEXT_PATH, "r") as f:
+    LINE_MATCHES = [kg.match_characters(line.strip()) if line.strip() else [] for line in f]
+
+
+def window_weights(line_matches, window, decay=1.0):
+    # Every pair of sentences of the window, compared one by one.
+    edge_weights = {}
+    for i, characters in enumerate(line_matches):
+        for j in range(max(i - window + 1, 0), i + 1):
+            for character1 in characters:
+                for character2 in line_matches[j]:
+                    if character1 < character2 or (j != i and character1 > character2):
+                        edge = tuple(sorted((character1, character2)))
+                        weight = 1 if decay == 1 else decay ** (i - j)
+                        edge_weights[edge] = edge_weights.get(edge, 0) + weight
+    return edge_weights
+
+
+def graph_weights(graph):
+    return {tuple(sorted(edge)): weight for *edge, weight in graph.edges(data="weight")}
+
+
+def test_all_pairs():
+    counter = CooccurrenceCounter(CooccurrencePolicy(ALL_PAIRS))
+    counter.add(["Arya Stark", "Mycah", "Sansa Stark"])
+    nodes, edge_weights = counter.take()
+
+    assert nodes == ["Arya Stark", "Mycah", "Sansa Stark"]
+    assert edge_weights == {
+        ("Arya Stark", "Mycah"): 1,
+        ("Arya Stark", "Sansa Stark"): 1,
+        ("Mycah", "Sansa Stark"): 1,
+    }
+
+
+@pytest.mark.parametrize("window", [1, 2, 5])
+def test_window_same_as_every_pair_of_sentences(window):
+    counter = CooccurrenceCounter(CooccurrencePolicy(WINDOW, window))
+    for characters in LINE_MATCHES:
+        counter.add(characters)
+
+    assert counter.take()[1] == window_weights(LINE_MATCHES, window)
+    assert len(counter.recent) <= window - 1
+
+
+def test_window_decay():
+    policy = CooccurrencePolicy(WINDOW, 3, 0.5)
+    window_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH, cooccurrence=policy)
+
+    expected = window_weights(LINE_MATCHES, 3, 0.5)
+    assert graph_weights(window_kg.kg) == pytest.approx(expected)
+    assert set(window_kg.kg.nodes()) == set(kg.kg.nodes())
+
+
+def test_window_spans_chunks():
+    policy = CooccurrencePolicy(WINDOW, 4)
+    sequential_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH, cooccurrence=policy)
+
+    parallel_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH, cooccurrence=policy)
+    parallel_kg.build_kg_parallel([TEXT_PATH], processes=2, chunk_size=300)
+
+    assert list(parallel_kg.kg.nodes()) == list(sequential_kg.kg.nodes())
+    assert graph_weights(parallel_kg.kg) == graph_weights(sequential_kg.kg)
+
+
+def test_window_resumes_from_checkpoint(tmp_path):
+    policy = CooccurrencePolicy(WINDOW, 4)
+    checkpoint_path = str(tmp_path / "kg.checkpoint")
+    interrupted_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH, cooccurrence=policy)
+
+    match_characters = interrupted_kg.match_characters
+    calls = []
+
+    def failing_match_characters(text):
+        calls.append(text)
+        if len(calls) > 150:
+            raise Interrupted()
+        return match_characters(text)
+
+    interrupted_kg.match_characters = failing_match_characters
+    with pytest.raises(Interrupted):
+        interrupted_kg.build_kg_streaming(
+            TEXT_PATH, checkpoint_path, chunk_size=1024, checkpoint_every=2
+        )
+
+    resumed_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH, cooccurrence=policy)
+    resumed_kg.build_kg_streaming(TEXT_PATH, checkpoint_path, chunk_size=1024)
+    assert graph_weights(resumed_kg.kg) == window_weights(LINE_MATCHES, 4)
+
+    # A build with another policy doesn't reuse the checkpoint.
+    pairwise_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH)
+    pairwise_kg.build_kg_streaming(TEXT_PATH, checkpoint_path, chunk_size=1024)
+    assert graph_weights(pairwise_kg.kg) == graph_weights(kg.kg)
+
+
+def test_window_from_mention_index(tmp_path):
+    policy = CooccurrencePolicy(WINDOW, 3)
+    index_kg = KnowledgeGraph(
+        TEXT_PATH, CHARACTER_PATH, ALIAS_PATH, index_dir=str(tmp_path), cooccurrence=policy
+    )
+    assert graph_weights(index_kg.kg) == window_weights(LINE_MATCHES, 3)
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        CooccurrencePolicy("sentence")
+    with pytest.raises(ValueError):
+        CooccurrencePolicy(WINDOW, 0)
+    with pytest.raises(ValueError):
+        CooccurrencePolicy(WINDOW, 3, 1.5)
@@ -0,0 +1,202 @@
+from conftest import Interrupted
+from pynlp5.batch import answer_query
+from pynlp5.cooccurrence import WINDOW, CooccurrencePolicy
+from pynlp5.evidence import LineIndex, Postings, decode_postings
+from pynlp5.knowledge_graph import KnowledgeGraph
+from pynlp5.snapshot import GraphSnapshot
+import os
+import pytest
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+with open(TEXT_PATH, "r") as f:
+    LINES = [line.strip() for line in f]
+
+
+def edge_lines(evidence, graph):
+    return {
+        (character1, character2): list(evidence.postings.lines(character1, character2))
+        for character1, character2 in graph.edges()
+    }
+
+
+def read_all(evidence, character1, character2):
+    return evidence.read(evidence.lines(character1, character2))
+
+
+def test_postings():
+    postings = Postings()
+    postings.add({("b", "a"): [300, 0, 7, 7, 200000]})
+    postings.add({("a", "b"): [5, 200001]}, first_line=10)
+    assert list(postings.lines("a", "b")) == [0, 7, 300, 200000, 200011]
+    assert postings.count("b", "a") == 5
+    # Small gaps take a byte.
+    assert len(postings.data[("a", "b")]) < 5 * 3
+
+    other = Postings()
+    other.add({("a", "c"): [1, 2]})
+    copy = postings.copy()
+    copy.extend(other, first_line=200100)
+    assert list(copy.lines("c", "a")) == [200101, 200102]
+    assert list(postings.lines("a", "c")) == []
+
+    loaded = Postings.from_dict(copy.to_dict())
+    assert list(decode_postings(loaded.encoded("a", "b"))) == [0, 7, 300, 200000, 200011]
+    loaded.append(("a", "b"), [200012])
+    assert loaded.count("a", "b") == 6 and list(loaded.lines("a", "b"))[-1] == 200012
+
+
+def test_line_index():
+    index = LineIndex.build(TEXT_PATH)
+    assert len(index) == len(LINES)
+    assert index.read_lines([3, 0, len(LINES) - 1]) == [LINES[3], LINES[0], LINES[-1]]
+    assert index.line_number(index.line_offsets[5]) == 5
+    assert index.line_number(index.line_offsets[5] + 1) == 5
+
+
+def test_evidence_of_edges():
+    evidence = kg.get_evidence()
+    for character1, character2, weight in kg.kg.edges(data="weight"):
+        # Every co-occurrence of the pairwise policy is a line of its own.
+        assert evidence.postings.count(character1, character2) == weight
+        for sentence in read_all(evidence, character1, character2):
+            assert sentence["source"] == "test_lines.txt"
+            assert sentence["text"] == LINES[sentence["line"] - 1]
+            assert {character1, character2} <= set(kg.match_characters(sentence["text"]))
+
+
+def test_evidence_of_every_build(tmp_path):
+    expected = edge_lines(kg.get_evidence(), kg.kg)
+
+    index_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH, index_dir=str(tmp_path / "index"))
+    assert edge_lines(index_kg.get_evidence(), index_kg.kg) == expected
+
+    parallel_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH)
+    parallel_kg.build_kg_parallel([TEXT_PATH], processes=2, chunk_size=300)
+    assert edge_lines(parallel_kg.get_evidence(), parallel_kg.kg) == expected
+
+    # The second half of the file as a byte range, its lines keep their numbers in the file.
+    start = LineIndex.build(TEXT_PATH).line_offsets[len(LINES) // 2]
+    range_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH)
+    range_kg.build_kg_parallel([(TEXT_PATH, start, os.path.getsize(TEXT_PATH))], processes=2, chunk_size=300)
+    for character1, character2 in range_kg.kg.edges():
+        lines = [sentence["line"] - 1 for sentence in read_all(range_kg.get_evidence(), character1, character2)]
+        line_ids = expected.get((character1, character2)) or expected[(character2, character1)]
+        assert lines == [line_id for line_id in line_ids if line_id >= len(LINES) // 2]
+
+
+def test_window_evidence(tmp_path):
+    policy = CooccurrencePolicy(WINDOW, 4)
+    window_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH, cooccurrence=policy)
+    expected = edge_lines(window_kg.get_evidence(), window_kg.kg)
+    for character1, character2 in window_kg.kg.edges():
+        # The line of a co-occurrence is the line that completes it, the other character is at most 3 lines before.
+        for line_id in expected[(character1, character2)]:
+            window = LINES[max(line_id - 3, 0) : line_id + 1]
+            assert {character1, character2} <= {character for line in window for character in window_kg.match_characters(line)}
+
+    parallel_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH, cooccurrence=policy)
+    parallel_kg.build_kg_parallel([TEXT_PATH], processes=2, chunk_size=300)
+    assert edge_lines(parallel_kg.get_evidence(), parallel_kg.kg) == expected
+
+    # An interrupted streaming build keeps the lines counted before the interruption in its checkpoint.
+    checkpoint_path = str(tmp_path / "kg.checkpoint")
+    interrupted_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH, cooccurrence=policy)
+    match_characters = interrupted_kg.match_characters
+    calls = []
+
+    def failing_match_characters(text):
+        calls.append(text)
+        if len(calls) > 150:
+            raise Interrupted()
+        return match_characters(text)
+
+    interrupted_kg.match_characters = failing_match_characters
+    with pytest.raises(Interrupted):
+        interrupted_kg.build_kg_streaming(TEXT_PATH, checkpoint_path, chunk_size=1024, checkpoint_every=2)
+
+    resumed_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH, cooccurrence=policy)
+    resumed_kg.build_kg_streaming(TEXT_PATH, checkpoint_path, chunk_size=1024)
+    assert edge_lines(resumed_kg.get_evidence(), resumed_kg.kg) == expected
+
+
+def test_ingested_evidence(tmp_path):
+    incremental_kg = kg.copy()
+    incremental_kg.ingest_lines(["Sansa Stark watched Joffrey Baratheon.", "Mycah ran."])
+    text_path = str(tmp_path / "new_lines.txt")
+    with open(text_path, "w") as f:
+        f.write("Nothing here.\nMycah ran from Sansa Stark.\n")
+    incremental_kg.ingest_file(text_path)
+
+    sentences = read_all(incremental_kg.get_evidence(), "Sansa Stark", "Joffrey Baratheon")
+    assert sentences[-1] == {"source": "ingested", "line": 1, "text": "Sansa Stark watched Joffrey Baratheon."}
+    assert sentences[:-1] == read_all(kg.get_evidence(), "Sansa Stark", "Joffrey Baratheon")
+    assert read_all(incremental_kg.get_evidence(), "Mycah", "Sansa Stark")[-1] == {
+        "source": "new_lines.txt",
+        "line": 2,
+        "text": "Mycah ran from Sansa Stark.",
+    }
+    # The graph it was copied from is unchanged.
+    assert kg.get_evidence().postings.count("Sansa Stark", "Joffrey Baratheon") == 6
+
+
+def test_serialized_evidence(tmp_path):
+    incremental_kg = kg.copy()
+    incremental_kg.ingest_lines(["Sansa Stark watched Joffrey Baratheon."])
+    expected = edge_lines(incremental_kg.get_evidence(), incremental_kg.kg)
+    query = {"type": "evidence", "character1": "Joffrey Baratheon", "character2": "Sansa Stark", "limit": 0}
+
+    json_path = str(tmp_path / "kg.json")
+    incremental_kg.serialize_kg(json_path)
+    json_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH, json_path)
+    assert edge_lines(json_kg.get_evidence(), json_kg.kg) == expected
+
+    snapshot_path = str(tmp_path / "kg.snapshot")
+    incremental_kg.serialize_snapshot(snapshot_path)
+    snapshot_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH, snapshot_path)
+    assert edge_lines(snapshot_kg.get_evidence(), snapshot_kg.kg) == expected
+
+    snapshot = GraphSnapshot(snapshot_path)
+    assert edge_lines(snapshot.get_evidence(), kg.kg) == expected
+    assert answer_query(snapshot, query) == answer_query(incremental_kg, query)
+    # The entries are found from either character, whatever the order of the neighbors.
+    postings = snapshot.get_evidence().postings
+    for character1, character2 in incremental_kg.kg.edges():
+        assert postings.encoded(character2, character1) == postings.encoded(character1, character2) != b""
+    assert postings.count("Sansa Stark", "Sansa Stark") == 0
+    snapshot.close()
+
+    # A graph saved without evidence.
+    plain_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH)
+    plain_kg.kg = kg.kg.copy()
+    plain_kg.serialize_snapshot(snapshot_path)
+    snapshot = GraphSnapshot(snapshot_path)
+    assert snapshot.get_evidence() is None
+    assert "error" in answer_query(snapshot, query)
+    snapshot.close()
+
+
+def test_evidence_pages():
+    query = {"type": "evidence", "character1": "Sansa Stark", "character2": "Joffrey Baratheon"}
+    expected = read_all(kg.get_evidence(), "Sansa Stark", "Joffrey Baratheon")
+    sentences = []
+    cursor = ""
+    while cursor is not None:
+        answer = answer_query(kg, {**query, "limit": 2, "cursor": cursor})
+        assert answer["total"] == len(expected)
+        assert len(answer["sentences"]) <= 2
+        sentences += answer["sentences"]
+        cursor = answer["next_cursor"]
+    assert sentences == expected
+
+    answer = answer_query(kg, {**query, "character1": "Joffrey Baratheon", "character2": "Sansa Stark"})
+    assert answer["sentences"] == expected[:20]
+
+    assert "error" in answer_query(kg, {**query, "character2": "Arya Stark"})
+    assert "error" in answer_query(kg, {**query, "limit": -1})
+    assert "error" in answer_query(kg, {**query, "cursor": "nope"})
@@ -0,0 +1,40 @@
+from pynlp5.knowledge_graph import KnowledgeGraph
+import os
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+
+def test_ingest_lines_same_as_build(tmp_path):
+    with open(TEXT_PATH, "r") as f:
+        lines = f.readlines()
+
+    first_half = tmp_path / "first_half.txt"
+    first_half.write_text("".join(lines[: len(lines) // 2]))
+
+    incremental_kg = KnowledgeGraph(str(first_half), CHARACTER_PATH, ALIAS_PATH)
+    incremental_kg.ingest_lines(lines[len(lines) // 2 :])
+
+    assert set(incremental_kg.kg.nodes()) == set(kg.kg.nodes())
+    assert dict(incremental_kg.kg.edges()) == dict(kg.kg.edges())
+
+
+def test_ingest_file():
+    incremental_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+    weight = incremental_kg.kg["Sansa Stark"]["Joffrey Baratheon"]["weight"]
+
+    incremental_kg.ingest_file(TEXT_PATH)
+    assert incremental_kg.kg["Sansa Stark"]["Joffrey Baratheon"]["weight"] == 2 * weight
+
+
+def test_ingest_new_characters():
+    incremental_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+    assert "Nymeria" not in incremental_kg.kg["Sansa Stark"]
+
+    incremental_kg.ingest_lines(["Sansa Stark watched Nymeria.", "Serwyn waited."])
+    assert incremental_kg.kg["Sansa Stark"]["Nymeria"]["weight"] == 1
+    assert "Serwyn" in incremental_kg.get_characters()
@@ -0,0 +1,137 @@
+from itertools import islice, pairwise
+from pynlp5.batch import answer_query
+from pynlp5.k_paths import MAX_PATHS, bidirectional_path, k_shortest_paths
+from pynlp5.knowledge_graph import KnowledgeGraph
+from pynlp5.snapshot import GraphSnapshot
+from pynlp5.wire import COMPACT
+import networkx as nx
+import os
+import pytest
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+
+def test_bidirectional_path():
+    graph = nx.grid_2d_graph(6, 6)
+    nodes = list(graph.nodes())
+    node_ids = {node: i for i, node in enumerate(nodes)}
+    adjacency = [[node_ids[neighbor] for neighbor in graph.adj[node]] for node in nodes]
+
+    path = bidirectional_path(adjacency, node_ids[(0, 0)], node_ids[(5, 5)], 10)
+    assert len(path) == 11 and all(graph.has_edge(nodes[a], nodes[b]) for a, b in pairwise(path))
+    assert bidirectional_path(adjacency, node_ids[(0, 0)], node_ids[(5, 5)], 9) is None
+
+    # Blocking the second column but its last node forces the path around it.
+    blocked = [node_ids[(1, y)] for y in range(5)]
+    path = bidirectional_path(adjacency, node_ids[(0, 0)], node_ids[(2, 0)], 20, blocked)
+    assert len(path) == 13
+    edge = (node_ids[(0, 0)], node_ids[(0, 1)])
+    path = bidirectional_path(adjacency, node_ids[(0, 0)], node_ids[(0, 1)], 20, (), {edge, edge[::-1]})
+    assert len(path) == 4
+
+
+def test_k_shortest_paths():
+    # The lengths of the paths are the ones of networkx, on random graphs.
+    for seed in range(10):
+        graph = nx.gnm_random_graph(30, 60, seed=seed)
+        adjacency = [list(graph.adj[node]) for node in graph.nodes()]
+        for source, target in [(0, 29), (3, 17)]:
+            if not nx.has_path(graph, source, target):
+                continue
+            expected = [
+                path for path in islice(nx.shortest_simple_paths(graph, source, target), 100) if len(path) <= 6
+            ][:10]
+            paths, complete = k_shortest_paths(adjacency, source, target, 10, 5)
+            assert complete
+            assert [len(path) for path in paths] == [len(path) for path in expected]
+            assert len({tuple(path) for path in paths}) == len(paths)
+            assert all(nx.is_simple_path(graph, path) for path in paths)
+
+    # The paths avoid the nodes, the paths of the same length come by weight.
+    graph = nx.Graph()
+    graph.add_weighted_edges_from([(0, 1, 1), (1, 3, 1), (0, 2, 5), (2, 3, 5), (0, 4, 1), (4, 5, 1), (5, 3, 1)])
+    adjacency = [list(graph.adj[node]) for node in range(6)]
+    weight = lambda node1, node2: graph[node1][node2]["weight"]  # noqa: E731
+    paths, _ = k_shortest_paths(adjacency, 0, 3, 3, weight=weight)
+    assert paths == [[0, 2, 3], [0, 1, 3], [0, 4, 5, 3]]
+    assert k_shortest_paths(adjacency, 0, 3, 5, avoid=[1, 2]) == ([[0, 4, 5, 3]], True)
+    assert k_shortest_paths(adjacency, 0, 3, 5, max_length=2, weight=weight) == (paths[:2], True)
+    assert k_shortest_paths(adjacency, 0, 3, 5, avoid=[1, 2, 4]) == ([], True)
+
+    for arguments in [{"k": 0}, {"k": MAX_PATHS + 1}, {"k": 3, "max_length": 0}, {"k": 3, "avoid": [3]}]:
+        with pytest.raises(ValueError):
+            k_shortest_paths(adjacency, 0, 3, **arguments)
+
+
+def test_expansion_budget():
+    graph = nx.complete_graph(12)
+    adjacency = [list(graph.adj[node]) for node in graph.nodes()]
+    paths, complete = k_shortest_paths(adjacency, 0, 11, MAX_PATHS, 4)
+    assert complete and len(paths) == MAX_PATHS
+
+    # With a small budget the search returns the paths it found so far.
+    paths, complete = k_shortest_paths(adjacency, 0, 11, MAX_PATHS, 4, budget=300)
+    assert not complete and 1 <= len(paths) < MAX_PATHS
+    assert all(nx.is_simple_path(graph, path) for path in paths)
+
+
+def test_k_shortest_paths_between_characters(tmp_path):
+    subgraph, paths, complete = kg.k_shortest_paths_between_characters("Mycah", "Sandor Clegane", 5)
+    expected = list(nx.shortest_simple_paths(kg.kg, "Mycah", "Sandor Clegane"))
+    assert complete and [len(path) for path, _ in paths] == [len(path) for path in expected]
+    assert {tuple(path) for path, _ in paths} == {tuple(path) for path in expected}
+    for path, sum_of_path in paths:
+        assert sum_of_path == sum(kg.kg[node1][node2]["weight"] for node1, node2 in pairwise(path))
+        assert all(subgraph.has_edge(node1, node2) for node1, node2 in pairwise(path))
+    # The first path is as short as the shortest path.
+    shortest_path, _ = kg.shortest_path_between_characters("Mycah", "Sandor Clegane")
+    assert len(paths[0][0]) == shortest_path.number_of_nodes()
+
+    _, avoiding, _ = kg.k_shortest_paths_between_characters("Mycah", "Sandor Clegane", 5, avoid=["Mother", "Nobody"])
+    assert avoiding == [(path, weight) for path, weight in paths if "Mother" not in path]
+
+    with pytest.raises(nx.NodeNotFound):
+        kg.k_shortest_paths_between_characters("Mycah", "Nobody")
+    with pytest.raises(nx.NetworkXNoPath):
+        kg.k_shortest_paths_between_characters("Mycah", "Sandor Clegane", avoid=["Joffrey Baratheon"])
+
+    # The snapshot and the time slices have the same paths.
+    snapshot_path = str(tmp_path / "kg.snapshot")
+    kg.serialize_snapshot(snapshot_path)
+    snapshot = GraphSnapshot(snapshot_path)
+    assert snapshot.k_shortest_paths_between_characters("Mycah", "Sandor Clegane", 5)[1:] == (paths, complete)
+    whole_book = ((1, None), (1, None))
+    assert kg.k_shortest_paths_between_characters("Mycah", "Sandor Clegane", 5, time_range=whole_book)[1:] == (
+        paths,
+        complete,
+    )
+    assert snapshot.k_shortest_paths_between_characters("Mycah", "Sandor Clegane", 5, time_range=whole_book)[1:] == (
+        paths,
+        complete,
+    )
+    snapshot.close()
+
+
+def test_k_shortest_paths_query():
+    query = {"type": "k_shortest_paths", "character1": "Mycah", "character2": "Sandor Clegane", "k": 5}
+    answer = answer_query(kg, query, COMPACT)
+    _, paths, _ = kg.k_shortest_paths_between_characters("Mycah", "Sandor Clegane", 5)
+    assert answer["complete"]
+    assert answer["paths"] == [
+        {"characters": path, "length": len(path) - 1, "sum_of_path_weights": sum_of_path} for path, sum_of_path in paths
+    ]
+    assert set(answer["subgraph"]["nodes"]) == {node for path, _ in paths for node in path}
+
+    avoiding = answer_query(kg, {**query, "avoid": "Mother, Nobody"}, COMPACT)
+    assert all("Mother" not in path["characters"] for path in avoiding["paths"])
+
+    assert "error" in answer_query(kg, {**query, "k": 100})
+    assert "error" in answer_query(kg, {**query, "max_length": 100})
+    assert "error" in answer_query(kg, {**query, "avoid": "Mycah"})
+    assert "error" in answer_query(kg, {**query, "character2": "Nobody"})
+    assert "error" in answer_query(kg, {**query, "from": "9"})
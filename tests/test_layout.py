@@ -0,0 +1,89 @@
+from pynlp5.batch import answer_batch, answer_query
+from pynlp5.knowledge_graph import KnowledgeGraph
+from pynlp5.layout import GraphLayout, force_layout
+from pynlp5.snapshot import GraphSnapshot
+from pynlp5.wire import COMPACT, graph_from_compact
+import networkx as nx
+import numpy as np
+import os
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+
+def test_force_layout():
+    # Two cliques joined by one edge: the nodes of a clique end up closer to each other than to the other clique.
+    graph = nx.disjoint_union(nx.complete_graph(6), nx.complete_graph(6))
+    graph.add_edge(0, 6)
+    sources, targets = zip(*graph.edges())
+    positions = force_layout(graph.number_of_nodes(), sources, targets)
+
+    assert positions.shape == (12, 2) and np.isfinite(positions).all()
+    distances = np.sqrt(((positions[:, None] - positions[None, :]) ** 2).sum(axis=2))
+    assert distances[:6, :6].mean() < distances[:6, 6:].mean()
+    assert distances[6:, 6:].mean() < distances[:6, 6:].mean()
+    # The layouts are seeded.
+    assert (force_layout(12, sources, targets) == positions).all()
+    assert force_layout(1, [], []).shape == (1, 2)
+
+
+def test_subgraph_positions():
+    layout = GraphLayout.compute(kg.kg)
+    assert layout.positions.min() >= 0 and layout.positions.max() <= 1
+
+    neighbors = nx.Graph(kg.get_character_neighbors("Sansa Stark", 2))
+    positions = layout.subgraph_positions(neighbors)
+    assert set(positions) == set(neighbors.nodes())
+    # Every node gets a place of its own.
+    assert len(set(positions.values())) == len(positions)
+    assert layout.subgraph_positions(neighbors) == positions
+
+    # A node added since the layout was computed.
+    neighbors.add_edge("Sansa Stark", "Nobody")
+    assert "Nobody" in layout.subgraph_positions(neighbors)
+    assert layout.subgraph_positions(nx.Graph()) == {}
+
+
+def test_layout_of_every_version():
+    incremental_kg = kg.copy()
+    layout = incremental_kg.get_layout()
+    assert incremental_kg.get_layout() is layout
+
+    incremental_kg.ingest_lines(["Sansa Stark met Nymeria."])
+    assert incremental_kg.get_layout() is not layout
+    assert incremental_kg.get_layout().version == incremental_kg.version
+    assert "Nymeria" in incremental_kg.get_layout().node_ids
+
+
+def test_answers_with_layout(tmp_path):
+    query = {"type": "neighbors", "character": "Sansa Stark", "distance": 2}
+    compact = answer_query(kg, query, COMPACT, layout=True)
+    assert len(compact["x"]) == len(compact["y"]) == len(compact["nodes"])
+    assert graph_from_compact(compact).number_of_edges() == kg.get_character_neighbors("Sansa Stark", 2).number_of_edges()
+
+    cytoscape = answer_query(kg, query, layout=True)
+    positions = {node["data"]["id"]: node["position"] for node in cytoscape["elements"]["nodes"]}
+    assert positions == {node: {"x": x, "y": y} for node, x, y in zip(compact["nodes"], compact["x"], compact["y"])}
+    assert "position" not in answer_query(kg, query)["elements"]["nodes"][0]
+
+    # The paged queries, the batches and the snapshots have the same positions.
+    paged = answer_query(kg, {**query, "limit": 1000}, COMPACT, layout=True)
+    assert dict(zip(paged["nodes"], paged["x"])) == dict(zip(compact["nodes"], compact["x"]))
+    assert answer_batch(kg, [query], COMPACT, layout=True) == [compact]
+
+    snapshot_path = str(tmp_path / "kg.snapshot")
+    kg.serialize_snapshot(snapshot_path)
+    snapshot = GraphSnapshot(snapshot_path)
+    snapshot_compact = answer_query(snapshot, query, COMPACT, layout=True)
+    assert dict(zip(snapshot_compact["nodes"], zip(snapshot_compact["x"], snapshot_compact["y"]))) == dict(
+        zip(compact["nodes"], zip(compact["x"], compact["y"]))
+    )
+    path = answer_query(
+        snapshot, {"type": "shortest_path", "character1": "Mycah", "character2": "Sandor Clegane"}, COMPACT, layout=True
+    )
+    assert len(path["shortest_path"]["x"]) == 4
+    snapshot.close()
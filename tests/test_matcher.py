@@ -0,0 +1,36 @@
+from pynlp5.knowledge_graph import KnowledgeGraph
+from pynlp5.matcher import MentionMatcher
+import os
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+
+def test_same_matches_as_regex():
+    with open(TEXT_PATH, "r") as f:
+        for line in f:
+            line = line.strip()
+            expected = [c for c in kg.characters if kg.match_character(line, c)]
+            assert kg.match_characters(line) == expected
+
+
+def test_word_boundaries():
+    matcher = MentionMatcher({"Ned": [0], "Ned Stark": [1]})
+    assert matcher.find("Ned Stark laughed.") == {0, 1}
+    assert matcher.find("Nedda and Stark") == set()
+    assert matcher.find("(Ned)") == {0}
+
+
+def test_overlapping_patterns():
+    matcher = MentionMatcher({"Lady": [0], "Lady Stark": [1], "Stark": [2]})
+    assert matcher.find("said Lady Stark") == {0, 1, 2}
+
+
+def test_regex_patterns():
+    matcher = MentionMatcher({"Hukko (unconfirmed)": [0], "Laenor Velaryon.": [1]})
+    assert matcher.find("Hukko unconfirmed") == {0}
+    assert matcher.find("Laenor Velaryon's ship") == {1}
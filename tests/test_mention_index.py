@@ -0,0 +1,72 @@
+from conftest import assert_same_graph
+from pynlp5.knowledge_graph import KnowledgeGraph
+from pynlp5.mention_index import MentionIndex
+import json
+import os
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+
+class CountingMatcher:
+    """Wraps a matcher and counts the lines it matches."""
+
+    def __init__(self, matcher):
+        self.matcher = matcher
+        self.calls = 0
+
+    def find(self, text):
+        self.calls += 1
+        return self.matcher.find(text)
+
+
+def test_build_with_index(tmp_path):
+    indexed_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH, index_dir=str(tmp_path))
+    assert_same_graph(indexed_kg.kg, kg.kg)
+    assert len(os.listdir(tmp_path)) == 1
+
+    # The second build reuses the matches of the index.
+    reused_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+    reused_kg.kg.clear()
+    reused_kg.matcher = CountingMatcher(reused_kg.matcher)
+    reused_kg.build_kg(TEXT_PATH, str(tmp_path))
+    assert reused_kg.matcher.calls == 0
+    assert_same_graph(reused_kg.kg, kg.kg)
+
+
+def test_index_round_trip(tmp_path):
+    KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH, index_dir=str(tmp_path))
+    filename = os.path.join(tmp_path, os.listdir(tmp_path)[0])
+
+    index = MentionIndex.load(filename)
+    assert index.characters == kg.characters
+    assert len(index.line_offsets) == len(index.line_pointers)
+    assert list(index.matches())[-1] == ["Nymeria"]
+
+
+def test_changed_aliases(tmp_path):
+    index_dir = str(tmp_path / "index")
+    KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH, index_dir=index_dir)
+
+    with open(ALIAS_PATH, "r") as f:
+        aliases = json.load(f)
+    aliases["Mycah"] = ["butcher's boy"]
+    del aliases["Sandor Clegane"]
+    alias_path = str(tmp_path / "aliases.json")
+    with open(alias_path, "w") as f:
+        json.dump(aliases, f)
+
+    expected_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, alias_path)
+
+    updated_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, alias_path)
+    updated_kg.kg.clear()
+    updated_kg.matcher = CountingMatcher(updated_kg.matcher)
+    updated_kg.build_kg(TEXT_PATH, index_dir)
+
+    assert_same_graph(updated_kg.kg, expected_kg.kg)
+    # Only the lines with "butcher's boy", "The Hound" or "Dog" are matched again.
+    assert 0 < updated_kg.matcher.calls < 20
@@ -0,0 +1,126 @@
+from pynlp5.batch import answer_batch, answer_query
+from pynlp5.knowledge_graph import KnowledgeGraph
+from pynlp5.metrics import METRICS, SAMPLING, Histogram, Metrics, profiled
+import os
+import pstats
+import pytest
+import time
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+with open(TEXT_PATH, "r") as f:
+    LINES = f.readlines()
+MENTIONS = sum(len(kg.match_characters(line.strip())) for line in LINES if line.strip())
+
+
+def test_histogram():
+    histogram = Histogram((0.1, 1.0, 10.0))
+    for value in [0.05, 0.5, 0.5, 5.0, 50.0]:
+        histogram.observe(value)
+
+    stats = histogram.stats()
+    assert stats["counts"] == [1, 2, 1, 1]
+    assert stats["count"] == 5
+    assert stats["sum"] == pytest.approx(56.05)
+    assert stats["max"] == 50.0
+    assert stats["p50"] == 1.0
+    assert stats["p99"] == 50.0
+
+
+def test_metrics():
+    metrics = Metrics()
+    metrics.increment("lines", 3)
+    metrics.increment("lines")
+    with metrics.timer("work"):
+        pass
+    metrics.register("cache", lambda: {"hits": 2, "hit_rate": 0.5})
+
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"] == {"lines": 4}
+    assert snapshot["timings"]["work"]["count"] == 1
+    assert snapshot["cache"] == {"hits": 2, "hit_rate": 0.5}
+
+    text = metrics.prometheus()
+    assert "pynlp5_lines 4\n" in text
+    assert 'pynlp5_work_seconds_bucket{le="+Inf"} 1\n' in text
+    assert "pynlp5_cache_hit_rate 0.5\n" in text
+
+    metrics.reset()
+    assert metrics.snapshot()["counters"] == {}
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_build_metrics(processes):
+    METRICS.reset()
+    built_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH, processes=processes)
+
+    snapshot = METRICS.snapshot()
+    counters = snapshot["counters"]
+    assert counters["build.lines"] == len(LINES)
+    assert counters["build.mentions"] == MENTIONS
+    assert counters["build.edges_added"] == built_kg.kg.number_of_edges()
+    assert counters["build.edge_updates"] >= built_kg.kg.number_of_edges()
+    assert snapshot["timings"]["build"]["count"] == 1
+    assert snapshot["timings"]["build.match"]["count"] >= 1
+    assert snapshot["timings"]["build.graph"]["count"] >= 1
+
+
+def test_streaming_build_metrics(tmp_path):
+    METRICS.reset()
+    streaming_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH)
+    streaming_kg.build_kg_streaming(TEXT_PATH, str(tmp_path / "kg.checkpoint"), chunk_size=1024, checkpoint_every=2)
+
+    snapshot = METRICS.snapshot()
+    assert snapshot["counters"]["build.lines"] == len(LINES)
+    assert snapshot["counters"]["build.mentions"] == MENTIONS
+    assert snapshot["timings"]["build.read"]["count"] == snapshot["timings"]["build.match"]["count"]
+    assert snapshot["timings"]["build.checkpoint"]["count"] >= 2
+
+
+def test_query_metrics():
+    METRICS.reset()
+    answer_query(kg, {"type": "top_connected_characters", "n": 3})
+    answer_query(kg, {"type": "top_connected_characters", "n": 5})
+    answer_batch(kg, [{"type": "neighbors", "character": "Sansa Stark", "distance": distance} for distance in [1, 2]])
+
+    timings = METRICS.snapshot()["timings"]
+    assert timings["query.top_connected_characters"]["count"] == 2
+    assert timings["query.neighborhoods"]["count"] == 1
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_cprofile(tmp_path):
+    profile_path = str(tmp_path / "build.prof")
+    with profiled(profile_path):
+        KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+    functions = {function for _, _, function in pstats.Stats(profile_path).stats}
+    assert "build_kg" in functions
+    assert "match_characters" in functions
+
+
+def test_sampling_profile(tmp_path):
+    profile_path = str(tmp_path / "build.folded")
+    with profiled(profile_path, SAMPLING):
+        busy(0.2)
+
+    with open(profile_path, "r") as f:
+        stacks = [line.rsplit(" ", 1) for line in f]
+    assert any("busy (" in stack for stack, _ in stacks)
+    assert sum(int(count) for _, count in stacks) > 5
+
+
+def test_unknown_profiler():
+    with pytest.raises(ValueError):
+        with profiled("build.prof", "perf"):
+            pass
@@ -0,0 +1,57 @@
+from conftest import assert_same_graph
+from pynlp5.cooccurrence import WINDOW, CooccurrencePolicy
+from pynlp5.knowledge_graph import KnowledgeGraph
+from pynlp5.parallel import read_chunk, split_into_chunks
+import os
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+
+def edge_set(graph):
+    return {(frozenset(edge), weight) for *edge, weight in graph.edges(data="weight")}
+
+
+def test_chunks_cover_every_line():
+    chunks = split_into_chunks([TEXT_PATH], chunk_size=1000)
+    assert len(chunks) > 1
+
+    lines = [line for chunk in chunks for line in read_chunk(chunk)]
+    with open(TEXT_PATH, "r") as f:
+        assert lines == f.readlines()
+
+
+def test_parallel_build():
+    parallel_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH, processes=2)
+    assert_same_graph(parallel_kg.kg, kg.kg)
+
+
+def test_parallel_build_multiple_files():
+    size = os.path.getsize(TEXT_PATH)
+    byte_ranges = [(TEXT_PATH, 0, size // 2), (TEXT_PATH, size // 2, size)]
+
+    parallel_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+    parallel_kg.kg.clear()
+    parallel_kg.build_kg_parallel(byte_ranges + [TEXT_PATH], processes=2, chunk_size=500)
+
+    sequential_kg = KnowledgeGraph(
+        [TEXT_PATH, TEXT_PATH], CHARACTER_PATH, ALIAS_PATH
+    )
+    assert_same_graph(parallel_kg.kg, sequential_kg.kg)
+
+
+def test_parallel_window_build():
+    # The links between two chunks are added after the edges of the chunk, only the order of the edges can differ.
+    policy = CooccurrencePolicy(WINDOW, 5)
+    parallel_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH, cooccurrence=policy)
+    parallel_kg.build_kg_parallel([TEXT_PATH], processes=2, chunk_size=300)
+    sequential_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH, cooccurrence=policy)
+
+    assert list(parallel_kg.kg.nodes()) == list(sequential_kg.kg.nodes())
+    assert edge_set(parallel_kg.kg) == edge_set(sequential_kg.kg)
+    for node in sequential_kg.kg:
+        assert set(parallel_kg.kg.adj[node]) == set(sequential_kg.kg.adj[node])
@@ -0,0 +1,58 @@
+from pynlp5.knowledge_graph import KnowledgeGraph
+from pynlp5.snapshot import GraphSnapshot
+import networkx as nx
+import os
+import pytest
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+
+def test_path_lengths():
+    kg.build_path_index()
+    characters = kg.get_characters()
+    for character1 in characters:
+        for character2 in characters:
+            if not nx.has_path(kg.kg, character1, character2):
+                continue
+            path, _ = kg.shortest_path_between_characters(character1, character2)
+            expected = nx.shortest_path_length(kg.kg, character1, character2)
+            assert path.number_of_edges() == expected
+            if expected > 0:
+                assert nx.is_connected(path)
+
+
+def test_no_path():
+    with pytest.raises(nx.NetworkXNoPath):
+        kg.shortest_path_between_characters("Sansa Stark", "Serwyn")
+    with pytest.raises(nx.NodeNotFound):
+        kg.shortest_path_between_characters("Sansa Stark", "Arya Stark")
+
+
+def test_index_invalidated_by_ingest():
+    incremental_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+    incremental_kg.build_path_index()
+    path, _ = incremental_kg.shortest_path_between_characters("Mycah", "Clegane")
+    assert len(path) == 5
+
+    incremental_kg.ingest_lines(["Mycah saw Clegane."])
+    path, sum_of_path = incremental_kg.shortest_path_between_characters("Mycah", "Clegane")
+    assert len(path) == 2
+    assert sum_of_path == 1
+
+
+def test_snapshot_shortest_path(tmp_path):
+    filename = str(tmp_path / "kg.snapshot")
+    kg.serialize_snapshot(filename)
+    snapshot = GraphSnapshot(filename)
+
+    path, sum_of_path = snapshot.shortest_path_between_characters("Sansa Stark", "Mycah")
+    expected_path, expected_sum = kg.shortest_path_between_characters("Sansa Stark", "Mycah")
+    assert set(map(frozenset, path.edges())) == set(map(frozenset, expected_path.edges()))
+    assert sum_of_path == expected_sum
+
+    snapshot.close()
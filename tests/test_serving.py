@@ -0,0 +1,104 @@
+from pynlp5.knowledge_graph import KnowledgeGraph
+from pynlp5.serving import GraphStore
+from pynlp5.snapshot import GraphSnapshot
+from threading import Event
+import os
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+
+def test_copy_is_independent():
+    copied_kg = kg.copy()
+    copied_kg.ingest_lines(["Mycah saw Serwyn."])
+
+    assert copied_kg.kg.has_edge("Mycah", "Serwyn")
+    assert not kg.kg.has_edge("Mycah", "Serwyn")
+
+
+def test_swap():
+    changes = []
+    store = GraphStore(on_change=lambda: changes.append(True))
+    assert store.get() == (None, 0)
+
+    assert store.swap(kg) == 1
+    assert store.get() == (kg, 1)
+    assert len(changes) == 1
+
+
+def test_reads_during_background_build():
+    store = GraphStore()
+    store.swap(kg)
+    started = Event()
+    release = Event()
+
+    def slow_build(current_kg):
+        started.set()
+        release.wait()
+        new_kg = current_kg.copy()
+        new_kg.ingest_lines(["Mycah saw Serwyn."])
+        return new_kg
+
+    job_id = store.submit("build", slow_build)
+    started.wait()
+
+    # The previous graph is served until the build is done.
+    assert store.get() == (kg, 1)
+    assert store.job(job_id)["status"] == "running"
+
+    release.set()
+    job = store.wait(job_id)
+    assert job["status"] == "done"
+    new_kg, version = store.get()
+    assert version == 2
+    assert new_kg.kg.has_edge("Mycah", "Serwyn")
+
+
+def test_failed_job():
+    store = GraphStore()
+
+    def failing_build(current_kg):
+        raise ValueError("Knowledge graph not loaded.")
+
+    job = store.wait(store.submit("ingest", failing_build))
+    assert job["status"] == "failed"
+    assert job["error"] == "Knowledge graph not loaded."
+    assert store.get() == (None, 0)
+
+
+def test_finished_jobs_are_forgotten(tmp_path, monkeypatch):
+    monkeypatch.setattr("pynlp5.serving.FINISHED_JOBS", 2)
+    store = GraphStore(str(tmp_path))
+
+    job_ids = [store.submit("build", lambda current_kg: kg) for _ in range(4)]
+    store.executor.shutdown(wait=True)
+
+    # Only the futures of the running jobs and the statuses of the last finished jobs are kept.
+    assert store.futures == {}
+    assert list(store.jobs) == job_ids[2:]
+    assert store.job(job_ids[0]) is None
+    assert store.job(job_ids[3])["status"] == "done"
+    assert sorted(os.listdir(tmp_path / "jobs")) == sorted(f"{job_id}.json" for job_id in job_ids[2:])
+
+
+def test_shared_between_workers(tmp_path):
+    publish_dir = str(tmp_path)
+    worker1 = GraphStore(publish_dir)
+    worker2 = GraphStore(publish_dir)
+
+    job_id = worker1.submit("build", lambda current_kg: kg)
+    worker1.wait(job_id)
+
+    # The other worker sees the new graph and the status of the job.
+    graph, version = worker2.get()
+    assert isinstance(graph, GraphSnapshot)
+    assert version == 1
+    assert set(graph.get_characters()) == set(kg.get_characters())
+    assert worker2.job(job_id)["status"] == "done"
+
+    worker2.swap(graph)
+    assert worker1.get()[1] == 2
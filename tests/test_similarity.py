@@ -0,0 +1,151 @@
+from pynlp5.batch import answer_query
+from pynlp5.knowledge_graph import KnowledgeGraph
+from pynlp5.similarity import MINHASH_PRIME, SimilarityIndex, minhash_signatures
+from pynlp5.snapshot import GraphSnapshot
+from pynlp5.sparse import SparseAdjacency
+import networkx as nx
+import numpy as np
+import os
+import pytest
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+
+def cosine(graph, node1, node2):
+    neighbors1, neighbors2 = graph.adj[node1], graph.adj[node2]
+    product = sum(neighbors1[n]["weight"] * neighbors2[n]["weight"] for n in neighbors1 if n in neighbors2)
+    norm1 = np.sqrt(sum(data["weight"] ** 2 for data in neighbors1.values()))
+    norm2 = np.sqrt(sum(data["weight"] ** 2 for data in neighbors2.values()))
+    return product / (norm1 * norm2) if norm1 * norm2 else 0
+
+
+def jaccard(graph, node1, node2):
+    neighbors1, neighbors2 = graph.adj[node1], graph.adj[node2]
+    minimums = sum(min(neighbors1[n]["weight"], neighbors2[n]["weight"]) for n in neighbors1 if n in neighbors2)
+    maximums = sum(data["weight"] for data in neighbors1.values()) + sum(data["weight"] for data in neighbors2.values())
+    return minimums / (maximums - minimums) if maximums else 0
+
+
+def planted_graph(groups=50, size=20, seed=0):
+    # Every node is linked to most of its group, the nodes of a group have similar neighbors.
+    rng = np.random.default_rng(seed)
+    graph = nx.Graph()
+    for group in range(groups):
+        members = range(group * size, (group + 1) * size)
+        for node in members:
+            for neighbor in rng.choice(members, size // 2, replace=False):
+                if neighbor != node:
+                    graph.add_edge(f"c{node}", f"c{neighbor}", weight=int(rng.integers(1, 5)))
+    return graph
+
+
+def test_similarities():
+    index = SimilarityIndex(SparseAdjacency.from_graph(kg.kg))
+    for character in kg.kg:
+        node_id = index.node_ids[character]
+        for metric, reference in [("cosine", cosine), ("jaccard", jaccard)]:
+            similarities = index.similarities(node_id, metric)
+            assert similarities == pytest.approx([reference(kg.kg, character, other) for other in index.nodes])
+            candidates = np.array([0, 2, 4])
+            assert index.similarities(node_id, metric, candidates) == pytest.approx(similarities[candidates])
+
+    with pytest.raises(ValueError):
+        index.similarities(0, "euclidean")
+
+
+def test_most_similar():
+    index = SimilarityIndex(SparseAdjacency.from_graph(kg.kg))
+    similar, method = index.most_similar("Sansa Stark", 100)
+    assert method == "exact"
+    expected = sorted(
+        (
+            (-cosine(kg.kg, "Sansa Stark", other), index.node_ids[other], other)
+            for other in kg.kg
+            if other != "Sansa Stark" and cosine(kg.kg, "Sansa Stark", other) > 0
+        )
+    )
+    assert [character for character, _ in similar] == [other for _, _, other in expected]
+    assert [similarity for _, similarity in similar] == pytest.approx([-similarity for similarity, _, _ in expected])
+    assert index.most_similar("Sansa Stark", 2)[0] == similar[:2]
+    assert index.most_similar("Sansa Stark", 0)[0] == []
+
+    with pytest.raises(nx.NetworkXError):
+        index.most_similar("Nobody")
+    for arguments in [{"k": -1}, {"metric": "euclidean"}, {"method": "nope"}]:
+        with pytest.raises(ValueError):
+            index.most_similar("Sansa Stark", **arguments)
+
+
+def test_minhash_signatures():
+    # Two rows with 60 shared neighbors out of 100: the share of equal hashes estimates the Jaccard index 0.6.
+    rows = [list(range(0, 80)), list(range(20, 100)), [], [5]]
+    indptr = np.cumsum([0] + [len(row) for row in rows])
+    indices = np.array([node for row in rows for node in row])
+    signatures = minhash_signatures(indptr, indices, 256)
+
+    assert signatures.shape == (4, 256)
+    assert abs((signatures[0] == signatures[1]).mean() - 0.6) < 0.1
+    assert (signatures[2] == MINHASH_PRIME).all()
+    assert (signatures[3] >= signatures[0]).all()
+    assert (minhash_signatures(indptr, indices, 256) == signatures).all()
+
+
+def test_lsh():
+    graph = planted_graph()
+    index = SimilarityIndex(SparseAdjacency.from_graph(graph))
+
+    # The candidates are mostly in the group of the character, and only a small part of the graph.
+    candidates = index.candidates(index.node_ids["c0"])
+    groups = [int(index.nodes[node][1:]) // 20 for node in candidates]
+    assert index.node_ids["c0"] not in candidates
+    assert groups.count(0) >= 15 and len(candidates) < 100
+
+    # The approximate characters are scored exactly, most of them are the exact ones.
+    exact, _ = index.most_similar("c0", 10, "jaccard", "exact")
+    approximate, method = index.most_similar("c0", 10, "jaccard", "lsh")
+    assert method == "lsh"
+    assert set(approximate) <= set(index.most_similar("c0", len(graph), "jaccard", "exact")[0])
+    assert len(set(approximate) & set(exact)) >= 7
+
+
+def test_similar_query(tmp_path):
+    query = {"type": "similar", "character": "Sansa Stark", "k": 3}
+    answer = answer_query(kg, query)
+    similar, _ = kg.get_similar_characters("Sansa Stark", 3)
+    assert answer == {
+        "character": "Sansa Stark",
+        "metric": "cosine",
+        "method": "exact",
+        "similar": [{"character": other, "similarity": similarity} for other, similarity in similar],
+    }
+    assert answer_query(kg, {**query, "metric": "jaccard"})["similar"][0]["similarity"] == pytest.approx(
+        max(jaccard(kg.kg, "Sansa Stark", other) for other in kg.kg if other != "Sansa Stark")
+    )
+
+    snapshot_path = str(tmp_path / "kg.snapshot")
+    kg.serialize_snapshot(snapshot_path)
+    snapshot = GraphSnapshot(snapshot_path)
+    assert answer_query(snapshot, query) == answer
+    snapshot.close()
+
+    assert "error" in answer_query(kg, {**query, "character": "Nobody"})
+    assert "error" in answer_query(kg, {**query, "metric": "euclidean"})
+    assert "error" in answer_query(kg, {**query, "method": "nope"})
+    assert "error" in answer_query(kg, {**query, "k": -1})
+
+
+def test_similarity_of_every_version():
+    incremental_kg = kg.copy()
+    index = incremental_kg.get_similarity_index()
+    assert incremental_kg.get_similarity_index() is index
+
+    incremental_kg.ingest_lines(["Mycah met Nymeria."])
+    assert incremental_kg.get_similarity_index() is not index
+    assert incremental_kg.get_similarity_index().version == incremental_kg.version
+    assert "Nymeria" in incremental_kg.get_similarity_index().node_ids
+    assert kg.get_similarity_index().version == kg.version
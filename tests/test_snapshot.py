@@ -0,0 +1,59 @@
+from pynlp5.knowledge_graph import KnowledgeGraph
+from pynlp5.snapshot import GraphSnapshot, is_snapshot
+import networkx as nx
+import os
+import pytest
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+
+def assert_same_subgraph(subgraph1, subgraph2):
+    assert set(subgraph1.nodes()) == set(subgraph2.nodes())
+    assert {(frozenset(edge), weight) for *edge, weight in subgraph1.edges(data="weight")} == {
+        (frozenset(edge), weight) for *edge, weight in subgraph2.edges(data="weight")
+    }
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    filename = str(tmp_path / "kg.snapshot")
+    kg.serialize_snapshot(filename)
+    snapshot = GraphSnapshot(filename)
+    yield snapshot
+    snapshot.close()
+
+
+def test_snapshot_characters(snapshot):
+    assert snapshot.get_characters() == kg.get_characters()
+    assert snapshot.node_id("Mycah") == kg.get_characters().index("Mycah")
+    with pytest.raises(nx.NetworkXError):
+        snapshot.node_id("Arya Stark")
+
+
+def test_snapshot_neighbors(snapshot):
+    for depth in [1, 2, 3]:
+        neighbors = snapshot.get_character_neighbors("Sansa Stark", depth)
+        expected = kg.get_character_neighbors("Sansa Stark", depth)
+        assert_same_subgraph(neighbors, expected)
+
+
+def test_snapshot_most_connections(snapshot):
+    character, connections, subgraph = snapshot.get_character_with_most_connections()
+    expected = kg.get_character_with_most_connections()
+    assert (character, connections) == expected[:2]
+    assert_same_subgraph(subgraph, expected[2])
+
+
+def test_deserialize_snapshot(tmp_path):
+    filename = str(tmp_path / "kg.snapshot")
+    kg.serialize_snapshot(filename)
+    assert is_snapshot(filename)
+
+    loaded_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH, filename)
+    assert list(loaded_kg.kg.nodes()) == list(kg.kg.nodes())
+    assert list(loaded_kg.kg.edges(data=True)) == list(kg.kg.edges(data=True))
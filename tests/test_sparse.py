@@ -0,0 +1,72 @@
+from pynlp5.knowledge_graph import KnowledgeGraph
+from pynlp5.snapshot import GraphSnapshot
+from pynlp5.sparse import SparseAdjacency
+import networkx as nx
+import os
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+
+def test_degrees():
+    adjacency = SparseAdjacency.from_graph(kg.kg)
+    for node, degree in kg.kg.degree(weight="weight"):
+        assert adjacency.degrees[adjacency.node_id(node)] == degree
+
+
+def edge_set(graph):
+    return {frozenset(edge) for edge in graph.edges()}
+
+
+def test_neighbors_match_networkx(tmp_path):
+    filename = str(tmp_path / "kg.snapshot")
+    kg.serialize_snapshot(filename)
+    snapshot = GraphSnapshot(filename)
+    adjacency = SparseAdjacency.from_graph(kg.kg)
+
+    # The parent of a node is the one networkx finds first, so the trees have the same edges.
+    for character in kg.get_characters():
+        for depth in [1, 2, 3]:
+            expected = list(nx.bfs_edges(kg.kg, character, depth_limit=depth))
+            edges = adjacency.bfs_edges(adjacency.node_id(character), depth)
+            assert [(adjacency.nodes[parent], adjacency.nodes[child]) for parent, child in edges] == expected
+            assert edge_set(kg.get_character_neighbors(character, depth)) == set(map(frozenset, expected))
+            assert edge_set(snapshot.get_character_neighbors(character, depth)) == set(map(frozenset, expected))
+
+    snapshot.close()
+
+
+def test_top_connected_characters():
+    assert kg.get_top_connected_characters(2) == [("Sansa Stark", 10), ("Joffrey Baratheon", 8)]
+    assert len(kg.get_top_connected_characters(100)) == len(kg.get_characters())
+
+
+def test_connected_components():
+    components = kg.get_connected_components()
+    expected = sorted(nx.connected_components(kg.kg), key=len, reverse=True)
+    assert [set(component) for component in components] == expected
+
+
+def test_rebuilt_after_ingest():
+    incremental_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+    components = len(incremental_kg.get_connected_components())
+
+    incremental_kg.ingest_lines(["Mycah saw Serwyn."])
+    assert len(incremental_kg.get_connected_components()) == components - 1
+
+
+def test_snapshot_analytics(tmp_path):
+    filename = str(tmp_path / "kg.snapshot")
+    kg.serialize_snapshot(filename)
+    snapshot = GraphSnapshot(filename)
+
+    assert snapshot.get_top_connected_characters(2) == kg.get_top_connected_characters(2)
+    assert [set(component) for component in snapshot.get_connected_components()] == [
+        set(component) for component in kg.get_connected_components()
+    ]
+
+    snapshot.close()
@@ -0,0 +1,38 @@
+from pynlp5.knowledge_graph import KnowledgeGraph
+import os
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+
+def test_no_matcher_when_loading_snapshot(tmp_path):
+    filename = str(tmp_path / "kg.snapshot")
+    kg.serialize_snapshot(filename)
+    loaded_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH, filename)
+
+    assert set(loaded_kg.get_characters()) == set(kg.get_characters())
+    assert loaded_kg._matcher is None
+    assert loaded_kg._characters_regex is None
+
+
+def test_matcher_compiled_once():
+    kg2 = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH)
+    assert kg2._matcher is None
+
+    # The matcher is compiled on first use, and shared with the graphs built from the same characters.
+    assert kg2.match_characters("Sansa saw Arya.") == kg.match_characters("Sansa saw Arya.")
+    assert kg2.matcher is kg.matcher
+    assert kg2.characters_regex is kg.characters_regex
+
+
+def test_changed_aliases_compile_new_matcher():
+    kg2 = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH)
+    kg2.character_aliases = {**kg2.character_aliases, "Mycah": ["the butcher's boy"]}
+
+    assert kg2.characters_hash() != kg.characters_hash()
+    assert kg2.matcher is not kg.matcher
+    assert "Mycah" in kg2.match_characters("He saw the butcher's boy.")
@@ -0,0 +1,187 @@
+from pynlp5.batch import answer_query
+from pynlp5.knowledge_graph import KnowledgeGraph
+from pynlp5.snapshot import GraphSnapshot
+from pynlp5.temporal import chapter_ranges, parse_period, parse_time_range
+import os
+import pytest
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+DATA_DIR = os.path.join(dir_name, "..", "data")
+
+with open(TEXT_PATH, "r") as f:
+    LINES = f.readlines()
+
+# The chapters of the raw book we write for the test lines, the first line of every chapter.
+CHAPTER_STARTS = [0, 40, 110]
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+
+@pytest.fixture
+def book(tmp_path):
+    # A raw book with chapter headings (and a page header), and the preprocessed text of the book.
+    text_path = str(tmp_path / "001test_line.txt")
+    with open(text_path, "w") as f:
+        f.writelines(LINES)
+
+    headings = dict(zip(CHAPTER_STARTS, ["PROLOGUE", "SANSA", "ARYA"]))
+    with open(str(tmp_path / "001test.txt"), "w") as f:
+        for i, line in enumerate(LINES):
+            if i in headings:
+                f.write(f"{headings[i]}\n")
+            if i == 70:
+                f.write("A GAME OF THRONES 213\n")
+            f.write(line)
+        # The preprocessing only keeps the text followed by a line in capital letters.
+        f.write("\nAPPENDIX\n")
+
+    return text_path
+
+
+def chapter_kg(lines):
+    chapter = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH)
+    chapter.ingest_lines(lines)
+    return chapter
+
+
+def graph_weights(graph):
+    return {tuple(sorted(edge)): weight for *edge, weight in graph.edges(data="weight")}
+
+
+def slice_weight(time_slice, character1, character2):
+    return time_slice.weight(time_slice.node_ids[character1], time_slice.node_ids[character2])
+
+
+def test_chapter_ranges(book):
+    offsets = [sum(len(line.encode("utf-8")) for line in LINES[:start]) for start in CHAPTER_STARTS]
+    size = os.path.getsize(book)
+
+    assert chapter_ranges(book) == [
+        (1, offsets[0], offsets[1]),
+        (2, offsets[1], offsets[2]),
+        (3, offsets[2], size),
+    ]
+    assert chapter_ranges(book, offsets[1] + 10, size - 10) == [
+        (2, offsets[1] + 10, offsets[2]),
+        (3, offsets[2], size - 10),
+    ]
+
+    # A text without a raw book is a single chapter.
+    assert chapter_ranges(TEXT_PATH) == [(0, 0, os.path.getsize(TEXT_PATH))]
+
+
+def test_book_chapters():
+    # The chapters of the real books, with the title pages (and the table of contents of A Dance with Dragons)
+    # but without the appendix, the acknowledgments or the teaser of the next book.
+    chapters = [len(chapter_ranges(os.path.join(DATA_DIR, f"00{book}ssb_line.txt"))) for book in range(1, 6)]
+    assert chapters == [73, 71, 69, 48, 79]
+
+
+def test_chapter_slices(book):
+    book_kg = KnowledgeGraph(book, CHARACTER_PATH, ALIAS_PATH)
+    assert book_kg.temporal.periods == [(1, 1), (1, 2), (1, 3)]
+    assert graph_weights(book_kg.kg) == graph_weights(kg.kg)
+
+    for chapter, (start, end) in enumerate(zip(CHAPTER_STARTS, CHAPTER_STARTS[1:] + [len(LINES)]), 1):
+        time_slice = book_kg.get_time_slice(((1, chapter), (1, chapter)))
+        expected = graph_weights(chapter_kg(LINES[start:end]).kg)
+        assert {edge: slice_weight(time_slice, *edge) for edge in expected} == expected
+        assert time_slice.matrix.nnz == 2 * len(expected)
+
+    neighbors = book_kg.get_character_neighbors("Sansa Stark", 1, ((1, 2), (1, 3)))
+    expected = chapter_kg(LINES[CHAPTER_STARTS[1] :]).get_character_neighbors("Sansa Stark", 1)
+    assert graph_weights(neighbors) == graph_weights(expected)
+
+    # The whole book is the full graph.
+    assert graph_weights(book_kg.get_character_neighbors("Sansa Stark", 2, ((1, None), None))) == graph_weights(
+        book_kg.get_character_neighbors("Sansa Stark", 2)
+    )
+
+
+def test_builds_have_the_same_slices(book, tmp_path):
+    sequential_kg = KnowledgeGraph(book, CHARACTER_PATH, ALIAS_PATH)
+    parallel_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH)
+    parallel_kg.build_kg_parallel([book], processes=2, chunk_size=300)
+    index_kg = KnowledgeGraph(book, CHARACTER_PATH, ALIAS_PATH, index_dir=str(tmp_path / "index"))
+    streaming_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH)
+    streaming_kg.build_kg_streaming(book, str(tmp_path / "kg.checkpoint"), chunk_size=1024)
+
+    time_range = ((1, 2), (1, 2))
+    expected = sequential_kg.get_character_neighbors("Sansa Stark", 2, time_range)
+    for other_kg in [parallel_kg, index_kg, streaming_kg]:
+        assert other_kg.temporal.periods == sequential_kg.temporal.periods
+        neighbors = other_kg.get_character_neighbors("Sansa Stark", 2, time_range)
+        assert graph_weights(neighbors) == graph_weights(expected)
+
+
+def test_books_are_periods(book):
+    books_kg = KnowledgeGraph([book, TEXT_PATH], CHARACTER_PATH, ALIAS_PATH)
+    assert books_kg.temporal.periods == [(1, 1), (1, 2), (1, 3), (2, 0)]
+
+    # The second book is the test lines again.
+    second_book = books_kg.get_character_neighbors("Sansa Stark", 2, ((2, None), (2, None)))
+    assert graph_weights(second_book) == graph_weights(kg.get_character_neighbors("Sansa Stark", 2))
+
+    character, connections, _ = books_kg.get_character_with_most_connections(((2, None), None))
+    assert (character, connections) == kg.get_character_with_most_connections()[:2]
+
+
+def test_serialized_slices(book, tmp_path):
+    book_kg = KnowledgeGraph(book, CHARACTER_PATH, ALIAS_PATH)
+    time_range = ((1, 3), (1, 3))
+    expected = book_kg.get_character_neighbors("Sansa Stark", 2, time_range)
+
+    json_path = str(tmp_path / "kg.json")
+    book_kg.serialize_kg(json_path)
+    json_kg = KnowledgeGraph([], CHARACTER_PATH, ALIAS_PATH, json_path)
+    assert graph_weights(json_kg.get_character_neighbors("Sansa Stark", 2, time_range)) == graph_weights(expected)
+
+    snapshot_path = str(tmp_path / "kg.snapshot")
+    book_kg.serialize_snapshot(snapshot_path)
+    snapshot = GraphSnapshot(snapshot_path)
+    assert graph_weights(snapshot.get_character_neighbors("Sansa Stark", 2, time_range)) == graph_weights(expected)
+    assert snapshot.shortest_path_between_characters("Sansa Stark", "Joffrey Baratheon", time_range)[1] == (
+        book_kg.shortest_path_between_characters("Sansa Stark", "Joffrey Baratheon", time_range)[1]
+    )
+    snapshot.close()
+
+
+def test_ingested_lines_are_in_the_last_period(book):
+    book_kg = KnowledgeGraph(book, CHARACTER_PATH, ALIAS_PATH)
+    before = slice_weight(book_kg.get_time_slice(((1, 3), (1, 3))), "Sansa Stark", "Joffrey Baratheon")
+    earlier = slice_weight(book_kg.get_time_slice(((1, 1), (1, 2))), "Sansa Stark", "Joffrey Baratheon")
+
+    book_kg.ingest_lines(["Sansa Stark looked at Joffrey Baratheon."])
+    after = slice_weight(book_kg.get_time_slice(((1, 3), (1, 3))), "Sansa Stark", "Joffrey Baratheon")
+    assert after == before + 1
+    assert slice_weight(book_kg.get_time_slice(((1, 1), (1, 2))), "Sansa Stark", "Joffrey Baratheon") == earlier
+
+
+def test_time_range_queries(book):
+    book_kg = KnowledgeGraph(book, CHARACTER_PATH, ALIAS_PATH)
+
+    answer = answer_query(
+        book_kg, {"type": "neighbors", "character": "Sansa Stark", "from": "1:2", "to": "1:2"}
+    )
+    nodes = {node["data"]["id"] for node in answer["elements"]["nodes"]}
+    assert nodes == set(book_kg.get_character_neighbors("Sansa Stark", 1, ((1, 2), (1, 2))).nodes())
+
+    assert "error" in answer_query(book_kg, {"type": "neighbors", "character": "Sansa Stark", "from": "2"})
+    assert "error" in answer_query(book_kg, {"type": "neighbors", "character": "Sansa Stark", "from": "one"})
+    assert "error" in answer_query(
+        book_kg, {"type": "get_character_with_most_connections", "from": "1:3", "to": "1:2"}
+    )
+
+
+def test_parse_time_range():
+    assert parse_period("3") == (3, None)
+    assert parse_period("3:12") == (3, 12)
+    assert parse_time_range("", "") is None
+    assert parse_time_range("2", "") == ((2, None), None)
+    with pytest.raises(ValueError):
+        parse_period("3:12:1")
+    with pytest.raises(ValueError):
+        parse_period("-1")
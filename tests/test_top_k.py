@@ -0,0 +1,190 @@
+from pynlp5.batch import answer_batch, answer_query
+from pynlp5.degree_index import DegreeIndex
+from pynlp5.knowledge_graph import KnowledgeGraph
+from pynlp5.paging import decode_cursor, encode_cursor, page
+from pynlp5.snapshot import GraphSnapshot
+from pynlp5.wire import COMPACT
+import networkx as nx
+import os
+import pytest
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+
+def sorted_degrees(graph):
+    # The order of the degree index, equal degrees in the order of the graph.
+    nodes = list(graph.nodes())
+    degrees = dict(graph.degree(weight="weight"))
+    return sorted(((node, degrees[node]) for node in nodes), key=lambda item: (-item[1], nodes.index(item[0])))
+
+
+def edge_set(edges):
+    return {(frozenset((node1, node2)), weight) for node1, node2, weight in edges}
+
+
+def compact_edges(graph):
+    nodes = graph["nodes"]
+    return edge_set((nodes[i], nodes[j], weight) for i, j, weight in zip(graph["sources"], graph["targets"], graph["weights"]))
+
+
+def test_degree_index():
+    graph = nx.Graph()
+    graph.add_weighted_edges_from([("a", "b", 3), ("b", "c", 1), ("c", "d", 5)])
+    index = DegreeIndex.from_graph(graph)
+    assert index.top(2) == [("c", 6), ("d", 5)]
+    assert index.top(2, offset=2) == [("b", 4), ("a", 3)]
+    assert index.top(10, offset=3) == [("a", 3)]
+
+    copy = index.copy()
+    copy.add(["e"], {("a", "e"): 4, ("b", "c"): 1})
+    graph.add_weighted_edges_from([("a", "e", 4), ("b", "c", 2)])
+    assert copy.top(len(graph)) == sorted_degrees(graph)
+    # The copy is updated on its own.
+    assert index.top(1) == [("c", 6)]
+    assert len(index) == 4 and len(copy) == 5
+
+
+def test_paging():
+    items = [(i, str(i)) for i in range(10)]
+    first, cursor = page(items, 4)
+    assert first == items[:4]
+    assert decode_cursor(cursor) == (4, [3])
+
+    second, cursor = page(items, 4, cursor)
+    last, cursor = page(items, 4, cursor)
+    assert second == items[4:8] and last == items[8:]
+    assert cursor is None
+
+    assert page(items) == (items, None)
+    with pytest.raises(ValueError):
+        page(items, -1)
+    with pytest.raises(ValueError):
+        page(items, 4, "not a cursor")
+    # The items changed since the cursor was made.
+    with pytest.raises(ValueError):
+        page(items[1:], 4, encode_cursor(4, [3]))
+
+
+def test_top_k_connected():
+    expected = sorted_degrees(kg.kg)
+    assert kg.top_k_connected(5) == expected[:5]
+    assert kg.top_k_connected(5, offset=3) == expected[3:8]
+    assert kg.get_top_connected_characters(4) == expected[:4]
+
+    character, connections, _ = kg.get_character_with_most_connections()
+    assert (character, connections) == expected[0]
+
+    # The whole book as a time range is the full graph.
+    assert kg.top_k_connected(5, time_range=((1, None), None)) == expected[:5]
+
+
+def test_top_k_after_ingest():
+    incremental_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+    index = incremental_kg.get_degree_index()
+    copy_kg = incremental_kg.copy()
+
+    lines = ["Sansa Stark watched Nymeria.", "Serwyn waited.", "Mycah ran from Sansa Stark and Nymeria."]
+    copy_kg.ingest_lines(lines * 50)
+
+    # The index was updated, not rebuilt, and it is the one of a fresh build.
+    assert copy_kg.get_degree_index() is not index
+    assert copy_kg.get_degree_index().version == copy_kg.version
+    assert copy_kg.top_k_connected(len(copy_kg.kg)) == sorted_degrees(copy_kg.kg)
+    # The graph it was copied from keeps its index.
+    assert incremental_kg.get_degree_index() is index
+    assert incremental_kg.top_k_connected(5) == kg.top_k_connected(5)
+
+
+def test_neighbor_edges():
+    for depth in [1, 2, 3]:
+        neighbors = kg.get_character_neighbors("Sansa Stark", depth)
+        edges = kg.get_neighbor_edges("Sansa Stark", depth)
+        assert edge_set(edges) == edge_set(neighbors.edges(data="weight"))
+
+    edges = kg.get_neighbor_edges("Sansa Stark", 2, min_weight=3)
+    assert edges and all(weight >= 3 for *_, weight in edges)
+    assert edge_set(edges) <= edge_set(kg.get_neighbor_edges("Sansa Stark", 2))
+
+    # The direct neighbors come first, the strongest first.
+    edges = kg.get_neighbor_edges("Sansa Stark", 1)
+    assert [weight for *_, weight in edges] == sorted((weight for *_, weight in edges), reverse=True)
+
+
+def test_neighbors_pages():
+    full = answer_query(kg, {"type": "neighbors", "character": "Sansa Stark", "distance": 2}, COMPACT)
+    full_edges = compact_edges(full)
+
+    edges = set()
+    cursor = ""
+    pages = 0
+    while cursor is not None:
+        query = {"type": "neighbors", "character": "Sansa Stark", "distance": 2, "limit": 5, "cursor": cursor}
+        answer = answer_query(kg, query, COMPACT)
+        assert len(answer["weights"]) <= 5
+        assert answer["total_edges"] == len(full_edges)
+        edges |= compact_edges(answer)
+        cursor = answer["next_cursor"]
+        pages += 1
+
+    assert edges == full_edges
+    assert pages == (len(full_edges) + 4) // 5
+
+    answer = answer_query(kg, {"type": "neighbors", "character": "Sansa Stark", "limit": 5, "cursor": "nope"})
+    assert "error" in answer
+
+
+def test_stale_cursor():
+    incremental_kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+    query = {"type": "top_k_connected", "k": 2}
+    answer = answer_query(incremental_kg, query)
+    assert [item["character"] for item in answer["characters"]] == [character for character, _ in kg.top_k_connected(2)]
+
+    # Serwyn becomes the second most connected character, the second page would skip a character.
+    incremental_kg.ingest_lines([f"Serwyn met {character}." for character, _ in kg.top_k_connected(2)] * 1000)
+    answer = answer_query(incremental_kg, {**query, "cursor": answer["next_cursor"]})
+    assert "error" in answer
+
+
+def test_top_k_pages():
+    expected = kg.top_k_connected(len(kg.kg))
+    characters = []
+    cursor = ""
+    while cursor is not None:
+        answer = answer_query(kg, {"type": "top_k_connected", "k": 3, "cursor": cursor})
+        characters += [(item["character"], item["connections"]) for item in answer["characters"]]
+        cursor = answer["next_cursor"]
+    assert characters == expected
+
+    assert "error" in answer_query(kg, {"type": "top_k_connected", "k": 0})
+
+
+def test_batch_pages():
+    queries = [
+        {"type": "neighbors", "character": "Sansa Stark", "distance": 2},
+        {"type": "neighbors", "character": "Sansa Stark", "distance": 2, "limit": 3},
+        {"type": "neighbors", "character": "Sansa Stark", "distance": 2, "min_weight": 3},
+    ]
+    answers = answer_batch(kg, queries)
+    assert [answer_query(kg, query) for query in queries] == answers
+    assert "next_cursor" not in answers[0]
+    assert answers[1]["next_cursor"] is not None
+
+
+def test_snapshot_top_k(tmp_path):
+    filename = str(tmp_path / "kg.snapshot")
+    kg.serialize_snapshot(filename)
+    snapshot = GraphSnapshot(filename)
+    try:
+        assert snapshot.top_k_connected(5) == kg.top_k_connected(5)
+        assert snapshot.top_k_connected(5, offset=2) == kg.top_k_connected(5, offset=2)
+        assert snapshot.get_character_with_most_connections()[:2] == kg.get_character_with_most_connections()[:2]
+        assert edge_set(snapshot.get_neighbor_edges("Sansa Stark", 2, min_weight=2)) == edge_set(
+            kg.get_neighbor_edges("Sansa Stark", 2, min_weight=2)
+        )
+    finally:
+        snapshot.close()
@@ -0,0 +1,57 @@
+from pynlp5.batch import answer_query
+from pynlp5.knowledge_graph import KnowledgeGraph
+from pynlp5.wire import (
+    COMPACT,
+    compact_graph,
+    graph_from_compact,
+    serialize_response,
+)
+import json
+import os
+import pytest
+
+dir_name = os.path.dirname(os.path.realpath(__file__))
+CHARACTER_PATH = os.path.join(dir_name, "characters_test.txt")
+ALIAS_PATH = os.path.join(dir_name, "character_aliases_test.json")
+TEXT_PATH = os.path.join(dir_name, "test_lines.txt")
+
+kg = KnowledgeGraph(TEXT_PATH, CHARACTER_PATH, ALIAS_PATH)
+
+
+def test_compact_round_trip():
+    data = compact_graph(kg.kg)
+    assert len(data["nodes"]) == kg.kg.number_of_nodes()
+    assert len(data["sources"]) == len(data["targets"]) == len(data["weights"])
+
+    graph = graph_from_compact(data)
+    assert list(graph.nodes()) == list(kg.kg.nodes())
+    assert list(graph.edges(data=True)) == list(kg.kg.edges(data=True))
+
+
+def test_compact_answers():
+    answer = answer_query(
+        kg,
+        {"type": "shortest_path", "character1": "Mycah", "character2": "Sandor Clegane"},
+        COMPACT,
+    )
+    path = graph_from_compact(answer["shortest_path"])
+    assert path.number_of_edges() == 3
+    assert answer["sum_of_path_weights"] == sum(answer["shortest_path"]["weights"])
+
+    # The compact json is much smaller than the cytoscape json.
+    neighbors = {"type": "neighbors", "character": "Sansa Stark", "distance": 2}
+    compact_size = len(serialize_response(answer_query(kg, neighbors, COMPACT))[0])
+    cytoscape_size = len(serialize_response(answer_query(kg, neighbors))[0])
+    assert compact_size * 3 < cytoscape_size
+
+
+def test_serialize_response():
+    data = answer_query(kg, {"type": "neighbors", "character": "Sansa Stark"}, COMPACT)
+    body, mimetype = serialize_response(data)
+    assert mimetype == "application/json"
+    assert json.loads(body) == data
+
+    msgpack = pytest.importorskip("msgpack")
+    body, mimetype = serialize_response(data, "msgpack")
+    assert mimetype == "application/msgpack"
+    assert msgpack.unpackb(body) == data